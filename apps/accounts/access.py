@@ -0,0 +1,186 @@
+"""
+Cached roles and departments for permission checks.
+
+``has_role``, ``is_department_member`` and friends, and the DRF permission
+classes built on them, queried ``UserRole``, ``Department`` or
+``UserDepartment`` on every call, so a request could run the same lookup
+several times and a list endpoint checking object permissions ran one per
+result.
+
+A user's active role names, department ids and headed department ids are
+now loaded together into a frozen ``Access``:
+
+* ``for_request`` memoizes it on the request, so a request resolves its
+  user once however many checks it makes.
+* Across requests it is cached under a per-user version token. The
+  ``UserRole``, ``Role``, ``UserDepartment`` and ``Department`` signals
+  replace the token, which orphans the old entry instead of having to find
+  and delete it. Entries also expire when the first of the user's roles
+  does.
+* ``get_many`` resolves many users with two cache reads and at most three
+  queries for the misses, for bulk checks such as ``same_department``.
+"""
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.common import helpers
+
+from .models import Department, UserDepartment, UserRole
+
+ACCESS_CACHE_TIMEOUT = 60 * 60
+EMPTY = frozenset()
+
+
+@dataclass(frozen=True)
+class Access:
+    """What permission checks need to know about one user"""
+
+    roles: frozenset = EMPTY
+    departments: frozenset = EMPTY
+    headed_departments: frozenset = EMPTY
+
+    def has_role(self, name):
+        return name in self.roles
+
+    def has_any_role(self, names):
+        return not self.roles.isdisjoint(names)
+
+    def is_department_head(self, department_id=None):
+        if department_id is None:
+            return bool(self.headed_departments)
+        return department_id in self.headed_departments
+
+    def is_department_member(self, department_id):
+        return department_id in self.departments
+
+    def shares_department(self, other):
+        return not self.departments.isdisjoint(other.departments)
+
+
+def _version_key(user_id):
+    return f"access_version:{user_id}"
+
+
+def _key(user_id, version):
+    return f"access:{user_id}:{version}"
+
+
+def _versions(user_ids):
+    keys = {_version_key(user_id): user_id for user_id in user_ids}
+    versions = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = {
+        _version_key(user_id): uuid.uuid4().hex
+        for user_id in user_ids
+        if user_id not in versions
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update({keys[key]: value for key, value in missing.items()})
+    return versions
+
+
+def load(user_ids):
+    """
+    {user id: (Access, seconds until its first role expires or None)},
+    read from the database.
+    """
+    now = timezone.now()
+    roles, departments, headed = (defaultdict(set) for _ in range(3))
+    expiries = {}
+    for user_id, name, expires_at in UserRole.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+        user_id__in=user_ids,
+        is_active=True,
+    ).values_list("user_id", "role__name", "expires_at"):
+        roles[user_id].add(name)
+        if expires_at is not None:
+            seconds = int((expires_at - now).total_seconds()) + 1
+            expiries[user_id] = min(seconds, expiries.get(user_id, seconds))
+    for user_id, department_id in UserDepartment.objects.filter(
+        user_id__in=user_ids
+    ).values_list("user_id", "department_id"):
+        departments[user_id].add(department_id)
+    for user_id, department_id in Department.objects.filter(
+        head_id__in=user_ids
+    ).values_list("head_id", "pk"):
+        headed[user_id].add(department_id)
+
+    return {
+        user_id: (
+            Access(
+                frozenset(roles[user_id]),
+                frozenset(departments[user_id]),
+                frozenset(headed[user_id]),
+            ),
+            expiries.get(user_id),
+        )
+        for user_id in user_ids
+    }
+
+
+def get_many(users):
+    """{user id: Access} for many users or ids, from the cache where possible"""
+    user_ids = list({helpers.user_id(user) for user in users})
+    if not user_ids:
+        return {}
+    versions = _versions(user_ids)
+    keys = {_key(user_id, versions[user_id]): user_id for user_id in user_ids}
+    found = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if missing:
+        for user_id, (access, expires_in) in load(missing).items():
+            found[user_id] = access
+            cache.set(
+                _key(user_id, versions[user_id]),
+                access,
+                min(ACCESS_CACHE_TIMEOUT, expires_in or ACCESS_CACHE_TIMEOUT),
+            )
+    return found
+
+
+def for_user(user):
+    """The Access of one user, or an empty one for anonymous users"""
+    if user is None or not getattr(user, "is_authenticated", True):
+        return Access()
+    user_id = helpers.user_id(user)
+    return get_many([user_id])[user_id]
+
+
+def for_request(request):
+    """The Access of the requesting user, resolved once per request"""
+    user = getattr(request, "user", None)
+    memo = getattr(request, "_access", None)
+    if memo is None or memo[0] != helpers.user_id(user):
+        memo = (helpers.user_id(user), for_user(user))
+        request._access = memo
+    return memo[1]
+
+
+def same_department(user, others):
+    """{other user id: whether they share a department with ``user``}"""
+    access = get_many([user, *others])
+    mine = access[helpers.user_id(user)]
+    return {
+        helpers.user_id(other): mine.shares_department(access[helpers.user_id(other)])
+        for other in others
+    }
+
+
+def invalidate(*users):
+    """Forget the cached Access of ``users`` after their roles or departments changed"""
+
+    def bump():
+        cache.set_many(
+            {_version_key(helpers.user_id(user)): uuid.uuid4().hex for user in users},
+            timeout=None,
+        )
+
+    # A read before the commit may cache the old rows under the new version
+    helpers.now_and_on_commit(bump)
@@ -0,0 +1,102 @@
+"""
+Buffered last-activity tracking.
+
+``User.update_last_activity`` saved the user on every call, and it is
+called on every socket connect, profile view, chat message and online
+status update, so active users' rows were rewritten constantly.
+
+``touch`` now records activity in the cache instead, at minute
+granularity: the first touch of a user in a minute adds them to that
+minute's buffer (see ``buffers``) and later ones in the same minute are
+dropped. ``flush``, run every minute by the ``flush_user_activity`` task,
+writes each finished minute to ``User.last_activity`` with one ``UPDATE``
+per batch of users, never moving a timestamp backwards. ``last_seen`` and
+``last_seen_many`` merge the still-pending minute with the stored value,
+so readers do not wait for the flush.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.common import buffers, helpers
+
+User = get_user_model()
+
+ACTIVITY_BATCH_SIZE = 1000
+BUFFER = "activity"
+
+
+def _seen_key(user_id):
+    return f"activity_seen:{user_id}"
+
+
+def touch(user, now=None):
+    """
+    Record activity of ``user`` (or a user id). Returns whether this was
+    the user's first activity in the minute.
+    """
+    if user is None or not getattr(user, "is_authenticated", True):
+        return False
+    user_id = helpers.user_id(user)
+    now = now or timezone.now()
+    bucket = buffers.bucket_of(now)
+
+    # add is atomic, so concurrent touches claim the minute once
+    if not cache.add(f"activity_claim:{user_id}:{bucket}", True, 120):
+        return False
+    cache.set(_seen_key(user_id), bucket, buffers.BUFFER_TIMEOUT)
+    buffers.append(BUFFER, user_id, now)
+    return True
+
+
+def pending(user_ids):
+    """{user id: start of the minute of their latest buffered activity}"""
+    keys = {_seen_key(user_id): user_id for user_id in user_ids}
+    return {
+        keys[key]: buffers.minute_of(bucket)
+        for key, bucket in cache.get_many(keys).items()
+    }
+
+
+def _latest(stored, buffered):
+    if buffered is None or (stored is not None and stored >= buffered):
+        return stored
+    return buffered
+
+
+def last_seen(user):
+    """When ``user`` was last active, including activity not flushed yet"""
+    return _latest(user.last_activity, pending([user.pk]).get(user.pk))
+
+
+def last_seen_many(user_ids):
+    """{user id: last activity} for many users, including unflushed activity"""
+    user_ids = list(user_ids)
+    buffered = pending(user_ids)
+    return {
+        user_id: _latest(stored, buffered.get(user_id))
+        for user_id, stored in User.objects.filter(pk__in=user_ids).values_list(
+            "pk", "last_activity"
+        )
+    }
+
+
+def flush(now=None):
+    """
+    Write the activity of every finished minute to ``User.last_activity``.
+    Returns the number of users updated.
+    """
+    updated = 0
+    for minute, user_ids in buffers.drain(BUFFER, now):
+        user_ids = list(set(user_ids))
+        for offset in range(0, len(user_ids), ACTIVITY_BATCH_SIZE):
+            updated += (
+                User.objects.filter(
+                    pk__in=user_ids[offset : offset + ACTIVITY_BATCH_SIZE]
+                )
+                .filter(Q(last_activity__isnull=True) | Q(last_activity__lt=minute))
+                .update(last_activity=minute)
+            )
+    return updated
@@ -1,4 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_index(sender, using="default", **kwargs):
+    """Create the full-text index behind profile search"""
+    from apps.accounts.search import install_search_index
+
+    install_search_index(using)
 
 
 class AccountsConfig(AppConfig):
@@ -12,3 +20,5 @@ class AccountsConfig(AppConfig):
             import apps.accounts.signals  # noqa
         except ImportError:
             pass
+
+        post_migrate.connect(install_search_index, sender=self)
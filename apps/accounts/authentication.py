@@ -0,0 +1,167 @@
+"""
+JWT authentication without a user query on read-only requests.
+
+simplejwt's ``JWTAuthentication`` loads the ``User`` row on every request
+and ``RefreshToken`` queries ``BlacklistedToken`` every time a refresh token
+is checked, although most requests only need the user's id and a few flags.
+
+``JWTAuthentication`` here builds the user of a GET, HEAD or OPTIONS request
+from the token's user id claim and a small cached snapshot of the user
+(``SNAPSHOT_FIELDS``). The result is a ``User`` instance with its other
+fields deferred, so ORM filters, equality and permission checks behave as
+before and any other field is loaded on first access. Views that read the
+whole user, such as ``MeView``, set ``stateless_authentication = False``,
+and other requests still fetch the row. The username and email claims are
+not used: they are only as fresh as the token, and saving a partly loaded
+user would write them back.
+
+The user signals drop the snapshot, so deactivation or a staff change
+applies to the next request. ``QuerySet.update`` bypasses the signals and
+is picked up within ``AUTH_SNAPSHOT_TIMEOUT``.
+
+``RefreshToken`` checks the blacklist through ``is_blacklisted``, which
+caches the answer per token id. The ``BlacklistedToken`` signals overwrite
+that answer, so a revoked refresh token is refused on its next use.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt import authentication, tokens
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from apps.common import helpers
+
+User = get_user_model()
+
+AUTH_SNAPSHOT_TIMEOUT = 5 * 60
+BLACKLIST_CACHE_TIMEOUT = 5 * 60
+# Loaded with the user on read-only requests; anything else is deferred
+SNAPSHOT_FIELDS = [
+    "id",
+    "username",
+    "email",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "is_verified",
+]
+# from_db expects the loaded fields in model order
+_FIELDS = [
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname in SNAPSHOT_FIELDS
+]
+
+
+def _snapshot_key(user_id):
+    return f"auth_user:{user_id}"
+
+
+def _blacklist_key(jti):
+    return f"token_blacklisted:{jti}"
+
+
+def snapshot(user_id):
+    """The snapshot values of ``user_id``, or None if there is no such user"""
+    key = _snapshot_key(user_id)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*_FIELDS).first()
+        if values is None:
+            return None
+        cache.set(key, values, AUTH_SNAPSHOT_TIMEOUT)
+    return values
+
+
+def snapshot_user(user_id):
+    """A ``User`` with only the snapshot fields loaded, or None"""
+    values = snapshot(user_id)
+    if values is None:
+        return None
+    return User.from_db(router.db_for_read(User), _FIELDS, values)
+
+
+def forget_user(user_id):
+    """Drop the snapshot of ``user_id`` after the user changed"""
+
+    helpers.now_and_on_commit(lambda: cache.delete(_snapshot_key(user_id)))
+
+
+def is_blacklisted(jti):
+    """Whether the refresh token ``jti`` is blacklisted"""
+    key = _blacklist_key(jti)
+    blacklisted = cache.get(key)
+    if blacklisted is None:
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        cache.set(key, blacklisted, BLACKLIST_CACHE_TIMEOUT)
+    return blacklisted
+
+
+def remember_blacklisted(jti, blacklisted=True):
+    """Record that the refresh token ``jti`` was blacklisted or released"""
+
+    def store():
+        cache.set(_blacklist_key(jti), blacklisted, BLACKLIST_CACHE_TIMEOUT)
+
+    store()
+    transaction.on_commit(store)
+
+
+class RefreshToken(tokens.RefreshToken):
+    """A refresh token whose blacklist check goes through the cache"""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """
+    JWT authentication that serves read-only requests from the user
+    snapshot instead of the user row.
+    """
+
+    stateless = False
+
+    def authenticate(self, request):
+        self.stateless = self.use_snapshot(request)
+        return super().authenticate(request)
+
+    def use_snapshot(self, request):
+        view = (getattr(request, "parser_context", None) or {}).get("view")
+        return (
+            request.method in SAFE_METHODS
+            and getattr(view, "stateless_authentication", True)
+            # The revoke claim is checked against the password hash
+            and not api_settings.CHECK_REVOKE_TOKEN
+        )
+
+    def get_user(self, validated_token):
+        if not self.stateless:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = User._meta.pk.to_python(
+                validated_token[api_settings.USER_ID_CLAIM]
+            )
+        except (KeyError, ValidationError) as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        user = snapshot_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
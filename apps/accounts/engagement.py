@@ -0,0 +1,201 @@
+"""
+Set-based engagement and skill trending scores.
+
+``calculate_profile_engagement_score`` ran five count queries and a
+``ProfileStats`` save for every active user, and
+``update_skill_trending_scores`` ran two counts per active skill only to
+throw the score away.
+
+Each signal is now one grouped aggregate over the whole window, e.g. the
+profile views of every user in a single ``GROUP BY profile_owner_id``. The
+per-user counts are combined into weighted scores in memory and written
+back with one ``UPDATE`` per distinct score, in chunks of ids, after
+resetting the rows that scored before. Scores are mostly small integers,
+so there are few distinct values.
+
+The weights default to ``ENGAGEMENT_WEIGHTS`` and
+``SKILL_TRENDING_WEIGHTS`` and can be overridden with the
+``PROFILE_ENGAGEMENT_WEIGHTS`` and ``SKILL_TRENDING_WEIGHTS`` settings.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.common import helpers
+
+from .models import (
+    Connection,
+    Message,
+    ProfileStats,
+    ProfileView,
+    Recommendation,
+    Skill,
+    SkillEndorsement,
+)
+
+User = get_user_model()
+
+ENGAGEMENT_WINDOW = timedelta(days=7)
+ENGAGEMENT_WEIGHTS = {
+    "profile_views": 1.0,
+    "endorsements": 3.0,
+    "recommendations": 5.0,
+    "connections": 4.0,
+    "messages": 2.0,
+}
+SKILL_TRENDING_WEIGHTS = {
+    "recent_endorsements": 3.0,
+    "new_skill": 1.0,
+    "total_endorsements": 1.0,
+}
+# Total endorsements only count up to this many
+TOTAL_ENDORSEMENTS_CAP = 10
+SCORE_BATCH_SIZE = 1000
+
+
+def engagement_weights():
+    return getattr(settings, "PROFILE_ENGAGEMENT_WEIGHTS", ENGAGEMENT_WEIGHTS)
+
+
+def skill_trending_weights():
+    return getattr(settings, "SKILL_TRENDING_WEIGHTS", SKILL_TRENDING_WEIGHTS)
+
+
+def grouped_counts(queryset, *fields):
+    """Row counts per value of ``fields``, summed when there are several"""
+    counts = defaultdict(int)
+    for field in fields:
+        for key, count in (
+            queryset.order_by()
+            .values(field)
+            .annotate(n=Count("pk"))
+            .values_list(field, "n")
+        ):
+            counts[key] += count
+    return counts
+
+
+def engagement_signals(since):
+    """Per-user counts of every engagement signal since ``since``"""
+    return {
+        "profile_views": grouped_counts(
+            ProfileView.objects.filter(created_at__gte=since), "profile_owner_id"
+        ),
+        "endorsements": grouped_counts(
+            SkillEndorsement.objects.filter(created_at__gte=since), "skill__user_id"
+        ),
+        "recommendations": grouped_counts(
+            Recommendation.objects.filter(is_public=True, updated_at__gte=since),
+            "recommendee_id",
+        ),
+        "connections": grouped_counts(
+            Connection.objects.filter(
+                status=Connection.ConnectionStatus.ACCEPTED, updated_at__gte=since
+            ),
+            "from_user_id",
+            "to_user_id",
+        ),
+        "messages": grouped_counts(
+            Message.objects.filter(created_at__gte=since), "sender_id", "recipient_id"
+        ),
+    }
+
+
+def _combine(signals, weights):
+    scores = defaultdict(float)
+    for signal, counts in signals.items():
+        weight = weights.get(signal, 0.0)
+        if weight:
+            for key, count in counts.items():
+                scores[key] += weight * count
+    return scores
+
+
+def _write_scores(queryset, key_field, score_field, scores):
+    """Reset the scored rows of ``queryset``, then store one UPDATE per value"""
+    by_value = defaultdict(list)
+    for key, score in scores.items():
+        if score:
+            by_value[round(score, 6)].append(key)
+
+    with transaction.atomic():
+        queryset.exclude(**{score_field: 0}).update(**{score_field: 0.0})
+        for score, keys in by_value.items():
+            for batch in helpers.chunks(keys, SCORE_BATCH_SIZE):
+                queryset.filter(**{f"{key_field}__in": batch}).update(
+                    **{score_field: score}
+                )
+
+
+def update_engagement_scores(now=None, weights=None):
+    """
+    Score the weekly engagement of every active user into ``ProfileStats``.
+
+    Returns the number of users with a non-zero score.
+    """
+    since = (now or timezone.now()) - ENGAGEMENT_WINDOW
+    active = set(
+        User.objects.filter(status=User.UserStatus.ACTIVE).values_list("pk", flat=True)
+    )
+    scores = {
+        user_id: score
+        for user_id, score in _combine(
+            engagement_signals(since), weights or engagement_weights()
+        ).items()
+        if user_id in active
+    }
+
+    # Users created without the signal have no stats row yet
+    with_stats = set(ProfileStats.objects.values_list("user_id", flat=True))
+    ProfileStats.objects.bulk_create(
+        [ProfileStats(user_id=user_id) for user_id in set(scores) - with_stats],
+        batch_size=SCORE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    # Users who are no longer active drop back to zero
+    _write_scores(ProfileStats.objects.all(), "user_id", "engagement_score", scores)
+    return len(scores)
+
+
+def skill_trending_signals(since):
+    """Per-skill trending signals of the skills active since ``since``"""
+    recent = grouped_counts(
+        SkillEndorsement.objects.filter(created_at__gte=since), "skill_id"
+    )
+    new = set(Skill.objects.filter(created_at__gte=since).values_list("pk", flat=True))
+
+    totals = {}
+    for batch in helpers.chunks(set(recent) | new, SCORE_BATCH_SIZE):
+        totals.update(
+            grouped_counts(
+                SkillEndorsement.objects.filter(skill_id__in=batch), "skill_id"
+            )
+        )
+    return {
+        "recent_endorsements": recent,
+        "new_skill": {skill_id: 1 for skill_id in new},
+        "total_endorsements": {
+            skill_id: min(total, TOTAL_ENDORSEMENTS_CAP)
+            for skill_id, total in totals.items()
+        },
+    }
+
+
+def update_skill_scores(now=None, weights=None):
+    """
+    Store the trending score of every skill; skills without recent activity
+    go back to zero. Returns the number of trending skills.
+    """
+    since = (now or timezone.now()) - ENGAGEMENT_WINDOW
+    scores = _combine(
+        skill_trending_signals(since), weights or skill_trending_weights()
+    )
+    _write_scores(Skill.objects.all(), "pk", "trending_score", scores)
+    return len(scores)
@@ -0,0 +1,157 @@
+"""
+Cached adjacency of the social graph.
+
+Connection checks used to query ``Connection`` with an OR over
+``from_user``/``to_user`` every time: the user list rebuilt the viewer's
+connected ids per request, and ``are_connected``, ``can_view_user_profile``
+and the suggestions each ran their own query.
+
+Each user's accepted connections, followers and followings are now cached
+as frozensets of user ids, one cache entry per user and kind, loaded from
+the database on first use. ``neighbors`` is one cache read,
+``are_connected`` a set lookup on top of it and ``mutual`` an intersection,
+which walks the smaller of the two sets.
+
+The ``Connection`` and ``Follow`` signals drop the entries of both users
+involved, right away and again once the transaction commits, so a read
+racing the write cannot keep the old edges cached. ``warm`` fills the cache
+for many users from one streamed pass over the edges.
+"""
+
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.common import helpers
+
+from .models import Connection, Follow
+
+CONNECTIONS = "connections"
+FOLLOWERS = "followers"
+FOLLOWING = "following"
+
+GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+EDGE_CHUNK_SIZE = 10000
+GRAPH_BATCH_SIZE = 1000
+
+
+def _key(kind, user_id):
+    return f"social_graph:{kind}:{user_id}"
+
+
+def edges(kind, user_ids=None):
+    """(user, neighbour) pairs of a kind, for every user or around ``user_ids``"""
+    if kind == CONNECTIONS:
+        rows = Connection.objects.filter(status=Connection.ConnectionStatus.ACCEPTED)
+        if user_ids is not None:
+            rows = rows.filter(
+                Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids)
+            )
+        for from_user_id, to_user_id in rows.values_list(
+            "from_user_id", "to_user_id"
+        ).iterator(chunk_size=EDGE_CHUNK_SIZE):
+            yield from_user_id, to_user_id
+            yield to_user_id, from_user_id
+        return
+
+    owner, other = (
+        ("following_id", "follower_id")
+        if kind == FOLLOWERS
+        else ("follower_id", "following_id")
+    )
+    rows = Follow.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(**{f"{owner}__in": user_ids})
+    yield from rows.values_list(owner, other).iterator(chunk_size=EDGE_CHUNK_SIZE)
+
+
+def _store(kind, adjacency):
+    for batch in helpers.chunks(adjacency.items(), GRAPH_BATCH_SIZE):
+        cache.set_many(
+            {_key(kind, user_id): ids for user_id, ids in batch}, GRAPH_CACHE_TIMEOUT
+        )
+
+
+def _load(kind, user_ids):
+    """Read the adjacency of ``user_ids`` from the database and cache it"""
+    loaded = {}
+    for batch in helpers.chunks(user_ids, GRAPH_BATCH_SIZE):
+        wanted = set(batch)
+        sets = {user_id: set() for user_id in wanted}
+        for user_id, other in edges(kind, batch):
+            if user_id in wanted:
+                sets[user_id].add(other)
+        sets = {user_id: frozenset(ids) for user_id, ids in sets.items()}
+        _store(kind, sets)
+        loaded.update(sets)
+    return loaded
+
+
+def adjacency(kind, users):
+    """The adjacency sets of several users, keyed by user id"""
+    user_ids = {helpers.user_id(user) for user in users}
+    user_ids.discard(None)
+    cached = cache.get_many([_key(kind, user_id) for user_id in user_ids])
+
+    result, missing = {}, []
+    for user_id in user_ids:
+        ids = cached.get(_key(kind, user_id))
+        if ids is None:
+            missing.append(user_id)
+        else:
+            result[user_id] = ids
+    if missing:
+        result.update(_load(kind, missing))
+    return result
+
+
+def _adjacent(kind, user):
+    return adjacency(kind, [user]).get(helpers.user_id(user), frozenset())
+
+
+def neighbors(user):
+    """Ids of the users ``user`` has an accepted connection with"""
+    return _adjacent(CONNECTIONS, user)
+
+
+def followers(user):
+    return _adjacent(FOLLOWERS, user)
+
+
+def following(user):
+    return _adjacent(FOLLOWING, user)
+
+
+def are_connected(user, other):
+    user_id, other_id = helpers.user_id(user), helpers.user_id(other)
+    if user_id is None or other_id is None or user_id == other_id:
+        return False
+    return other_id in neighbors(user_id)
+
+
+def is_following(user, other):
+    return helpers.user_id(other) in following(user)
+
+
+def mutual(user, other):
+    """Ids of the connections two users share"""
+    sets = adjacency(CONNECTIONS, [user, other])
+    return sets.get(helpers.user_id(user), frozenset()) & sets.get(
+        helpers.user_id(other), frozenset()
+    )
+
+
+def invalidate(kind, *users):
+    """Forget the cached adjacency of ``users`` after their edges changed"""
+    keys = [_key(kind, helpers.user_id(user)) for user in users]
+    helpers.now_and_on_commit(lambda: cache.delete_many(keys))
+
+
+def warm(kind=CONNECTIONS):
+    """Cache every user's adjacency from one pass over the edges"""
+    sets = defaultdict(set)
+    for user_id, other in edges(kind):
+        sets[user_id].add(other)
+    _store(kind, {user_id: frozenset(ids) for user_id, ids in sets.items()})
+    return len(sets)
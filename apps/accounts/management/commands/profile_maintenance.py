@@ -10,7 +10,6 @@ from apps.accounts.models import (
     Connection,
     Education,
     Experience,
-    Follow,
     Notification,
     ProfileStats,
     ProfileView,
@@ -21,6 +20,12 @@ from apps.accounts.models import (
     Task,
     UserProfile,
 )
+from apps.accounts.search import rebuild_search_documents
+from apps.accounts.stats import (
+    VIEW_COUNTERS,
+    refresh_counters,
+    update_completeness,
+)
 from apps.accounts.signals import (
     calculate_profile_engagement_score,
     cleanup_expired_connections,
@@ -177,6 +182,11 @@ class Command(BaseCommand):
             self._cleanup_old_profile_views()
         self._log_task("Cleaned up old profile views")
 
+        # Age the weekly and monthly profile view counts
+        if not self.dry_run:
+            refresh_counters(fields=VIEW_COUNTERS)
+        self._log_task("Refreshed profile view counters")
+
         # Update profile completeness scores
         if not self.dry_run:
             self._update_profile_completeness()
@@ -207,6 +217,11 @@ class Command(BaseCommand):
             calculate_profile_engagement_score()
         self._log_task("Calculated engagement scores")
 
+        # Catch up search documents missed by bulk updates
+        if not self.dry_run:
+            rebuild_search_documents()
+        self._log_task("Rebuilt profile search documents")
+
         # Cleanup old data
         if not self.dry_run:
             cleanup_old_notifications()
@@ -338,19 +353,7 @@ class Command(BaseCommand):
     def _update_profile_completeness(self):
         """Update profile completeness for all users."""
         try:
-            updated_count = 0
-
-            for user in User.objects.filter(status=User.UserStatus.ACTIVE):
-                try:
-                    profile = user.userprofile
-                    # Trigger profile completeness recalculation
-                    profile.save()
-                    updated_count += 1
-                except UserProfile.DoesNotExist:
-                    # Create profile if it doesn't exist
-                    UserProfile.objects.create(user=user)
-                    updated_count += 1
-
+            updated_count = update_completeness()
             logger.info(f"Updated profile completeness for {updated_count} users")
 
         except Exception as e:
@@ -361,40 +364,7 @@ class Command(BaseCommand):
     def _update_all_profile_stats(self):
         """Update all profile statistics."""
         try:
-            updated_count = 0
-
-            for user in User.objects.filter(status=User.UserStatus.ACTIVE):
-                stats, created = ProfileStats.objects.get_or_create(user=user)
-
-                # Update all counts
-                stats.profile_views = ProfileView.objects.filter(
-                    viewed_user=user
-                ).count()
-
-                stats.connections_count = (
-                    Connection.objects.filter(
-                        from_user=user, status=Connection.ConnectionStatus.ACCEPTED
-                    ).count()
-                    + Connection.objects.filter(
-                        to_user=user, status=Connection.ConnectionStatus.ACCEPTED
-                    ).count()
-                )
-
-                stats.followers_count = Follow.objects.filter(following=user).count()
-                stats.following_count = Follow.objects.filter(follower=user).count()
-
-                stats.endorsements_count = SkillEndorsement.objects.filter(
-                    skill__user=user
-                ).count()
-
-                stats.recommendations_count = Recommendation.objects.filter(
-                    recommended_user=user,
-                    status=Recommendation.RecommendationStatus.APPROVED,
-                ).count()
-
-                stats.save()
-                updated_count += 1
-
+            updated_count = refresh_counters()
             logger.info(f"Updated profile statistics for {updated_count} users")
 
         except Exception as e:
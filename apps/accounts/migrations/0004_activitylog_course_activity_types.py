@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_alter_activitylog_activity_type_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="activitylog",
+            name="activity_type",
+            field=models.CharField(
+                choices=[
+                    ("profile_update", "Profile Update"),
+                    ("connection_request", "Connection Request"),
+                    ("connection_accept", "Connection Accept"),
+                    ("endorsement", "Endorsement"),
+                    ("project_update", "Project Update"),
+                    ("skill_update", "Skill Update"),
+                    ("login", "Login"),
+                    ("password_change", "Password Change"),
+                    ("profile_view", "Profile View"),
+                    ("resume_created", "Resume Created"),
+                    ("resume_updated", "Resume Updated"),
+                    ("resume_deleted", "Resume Deleted"),
+                    ("resume_published", "Resume Published"),
+                    ("resume_downloaded", "Resume Downloaded"),
+                    ("resume_generated", "Resume Generated"),
+                    ("recommendation_given", "Recommendation Given"),
+                    ("recommendation_received", "Recommendation Received"),
+                    ("recommendation_updated", "Recommendation Updated"),
+                    ("recommendation_deleted", "Recommendation Deleted"),
+                    ("recommendation_approved", "Recommendation Approved"),
+                    ("recommendation_declined", "Recommendation Declined"),
+                    ("recommendation_requested", "Recommendation Requested"),
+                    ("login_failed", "Login Failed"),
+                    ("course_enrollment", "Course Enrollment"),
+                    ("lesson_start", "Lesson Start"),
+                    ("lesson_completion", "Lesson Completion"),
+                    ("assessment_start", "Assessment Start"),
+                    ("assessment_completion", "Assessment Completion"),
+                ],
+                max_length=30,
+            ),
+        ),
+    ]
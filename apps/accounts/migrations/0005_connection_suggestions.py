@@ -0,0 +1,60 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_activitylog_course_activity_types"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConnectionSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("mutual_connections", models.PositiveIntegerField(default=0)),
+                ("shared_companies", models.PositiveIntegerField(default=0)),
+                ("shared_schools", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "suggested_user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="suggested_to",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="connection_suggestions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "connection suggestion",
+                "verbose_name_plural": "connection suggestions",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-score"], name="accounts_co_user_id_5575a0_idx"
+                    )
+                ],
+                "unique_together": {("user", "suggested_user")},
+            },
+        ),
+    ]
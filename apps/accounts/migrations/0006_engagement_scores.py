@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0005_connection_suggestions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilestats",
+            name="engagement_score",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name="skill",
+            name="trending_score",
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+    ]
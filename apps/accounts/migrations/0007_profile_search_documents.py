@@ -0,0 +1,138 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:00
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_search_documents(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Connection = apps.get_model("accounts", "Connection")
+    Education = apps.get_model("accounts", "Education")
+    Experience = apps.get_model("accounts", "Experience")
+    ProfileSearchDocument = apps.get_model("accounts", "ProfileSearchDocument")
+    Skill = apps.get_model("accounts", "Skill")
+
+    def join(values):
+        joined = []
+        for value in values:
+            value = (value or "").strip()
+            if value and value not in joined:
+                joined.append(value)
+        return ", ".join(joined)
+
+    skills, titles, companies, schools = (defaultdict(list) for _ in range(4))
+    for user_id, name in Skill.objects.values_list("user_id", "name"):
+        skills[user_id].append(name)
+    for user_id, title, company in Experience.objects.order_by(
+        "-is_current", "-start_date"
+    ).values_list("user_id", "title", "company"):
+        titles[user_id].append(title)
+        companies[user_id].append(company)
+    for user_id, institution in Education.objects.values_list("user_id", "institution"):
+        schools[user_id].append(institution)
+    degrees = Counter()
+    for pair in Connection.objects.filter(status="accepted").values_list(
+        "from_user_id", "to_user_id"
+    ):
+        degrees.update(pair)
+
+    documents = []
+    for row in (
+        User.objects.filter(is_active=True)
+        .exclude(profile__searchable=False)
+        .values(
+            "pk",
+            "username",
+            "first_name",
+            "last_name",
+            "bio",
+            "headline",
+            "current_position",
+            "current_company",
+            "location",
+            "profile__display_name",
+            "profile__bio",
+            "profile__location",
+            "profile__current_position",
+        )
+        .iterator()
+    ):
+        user_id = row["pk"]
+        keys = sorted(
+            {n.replace(",", " ").strip().lower() for n in skills[user_id] if n.strip()}
+        )
+        documents.append(
+            ProfileSearchDocument(
+                user_id=user_id,
+                name=join(
+                    [
+                        f"{row['first_name']} {row['last_name']}",
+                        row["profile__display_name"],
+                        row["username"],
+                    ]
+                ),
+                headline=row["headline"]
+                or row["current_position"]
+                or row["profile__current_position"]
+                or "",
+                bio=row["bio"] or row["profile__bio"] or "",
+                skills=join(skills[user_id]),
+                titles=join(titles[user_id]),
+                companies=join([row["current_company"], *companies[user_id]]),
+                schools=join(schools[user_id]),
+                location=row["location"] or row["profile__location"] or "",
+                skill_index="," + ",".join(keys) + "," if keys else "",
+                connections_count=degrees[user_id],
+            )
+        )
+    ProfileSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_engagement_scores"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileSearchDocument",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("name", models.CharField(blank=True, max_length=400)),
+                ("headline", models.CharField(blank=True, max_length=220)),
+                ("bio", models.TextField(blank=True)),
+                ("skills", models.TextField(blank=True)),
+                ("titles", models.TextField(blank=True)),
+                ("companies", models.TextField(blank=True)),
+                ("schools", models.TextField(blank=True)),
+                (
+                    "location",
+                    models.CharField(blank=True, db_index=True, max_length=100),
+                ),
+                ("skill_index", models.TextField(blank=True)),
+                (
+                    "connections_count",
+                    models.PositiveIntegerField(db_index=True, default=0),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "profile search document",
+                "verbose_name_plural": "profile search documents",
+            },
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:35
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_profile_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Connection = apps.get_model("accounts", "Connection")
+    Follow = apps.get_model("accounts", "Follow")
+    ProfileStats = apps.get_model("accounts", "ProfileStats")
+
+    counters = {
+        field: Counter()
+        for field in [
+            "pending_sent_count",
+            "pending_received_count",
+            "followers_count",
+            "following_count",
+            "profile_completeness",
+        ]
+    }
+    for from_user_id, to_user_id in Connection.objects.filter(
+        status="pending"
+    ).values_list("from_user_id", "to_user_id"):
+        counters["pending_sent_count"][from_user_id] += 1
+        counters["pending_received_count"][to_user_id] += 1
+    for follower_id, following_id in Follow.objects.values_list(
+        "follower_id", "following_id"
+    ):
+        counters["following_count"][follower_id] += 1
+        counters["followers_count"][following_id] += 1
+
+    # 60 points for the profile fields, 10 for each filled-in section
+    fields = [
+        "first_name",
+        "last_name",
+        "bio",
+        "headline",
+        "location",
+        "current_position",
+        "current_company",
+        "profile_picture",
+    ]
+    sections = [
+        set(
+            apps.get_model("accounts", name)
+            .objects.values_list("user_id", flat=True)
+            .distinct()
+        )
+        for name in ["Experience", "Education", "Skill", "Project"]
+    ]
+    for user_id, *values in User.objects.values_list("pk", *fields).iterator():
+        counters["profile_completeness"][user_id] = round(
+            60 / len(fields) * sum(1 for value in values if value)
+            + 10 * sum(1 for ids in sections if user_id in ids)
+        )
+
+    stats = list(ProfileStats.objects.all())
+    for row in stats:
+        for field, counts in counters.items():
+            setattr(row, field, counts[row.user_id])
+    ProfileStats.objects.bulk_update(stats, list(counters), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_profile_search_documents"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilestats",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilestats",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilestats",
+            name="pending_received_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilestats",
+            name="pending_sent_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilestats",
+            name="profile_completeness",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_profile_counters, migrations.RunPython.noop),
+    ]
@@ -141,11 +141,13 @@ class User(GuardianUserMixin, AbstractUser):
         return full_name or self.username
 
     def update_last_activity(self):
-        """Update the last_activity timestamp."""
+        """Update the last_activity timestamp, stored by the next activity flush."""
         from django.utils import timezone
 
+        from .activity import touch
+
         self.last_activity = timezone.now()
-        self.save(update_fields=["last_activity"])
+        touch(self, self.last_activity)
 
 
 class UserProfile(models.Model):
@@ -503,6 +505,7 @@ class Skill(models.Model):
     )
     years_of_experience = models.PositiveIntegerField(blank=True, null=True)
     last_used = models.DateField(blank=True, null=True)
+    trending_score = models.FloatField(default=0.0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -831,6 +834,11 @@ class ActivityLog(models.Model):
             _("Recommendation Requested"),
         )
         LOGIN_FAILED = "login_failed", _("Login Failed")
+        COURSE_ENROLLMENT = "course_enrollment", _("Course Enrollment")
+        LESSON_START = "lesson_start", _("Lesson Start")
+        LESSON_COMPLETION = "lesson_completion", _("Lesson Completion")
+        ASSESSMENT_START = "assessment_start", _("Assessment Start")
+        ASSESSMENT_COMPLETION = "assessment_completion", _("Assessment Completion")
 
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="activity_logs"
@@ -1314,9 +1322,15 @@ class ProfileStats(models.Model):
     profile_views_this_week = models.PositiveIntegerField(default=0)
     profile_views_this_month = models.PositiveIntegerField(default=0)
     connections_count = models.PositiveIntegerField(default=0)
+    pending_sent_count = models.PositiveIntegerField(default=0)
+    pending_received_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
     endorsements_count = models.PositiveIntegerField(default=0)
+    profile_completeness = models.PositiveSmallIntegerField(default=0)
     project_views = models.PositiveIntegerField(default=0)
     search_appearances = models.PositiveIntegerField(default=0)
+    engagement_score = models.FloatField(default=0.0)
     last_updated = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -1325,3 +1339,57 @@ class ProfileStats(models.Model):
 
     def __str__(self):
         return f"Stats for {self.user.username}"
+
+
+class ConnectionSuggestion(models.Model):
+    """Precomputed "people you may know" suggestions for a user."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="connection_suggestions"
+    )
+    suggested_user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="suggested_to"
+    )
+    score = models.FloatField()
+    mutual_connections = models.PositiveIntegerField(default=0)
+    shared_companies = models.PositiveIntegerField(default=0)
+    shared_schools = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("connection suggestion")
+        verbose_name_plural = _("connection suggestions")
+        unique_together = [["user", "suggested_user"]]
+        indexes = [models.Index(fields=["user", "-score"])]
+
+    def __str__(self):
+        return f"{self.suggested_user_id} for {self.user_id} ({self.score:.2f})"
+
+
+class ProfileSearchDocument(models.Model):
+    """Denormalized profile text for people search."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    name = models.CharField(max_length=400, blank=True)
+    headline = models.CharField(max_length=220, blank=True)
+    bio = models.TextField(blank=True)
+    skills = models.TextField(blank=True)
+    titles = models.TextField(blank=True)
+    companies = models.TextField(blank=True)
+    schools = models.TextField(blank=True)
+    location = models.CharField(max_length=100, blank=True, db_index=True)
+    skill_index = models.TextField(blank=True)
+    connections_count = models.PositiveIntegerField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("profile search document")
+        verbose_name_plural = _("profile search documents")
+
+    def __str__(self):
+        return f"Search document for {self.user_id}"
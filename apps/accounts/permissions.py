@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
 from rest_framework import permissions
 
-from .models import Connection, Department, NetworkMembership, UserDepartment, UserRole
+from . import access, graph
+from .models import Connection, Department, NetworkMembership
 
 User = get_user_model()
 
@@ -119,11 +120,7 @@ class HasRole(permissions.BasePermission):
             return False
 
         # Check if user has the required role
-        return UserRole.objects.filter(
-            user=request.user,
-            role__name=self.role_name,
-            is_active=True,
-        ).exists()
+        return access.for_request(request).has_role(self.role_name)
 
     def __call__(self):
         return self
@@ -142,11 +139,7 @@ class HasAnyRole(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        return UserRole.objects.filter(
-            user=request.user,
-            role__name__in=self.role_names,
-            is_active=True,
-        ).exists()
+        return access.for_request(request).has_any_role(self.role_names)
 
     def __call__(self):
         return self
@@ -180,11 +173,7 @@ class CanViewProfile(permissions.BasePermission):
             return False
         elif profile.profile_visibility == "connections-only":
             # Check if users are connected
-            return Connection.objects.filter(
-                models.Q(from_user=request.user, to_user=profile_user)
-                | models.Q(from_user=profile_user, to_user=request.user),
-                status=Connection.ConnectionStatus.ACCEPTED,
-            ).exists()
+            return are_connected(request.user, profile_user)
 
         return False
 
@@ -231,11 +220,7 @@ class CanSendMessage(permissions.BasePermission):
         profile = getattr(target_user, "profile", None)
         if profile and not profile.allow_messages:
             # Only allow if users are connected
-            return Connection.objects.filter(
-                models.Q(from_user=request.user, to_user=target_user)
-                | models.Q(from_user=target_user, to_user=request.user),
-                status=Connection.ConnectionStatus.ACCEPTED,
-            ).exists()
+            return are_connected(request.user, target_user)
 
         return True
 
@@ -259,11 +244,7 @@ class CanEndorseSkill(permissions.BasePermission):
 
         # Must be connected or profile is public
         if profile and profile.profile_visibility == "private":
-            return Connection.objects.filter(
-                models.Q(from_user=request.user, to_user=skill_owner)
-                | models.Q(from_user=skill_owner, to_user=request.user),
-                status=Connection.ConnectionStatus.ACCEPTED,
-            ).exists()
+            return are_connected(request.user, skill_owner)
 
         return True
 
@@ -277,17 +258,17 @@ class IsDepartmentHead(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        return Department.objects.filter(head=request.user).exists()
+        return access.for_request(request).is_department_head()
 
     def has_object_permission(self, request, view, obj):
         if not request.user or not request.user.is_authenticated:
             return False
 
         # Check if user is head of the department
-        if hasattr(obj, "department"):
-            return obj.department.head == request.user
-        elif isinstance(obj, Department):
-            return obj.head == request.user
+        if isinstance(obj, Department):
+            return access.for_request(request).is_department_head(obj.pk)
+        elif hasattr(obj, "department_id"):
+            return access.for_request(request).is_department_head(obj.department_id)
 
         return False
 
@@ -301,28 +282,32 @@ class IsDepartmentMember(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        return UserDepartment.objects.filter(user=request.user).exists()
+        return bool(access.for_request(request).departments)
 
     def has_object_permission(self, request, view, obj):
         if not request.user or not request.user.is_authenticated:
             return False
 
         # Check if user is member of the same department
-        if hasattr(obj, "user"):
-            user_departments = set(
-                UserDepartment.objects.filter(user=request.user).values_list(
-                    "department", flat=True
-                )
+        if hasattr(obj, "user_id"):
+            return access.for_request(request).shares_department(
+                access.for_user(obj.user_id)
             )
-            obj_departments = set(
-                UserDepartment.objects.filter(user=obj.user).values_list(
-                    "department", flat=True
-                )
-            )
-            return bool(user_departments.intersection(obj_departments))
 
         return False
 
+    def filter_objects(self, request, objects):
+        """
+        The objects of a list the user may access, checked with one bulk
+        lookup instead of ``has_object_permission`` per object.
+        """
+        if not request.user or not request.user.is_authenticated:
+            return []
+
+        objects = [obj for obj in objects if hasattr(obj, "user_id")]
+        allowed = access.same_department(request.user, [obj.user_id for obj in objects])
+        return [obj for obj in objects if allowed[obj.user_id]]
+
 
 class IsTaskAssigneeOrCreator(permissions.BasePermission):
     """
@@ -410,9 +395,7 @@ def requires_role(role_name):
             if not request.user.is_authenticated:
                 return permissions.PermissionDenied("Authentication required")
 
-            if not UserRole.objects.filter(
-                user=request.user, role__name=role_name, is_active=True
-            ).exists():
+            if not access.for_request(request).has_role(role_name):
                 return permissions.PermissionDenied(
                     f"Role '{role_name}' required for this action"
                 )
@@ -434,9 +417,7 @@ def requires_any_role(role_names):
             if not request.user.is_authenticated:
                 return permissions.PermissionDenied("Authentication required")
 
-            if not UserRole.objects.filter(
-                user=request.user, role__name__in=role_names, is_active=True
-            ).exists():
+            if not access.for_request(request).has_any_role(role_names):
                 return permissions.PermissionDenied(
                     f"One of roles {role_names} required for this action"
                 )
@@ -468,11 +449,7 @@ def can_view_user_profile(viewer, profile_user):
     elif profile.profile_visibility == "private":
         return False
     elif profile.profile_visibility == "connections-only":
-        return Connection.objects.filter(
-            models.Q(from_user=viewer, to_user=profile_user)
-            | models.Q(from_user=profile_user, to_user=viewer),
-            status=Connection.ConnectionStatus.ACCEPTED,
-        ).exists()
+        return are_connected(viewer, profile_user)
 
     return False
 
@@ -506,11 +483,7 @@ def can_send_message(sender, recipient):
     profile = getattr(recipient, "profile", None)
     if profile and not profile.allow_messages:
         # Only allow if users are connected
-        return Connection.objects.filter(
-            models.Q(from_user=sender, to_user=recipient)
-            | models.Q(from_user=recipient, to_user=sender),
-            status=Connection.ConnectionStatus.ACCEPTED,
-        ).exists()
+        return are_connected(sender, recipient)
 
     return True
 
@@ -528,11 +501,7 @@ def can_endorse_skill(endorser, skill_owner):
 
     # Must be connected or profile is public
     if profile and profile.profile_visibility == "private":
-        return Connection.objects.filter(
-            models.Q(from_user=endorser, to_user=skill_owner)
-            | models.Q(from_user=skill_owner, to_user=endorser),
-            status=Connection.ConnectionStatus.ACCEPTED,
-        ).exists()
+        return are_connected(endorser, skill_owner)
 
     return True
 
@@ -544,9 +513,7 @@ def has_role(user, role_name):
     if not user or not user.is_authenticated:
         return False
 
-    return UserRole.objects.filter(
-        user=user, role__name=role_name, is_active=True
-    ).exists()
+    return access.for_user(user).has_role(role_name)
 
 
 def has_any_role(user, role_names):
@@ -556,9 +523,7 @@ def has_any_role(user, role_names):
     if not user or not user.is_authenticated:
         return False
 
-    return UserRole.objects.filter(
-        user=user, role__name__in=role_names, is_active=True
-    ).exists()
+    return access.for_user(user).has_any_role(role_names)
 
 
 def is_department_head(user, department=None):
@@ -568,11 +533,9 @@ def is_department_head(user, department=None):
     if not user or not user.is_authenticated:
         return False
 
-    query = Department.objects.filter(head=user)
-    if department:
-        query = query.filter(id=department.id)
-
-    return query.exists()
+    return access.for_user(user).is_department_head(
+        department.id if department else None
+    )
 
 
 def is_department_member(user, department):
@@ -582,7 +545,9 @@ def is_department_member(user, department):
     if not user or not user.is_authenticated:
         return False
 
-    return UserDepartment.objects.filter(user=user, department=department).exists()
+    return access.for_user(user).is_department_member(
+        getattr(department, "pk", department)
+    )
 
 
 def is_same_department(user1, user2):
@@ -592,14 +557,7 @@ def is_same_department(user1, user2):
     if not user1 or not user2:
         return False
 
-    user1_departments = set(
-        UserDepartment.objects.filter(user=user1).values_list("department", flat=True)
-    )
-    user2_departments = set(
-        UserDepartment.objects.filter(user=user2).values_list("department", flat=True)
-    )
-
-    return bool(user1_departments.intersection(user2_departments))
+    return access.same_department(user1, [user2])[getattr(user2, "pk", user2)]
 
 
 def is_network_admin(user, network):
@@ -630,11 +588,7 @@ def are_connected(user1, user2):
     """
     Helper function to check if two users are connected.
     """
-    return Connection.objects.filter(
-        models.Q(from_user=user1, to_user=user2)
-        | models.Q(from_user=user2, to_user=user1),
-        status=Connection.ConnectionStatus.ACCEPTED,
-    ).exists()
+    return graph.are_connected(user1, user2)
 
 
 def can_access_user_data(accessor, target_user, data_type="basic"):
@@ -790,13 +744,7 @@ class CanViewProfile(permissions.BasePermission):
             if not request.user.is_authenticated:
                 return False
 
-            from .models import Connection
-
-            return Connection.objects.filter(
-                models.Q(from_user=request.user, to_user=obj)
-                | models.Q(from_user=obj, to_user=request.user),
-                status="accepted",
-            ).exists()
+            return are_connected(request.user, obj)
 
         return False
 
@@ -0,0 +1,86 @@
+"""
+Buffered, deduplicated profile view tracking.
+
+Every profile retrieval ran ``UserViewSet.track_profile_view``
+synchronously: a ``get_or_create`` and a save on the view row plus an
+``F()`` update on the viewed profile. Each new ``ProfileView`` also fired
+``handle_profile_view``, which updated the owner's ``ProfileStats`` and
+last activity. A popular profile's rows were written on every hit.
+
+``record`` now only touches the cache. A viewer's repeat visits to a
+profile within ``PROFILE_VIEW_WINDOW`` count once, and the first visit is
+appended to the minute's buffer (see ``buffers``). ``flush``, run every
+minute by the ``flush_profile_views`` task, inserts each finished minute
+with ``bulk_create`` and adds the views to the owners' counters with
+``stats.add_profile_views``, one grouped ``UPDATE`` per batch of owners.
+"""
+
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.common import buffers, helpers
+
+from . import activity, stats
+from .models import ProfileView
+
+User = get_user_model()
+
+# Repeat views of a profile by the same viewer within a window count once
+PROFILE_VIEW_WINDOW = 30 * 60
+PROFILE_VIEW_BATCH_SIZE = 1000
+BUFFER = "profile_views"
+
+
+def record(viewer, owner, ip_address=None, user_agent="", referrer="", now=None):
+    """
+    Count a view of ``owner``'s profile by ``viewer`` (users or ids).
+    Returns whether it was the first view of the pair in the window.
+    """
+    now = now or timezone.now()
+    viewer_id, owner_id = helpers.user_id(viewer), helpers.user_id(owner)
+    window = int(now.timestamp() // PROFILE_VIEW_WINDOW)
+    if not cache.add(
+        f"profile_view_seen:{viewer_id}:{owner_id}:{window}",
+        True,
+        PROFILE_VIEW_WINDOW,
+    ):
+        return False
+    buffers.append(BUFFER, (viewer_id, owner_id, ip_address, user_agent, referrer), now)
+    return True
+
+
+def flush(now=None):
+    """
+    Store the views of every finished minute and add them to the owners'
+    counters. Returns the number of views stored.
+    """
+    stored = 0
+    for minute, views in buffers.drain(BUFFER, now):
+        # Users may have been deleted since they viewed or were viewed
+        existing = set(
+            User.objects.filter(
+                pk__in={view[0] for view in views} | {view[1] for view in views}
+            ).values_list("pk", flat=True)
+        )
+        rows = [
+            ProfileView(
+                viewer_id=viewer_id if viewer_id in existing else None,
+                profile_owner_id=owner_id,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                referrer=referrer,
+            )
+            for viewer_id, owner_id, ip_address, user_agent, referrer in views
+            if owner_id in existing
+        ]
+        ProfileView.objects.bulk_create(rows, batch_size=PROFILE_VIEW_BATCH_SIZE)
+
+        owners = Counter(row.profile_owner_id for row in rows)
+        stats.add_profile_views(owners)
+        for owner_id in owners:
+            activity.touch(owner_id, minute)
+        stored += len(rows)
+    return stored
@@ -0,0 +1,644 @@
+"""
+Analytics reports built from grouped aggregates.
+
+``generate_analytics`` built its reports in Python: profile completeness
+was scored user by user over every active user, once per report that
+showed it, the network growth timeline ran one count per day, top skills
+and most connected users loaded each user separately, and trending
+technologies loaded every recent project. A dozen more counts ran one
+after another and every report was held in memory until the last one was
+done.
+
+Each report here is a handful of queries: conditional ``Count``s folded
+into one ``aggregate`` per table, ``GROUP BY`` queries for breakdowns and
+rankings, and completeness scored in SQL from the same fields and sections
+as ``stats.completeness_scores``. ``generate`` runs independent reports on
+a thread pool and yields each one as it finishes, and ``write_jsonl`` and
+``write_csv`` stream them as flat (report, metric, value) rows.
+
+Events such as sign-ups, endorsements or new content are counted per local
+day by ``daily_counts``. Finished days are cached for
+``REPORT_DAY_TIMEOUT``, so a daily run after a monthly one only queries
+today, and a period overlapping an earlier one only queries the days that
+are not cached yet. Periods therefore cover whole days.
+"""
+
+import csv
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    Exists,
+    FloatField,
+    IntegerField,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from . import stats
+from .models import (
+    Achievement,
+    ActivityLog,
+    Certification,
+    Connection,
+    Education,
+    Experience,
+    Follow,
+    Language,
+    Message,
+    NetworkMembership,
+    ProfileStats,
+    Project,
+    Publication,
+    Recommendation,
+    Resume,
+    Skill,
+    SkillEndorsement,
+    Task,
+    UserFile,
+    Volunteer,
+)
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = 4
+# Finished days are recounted after this, picking up late edits and deletes
+REPORT_DAY_TIMEOUT = 24 * 60 * 60
+TOP_LIMIT = 10
+PROJECT_CHUNK_SIZE = 2000
+
+COMPLETENESS_RANGES = [
+    ("very_low", 0, 20, "Very Low"),
+    ("low", 21, 40, "Low"),
+    ("medium", 41, 60, "Medium"),
+    ("high", 61, 80, "High"),
+    ("very_high", 81, 100, "Very High"),
+]
+CONTENT_MODELS = {
+    "experiences": Experience,
+    "education": Education,
+    "skills": Skill,
+    "projects": Project,
+    "certifications": Certification,
+    "achievements": Achievement,
+    "publications": Publication,
+    "volunteer": Volunteer,
+    "languages": Language,
+    "resumes": Resume,
+}
+ROW_FIELDS = ["report", "metric", "value"]
+
+
+def _events():
+    """Per event, the rows counted and the date they are counted on"""
+    events = {
+        "users_joined": (User.objects.all(), "date_joined"),
+        "activity": (ActivityLog.objects.all(), "created_at"),
+        "connections_accepted": (
+            Connection.objects.filter(status=Connection.ConnectionStatus.ACCEPTED),
+            "updated_at",
+        ),
+        "follows": (Follow.objects.all(), "created_at"),
+        "endorsements": (SkillEndorsement.objects.all(), "created_at"),
+        "recommendations": (Recommendation.objects.all(), "created_at"),
+        "files": (UserFile.objects.all(), "created_at"),
+    }
+    for name, model in CONTENT_MODELS.items():
+        events[name] = (model.objects.all(), "created_at")
+    return events
+
+
+def period_days(start, end):
+    """The local dates from ``start`` to ``end``, both included"""
+    first, last = timezone.localdate(start), timezone.localdate(end)
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def daily_counts(name, queryset, field, days, group=None):
+    """
+    {day: {``group`` value: rows}} of ``queryset`` by the local date of
+    ``field``, for each of ``days``. Without ``group`` the only key is None.
+    """
+    today = timezone.localdate()
+    keys = {f"report_day:{name}:{day.isoformat()}": day for day in days}
+    counts = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [day for day in days if day not in counts]
+    if not missing:
+        return counts
+
+    # One grouped query over the span of the missing days
+    fresh = {day: {} for day in missing}
+    grouped = (
+        queryset.filter(
+            **{
+                f"{field}__gte": _day_start(missing[0]),
+                f"{field}__lt": _day_start(missing[-1] + timedelta(days=1)),
+            }
+        )
+        .order_by()
+        .annotate(day=TruncDate(field))
+        .values(*["day", group] if group else ["day"])
+        .annotate(count=Count("pk"))
+    )
+    for row in grouped:
+        if row["day"] in fresh:
+            fresh[row["day"]][row.get(group)] = row["count"]
+    cache.set_many(
+        {key: fresh[day] for key, day in keys.items() if day in fresh and day < today},
+        REPORT_DAY_TIMEOUT,
+    )
+    counts.update(fresh)
+    return counts
+
+
+def events(name, days, group=None):
+    """``daily_counts`` of the event ``name``"""
+    queryset, field = _events()[name]
+    key = f"{name}:{group}" if group else name
+    return daily_counts(key, queryset, field, days, group)
+
+
+def _total(counts):
+    return sum(sum(groups.values()) for groups in counts.values())
+
+
+def _by_group(counts):
+    totals = Counter()
+    for groups in counts.values():
+        totals.update(groups)
+    return totals
+
+
+def _full_name(row, prefix):
+    return f"{row[f'{prefix}first_name']} {row[f'{prefix}last_name']}".strip()
+
+
+def _filled(field):
+    return Q(**{f"{field}__isnull": False}) & ~Q(**{field: ""})
+
+
+def completeness_score():
+    """
+    The profile completeness of a user as a SQL expression, scored like
+    ``stats.completeness_scores`` but before rounding.
+    """
+    field_points = stats.COMPLETENESS_FIELDS_SHARE / len(stats.COMPLETENESS_FIELDS)
+    section_points = (100 - stats.COMPLETENESS_FIELDS_SHARE) / len(
+        stats.COMPLETENESS_SECTIONS
+    )
+    terms = [
+        Case(
+            When(_filled(field), then=Value(field_points)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        for field in stats.COMPLETENESS_FIELDS
+    ] + [
+        Case(
+            When(
+                Exists(model.objects.filter(user=OuterRef("pk"))),
+                then=Value(section_points),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        for model in stats.COMPLETENESS_SECTIONS
+    ]
+    return sum(terms[1:], terms[0])
+
+
+def _completeness():
+    """Average completeness of active users and how many fall in each range"""
+    # Half a point either side buckets the scores as if they were rounded
+    return (
+        User.objects.filter(status=User.UserStatus.ACTIVE)
+        .annotate(score=completeness_score())
+        .aggregate(
+            average=Avg("score"),
+            **{
+                key: Count("pk", filter=Q(score__gte=low - 0.5, score__lt=high + 0.5))
+                for key, low, high, _ in COMPLETENESS_RANGES
+            },
+        )
+    )
+
+
+def user_engagement(start, end):
+    days = period_days(start, end)
+    since = _day_start(days[0])
+    users = User.objects.aggregate(
+        active_users=Count(
+            "pk", filter=Q(last_activity__gte=since, status=User.UserStatus.ACTIVE)
+        ),
+        online_users=Count("pk", filter=Q(is_online=True)),
+        total_users=Count("pk", filter=Q(status=User.UserStatus.ACTIVE)),
+    )
+    activity = _by_group(events("activity", days, "activity_type"))
+    top_users = (
+        ActivityLog.objects.filter(created_at__gte=since)
+        .values("user__username", "user__first_name", "user__last_name")
+        .annotate(activity_count=Count("pk"))
+        .order_by("-activity_count")[:TOP_LIMIT]
+    )
+    profile_stats = ProfileStats.objects.filter(
+        user__status=User.UserStatus.ACTIVE
+    ).aggregate(
+        avg_connections=Avg("connections_count"),
+        max_connections=Max("connections_count"),
+        min_connections=Min("connections_count"),
+    )
+
+    return {
+        "start_date": days[0].isoformat(),
+        "end_date": days[-1].isoformat(),
+        **users,
+        "new_users": _total(events("users_joined", days)),
+        "online_percentage": round(
+            users["online_users"] / max(users["total_users"], 1) * 100, 2
+        ),
+        "activity_breakdown": {
+            str(label): activity[value]
+            for value, label in ActivityLog.ActivityType.choices
+        },
+        "top_active_users": list(top_users),
+        "profile_statistics": profile_stats,
+    }
+
+
+def skill_trends(start, end):
+    days = period_days(start, end)
+    since = _day_start(days[0])
+    top_endorsed = (
+        Skill.objects.filter(endorsements__created_at__gte=since)
+        .annotate(endorsement_count=Count("endorsements"))
+        .order_by("-endorsement_count")
+        .values(
+            "name",
+            "category",
+            "user__first_name",
+            "user__last_name",
+            "endorsement_count",
+        )[: TOP_LIMIT * 2]
+    )
+    popular_categories = (
+        Skill.objects.values("category")
+        .annotate(count=Count("pk"))
+        .order_by("-count")[:TOP_LIMIT]
+    )
+    skill_count = Coalesce(
+        Subquery(
+            Skill.objects.filter(user=OuterRef("pk"))
+            .order_by()
+            .values("user")
+            .annotate(count=Count("pk"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+    skill_distribution = (
+        User.objects.filter(status=User.UserStatus.ACTIVE)
+        .annotate(skill_count=skill_count)
+        .values("skill_count")
+        .annotate(user_count=Count("pk"))
+        .order_by("skill_count")
+    )
+    top_endorsers = (
+        SkillEndorsement.objects.filter(created_at__gte=since)
+        .values("endorser__username", "endorser__first_name", "endorser__last_name")
+        .annotate(endorsement_count=Count("pk"))
+        .order_by("-endorsement_count")[:TOP_LIMIT]
+    )
+
+    return {
+        "top_endorsed_skills": [
+            {
+                "name": row["name"],
+                "category": row["category"],
+                "endorsement_count": row["endorsement_count"],
+                "user": _full_name(row, "user__"),
+            }
+            for row in top_endorsed
+        ],
+        "popular_categories": list(popular_categories),
+        "new_skills_added": _total(events("skills", days)),
+        "total_endorsements": _total(events("endorsements", days)),
+        "skill_distribution": list(skill_distribution),
+        "top_endorsers": list(top_endorsers),
+    }
+
+
+def network_growth(start, end):
+    days = period_days(start, end)
+    since = _day_start(days[0])
+    daily = events("connections_accepted", days)
+    connections = Connection.objects.aggregate(
+        pending_connections=Count(
+            "pk", filter=Q(status=Connection.ConnectionStatus.PENDING)
+        ),
+        total_connections=Count(
+            "pk", filter=Q(status=Connection.ConnectionStatus.ACCEPTED)
+        ),
+    )
+    active_stats = ProfileStats.objects.filter(user__status=User.UserStatus.ACTIVE)
+    user_fields = ["user__username", "user__first_name", "user__last_name"]
+    most_connected = active_stats.order_by("-connections_count").values(
+        *user_fields, "connections_count"
+    )[:TOP_LIMIT]
+    most_followed = active_stats.order_by("-followers_count").values(
+        *user_fields, "followers_count"
+    )[:TOP_LIMIT]
+
+    return {
+        "new_connections": _total(daily),
+        **connections,
+        "new_follows": _total(events("follows", days)),
+        "new_network_memberships": NetworkMembership.objects.filter(
+            joined_at__gte=since, status=NetworkMembership.MembershipStatus.ACTIVE
+        ).count(),
+        "most_connected_users": [
+            {
+                "user": _full_name(row, "user__"),
+                "username": row["user__username"],
+                "connections": row["connections_count"],
+            }
+            for row in most_connected
+        ],
+        "most_followed_users": [
+            {
+                "user": _full_name(row, "user__"),
+                "username": row["user__username"],
+                "followers": row["followers_count"],
+            }
+            for row in most_followed
+        ],
+        "daily_growth": [
+            {"date": day.isoformat(), "new_connections": sum(daily[day].values())}
+            for day in days
+        ],
+    }
+
+
+def profile_completeness(start, end):
+    completeness = _completeness()
+    missing = User.objects.filter(status=User.UserStatus.ACTIVE).aggregate(
+        users_without_bio=Count("pk", filter=~_filled("bio")),
+        users_without_photo=Count("pk", filter=~_filled("profile_picture")),
+        **{
+            f"users_without_{name}": Count(
+                "pk", filter=~Exists(model.objects.filter(user=OuterRef("pk")))
+            )
+            for name, model in [
+                ("experience", Experience),
+                ("education", Education),
+                ("skills", Skill),
+            ]
+        },
+    )
+
+    return {
+        "average_completeness": round(completeness["average"] or 0, 2),
+        "completeness_distribution": {
+            label: completeness[key] for key, _, _, label in COMPLETENESS_RANGES
+        },
+        "improvement_opportunities": missing,
+    }
+
+
+def system_usage(start, end):
+    days = period_days(start, end)
+    since = _day_start(days[0])
+    messages = Message.objects.filter(created_at__gte=since).aggregate(
+        total_messages=Count("pk"),
+        read_messages=Count("pk", filter=Q(read_at__isnull=False)),
+    )
+    tasks = Task.objects.aggregate(
+        total_tasks=Count("pk", filter=Q(created_at__gte=since)),
+        completed_tasks=Count(
+            "pk",
+            filter=Q(created_at__gte=since, status=Task.TaskStatus.COMPLETED),
+        ),
+        overdue_tasks=Count(
+            "pk",
+            filter=Q(
+                due_date__lt=timezone.now(),
+                status__in=[Task.TaskStatus.TODO, Task.TaskStatus.IN_PROGRESS],
+            ),
+        ),
+    )
+    files = _by_group(events("files", days, "is_public"))
+
+    return {
+        "content_statistics": {
+            f"total_{name}": model.objects.count()
+            for name, model in CONTENT_MODELS.items()
+        },
+        "new_content": {
+            f"new_{name}": _total(events(name, days)) for name in CONTENT_MODELS
+        },
+        "message_statistics": messages,
+        "task_statistics": tasks,
+        "file_statistics": {
+            "total_files": sum(files.values()),
+            "public_files": files[True],
+        },
+    }
+
+
+def admin_summary(start, end):
+    week = period_days(end - timedelta(days=7), end)
+    month = period_days(end - timedelta(days=30), end)
+    users = User.objects.aggregate(
+        total_users=Count("pk"),
+        active_users=Count("pk", filter=Q(status=User.UserStatus.ACTIVE)),
+        verified_users=Count("pk", filter=Q(is_verified=True)),
+        suspended_users=Count("pk", filter=Q(status=User.UserStatus.SUSPENDED)),
+    )
+    total_users = max(users["total_users"], 1)
+    averages = ProfileStats.objects.filter(
+        user__status=User.UserStatus.ACTIVE
+    ).aggregate(
+        avg_connections_per_user=Avg("connections_count"),
+        avg_endorsements_per_user=Avg("endorsements_count"),
+    )
+    overdue_tasks = Task.objects.filter(
+        due_date__lt=timezone.now(),
+        status__in=[Task.TaskStatus.TODO, Task.TaskStatus.IN_PROGRESS],
+    ).count()
+
+    alerts = []
+    if users["suspended_users"] > users["total_users"] * 0.05:
+        alerts.append(
+            f"High suspension rate: {users['suspended_users']} users suspended"
+        )
+    if users["active_users"] < users["total_users"] * 0.7:
+        alerts.append(
+            f"Low activity rate: Only {users['active_users']}/"
+            f"{users['total_users']} users active"
+        )
+    if overdue_tasks > 0:
+        alerts.append(f"{overdue_tasks} overdue tasks need attention")
+
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "system_health": {
+            **users,
+            "activity_rate": round(users["active_users"] / total_users * 100, 2),
+            "verification_rate": round(users["verified_users"] / total_users * 100, 2),
+        },
+        "recent_activity": {
+            "new_users_7d": _total(events("users_joined", week)),
+            "new_connections_7d": _total(events("connections_accepted", week)),
+            "new_endorsements_7d": _total(events("endorsements", week)),
+            "new_recommendations_7d": _total(events("recommendations", week)),
+        },
+        "moderation_queue": {
+            "pending_recommendations": _total(events("recommendations", month)),
+            "recent_certifications": _total(events("certifications", month)),
+            "total_user_files": _total(events("files", month)),
+            "pending_network_memberships": NetworkMembership.objects.filter(
+                status=NetworkMembership.MembershipStatus.PENDING
+            ).count(),
+        },
+        "performance_indicators": {
+            "avg_profile_completeness": round(_completeness()["average"] or 0, 2),
+            **{key: round(value or 0, 2) for key, value in averages.items()},
+        },
+        "alerts": alerts,
+    }
+
+
+def trending_topics(start, end):
+    days = period_days(start, end)
+    since = _day_start(days[0])
+    companies = (
+        Experience.objects.filter(created_at__gte=since)
+        .values("company")
+        .annotate(count=Count("pk"))
+        .order_by("-count")[:TOP_LIMIT]
+    )
+    # Technologies are JSON lists, which are not portable to group in SQL,
+    # so they are streamed and only the tally is kept
+    technologies = Counter()
+    for values in (
+        Project.objects.filter(created_at__gte=since)
+        .values_list("technologies", flat=True)
+        .iterator(chunk_size=PROJECT_CHUNK_SIZE)
+    ):
+        if isinstance(values, str):
+            values = values.split(",")
+        technologies.update({str(value).strip() for value in values or []} - {""})
+    categories = _by_group(events("skills", days, "category"))
+
+    return {
+        "trending_companies": list(companies),
+        "trending_technologies": [
+            {"technology": name, "count": count}
+            for name, count in technologies.most_common(TOP_LIMIT)
+        ],
+        "trending_skill_categories": [
+            {"category": name, "count": count}
+            for name, count in categories.most_common(TOP_LIMIT)
+        ],
+    }
+
+
+REPORTS = {
+    "user_engagement": user_engagement,
+    "skill_trends": skill_trends,
+    "network_growth": network_growth,
+    "profile_completeness": profile_completeness,
+    "system_usage": system_usage,
+    "admin_summary": admin_summary,
+    "trending_topics": trending_topics,
+}
+
+
+def _build(name, start, end):
+    try:
+        return REPORTS[name](start, end)
+    except Exception as e:
+        logger.error(f"Error generating {name} report: {str(e)}", exc_info=True)
+        return {"error": str(e)}
+
+
+def _build_in_thread(name, start, end):
+    try:
+        return _build(name, start, end)
+    finally:
+        # Worker threads open their own connections
+        connections.close_all()
+
+
+def generate(names, start, end, workers=REPORT_WORKERS):
+    """
+    Yield (name, report) for each of ``names`` as it finishes, running up
+    to ``workers`` reports at once. A failed report is {"error": message}.
+    """
+    if workers <= 1 or len(names) <= 1:
+        for name in names:
+            yield name, _build(name, start, end)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_build_in_thread, name, start, end): name for name in names
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def rows(name, report):
+    """
+    The report as flat {"report", "metric", "value"} rows, nested keys and
+    list positions joined with dots in the metric.
+    """
+
+    def walk(path, value):
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, (list, tuple)):
+            items = enumerate(value)
+        else:
+            yield {"report": name, "metric": path, "value": value}
+            return
+        for key, item in items:
+            yield from walk(f"{path}.{key}" if path else str(key), item)
+
+    yield from walk("", report)
+
+
+def write_jsonl(stream, reports):
+    """Write each (name, report) of ``reports`` to ``stream`` as JSON lines"""
+    for name, report in reports:
+        for row in rows(name, report):
+            stream.write(json.dumps(row, default=str) + "\n")
+
+
+def write_csv(stream, reports):
+    """Write each (name, report) of ``reports`` to ``stream`` as CSV rows"""
+    writer = csv.DictWriter(stream, fieldnames=ROW_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    for name, report in reports:
+        writer.writerows(rows(name, report))
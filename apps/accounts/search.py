@@ -0,0 +1,450 @@
+"""
+Indexed people search.
+
+``search_profiles`` OR-ed ``icontains`` predicates over ``User`` and
+``UserProfile``, joined skills, experience and education for more of them
+and could count connections for sorting on top: unindexed scans that also
+needed ``DISTINCT``.
+
+Every searchable user now has a ``ProfileSearchDocument`` holding their
+name, headline, bio, skills, positions, companies, schools and location as
+plain text, a ``,python,django,`` skill index for filters and their
+connection count. The profile content signals rebuild a user's document
+once the change commits.
+
+Text queries use the best index the database has:
+
+* SQLite: an FTS5 table over the documents, kept in step by triggers and
+  ranked with ``bm25`` (field weights in ``FIELD_WEIGHTS``).
+* PostgreSQL: a GIN full-text index ranked with ``ts_rank``, plus a
+  trigram index on names that also catches misspellings.
+* Anything else, or SQLite built without FTS5: ``icontains`` on the
+  documents table alone.
+
+``install_search_index`` creates these after every migrate. At most
+``SEARCH_CANDIDATE_LIMIT`` matches are ranked: their text relevance is
+blended with how close they are to the searcher in the social graph
+(``DEGREE_BOOSTS``) and with their own connection count, and the skill and
+location facets are counted over the same matches.
+"""
+
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+from apps.common import helpers
+
+from . import graph
+from .models import Education, Experience, ProfileSearchDocument, Skill
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "accounts_profilesearch_fts"
+DOCUMENT_TABLE = ProfileSearchDocument._meta.db_table
+
+TEXT_FIELDS = [
+    "name",
+    "headline",
+    "bio",
+    "skills",
+    "titles",
+    "companies",
+    "schools",
+    "location",
+]
+# bm25 weight of each of TEXT_FIELDS
+FIELD_WEIGHTS = [10.0, 5.0, 1.0, 4.0, 3.0, 3.0, 2.0, 2.0]
+DOCUMENT_FIELDS = TEXT_FIELDS + ["skill_index", "connections_count", "updated_at"]
+
+# User fields that end up in the document
+USER_SEARCH_FIELDS = {
+    "username",
+    "first_name",
+    "last_name",
+    "bio",
+    "headline",
+    "current_position",
+    "current_company",
+    "location",
+    "is_active",
+}
+
+SEARCH_CANDIDATE_LIMIT = 1000
+FACET_LIMIT = 10
+# Added to the relevance of the searcher's first and second degree connections
+DEGREE_BOOSTS = {1: 1.0, 2: 0.5}
+POPULARITY_WEIGHT = 0.05
+INDEX_BATCH_SIZE = 500
+
+_PG_VECTOR = (
+    "to_tsvector('simple', "
+    + " || ' ' || ".join(f"coalesce({field}, '')" for field in TEXT_FIELDS)
+    + ")"
+)
+
+# Whether each database alias has the FTS5 table
+_fts_tables = {}
+
+
+def _words(query):
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def _join(values):
+    """Distinct non-empty values, in order, as one comma-separated string"""
+    joined = []
+    for value in values:
+        value = (value or "").strip()
+        if value and value not in joined:
+            joined.append(value)
+    return ", ".join(joined)
+
+
+def _skill_key(name):
+    return name.replace(",", " ").strip().lower()
+
+
+def _skill_index(names):
+    keys = sorted({_skill_key(name) for name in names if name and name.strip()})
+    return "," + ",".join(keys) + "," if keys else ""
+
+
+def index_profiles(user_ids):
+    """
+    Rebuild the search documents of the given users; inactive users and
+    profiles that opted out of search lose theirs. Returns the number indexed.
+    """
+    indexed = 0
+    for batch in helpers.chunks(user_ids, INDEX_BATCH_SIZE):
+        skills, titles, companies, schools = (defaultdict(list) for _ in range(4))
+        for user_id, name in Skill.objects.filter(user_id__in=batch).values_list(
+            "user_id", "name"
+        ):
+            skills[user_id].append(name)
+        for user_id, title, company in (
+            Experience.objects.filter(user_id__in=batch)
+            .order_by("-is_current", "-start_date")
+            .values_list("user_id", "title", "company")
+        ):
+            titles[user_id].append(title)
+            companies[user_id].append(company)
+        for user_id, institution in Education.objects.filter(
+            user_id__in=batch
+        ).values_list("user_id", "institution"):
+            schools[user_id].append(institution)
+        adjacency = graph.adjacency(graph.CONNECTIONS, batch)
+
+        documents, hidden = [], []
+        for row in User.objects.filter(pk__in=batch).values(
+            "pk",
+            *USER_SEARCH_FIELDS,
+            "profile__display_name",
+            "profile__bio",
+            "profile__location",
+            "profile__current_position",
+            "profile__searchable",
+        ):
+            user_id = row["pk"]
+            if not row["is_active"] or row["profile__searchable"] is False:
+                hidden.append(user_id)
+                continue
+            documents.append(
+                ProfileSearchDocument(
+                    user_id=user_id,
+                    name=_join(
+                        [
+                            f"{row['first_name']} {row['last_name']}",
+                            row["profile__display_name"],
+                            row["username"],
+                        ]
+                    ),
+                    headline=row["headline"]
+                    or row["current_position"]
+                    or row["profile__current_position"]
+                    or "",
+                    bio=row["bio"] or row["profile__bio"] or "",
+                    skills=_join(skills[user_id]),
+                    titles=_join(titles[user_id]),
+                    companies=_join([row["current_company"], *companies[user_id]]),
+                    schools=_join(schools[user_id]),
+                    location=row["location"] or row["profile__location"] or "",
+                    skill_index=_skill_index(skills[user_id]),
+                    connections_count=len(adjacency.get(user_id, ())),
+                )
+            )
+
+        ProfileSearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=DOCUMENT_FIELDS,
+        )
+        if hidden:
+            ProfileSearchDocument.objects.filter(user_id__in=hidden).delete()
+        indexed += len(documents)
+    return indexed
+
+
+def update_connection_counts(*user_ids):
+    """Refresh the connection counts of some documents from the graph"""
+    adjacency = graph.adjacency(graph.CONNECTIONS, user_ids)
+    by_count = defaultdict(list)
+    for user_id in user_ids:
+        by_count[len(adjacency.get(user_id, ()))].append(user_id)
+    for count, ids in by_count.items():
+        ProfileSearchDocument.objects.filter(user_id__in=ids).update(
+            connections_count=count
+        )
+
+
+def rebuild_search_documents():
+    """Recompute every user's search document; returns the number indexed"""
+    return index_profiles(User.objects.values_list("pk", flat=True))
+
+
+def _install_fts5(cursor):
+    columns = ", ".join(TEXT_FIELDS)
+    new = ", ".join(f"new.{field}" for field in TEXT_FIELDS)
+    old = ", ".join(f"old.{field}" for field in TEXT_FIELDS)
+    remove = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.user_id, {old});"
+    )
+    add = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.user_id, {new});"
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+    )
+    created = cursor.fetchone() is None
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, "
+        f"content='{DOCUMENT_TABLE}', content_rowid='user_id', "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    )
+    triggers = {
+        "insert": f"AFTER INSERT ON {DOCUMENT_TABLE} BEGIN {add} END",
+        "delete": f"AFTER DELETE ON {DOCUMENT_TABLE} BEGIN {remove} END",
+        "update": f"AFTER UPDATE OF {columns} ON {DOCUMENT_TABLE} "
+        f"BEGIN {remove} {add} END",
+    }
+    for name, body in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{name} {body}")
+    if created:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _install_postgresql(cursor):
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {DOCUMENT_TABLE}_fts "
+        f"ON {DOCUMENT_TABLE} USING GIN ({_PG_VECTOR})"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {DOCUMENT_TABLE}_name_trgm "
+        f"ON {DOCUMENT_TABLE} USING GIN (name gin_trgm_ops)"
+    )
+
+
+def install_search_index(using="default"):
+    """Create the database's full-text index over the documents, if it has one"""
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                _install_fts5(cursor)
+            elif connection.vendor == "postgresql":
+                _install_postgresql(cursor)
+    except DatabaseError as e:
+        logger.warning(f"Profile search will not use a text index: {str(e)}")
+    _fts_tables.pop(using, None)
+
+
+def _backend(connection):
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor == "sqlite":
+        if connection.alias not in _fts_tables:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [FTS_TABLE],
+                )
+                _fts_tables[connection.alias] = cursor.fetchone() is not None
+        if _fts_tables[connection.alias]:
+            return "fts5"
+    return None
+
+
+def match(query, documents=None, limit=SEARCH_CANDIDATE_LIMIT, using="default"):
+    """
+    The best text matches of ``query`` among ``documents`` (all documents by
+    default), as {user id: relevance}, best first.
+    """
+    words = _words(query)
+    if not words:
+        return {}
+
+    connection = connections[using]
+    backend = _backend(connection)
+    if backend is None:
+        rows = ProfileSearchDocument.objects.all() if documents is None else documents
+        for word in words:
+            rows = rows.filter(
+                reduce(or_, [Q(**{f"{f}__icontains": word}) for f in TEXT_FIELDS])
+            )
+        return dict.fromkeys(
+            rows.order_by("-connections_count").values_list("user_id", flat=True)[
+                :limit
+            ],
+            1.0,
+        )
+
+    # The filters are checked on the text matches only, rather than
+    # scanning every document for them up front
+    restrict, restrict_params = "", []
+    if documents is not None:
+        sql, restrict_params = documents.query.get_compiler(using).compile(
+            documents.query.where
+        )
+        restrict = f" AND ({sql})"
+
+    if backend == "fts5":
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+        sql = (
+            f"SELECT {FTS_TABLE}.rowid, -bm25({FTS_TABLE}, {weights}) "
+            f"FROM {FTS_TABLE} JOIN {DOCUMENT_TABLE} "
+            f"ON {DOCUMENT_TABLE}.user_id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{restrict} "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s"
+        )
+        # Every word, as a prefix
+        params = [" ".join(f'"{word}"*' for word in words)]
+    else:
+        text = " ".join(words)
+        sql = (
+            f"SELECT user_id, ts_rank({_PG_VECTOR}, query) + similarity(name, %s) "
+            f"FROM {DOCUMENT_TABLE}, plainto_tsquery('simple', %s) query "
+            f"WHERE ({_PG_VECTOR} @@ query OR name %% %s)"
+            f"{restrict} ORDER BY 2 DESC LIMIT %s"
+        )
+        params = [text, text, text]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, *restrict_params, limit])
+        return {user_id: relevance for user_id, relevance in cursor.fetchall()}
+
+
+def filter_documents(skills=None, location="", company="", experience="", education=""):
+    """Documents passing the structured filters, or None when there are none"""
+    filters = Q()
+    if skills:
+        filters &= reduce(
+            or_, [Q(skill_index__contains=f",{_skill_key(name)},") for name in skills]
+        )
+    for field, value in [
+        ("location", location),
+        ("companies", company),
+        ("titles", experience),
+        ("schools", education),
+    ]:
+        if value:
+            filters &= Q(**{f"{field}__icontains": value})
+    return ProfileSearchDocument.objects.filter(filters) if filters else None
+
+
+def _facets(rows):
+    skills, locations = Counter(), Counter()
+    for row in rows:
+        skills.update({name for name in row["skills"].split(", ") if name})
+        if row["location"]:
+            locations[row["location"]] += 1
+    return {
+        "skills": [
+            {"value": value, "count": count}
+            for value, count in skills.most_common(FACET_LIMIT)
+        ],
+        "locations": [
+            {"value": value, "count": count}
+            for value, count in locations.most_common(FACET_LIMIT)
+        ],
+    }
+
+
+def _degree(user_id, neighbours, adjacency):
+    if user_id in neighbours:
+        return 1
+    if not adjacency.get(user_id, frozenset()).isdisjoint(neighbours):
+        return 2
+    return None
+
+
+def _relevance_key(viewer, relevance, user_ids):
+    """Text relevance plus closeness to ``viewer`` and popularity"""
+    top = max(relevance.values(), default=0.0) or 1.0
+    neighbours, adjacency = frozenset(), {}
+    if viewer is not None and viewer.is_authenticated:
+        neighbours = graph.neighbors(viewer)
+        if neighbours:
+            adjacency = graph.adjacency(graph.CONNECTIONS, user_ids)
+
+    def key(row):
+        user_id = row["user_id"]
+        return (
+            relevance[user_id] / top
+            + DEGREE_BOOSTS.get(_degree(user_id, neighbours, adjacency), 0.0)
+            + POPULARITY_WEIGHT * math.log1p(row["connections_count"])
+        )
+
+    return key
+
+
+SORT_KEYS = {
+    "name": lambda row: row["name"].lower(),
+    "experience": lambda row: len(row["titles"].split(", ")) if row["titles"] else 0,
+    "connections": lambda row: row["connections_count"],
+}
+
+
+def search(viewer, visible, query="", sort_by="relevance", descending=True, **filters):
+    """
+    Search the documents of the users in ``visible``.
+
+    Returns the ids of at most ``SEARCH_CANDIDATE_LIMIT`` matching users in
+    order, and the skill and location facets of all of them. Visibility is
+    checked with the filters, before the limit, so every candidate can be
+    shown.
+    """
+    documents = filter_documents(**filters)
+    if documents is None:
+        documents = ProfileSearchDocument.objects.all()
+    documents = documents.filter(user_id__in=visible.order_by().values("pk"))
+    if _words(query):
+        relevance = match(query, documents, limit=SEARCH_CANDIDATE_LIMIT)
+    else:
+        relevance = dict.fromkeys(
+            documents.order_by("-connections_count").values_list("user_id", flat=True)[
+                :SEARCH_CANDIDATE_LIMIT
+            ],
+            0.0,
+        )
+
+    rows = list(
+        ProfileSearchDocument.objects.filter(user_id__in=list(relevance)).values(
+            "user_id", "name", "skills", "titles", "location", "connections_count"
+        )
+    )
+
+    if sort_by in SORT_KEYS:
+        key = SORT_KEYS[sort_by]
+    else:
+        key = _relevance_key(viewer, relevance, [row["user_id"] for row in rows])
+    rows.sort(key=key, reverse=descending)
+    return [row["user_id"] for row in rows], _facets(rows)
@@ -1,9 +1,9 @@
 from django.contrib.auth import get_user_model, password_validation
 from django.core.exceptions import ValidationError
-from django.db import models
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from . import graph
 from .models import (
     Achievement,
     ActivityLog,
@@ -519,10 +519,7 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
     def get_connections_count(self, obj):
-        return Connection.objects.filter(
-            models.Q(from_user=obj) | models.Q(to_user=obj),
-            status=Connection.ConnectionStatus.ACCEPTED,
-        ).count()
+        return len(graph.neighbors(obj))
 
     def get_followers_count(self, obj):
         return obj.followers.count()
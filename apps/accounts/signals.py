@@ -2,16 +2,22 @@ import logging
 from datetime import timedelta
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Count, Q
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 
+from . import access, activity, authentication, graph, search, stats
+from .engagement import update_engagement_scores, update_skill_scores
 from .models import (
     Achievement,
     ActivityLog,
     Certification,
     Connection,
+    ConnectionSuggestion,
+    Department,
     Education,
     Experience,
     Follow,
@@ -25,14 +31,18 @@ from .models import (
     Publication,
     Recommendation,
     Resume,
+    Role,
     Skill,
     SkillEndorsement,
     Task,
     TaskComment,
+    UserDepartment,
     UserFile,
     UserProfile,
+    UserRole,
     Volunteer,
 )
+from .suggestions import build_suggestions, forget_suggestion
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -54,7 +64,7 @@ def create_user_profile(sender, instance, created, **kwargs):
             )
 
             # Create profile stats
-            stats, stats_created = ProfileStats.objects.get_or_create(
+            _, stats_created = ProfileStats.objects.get_or_create(
                 user=instance,
                 defaults={
                     "profile_views": 0,
@@ -81,43 +91,29 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
 def update_profile_completeness(sender, instance, **kwargs):
-    """Update profile completeness score when profile is updated."""
+    """Update profile completeness score when profile content changes."""
     try:
-        completeness = 0
-        total_fields = 8  # Total number of profile fields to check
-
-        # Check profile fields
-        if instance.user.bio:
-            completeness += 1
-        if instance.user.location:
-            completeness += 1
-        if instance.user.current_position:
-            completeness += 1
-        if instance.user.current_company:
-            completeness += 1
-        if instance.website:
-            completeness += 1
-        if instance.user.phone_number:
-            completeness += 1
-        if instance.user.profile_picture:
-            completeness += 1
-        if instance.cover_image:
-            completeness += 1
-
-        # Calculate percentage
-        completeness_percentage = int((completeness / total_fields) * 100)
-
-        # Update profile stats
-        stats, created = ProfileStats.objects.get_or_create(user=instance.user)
-        # Only update if ProfileStats has profile_completeness field
-        if hasattr(stats, "profile_completeness"):
-            stats.profile_completeness = completeness_percentage
-            stats.save(update_fields=["profile_completeness"])
-
-        logger.debug(
-            f"Updated profile completeness for {instance.user.username}: {completeness_percentage}%"
-        )
+        stats.update_completeness([instance.user_id])
+    except Exception as e:
+        logger.error(f"Error updating profile completeness: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=User)
+def update_user_completeness(sender, instance, update_fields=None, **kwargs):
+    """Update profile completeness score when the user's own fields change."""
+    if update_fields and not set(stats.COMPLETENESS_FIELDS).intersection(update_fields):
+        return
+    try:
+        stats.update_completeness([instance.pk])
     except Exception as e:
         logger.error(f"Error updating profile completeness: {str(e)}", exc_info=True)
 
@@ -127,19 +123,6 @@ def handle_connection_creation(sender, instance, created, **kwargs):
     """Handle connection creation and updates."""
     if created:
         try:
-            # Update connection counts for both users
-            for user in [instance.from_user, instance.to_user]:
-                stats, created = ProfileStats.objects.get_or_create(user=user)
-                stats.connections_count = (
-                    Connection.objects.filter(
-                        from_user=user, status=Connection.ConnectionStatus.ACCEPTED
-                    ).count()
-                    + Connection.objects.filter(
-                        to_user=user, status=Connection.ConnectionStatus.ACCEPTED
-                    ).count()
-                )
-                stats.save(update_fields=["connections_count"])
-
             # Create notification for connection request
             if instance.status == Connection.ConnectionStatus.PENDING:
                 Notification.objects.create(
@@ -166,23 +149,27 @@ def handle_connection_creation(sender, instance, created, **kwargs):
             logger.error(f"Error handling connection creation: {str(e)}", exc_info=True)
 
 
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def update_connection_counters(sender, instance, **kwargs):
+    """Recount the connections and pending requests of both users."""
+    try:
+        stats.refresh_counters(
+            [instance.from_user_id, instance.to_user_id], stats.CONNECTION_COUNTERS
+        )
+    except Exception as e:
+        logger.error(f"Error updating connection counters: {str(e)}", exc_info=True)
+
+
 @receiver(post_save, sender=Follow)
 def handle_follow_creation(sender, instance, created, **kwargs):
     """Handle follow relationships."""
     if created:
         try:
             # Update follower/following counts
-            follower_stats, created = ProfileStats.objects.get_or_create(
-                user=instance.follower
+            stats.refresh_counters(
+                [instance.follower_id, instance.following_id], stats.FOLLOW_COUNTERS
             )
-            following_stats, created = ProfileStats.objects.get_or_create(
-                user=instance.following
-            )
-
-            # Since ProfileStats doesn't have following_count/followers_count fields,
-            # we'll just update the last_updated timestamp
-            follower_stats.save()
-            following_stats.save()
 
             # Create notification
             Notification.objects.create(
@@ -203,20 +190,163 @@ def handle_follow_deletion(sender, instance, **kwargs):
     """Handle follow relationship deletion."""
     try:
         # Update follower/following counts
-        follower_stats, created = ProfileStats.objects.get_or_create(
-            user=instance.follower
+        stats.refresh_counters(
+            [instance.follower_id, instance.following_id], stats.FOLLOW_COUNTERS
         )
-        following_stats, created = ProfileStats.objects.get_or_create(
-            user=instance.following
+
+    except Exception as e:
+        logger.error(f"Error handling follow deletion: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def refresh_connection_graph(sender, instance, **kwargs):
+    """Drop the cached connections of both users."""
+    try:
+        graph.invalidate(graph.CONNECTIONS, instance.from_user_id, instance.to_user_id)
+    except Exception as e:
+        logger.error(f"Error refreshing connection graph: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=Connection)
+def drop_connection_suggestion(sender, instance, created, **kwargs):
+    """Stop suggesting two users to each other once a request exists."""
+    if created:
+        try:
+            forget_suggestion(instance.from_user_id, instance.to_user_id)
+        except Exception as e:
+            logger.error(
+                f"Error dropping connection suggestion: {str(e)}", exc_info=True
+            )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def refresh_follow_graph(sender, instance, **kwargs):
+    """Drop the cached followings of the follower and followers of the followed."""
+    try:
+        graph.invalidate(graph.FOLLOWING, instance.follower_id)
+        graph.invalidate(graph.FOLLOWERS, instance.following_id)
+    except Exception as e:
+        logger.error(f"Error refreshing follow graph: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=UserDepartment)
+@receiver(post_delete, sender=UserDepartment)
+def refresh_user_access(sender, instance, **kwargs):
+    """Drop the cached roles and departments of the user concerned."""
+    try:
+        access.invalidate(instance.user_id)
+    except Exception as e:
+        logger.error(f"Error refreshing user access: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=Role)
+def refresh_role_access(sender, instance, created, **kwargs):
+    """Drop the cached roles of everyone holding a renamed role."""
+    if not created:
+        try:
+            access.invalidate(
+                *UserRole.objects.filter(role=instance).values_list(
+                    "user_id", flat=True
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error refreshing role access: {str(e)}", exc_info=True)
+
+
+@receiver(pre_save, sender=Department)
+def remember_department_head(sender, instance, **kwargs):
+    """Keep the previous head, whose access changes along with the new one's."""
+    instance._previous_head_id = (
+        Department.objects.filter(pk=instance.pk)
+        .values_list("head_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def refresh_department_access(sender, instance, **kwargs):
+    """Drop the cached departments of the old and new department head."""
+    try:
+        heads = {instance.head_id, getattr(instance, "_previous_head_id", None)}
+        heads.discard(None)
+        if heads:
+            access.invalidate(*heads)
+    except Exception as e:
+        logger.error(f"Error refreshing department access: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def refresh_auth_snapshot(sender, instance, **kwargs):
+    """Drop the cached auth snapshot of a changed user."""
+    try:
+        authentication.forget_user(instance.pk)
+    except Exception as e:
+        logger.error(f"Error refreshing auth snapshot: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+@receiver(post_delete, sender=BlacklistedToken)
+def refresh_token_blacklist(sender, instance, signal, **kwargs):
+    """Cache the blacklisting or release of a refresh token right away."""
+    try:
+        authentication.remember_blacklisted(
+            instance.token.jti, blacklisted=signal is post_save
         )
+    except Exception as e:
+        logger.error(f"Error refreshing token blacklist: {str(e)}", exc_info=True)
 
-        # Update following count for follower
-        # Update last_updated timestamp
-        follower_stats.save()
-        following_stats.save()
 
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def refresh_search_connections(sender, instance, **kwargs):
+    """Refresh the connection counts in both users' search documents."""
+    try:
+        transaction.on_commit(
+            lambda: search.update_connection_counts(
+                instance.from_user_id, instance.to_user_id
+            )
+        )
     except Exception as e:
-        logger.error(f"Error handling follow deletion: {str(e)}", exc_info=True)
+        logger.error(f"Error refreshing search connections: {str(e)}", exc_info=True)
+
+
+def _reindex_profile(user_id):
+    # After the commit, so that cascading deletes cannot recreate a document
+    transaction.on_commit(lambda: search.index_profiles([user_id]))
+
+
+@receiver(post_save, sender=User)
+def index_user_profile(sender, instance, update_fields=None, **kwargs):
+    """Rebuild the search document of a user whose searchable fields changed."""
+    if update_fields and not search.USER_SEARCH_FIELDS.intersection(update_fields):
+        return
+    try:
+        _reindex_profile(instance.pk)
+    except Exception as e:
+        logger.error(f"Error indexing user profile: {str(e)}", exc_info=True)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+def index_profile_content(sender, instance, **kwargs):
+    """Rebuild the search document of the user owning changed profile content."""
+    try:
+        _reindex_profile(instance.user_id)
+    except Exception as e:
+        logger.error(f"Error indexing profile content: {str(e)}", exc_info=True)
 
 
 @receiver(post_save, sender=SkillEndorsement)
@@ -226,11 +356,7 @@ def handle_skill_endorsement(sender, instance, created, **kwargs):
         try:
             # Update endorsement count for the skill owner
             skill_owner = instance.skill.user
-            stats, created = ProfileStats.objects.get_or_create(user=skill_owner)
-            stats.endorsements_count = SkillEndorsement.objects.filter(
-                skill__user=skill_owner
-            ).count()
-            stats.save(update_fields=["endorsements_count"])
+            stats.refresh_counters([skill_owner.pk], ["endorsements_count"])
 
             # Create notification
             Notification.objects.create(
@@ -254,12 +380,7 @@ def handle_skill_endorsement_deletion(sender, instance, **kwargs):
     """Handle skill endorsement deletion."""
     try:
         # Update endorsement count for the skill owner
-        skill_owner = instance.skill.user
-        stats, created = ProfileStats.objects.get_or_create(user=skill_owner)
-        stats.endorsements_count = SkillEndorsement.objects.filter(
-            skill__user=skill_owner
-        ).count()
-        stats.save(update_fields=["endorsements_count"])
+        stats.refresh_counters([instance.skill.user_id], ["endorsements_count"])
 
     except Exception as e:
         logger.error(
@@ -272,17 +393,11 @@ def handle_profile_view(sender, instance, created, **kwargs):
     """Handle profile view tracking."""
     if created:
         try:
-            # Update profile view count
-            stats, created = ProfileStats.objects.get_or_create(
-                user=instance.profile_owner
-            )
-            stats.profile_views = ProfileView.objects.filter(
-                profile_owner=instance.profile_owner
-            ).count()
-            stats.save(update_fields=["profile_views"])
+            # Update profile view counts
+            stats.record_profile_view(instance.profile_owner_id)
 
             # Update last activity for viewed user
-            instance.profile_owner.update_last_activity()
+            activity.touch(instance.profile_owner_id)
 
         except Exception as e:
             logger.error(f"Error handling profile view: {str(e)}", exc_info=True)
@@ -593,6 +708,8 @@ def update_user_activity_status():
     This should be called periodically.
     """
     try:
+        activity.flush()
+
         # Mark users as offline if they haven't been active for 15 minutes
         fifteen_minutes_ago = timezone.now() - timedelta(minutes=15)
 
@@ -638,89 +755,51 @@ def send_connection_suggestions():
     This should be called periodically.
     """
     try:
-        active_users = User.objects.filter(status=User.UserStatus.ACTIVE)
-
-        for user in active_users:
-            # Get mutual connections
-            user_connections = Connection.objects.filter(
-                Q(from_user=user) | Q(to_user=user),
-                status=Connection.ConnectionStatus.ACCEPTED,
-            )
-
-            suggested_users = set()
-
-            # Find users with mutual connections
-            for connection in user_connections:
-                other_user = (
-                    connection.to_user
-                    if connection.from_user == user
-                    else connection.from_user
-                )
+        build_suggestions()
 
-                # Get other user's connections
-                other_connections = Connection.objects.filter(
-                    Q(from_user=other_user) | Q(to_user=other_user),
-                    status=Connection.ConnectionStatus.ACCEPTED,
-                ).exclude(
-                    Q(from_user=user)
-                    | Q(to_user=user)  # Exclude existing connections with main user
-                )
-
-                for other_conn in other_connections[:3]:  # Limit suggestions
-                    suggested_user = (
-                        other_conn.to_user
-                        if other_conn.from_user == other_user
-                        else other_conn.from_user
-                    )
-                    if suggested_user != user:
-                        suggested_users.add(suggested_user)
-
-            # Find users from same company
-            if hasattr(user, "userprofile") and user.userprofile.current_position:
-                current_experiences = Experience.objects.filter(
-                    user=user, is_current=True
-                ).values_list("company", flat=True)
-
-                for company in current_experiences:
-                    same_company_users = (
-                        Experience.objects.filter(company=company, is_current=True)
-                        .exclude(user=user)
-                        .values_list("user", flat=True)
-                    )
-
-                    for user_id in same_company_users[:2]:  # Limit suggestions
-                        try:
-                            suggested_user = User.objects.get(id=user_id)
-                            suggested_users.add(suggested_user)
-                        except User.DoesNotExist:
-                            continue
-
-            # Send notifications for suggestions (limit to 5 per day)
-            existing_suggestions_today = Notification.objects.filter(
-                recipient=user,
+        # Send notifications for suggestions (limit to 5 per day)
+        sent_today = dict(
+            Notification.objects.filter(
                 notification_type=Notification.NotificationType.CONNECTION_REQUEST,
                 created_at__date=timezone.now().date(),
                 title__icontains="You might know",
-            ).count()
-
-            if existing_suggestions_today < 5:
-                for suggested_user in list(suggested_users)[
-                    : 5 - existing_suggestions_today
-                ]:
-                    # Check if already connected or request pending
-                    existing_connection = Connection.objects.filter(
-                        Q(from_user=user, to_user=suggested_user)
-                        | Q(from_user=suggested_user, to_user=user)
-                    ).exists()
-
-                    if not existing_connection:
-                        Notification.objects.create(
-                            recipient=user,
-                            notification_type=Notification.NotificationType.CONNECTION_REQUEST,
-                            title=f"You might know {suggested_user.get_full_name()}",
-                            message=f"Connect with {suggested_user.get_full_name()} to expand your network.",
-                            data={"suggested_user_id": str(suggested_user.id)},
-                        )
+            )
+            .values("recipient_id")
+            .annotate(count=Count("id"))
+            .values_list("recipient_id", "count")
+        )
+
+        notifications = []
+        suggestions = (
+            ConnectionSuggestion.objects.select_related("suggested_user")
+            .only(
+                "user_id",
+                "suggested_user__username",
+                "suggested_user__first_name",
+                "suggested_user__last_name",
+            )
+            .order_by("user_id", "-score")
+        )
+        for suggestion in suggestions.iterator(chunk_size=2000):
+            user_id = suggestion.user_id
+            if sent_today.get(user_id, 0) >= 5:
+                continue
+            sent_today[user_id] = sent_today.get(user_id, 0) + 1
+
+            suggested_user = suggestion.suggested_user
+            notifications.append(
+                Notification(
+                    recipient_id=user_id,
+                    notification_type=Notification.NotificationType.CONNECTION_REQUEST,
+                    title=f"You might know {suggested_user.get_full_name()}",
+                    message=f"Connect with {suggested_user.get_full_name()} to expand your network.",
+                    data={"suggested_user_id": str(suggested_user.id)},
+                )
+            )
+            if len(notifications) >= 1000:
+                Notification.objects.bulk_create(notifications)
+                notifications = []
+        Notification.objects.bulk_create(notifications)
 
     except Exception as e:
         logger.error(f"Error sending connection suggestions: {str(e)}", exc_info=True)
@@ -925,58 +1004,8 @@ def calculate_profile_engagement_score():
     This should be called weekly.
     """
     try:
-        one_week_ago = timezone.now() - timedelta(days=7)
-
-        for user in User.objects.filter(status=User.UserStatus.ACTIVE):
-            score = 0
-
-            # Profile views (weight: 1)
-            score += ProfileView.objects.filter(
-                profile_owner=user, created_at__gte=one_week_ago
-            ).count()
-
-            # Endorsements received (weight: 3)
-            score += (
-                SkillEndorsement.objects.filter(
-                    skill__user=user, created_at__gte=one_week_ago
-                ).count()
-                * 3
-            )
-
-            # Recommendations received (weight: 5)
-            score += (
-                Recommendation.objects.filter(
-                    recommended_user=user,
-                    status=Recommendation.RecommendationStatus.APPROVED,
-                    updated_at__gte=one_week_ago,
-                ).count()
-                * 5
-            )
-
-            # New connections (weight: 4)
-            score += (
-                Connection.objects.filter(
-                    Q(from_user=user) | Q(to_user=user),
-                    status=Connection.ConnectionStatus.ACCEPTED,
-                    updated_at__gte=one_week_ago,
-                ).count()
-                * 4
-            )
-
-            # Messages sent/received (weight: 2)
-            score += (
-                Message.objects.filter(
-                    Q(sender=user) | Q(recipient=user), created_at__gte=one_week_ago
-                ).count()
-                * 2
-            )
-
-            # Update profile stats
-            stats, created = ProfileStats.objects.get_or_create(user=user)
-            stats.engagement_score = score
-            stats.save(update_fields=["engagement_score"])
-
-        logger.info("Updated engagement scores for all active users")
+        scored = update_engagement_scores()
+        logger.info(f"Updated engagement scores, {scored} active users engaged")
 
     except Exception as e:
         logger.error(f"Error calculating engagement scores: {str(e)}", exc_info=True)
@@ -988,37 +1017,8 @@ def update_skill_trending_scores():
     This should be called daily.
     """
     try:
-        one_week_ago = timezone.now() - timedelta(days=7)
-
-        # Get all skills with recent activity
-        active_skills = Skill.objects.filter(
-            Q(endorsements__created_at__gte=one_week_ago)
-            | Q(created_at__gte=one_week_ago)
-        ).distinct()
-
-        for skill in active_skills:
-            # Calculate trending score
-            score = 0
-
-            # Recent endorsements (weight: 3)
-            recent_endorsements = SkillEndorsement.objects.filter(
-                skill=skill, created_at__gte=one_week_ago
-            ).count()
-            score += recent_endorsements * 3
-
-            # If skill was recently added (weight: 1)
-            if skill.created_at >= one_week_ago:
-                score += 1
-
-            # Total endorsements (normalized, weight: 1)
-            total_endorsements = skill.endorsements.count()
-            score += min(total_endorsements, 10)  # Cap at 10
-
-            # Update skill with trending score (you might want to add this field to the model)
-            # skill.trending_score = score
-            # skill.save(update_fields=['trending_score'])
-
-        logger.info(f"Updated trending scores for {active_skills.count()} skills")
+        trending = update_skill_scores()
+        logger.info(f"Updated trending scores for {trending} skills")
 
     except Exception as e:
         logger.error(f"Error updating skill trending scores: {str(e)}", exc_info=True)
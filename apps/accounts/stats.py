@@ -0,0 +1,255 @@
+"""
+Profile counters and completeness kept in ``ProfileStats``.
+
+``UserViewSet.analytics`` ran three ``Sum`` aggregates over profile views,
+three ``Connection`` counts, two ``Follow`` counts and an endorsement count
+on every request, and profile completeness was worked out three different
+ways: by the view with four ``.exists()`` queries, by the ``UserProfile``
+signal and by ``generate_analytics`` once per user, over and over.
+
+The counters now live on the user's ``ProfileStats`` row. The connection,
+follow, endorsement and content signals recount only the counters they
+affect for only the users involved, and profile views are added to the
+view counters as they are stored. ``refresh_counters`` recounts everything with grouped
+queries; the daily ``age_profile_view_counters`` task runs it for the view
+counters, so the weekly and monthly counts drop views that left their
+window. The analytics endpoint is a single read.
+
+``completeness_scores`` is the one completeness calculator. It scores a
+batch of users from one query over their fields plus one per profile
+section, and ``update_completeness`` stores the result.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from apps.common import helpers
+
+from .engagement import grouped_counts
+from .models import (
+    Connection,
+    Education,
+    Experience,
+    Follow,
+    ProfileStats,
+    ProfileView,
+    Project,
+    Skill,
+    SkillEndorsement,
+)
+
+User = get_user_model()
+
+CONNECTION_COUNTERS = [
+    "connections_count",
+    "pending_sent_count",
+    "pending_received_count",
+]
+FOLLOW_COUNTERS = ["followers_count", "following_count"]
+VIEW_COUNTERS = [
+    "profile_views",
+    "profile_views_this_week",
+    "profile_views_this_month",
+]
+COUNTERS = (
+    CONNECTION_COUNTERS + FOLLOW_COUNTERS + VIEW_COUNTERS + ["endorsements_count"]
+)
+
+# User fields that count towards completeness
+COMPLETENESS_FIELDS = [
+    "first_name",
+    "last_name",
+    "bio",
+    "headline",
+    "location",
+    "current_position",
+    "current_company",
+    "profile_picture",
+]
+COMPLETENESS_SECTIONS = [Experience, Education, Skill, Project]
+# Share of the score earned by the fields; the sections split the rest
+COMPLETENESS_FIELDS_SHARE = 60
+
+STATS_BATCH_SIZE = 1000
+
+
+def _sources(now):
+    """Per counter, the rows it counts and the user fields they count towards"""
+    accepted = Connection.objects.filter(status=Connection.ConnectionStatus.ACCEPTED)
+    pending = Connection.objects.filter(status=Connection.ConnectionStatus.PENDING)
+    return {
+        "connections_count": (accepted, ["from_user_id", "to_user_id"]),
+        "pending_sent_count": (pending, ["from_user_id"]),
+        "pending_received_count": (pending, ["to_user_id"]),
+        "followers_count": (Follow.objects.all(), ["following_id"]),
+        "following_count": (Follow.objects.all(), ["follower_id"]),
+        "endorsements_count": (SkillEndorsement.objects.all(), ["skill__user_id"]),
+        "profile_views": (ProfileView.objects.all(), ["profile_owner_id"]),
+        "profile_views_this_week": (
+            ProfileView.objects.filter(created_at__gte=now - timedelta(days=7)),
+            ["profile_owner_id"],
+        ),
+        "profile_views_this_month": (
+            ProfileView.objects.filter(created_at__gte=now - timedelta(days=30)),
+            ["profile_owner_id"],
+        ),
+    }
+
+
+def _ensure_stats(user_ids):
+    existing = set(
+        ProfileStats.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    ProfileStats.objects.bulk_create(
+        [ProfileStats(user_id=user_id) for user_id in set(user_ids) - existing],
+        ignore_conflicts=True,
+    )
+
+
+def _store(values, fields):
+    """
+    Write {user id: {field: value}} to the stats rows that exist, one UPDATE
+    per distinct value of a field. A signal may fire while the user is being
+    deleted, so no rows are created here.
+    """
+    for field in fields:
+        by_value = defaultdict(list)
+        for user_id, row in values.items():
+            by_value[row[field]].append(user_id)
+        for value, user_ids in by_value.items():
+            for batch in helpers.chunks(user_ids, STATS_BATCH_SIZE):
+                ProfileStats.objects.filter(user_id__in=batch).update(**{field: value})
+
+
+def _all_users():
+    """Every user id, making sure each has a stats row"""
+    user_ids = list(User.objects.values_list("pk", flat=True))
+    for batch in helpers.chunks(user_ids, STATS_BATCH_SIZE):
+        _ensure_stats(batch)
+    return user_ids
+
+
+def counts(user_ids, fields=None, now=None):
+    """The current value of ``fields`` (every counter by default) per user"""
+    fields = fields or COUNTERS
+    sources = _sources(now or timezone.now())
+    values = {user_id: dict.fromkeys(fields, 0) for user_id in user_ids}
+    for batch in helpers.chunks(user_ids, STATS_BATCH_SIZE):
+        for field in fields:
+            queryset, user_fields = sources[field]
+            for user_field in user_fields:
+                for user_id, count in grouped_counts(
+                    queryset.filter(**{f"{user_field}__in": batch}), user_field
+                ).items():
+                    values[user_id][field] += count
+    return values
+
+
+def refresh_counters(user_ids=None, fields=None, now=None):
+    """
+    Recount ``fields`` (every counter by default) of ``user_ids`` (every
+    user by default). Returns the number of users refreshed.
+    """
+    user_ids = _all_users() if user_ids is None else list(user_ids)
+    fields = fields or COUNTERS
+    _store(counts(user_ids, fields, now), fields)
+    return len(user_ids)
+
+
+def record_profile_view(user_id):
+    """Count a new view of ``user_id``'s profile"""
+    ProfileStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1 for field in VIEW_COUNTERS}
+    )
+
+
+def add_profile_views(views):
+    """
+    Add {user id: number of new views} to the view counters, one grouped
+    UPDATE per batch of users.
+    """
+    for batch in helpers.chunks(views, STATS_BATCH_SIZE):
+        added = Case(
+            *[When(user_id=user_id, then=Value(views[user_id])) for user_id in batch],
+            default=Value(0),
+        )
+        ProfileStats.objects.filter(user_id__in=batch).update(
+            **{field: F(field) + added for field in VIEW_COUNTERS}
+        )
+
+
+def completeness_scores(user_ids):
+    """Profile completeness percentage of each user"""
+    scores = {}
+    field_points = COMPLETENESS_FIELDS_SHARE / len(COMPLETENESS_FIELDS)
+    section_points = (100 - COMPLETENESS_FIELDS_SHARE) / len(COMPLETENESS_SECTIONS)
+    for batch in helpers.chunks(user_ids, STATS_BATCH_SIZE):
+        sections = [
+            set(
+                model.objects.filter(user_id__in=batch)
+                .values_list("user_id", flat=True)
+                .distinct()
+            )
+            for model in COMPLETENESS_SECTIONS
+        ]
+        for user_id, *values in User.objects.filter(pk__in=batch).values_list(
+            "pk", *COMPLETENESS_FIELDS
+        ):
+            score = field_points * sum(1 for value in values if value)
+            score += section_points * sum(1 for ids in sections if user_id in ids)
+            scores[user_id] = round(score)
+    return scores
+
+
+def profile_completeness(user):
+    """Profile completeness percentage of one user"""
+    return completeness_scores([user.pk]).get(user.pk, 0)
+
+
+def update_completeness(user_ids=None):
+    """
+    Store the completeness of ``user_ids`` (every user by default). Returns
+    the number of users scored.
+    """
+    if user_ids is None:
+        user_ids = _all_users()
+    scores = completeness_scores(user_ids)
+    _store(
+        {user_id: {"profile_completeness": score} for user_id, score in scores.items()},
+        ["profile_completeness"],
+    )
+    return len(scores)
+
+
+def analytics(user):
+    """The profile analytics of ``user``, read from their stats row"""
+    stats = ProfileStats.objects.filter(user=user).first()
+    if stats is None:
+        # Users created without the signal
+        _ensure_stats([user.pk])
+        refresh_counters([user.pk])
+        update_completeness([user.pk])
+        stats = ProfileStats.objects.get(user=user)
+
+    return {
+        "profile_views": {
+            "total": stats.profile_views,
+            "this_week": stats.profile_views_this_week,
+            "this_month": stats.profile_views_this_month,
+        },
+        "connections": {
+            "total": stats.connections_count,
+            "pending_sent": stats.pending_sent_count,
+            "pending_received": stats.pending_received_count,
+        },
+        "followers": stats.followers_count,
+        "following": stats.following_count,
+        "skill_endorsements": stats.endorsements_count,
+        "profile_completeness": stats.profile_completeness,
+    }
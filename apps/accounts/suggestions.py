@@ -0,0 +1,201 @@
+"""
+Batch "people you may know" suggestions.
+
+``send_connection_suggestions`` used to walk every active user's
+connections, query each neighbour's connections in turn, load same-company
+colleagues one ``User.objects.get`` at a time and run an EXISTS query per
+suggestion, so a weekly run cost queries in the order of users x degree.
+
+Suggestions are now computed offline and stored as ``ConnectionSuggestion``
+rows:
+
+* The accepted connections are streamed once into a sparse adjacency, a set
+  of neighbour ids per user. A user's mutual-connection counts are their
+  row of the squared adjacency matrix: each neighbour adds one to every one
+  of its own neighbours. Only that row is built, one user at a time.
+* Users sharing a current employer (``Experience.is_current``) or a school
+  (``Education``) count as co-members of that group. Groups larger than
+  ``MAX_GROUP_SIZE`` say little about who knows whom and would add a
+  quadratic number of pairs, so they are left out.
+
+Candidates are scored with ``SUGGESTION_WEIGHTS`` and the
+``SUGGESTIONS_LIMIT`` best ones of each active user are written in bulk,
+replacing the previous rows. Users who are already connected, or have a
+request between them in any state, are never suggested.
+"""
+
+import heapq
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.common import helpers
+
+from . import graph
+from .models import Connection, ConnectionSuggestion, Education, Experience
+
+User = get_user_model()
+
+SUGGESTION_WEIGHTS = {"mutual": 1.0, "company": 2.0, "school": 1.0}
+SUGGESTIONS_LIMIT = 20
+MAX_GROUP_SIZE = 500
+WRITE_BATCH_SIZE = 1000
+
+
+def _stream(queryset, *fields):
+    return (
+        queryset.order_by()
+        .values_list(*fields)
+        .iterator(chunk_size=graph.EDGE_CHUNK_SIZE)
+    )
+
+
+def load_adjacency():
+    """Neighbour ids of every user with an accepted connection"""
+    adjacency = defaultdict(set)
+    for user_id, other in graph.edges(graph.CONNECTIONS):
+        adjacency[user_id].add(other)
+    return adjacency
+
+
+def load_requests():
+    """Users each user has a pending, declined or blocked request with"""
+    requests = defaultdict(set)
+    for from_user_id, to_user_id in _stream(
+        Connection.objects.exclude(status=Connection.ConnectionStatus.ACCEPTED),
+        "from_user_id",
+        "to_user_id",
+    ):
+        requests[from_user_id].add(to_user_id)
+        requests[to_user_id].add(from_user_id)
+    return requests
+
+
+def load_memberships():
+    """The company and school groups of each user, keyed by kind"""
+    sources = {
+        "company": _stream(
+            Experience.objects.filter(is_current=True), "user_id", "company"
+        ),
+        "school": _stream(Education.objects.all(), "user_id", "institution"),
+    }
+    memberships = {}
+    for kind, rows in sources.items():
+        groups = defaultdict(set)
+        for user_id, name in rows:
+            name = (name or "").strip().lower()
+            if name:
+                groups[name].add(user_id)
+
+        memberships[kind] = defaultdict(list)
+        for members in groups.values():
+            if 1 < len(members) <= MAX_GROUP_SIZE:
+                members = frozenset(members)
+                for user_id in members:
+                    memberships[kind][user_id].append(members)
+    return memberships
+
+
+def suggest(user_id, adjacency, memberships, excluded, candidates):
+    """
+    Top suggestions of one user, as (score, user id, mutual connections,
+    shared companies, shared schools) tuples.
+    """
+    neighbours = adjacency.get(user_id, set())
+    counts = {"mutual": Counter()}
+    for neighbour in neighbours:
+        counts["mutual"].update(adjacency[neighbour])
+    for kind, groups in memberships.items():
+        counts[kind] = Counter()
+        for members in groups.get(user_id, ()):
+            counts[kind].update(members)
+
+    skip = neighbours | excluded.get(user_id, set())
+    skip.add(user_id)
+    scores = defaultdict(float)
+    for kind, counter in counts.items():
+        weight = SUGGESTION_WEIGHTS[kind]
+        for other, count in counter.items():
+            if other not in skip and other in candidates:
+                scores[other] += weight * count
+
+    return [
+        (
+            score,
+            other,
+            counts["mutual"][other],
+            counts["company"][other],
+            counts["school"][other],
+        )
+        for score, other in heapq.nlargest(
+            SUGGESTIONS_LIMIT, ((s, o) for o, s in scores.items())
+        )
+    ]
+
+
+def _write_suggestions(rows):
+    with transaction.atomic():
+        ConnectionSuggestion.objects.filter(
+            user_id__in=[user_id for user_id, _ in rows]
+        ).delete()
+        ConnectionSuggestion.objects.bulk_create(
+            [
+                ConnectionSuggestion(
+                    user_id=user_id,
+                    suggested_user_id=other,
+                    score=score,
+                    mutual_connections=mutual,
+                    shared_companies=companies,
+                    shared_schools=schools,
+                )
+                for user_id, top in rows
+                for score, other, mutual, companies, schools in top
+            ],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+    cache.delete_many([f"profile_suggestions:{user_id}" for user_id, _ in rows])
+
+
+def build_suggestions(user_ids=None):
+    """
+    Recompute the suggestions of every active user, or only of ``user_ids``.
+
+    Returns the number of users processed.
+    """
+    started = timezone.now()
+    active = set(
+        User.objects.filter(status=User.UserStatus.ACTIVE).values_list("pk", flat=True)
+    )
+    targets = active if user_ids is None else active.intersection(user_ids)
+
+    adjacency = load_adjacency()
+    memberships = load_memberships()
+    excluded = load_requests()
+
+    for batch in helpers.chunks(sorted(targets), WRITE_BATCH_SIZE):
+        _write_suggestions(
+            [
+                (user_id, suggest(user_id, adjacency, memberships, excluded, active))
+                for user_id in batch
+            ]
+        )
+
+    if user_ids is None:
+        # Rows of users who are no longer active
+        ConnectionSuggestion.objects.filter(updated_at__lt=started).delete()
+    return len(targets)
+
+
+def forget_suggestion(user_id, other_id):
+    """Drop the suggestions between two users, e.g. once a request is sent"""
+    ConnectionSuggestion.objects.filter(
+        Q(user_id=user_id, suggested_user_id=other_id)
+        | Q(user_id=other_id, suggested_user_id=user_id)
+    ).delete()
+    cache.delete_many(
+        [f"profile_suggestions:{user_id}", f"profile_suggestions:{other_id}"]
+    )
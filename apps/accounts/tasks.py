@@ -0,0 +1,31 @@
+from celery import shared_task
+
+from . import activity, profile_views, stats
+
+
+@shared_task
+def flush_user_activity():
+    """
+    Write buffered user activity to User.last_activity.
+    """
+    return {"status": "flushed", "users": activity.flush()}
+
+
+@shared_task
+def flush_profile_views():
+    """
+    Store buffered profile views and add them to the view counters.
+    """
+    return {"status": "flushed", "views": profile_views.flush()}
+
+
+@shared_task
+def age_profile_view_counters():
+    """
+    Recount the profile view counters, so the weekly and monthly counts drop
+    views that left their window.
+    """
+    return {
+        "status": "refreshed",
+        "users": stats.refresh_counters(fields=stats.VIEW_COUNTERS),
+    }
@@ -20,8 +20,9 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 
+from apps.accounts.authentication import RefreshToken
 from apps.accounts.models import ActivityLog, User
 from apps.accounts.serializers import (
     EmailChangeSerializer,
@@ -357,6 +358,8 @@ class MeView(APIView):
 
     permission_classes = [IsAuthenticated]
     throttle_classes = [UserRateThrottle]
+    # Serializes the whole user, so load it in one query
+    stateless_authentication = False
 
     def get(self, request: Request) -> Response:
         """Get current user data"""
@@ -388,18 +391,12 @@ class RefreshView(APIView):
         serializer = RefreshSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        refresh_token = serializer.validated_data["refresh_token"]
+        refresh_token = serializer.validated_data["refresh"]
 
         try:
+            # Verifies the signature, expiry and blacklist
             token = RefreshToken(refresh_token)
 
-            # Verify token is not blacklisted
-            if token.check_blacklist():
-                return Response(
-                    {"error": "Token is blacklisted"},
-                    status=status.HTTP_401_UNAUTHORIZED,
-                )
-
             # Get user from token
             user_id = token.payload.get("user_id")
             user = User.objects.get(id=user_id, is_active=True)
@@ -418,6 +415,8 @@ class RefreshView(APIView):
 
             return Response(new_tokens, status=status.HTTP_200_OK)
 
+        except TokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
         except jwt.ExpiredSignatureError:
             return Response(
                 {"error": "Refresh token has expired"},
@@ -548,6 +547,7 @@ class ProfileMeView(APIView):
 
     permission_classes = [IsAuthenticated]
     throttle_classes = [UserRateThrottle]
+    stateless_authentication = False
 
     def get(self, request: Request) -> Response:
         """Get current user profile"""
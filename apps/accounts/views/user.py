@@ -1,11 +1,9 @@
 import logging
-from datetime import timedelta
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.db import models
-from django.db.models import Case, Count, F, Q, When
-from django.utils import timezone
+from django.db.models import Case, Count, Q, When
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import filters, status, viewsets
@@ -15,12 +13,13 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
 
+from apps.accounts import graph, profile_views, search, stats
 from apps.accounts.filters import UserFilter
 from apps.accounts.models import (
     ActivityLog,
     Connection,
+    ConnectionSuggestion,
     Follow,
-    ProfileView,
     Skill,
     SkillEndorsement,
     UserProfile,
@@ -175,6 +174,9 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter queryset based on privacy settings and user permissions"""
         queryset = super().get_queryset()
+        if self.action == "analytics":
+            # Analytics only read the stats row
+            queryset = queryset.prefetch_related(None)
 
         # If user is not authenticated, only show public profiles
         if not self.request.user.is_authenticated:
@@ -194,20 +196,9 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
             own_q = Q(id=user.id)
 
             # Include connection-only profiles if connected
-            connected_users = Connection.objects.filter(
-                Q(from_user=user) | Q(to_user=user),
-                status=Connection.ConnectionStatus.ACCEPTED,
-            ).values_list("from_user_id", "to_user_id")
-
-            connected_ids = set()
-            for from_user_id, to_user_id in connected_users:
-                connected_ids.add(
-                    from_user_id if from_user_id != user.id else to_user_id
-                )
-
             connections_q = Q(
                 profile__profile_visibility=UserProfile.ProfileVisibility.CONNECTIONS_ONLY,
-                id__in=connected_ids,
+                id__in=graph.neighbors(user),
             )
 
             queryset = queryset.filter(public_q | own_q | connections_q)
@@ -228,23 +219,15 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
     def track_profile_view(self, viewer: User, viewed: User) -> None:  # type: ignore
         """Track profile view for analytics"""
         try:
-            # Create or update profile view
-            profile_view, created = ProfileView.objects.get_or_create(
-                viewer=viewer,
-                viewed=viewed,
-                defaults={"view_count": 1, "last_viewed": timezone.now()},
+            ip_address = get_client_ip(self.request)
+            profile_views.record(
+                viewer,
+                viewed,
+                ip_address=None if ip_address == "unknown" else ip_address,
+                user_agent=get_user_agent(self.request),
+                referrer=self.request.META.get("HTTP_REFERER", "")[:200],
             )
 
-            if not created:
-                profile_view.view_count += 1
-                profile_view.last_viewed = timezone.now()
-                profile_view.save(update_fields=["view_count", "last_viewed"])
-
-            # Update profile stats
-            if hasattr(viewed, "profile"):
-                viewed.profile.profile_views_count = F("profile_views_count") + 1
-                viewed.profile.save(update_fields=["profile_views_count"])
-
         except Exception as e:
             logger.error(f"Failed to track profile view: {e}")
 
@@ -261,71 +244,28 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         query_params = serializer.validated_data
-        queryset = self.get_queryset()
-
-        # Apply search filters
-        if query_params.get("query"):
-            search_query = query_params["query"]
-            queryset = queryset.filter(
-                Q(first_name__icontains=search_query)
-                | Q(last_name__icontains=search_query)
-                | Q(username__icontains=search_query)
-                | Q(profile__headline__icontains=search_query)
-                | Q(profile__bio__icontains=search_query)
-            )
-
-        if query_params.get("skills"):
-            skills = query_params["skills"]
-            queryset = queryset.filter(skills__name__in=skills).annotate(
-                skill_match_count=Count("skills", distinct=True)
-            )
-
-        if query_params.get("location"):
-            queryset = queryset.filter(
-                profile__location__icontains=query_params["location"]
-            )
-
-        if query_params.get("company"):
-            queryset = queryset.filter(
-                profile__current_company__icontains=query_params["company"]
-            )
-
-        if query_params.get("experience"):
-            queryset = queryset.filter(
-                experience__title__icontains=query_params["experience"]
-            )
-
-        if query_params.get("education"):
-            queryset = queryset.filter(
-                educations__institution__icontains=query_params["education"]
-            )
+        ranked, facets = search.search(
+            request.user,
+            self.get_queryset(),
+            query=query_params.get("query", ""),
+            sort_by=query_params.get("sort_by", "relevance"),
+            descending=query_params.get("sort_order", "desc") == "desc",
+            skills=query_params.get("skills"),
+            location=query_params.get("location", ""),
+            company=query_params.get("company", ""),
+            experience=query_params.get("experience", ""),
+            education=query_params.get("education", ""),
+        )
 
-        # Apply sorting
-        sort_by = query_params.get("sort_by", "relevance")
-        sort_order = query_params.get("sort_order", "desc")
-        order_prefix = "-" if sort_order == "desc" else ""
-
-        if sort_by == "relevance":
-            # Sort by skill match count if skills provided, otherwise by profile completeness
-            if query_params.get("skills"):
-                queryset = queryset.order_by(f"{order_prefix}skill_match_count")
-            else:
-                queryset = queryset.order_by(f"{order_prefix}profile__updated_at")
-        elif sort_by == "name":
+        # Keep the search ranking
+        queryset = self.get_queryset().filter(pk__in=ranked)
+        if ranked:
             queryset = queryset.order_by(
-                f"{order_prefix}first_name", f"{order_prefix}last_name"
-            )
-        elif sort_by == "experience":
-            queryset = queryset.order_by(f"{order_prefix}profile__years_of_experience")
-        elif sort_by == "connections":
-            queryset = queryset.annotate(
-                connections_count=Count(
-                    "connections_received",
-                    filter=Q(
-                        connections_received__status=Connection.ConnectionStatus.ACCEPTED
-                    ),
+                Case(
+                    *[When(pk=pk, then=rank) for rank, pk in enumerate(ranked)],
+                    output_field=models.IntegerField(),
                 )
-            ).order_by(f"{order_prefix}connections_count")
+            )
 
         # Paginate results
         page = self.paginate_queryset(queryset)
@@ -333,7 +273,9 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
             serializer = UserBasicSerializer(
                 page, many=True, context={"request": request}
             )
-            return self.get_paginated_response(serializer.data)
+            response = self.get_paginated_response(serializer.data)
+            response.data["facets"] = facets
+            return response
 
         serializer = UserBasicSerializer(
             queryset, many=True, context={"request": request}
@@ -356,25 +298,30 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
         if cached_suggestions:
             return Response(cached_suggestions)
 
-        # Get user's skills and connections for better suggestions
-        user_skills = (
-            list(user.profile.skills.values_list("name", flat=True))
-            if hasattr(user, "profile")
-            else []
-        )
-        connected_user_ids = list(
-            Connection.objects.filter(
-                Q(from_user=user) | Q(to_user=user),
-                status=Connection.ConnectionStatus.ACCEPTED,
-            ).values_list("from_user_id", "to_user_id")
-        )
-
-        # Flatten connection IDs and exclude current user
-        connected_ids = set()
-        for from_id, to_id in connected_user_ids:
-            connected_ids.add(from_id if from_id != user.id else to_id)
+        connected_ids = set(graph.neighbors(user))
         connected_ids.add(user.id)  # Exclude self
 
+        # Precomputed "people you may know", best first
+        ranked = list(
+            ConnectionSuggestion.objects.filter(user=user)
+            .exclude(suggested_user_id__in=connected_ids)
+            .order_by("-score")
+            .values_list("suggested_user_id", flat=True)
+        )
+        if ranked:
+            rank = {user_id: index for index, user_id in enumerate(ranked)}
+            suggestions = sorted(
+                self.get_queryset().filter(id__in=ranked),
+                key=lambda suggested: rank[suggested.id],
+            )[:10]
+            serializer = UserBasicSerializer(
+                suggestions, many=True, context={"request": request}
+            )
+            cache.set(cache_key, serializer.data, 3600)
+            return Response(serializer.data)
+
+        # Not ranked yet: fall back to users with similar skills
+        user_skills = list(user.skills.values_list("name", flat=True))
         queryset = self.get_queryset().exclude(id__in=connected_ids)
 
         # Prioritize users with similar skills
@@ -603,80 +550,7 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
     def analytics(self, request: Request, pk=None) -> Response:
         """Get profile analytics"""
         user = self.get_object()
-
-        # Get analytics data
-        now = timezone.now()
-        last_week = now - timedelta(days=7)
-        last_month = now - timedelta(days=30)
-
-        analytics_data = {
-            "profile_views": {
-                "total": ProfileView.objects.filter(viewed=user).aggregate(
-                    total=models.Sum("view_count")
-                )["total"]
-                or 0,
-                "this_week": ProfileView.objects.filter(
-                    viewed=user, last_viewed__gte=last_week
-                ).aggregate(total=models.Sum("view_count"))["total"]
-                or 0,
-                "this_month": ProfileView.objects.filter(
-                    viewed=user, last_viewed__gte=last_month
-                ).aggregate(total=models.Sum("view_count"))["total"]
-                or 0,
-            },
-            "connections": {
-                "total": Connection.objects.filter(
-                    Q(from_user=user) | Q(to_user=user),
-                    status=Connection.ConnectionStatus.ACCEPTED,
-                ).count(),
-                "pending_sent": Connection.objects.filter(
-                    from_user=user, status=Connection.ConnectionStatus.PENDING
-                ).count(),
-                "pending_received": Connection.objects.filter(
-                    to_user=user, status=Connection.ConnectionStatus.PENDING
-                ).count(),
-            },
-            "followers": Follow.objects.filter(following=user).count(),
-            "following": Follow.objects.filter(follower=user).count(),
-            "skill_endorsements": SkillEndorsement.objects.filter(
-                skill__user_profile__user=user
-            ).count(),
-            "profile_completeness": self.calculate_profile_completeness(user),
-        }
-
-        return Response(analytics_data)
-
-    def calculate_profile_completeness(self, user: User) -> float:  # type: ignore
-        """Calculate profile completeness percentage"""
-        if not hasattr(user, "profile"):
-            return 0.0
-
-        profile = user.profile
-        fields_to_check = [
-            profile.bio,
-            profile.avatar,
-            profile.headline,
-            profile.location,
-            profile.current_company,
-        ]
-
-        completed_fields = sum(1 for field in fields_to_check if field)
-        basic_completion = (
-            completed_fields / len(fields_to_check)
-        ) * 60  # 60% for basic fields
-
-        # Additional sections (40% total)
-        additional_completion = 0
-        if profile.experience.exists():
-            additional_completion += 10
-        if profile.education.exists():
-            additional_completion += 10
-        if profile.skills.exists():
-            additional_completion += 10
-        if profile.projects.exists():
-            additional_completion += 10
-
-        return basic_completion + additional_completion
+        return Response(stats.analytics(user))
 
     @extend_schema(
         summary="Update Online Status",
@@ -693,14 +567,13 @@ class UserViewSet(CacheableViewSetMixin, SecurityMixin, viewsets.ModelViewSet):
         is_online = serializer.validated_data["is_online"]
         status_type = serializer.validated_data.get("status", "active")
 
-        if hasattr(request.user, "profile"):
-            request.user.profile.is_online = is_online
-            request.user.profile.status = status_type
-            if is_online:
-                request.user.profile.update_last_activity()
-            request.user.profile.save(
-                update_fields=["is_online", "status", "last_activity"]
-            )
+        user = request.user
+        if (user.is_online, user.status) != (is_online, status_type):
+            user.is_online = is_online
+            user.status = status_type
+            user.save(update_fields=["is_online", "status"])
+        if is_online:
+            user.update_last_activity()
 
         return Response({"is_online": is_online, "status": status_type})
 
@@ -8,6 +8,8 @@ from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
+from apps.accounts import activity
+
 from .models import (
     Chat,
     ChatAttachment,
@@ -73,10 +75,11 @@ class UserBasicSerializer(serializers.ModelSerializer):
         is_online = cache.get(cache_key)
 
         if is_online is None:
-            if not obj.last_activity:
+            seen = activity.last_seen(obj)
+            if not seen:
                 is_online = False
             else:
-                is_online = (timezone.now() - obj.last_activity).total_seconds() < 300
+                is_online = (timezone.now() - seen).total_seconds() < 300
             cache.set(cache_key, is_online, 60)  # Cache for 1 minute
 
         return is_online
@@ -506,8 +506,7 @@ def invalidate_participant_cache_on_delete(sender, instance, **kwargs):
 def update_sender_activity(sender, instance, created, **kwargs):
     """Update sender's last activity."""
     if created and instance.sender:
-        instance.sender.last_activity = timezone.now()
-        instance.sender.save(update_fields=["last_activity"])
+        instance.sender.update_last_activity()
 
         # Update participant's last activity
         try:
@@ -64,8 +64,7 @@ def update_user_activity(user_id):
     """
     try:
         user = User.objects.get(id=user_id)
-        user.last_activity = timezone.now()
-        user.save(update_fields=["last_activity"])
+        user.update_last_activity()
         return {"status": "updated", "user": user.username}
     except User.DoesNotExist:
         return {"status": "error", "message": "User not found"}
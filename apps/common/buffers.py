@@ -0,0 +1,74 @@
+"""
+Per-minute buffers of pending writes, kept in the cache.
+
+Used by the accounts ``activity`` and ``profile_views`` pipelines and the
+events view and trending ingestion to turn a write per event into a bulk
+write per minute. ``append`` files an item under the minute it
+happened in; an atomic counter hands out the slots, so concurrent writers
+never overwrite each other. ``drain`` hands back the items of every
+finished minute that was not drained yet, and only marks a minute drained
+once its items were handled. Only one drain of a buffer runs at a time, so
+overlapping flushes never hand out the same minute twice.
+"""
+
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+# Items older than this are dropped if nothing drained them meanwhile
+BUFFER_TIMEOUT = 2 * 60 * 60
+BUFFER_BACKLOG_MINUTES = BUFFER_TIMEOUT // 60
+# A drain that dies without releasing its lock blocks the next ones this long
+DRAIN_LOCK_TIMEOUT = 5 * 60
+
+
+def bucket_of(now):
+    return int(now.timestamp() // 60)
+
+
+def minute_of(bucket):
+    return datetime.fromtimestamp(bucket * 60, tz=dt_timezone.utc)
+
+
+def _count_key(name, bucket):
+    return f"{name}_count:{bucket}"
+
+
+def _slot_key(name, bucket, index):
+    return f"{name}_slot:{bucket}:{index}"
+
+
+def append(name, item, now=None):
+    """Add ``item`` to the ``name`` buffer of the current minute"""
+    bucket = bucket_of(now or timezone.now())
+    count_key = _count_key(name, bucket)
+    cache.add(count_key, 0, BUFFER_TIMEOUT)
+    index = cache.incr(count_key)
+    cache.set(_slot_key(name, bucket, index), item, BUFFER_TIMEOUT)
+
+
+def drain(name, now=None):
+    """
+    Yield (start of the minute, items) for each finished minute of the
+    ``name`` buffer not drained yet. Yields nothing while another drain of
+    the buffer is running.
+    """
+    lock_key = f"{name}_draining"
+    if not cache.add(lock_key, True, DRAIN_LOCK_TIMEOUT):
+        return
+    try:
+        current = bucket_of(now or timezone.now())
+        flushed_key = f"{name}_flushed"
+        start = max(cache.get(flushed_key) or 0, current - BUFFER_BACKLOG_MINUTES)
+        for bucket in range(start, current):
+            count = cache.get(_count_key(name, bucket)) or 0
+            if count:
+                items = cache.get_many(
+                    [_slot_key(name, bucket, index) for index in range(1, count + 1)]
+                )
+                yield minute_of(bucket), list(items.values())
+            cache.set(flushed_key, bucket + 1, None)
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,29 @@
+"""
+Small helpers shared by the batch jobs and caches of the apps.
+
+Kept free of model imports, so any app module can use them at import time.
+"""
+
+from django.db import transaction
+
+
+def chunks(items, size):
+    """Lists of at most ``size`` consecutive ``items``"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def user_id(user):
+    """The id of a user given as a ``User`` or as an id"""
+    return getattr(user, "pk", user)
+
+
+def now_and_on_commit(func):
+    """
+    Run a cache invalidation ``func`` right away and again once the current
+    transaction commits, since a read before the commit may cache the old
+    rows again.
+    """
+    func()
+    transaction.on_commit(func)
@@ -0,0 +1,226 @@
+"""
+Achievement rule engine.
+
+Achievement criteria used to be interpreted per achievement, per user, on
+every progress event, with one aggregate query per criterion. All active
+rules are instead compiled into an index keyed by metric, each holding the
+rules' thresholds in sorted order. An event that moves a metric from one
+value to another only has to look at the rules whose threshold lies in
+between, which is a pair of binary searches.
+
+The compiled index is kept per process and rebuilt whenever the version
+token in the cache changes; saving or deleting an Achievement bumps it.
+"""
+
+import logging
+import uuid
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Q, Sum
+
+from .models import Achievement, UserAchievement, UserProgress
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_CACHE_KEY = "course_achievement_index_version"
+
+# Criteria keys the engine can evaluate. ``perfect_assessment`` is an event
+# metric: it is only known while handling an assessment attempt.
+AGGREGATE_METRICS = [
+    "courses_completed",
+    "lessons_completed",
+    "total_xp",
+    "min_streak_days",
+    "min_average_score",
+]
+EVENT_METRICS = ["perfect_assessment"]
+METRICS = AGGREGATE_METRICS + EVENT_METRICS
+
+
+@dataclass
+class CriteriaIndex:
+    """Active achievement rules compiled for threshold lookups"""
+
+    version: str = ""
+    # metric -> sorted thresholds and the rule ids aligned with them
+    thresholds: dict = field(default_factory=dict)
+    rule_ids: dict = field(default_factory=dict)
+    # rule id -> {metric: threshold}
+    rules: dict = field(default_factory=dict)
+
+    def crossed(self, metric, previous, current):
+        """Rule ids whose threshold on ``metric`` lies in (previous, current]"""
+        thresholds = self.thresholds.get(metric)
+        if not thresholds or current is None:
+            return []
+        start = 0 if previous is None else bisect_right(thresholds, previous)
+        end = bisect_right(thresholds, current)
+        return self.rule_ids[metric][start:end]
+
+
+def _normalize_threshold(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def compile_criteria_index(version=""):
+    """Compile all active achievements into a criteria index"""
+    index = CriteriaIndex(version=version)
+    entries = {metric: [] for metric in METRICS}
+
+    for achievement_id, criteria in Achievement.objects.filter(
+        is_active=True
+    ).values_list("id", "criteria"):
+        criteria = criteria or {}
+        rule = {}
+        for metric, value in criteria.items():
+            threshold = _normalize_threshold(value)
+            if metric not in entries or threshold is None:
+                # A rule the engine cannot evaluate must never be awarded
+                rule = None
+                break
+            rule[metric] = threshold
+        if not rule:
+            continue
+
+        index.rules[achievement_id] = rule
+        for metric, threshold in rule.items():
+            entries[metric].append((threshold, str(achievement_id), achievement_id))
+
+    for metric, metric_entries in entries.items():
+        if not metric_entries:
+            continue
+        metric_entries.sort()
+        index.thresholds[metric] = [threshold for threshold, _, _ in metric_entries]
+        index.rule_ids[metric] = [rule_id for _, _, rule_id in metric_entries]
+
+    return index
+
+
+_local_index = CriteriaIndex()
+
+
+def get_criteria_index():
+    """Return the compiled index, recompiling if the rules changed"""
+    global _local_index
+
+    version = cache.get(INDEX_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(INDEX_VERSION_CACHE_KEY, version, None)
+        version = cache.get(INDEX_VERSION_CACHE_KEY, version)
+
+    if _local_index.version != version:
+        _local_index = compile_criteria_index(version)
+    return _local_index
+
+
+def invalidate_criteria_index():
+    """Make every process recompile the index on its next evaluation"""
+    cache.set(INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def get_user_metrics(user):
+    """Current value of every aggregate metric for a user, in one query"""
+    metrics = UserProgress.objects.filter(user=user, is_active=True).aggregate(
+        courses_completed=Count(
+            "id",
+            filter=Q(
+                course__isnull=False,
+                module__isnull=True,
+                lesson__isnull=True,
+                step__isnull=True,
+                assessment__isnull=True,
+                is_completed=True,
+            ),
+        ),
+        lessons_completed=Count(
+            "id", filter=Q(lesson__isnull=False, is_completed=True)
+        ),
+        total_xp=Sum("xp_earned"),
+        min_streak_days=Max("longest_streak"),
+        min_average_score=Avg("average_score"),
+    )
+    return {metric: value or 0 for metric, value in metrics.items()}
+
+
+def evaluate_achievements(user, changed, previous=None, context=None):
+    """
+    Award the achievements a metric change unlocks.
+
+    ``changed`` maps the metrics that moved to their current values; any
+    aggregate metric missing from it is loaded when a candidate rule needs
+    it. ``previous`` optionally maps metrics to their values before the
+    event, narrowing candidates to thresholds that were just crossed.
+    Returns the awarded achievement ids.
+    """
+    index = get_criteria_index()
+    previous = previous or {}
+
+    candidates = set()
+    for metric, current in changed.items():
+        candidates.update(index.crossed(metric, previous.get(metric), current))
+    if not candidates:
+        return []
+
+    owned = set(
+        UserAchievement.objects.filter(
+            user=user, achievement_id__in=candidates
+        ).values_list("achievement_id", flat=True)
+    )
+    candidates -= owned
+    if not candidates:
+        return []
+
+    values = dict(changed)
+    needs_aggregates = any(
+        metric not in values and metric in AGGREGATE_METRICS
+        for rule_id in candidates
+        for metric in index.rules[rule_id]
+    )
+    if needs_aggregates:
+        values = {**get_user_metrics(user), **changed}
+
+    awarded = [
+        rule_id
+        for rule_id in candidates
+        if all(
+            values.get(metric) is not None and values[metric] >= threshold
+            for metric, threshold in index.rules[rule_id].items()
+        )
+    ]
+    if not awarded:
+        return []
+
+    unlocks = UserAchievement.objects.bulk_create(
+        [
+            UserAchievement(
+                user=user, achievement_id=rule_id, progress_data=context or {}
+            )
+            for rule_id in awarded
+        ],
+        ignore_conflicts=True,
+    )
+    # Rows a concurrent award inserted first were skipped; the ids are made
+    # here, so the rows that carry them are the ones inserted
+    awarded = list(
+        UserAchievement.objects.filter(
+            pk__in=[unlock.pk for unlock in unlocks]
+        ).values_list("achievement_id", flat=True)
+    )
+    if not awarded:
+        return []
+    # bulk_create skips the post_save receivers these would normally trigger
+    Achievement.objects.filter(id__in=awarded).update(
+        unlock_count=F("unlock_count") + 1
+    )
+
+    from .dashboard import invalidate_dashboard_snapshot
+
+    invalidate_dashboard_snapshot(user.pk)
+    return awarded
@@ -0,0 +1,187 @@
+"""
+Compiled course content trees.
+
+Navigating a course used to take one request per level (modules, lessons,
+steps, questions), each with its own queries and serializer pass, even though
+course content rarely changes. The whole outline is instead compiled into a
+plain-data snapshot with counts, cached per course and dropped by the content
+signals in ``models.py`` whenever a course, module, lesson, step or question
+changes.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Lesson, Module, Question, Step
+
+logger = logging.getLogger(__name__)
+
+# Bump when the tree layout changes so stale snapshots are never served
+CONTENT_TREE_VERSION = 1
+CONTENT_TREE_CACHE_TIMEOUT = 60 * 60 * 24
+
+MODULE_FIELDS = [
+    "id",
+    "title",
+    "slug",
+    "order",
+    "description",
+    "estimated_time_minutes",
+    "is_mandatory",
+    "unlock_xp_required",
+    "completion_xp_reward",
+    "icon_name",
+]
+LESSON_FIELDS = [
+    "id",
+    "module_id",
+    "title",
+    "slug",
+    "order",
+    "content_type",
+    "difficulty",
+    "estimated_time_minutes",
+    "unlock_xp_required",
+    "completion_xp_reward",
+]
+STEP_FIELDS = [
+    "id",
+    "lesson_id",
+    "order",
+    "title",
+    "step_type",
+    "content_type",
+    "duration_seconds",
+    "is_interactive",
+    "required_for_completion",
+]
+
+
+def content_tree_cache_key(course_id):
+    """Cache key for a course's compiled content tree"""
+    return f"course_content_tree_v{CONTENT_TREE_VERSION}_{course_id}"
+
+
+def build_content_tree(course):
+    """Compile the course outline straight from the database"""
+    modules = list(
+        Module.objects.filter(course=course, is_active=True)
+        .order_by("order")
+        .values(*MODULE_FIELDS)
+    )
+    lessons = list(
+        Lesson.objects.filter(module__course=course, is_active=True)
+        .order_by("order")
+        .values(*LESSON_FIELDS)
+    )
+    steps = list(
+        Step.objects.filter(lesson__module__course=course, is_active=True)
+        .order_by("order")
+        .values(*STEP_FIELDS)
+    )
+    question_counts = dict(
+        Question.objects.filter(step__lesson__module__course=course, is_active=True)
+        .values("step_id")
+        .annotate(questions=Count("id"))
+        .values_list("step_id", "questions")
+        .order_by()
+    )
+
+    steps_by_lesson = {}
+    for step in steps:
+        step["questions_count"] = question_counts.get(step["id"], 0)
+        steps_by_lesson.setdefault(step.pop("lesson_id"), []).append(step)
+
+    lessons_by_module = {}
+    for lesson in lessons:
+        lesson["steps"] = steps_by_lesson.get(lesson["id"], [])
+        lesson["steps_count"] = len(lesson["steps"])
+        lessons_by_module.setdefault(lesson.pop("module_id"), []).append(lesson)
+
+    for module in modules:
+        module["lessons"] = lessons_by_module.get(module["id"], [])
+        module["lessons_count"] = len(module["lessons"])
+        module["steps_count"] = sum(
+            lesson["steps_count"] for lesson in module["lessons"]
+        )
+
+    tree = {
+        "course": {
+            "id": course.id,
+            "title": course.title,
+            "slug": course.slug,
+            "level": course.level,
+            "is_published": course.is_published,
+        },
+        "modules": modules,
+        "counts": {
+            "modules": len(modules),
+            "lessons": sum(module["lessons_count"] for module in modules),
+            "steps": sum(module["steps_count"] for module in modules),
+            "questions": sum(question_counts.values()),
+        },
+    }
+
+    # Normalise to plain JSON data so the snapshot caches and hashes cleanly
+    encoded = json.dumps(tree, cls=DjangoJSONEncoder, sort_keys=True)
+    digest = hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+    snapshot = json.loads(encoded)
+    snapshot["version"] = f"{CONTENT_TREE_VERSION}-{digest}"
+    snapshot["generated_at"] = timezone.now().isoformat()
+    return snapshot
+
+
+def get_content_tree(course):
+    """Return the cached content tree for a course, compiling it on a miss"""
+    key = content_tree_cache_key(course.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_content_tree(course)
+        cache.set(key, snapshot, CONTENT_TREE_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_content_tree(*course_ids):
+    """Drop the content trees of the given courses once the transaction commits"""
+    course_ids = {course_id for course_id in course_ids if course_id}
+    if not course_ids:
+        return
+
+    def _delete():
+        try:
+            cache.delete_many(
+                [content_tree_cache_key(course_id) for course_id in course_ids]
+            )
+        except Exception as e:
+            logger.error(
+                f"Error invalidating content trees {course_ids}: {str(e)}",
+                exc_info=True,
+            )
+
+    transaction.on_commit(_delete)
+
+
+def invalidate_content_tree_for_lesson(lesson_id):
+    """Drop the content tree of the course a lesson belongs to"""
+    invalidate_content_tree(
+        Lesson.objects.filter(pk=lesson_id)
+        .values_list("module__course_id", flat=True)
+        .first()
+    )
+
+
+def invalidate_content_tree_for_step(step_id):
+    """Drop the content tree of the course a step belongs to"""
+    invalidate_content_tree(
+        Step.objects.filter(pk=step_id)
+        .values_list("lesson__module__course_id", flat=True)
+        .first()
+    )
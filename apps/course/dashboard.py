@@ -0,0 +1,181 @@
+"""
+Learner dashboard snapshots.
+
+The dashboard is opened on every app launch but only changes when the learner
+makes progress, answers a question or unlocks an achievement. It is therefore
+built once into a plain-data snapshot, cached per user and dropped by the
+model signals in ``models.py`` whenever one of those events happens.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    SpacedRepetition,
+    UserAchievement,
+    UserAnalytics,
+    UserProgress,
+    UserSettings,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when the payload layout changes so stale snapshots are never served
+DASHBOARD_SNAPSHOT_VERSION = 1
+DASHBOARD_CACHE_TIMEOUT = 60 * 15
+DEFAULT_DAILY_GOAL_MINUTES = 15
+RECENT_ACTIVITY_DAYS = 7
+RECENT_ACTIVITY_LIMIT = 10
+
+
+def dashboard_cache_key(user_id, date=None):
+    """Cache key for a user's dashboard snapshot on a given day"""
+    date = date or timezone.localdate()
+    return (
+        f"course_dashboard_v{DASHBOARD_SNAPSHOT_VERSION}_{user_id}_{date.isoformat()}"
+    )
+
+
+def get_user_stats(user):
+    """Aggregate the learner's headline stats in a single query"""
+    stats = UserProgress.objects.filter(user=user, is_active=True).aggregate(
+        total_xp=Sum("xp_earned"),
+        courses_enrolled=Count("course", filter=Q(course__isnull=False), distinct=True),
+        lessons_completed=Count(
+            "id", filter=Q(lesson__isnull=False, is_completed=True)
+        ),
+        current_streak=Avg("current_streak", filter=Q(course__isnull=False)),
+    )
+    return {key: value or 0 for key, value in stats.items()}
+
+
+def _get_daily_goal_progress(user, today):
+    """Minutes studied today against the learner's daily goal"""
+    minutes_studied = (
+        UserAnalytics.objects.filter(user=user, date=today).aggregate(
+            minutes=Sum("total_time_spent_minutes")
+        )["minutes"]
+        or 0
+    )
+    daily_goal = (
+        UserSettings.objects.filter(user=user)
+        .values_list("daily_goal_minutes", flat=True)
+        .first()
+    )
+    if daily_goal is None:
+        daily_goal = DEFAULT_DAILY_GOAL_MINUTES
+
+    return {
+        "minutes_studied": minutes_studied,
+        "daily_goal": daily_goal,
+        "percentage": (
+            min(100, minutes_studied / daily_goal * 100) if daily_goal > 0 else 0
+        ),
+    }
+
+
+def build_dashboard_snapshot(user):
+    """Build the dashboard payload for a user straight from the database"""
+    from .serializers import DashboardSerializer
+
+    now = timezone.now()
+    week_ago = now - timezone.timedelta(days=RECENT_ACTIVITY_DAYS)
+    progress = UserProgress.objects.filter(user=user, is_active=True)
+
+    recent_progress = list(
+        progress.filter(last_accessed__gte=week_ago)
+        .select_related("course", "lesson")
+        .order_by("-last_accessed")[:RECENT_ACTIVITY_LIMIT]
+    )
+    next_lesson = (
+        progress.filter(lesson__isnull=False, is_completed=False)
+        .select_related("lesson__module", "lesson__created_by", "lesson__updated_by")
+        .first()
+    )
+    achievements_this_week = (
+        UserAchievement.objects.filter(user=user, unlocked_at__gte=week_ago)
+        .select_related(
+            "user",
+            "created_by",
+            "updated_by",
+            "achievement__created_by",
+            "achievement__updated_by",
+        )
+        .prefetch_related("achievement__tags", "achievement__prerequisites")
+    )
+
+    # The summary is derived from the rows already loaded above
+    active_courses = {p.course_id for p in recent_progress if p.course_id}
+    completed_recent = sum(1 for p in recent_progress if p.is_completed)
+
+    dashboard_data = {
+        "user_stats": get_user_stats(user),
+        "recent_activity": [
+            {
+                "type": "progress",
+                "description": f"Studied {p.lesson.title if p.lesson else p.course.title}",
+                "timestamp": p.last_accessed,
+                "xp_earned": p.xp_earned,
+            }
+            for p in recent_progress
+            if p.lesson or p.course
+        ],
+        "progress_summary": {
+            "active_courses": len(active_courses),
+            "completion_rate": completed_recent / max(len(recent_progress), 1) * 100,
+        },
+        "upcoming_lessons": (
+            [next_lesson.lesson] if next_lesson and next_lesson.lesson else []
+        ),
+        "review_items_count": SpacedRepetition.objects.filter(
+            user=user, is_due=True
+        ).count(),
+        "achievements_this_week": achievements_this_week,
+        "daily_goal_progress": _get_daily_goal_progress(user, timezone.localdate()),
+        "recommendations": [],  # Would be populated by recommendation engine
+    }
+
+    # Normalise to plain JSON data so the snapshot caches and hashes cleanly
+    encoded = json.dumps(
+        DashboardSerializer(dashboard_data).data,
+        cls=DjangoJSONEncoder,
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+    snapshot = json.loads(encoded)
+    snapshot["version"] = f"{DASHBOARD_SNAPSHOT_VERSION}-{digest}"
+    snapshot["generated_at"] = now.isoformat()
+    return snapshot
+
+
+def get_dashboard_snapshot(user):
+    """Return the cached dashboard snapshot for a user, building it on a miss"""
+    key = dashboard_cache_key(user.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot(user)
+        cache.set(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_dashboard_snapshot(user_id):
+    """Drop a user's dashboard snapshot once the current transaction commits"""
+
+    def _delete():
+        try:
+            cache.delete(dashboard_cache_key(user_id))
+        except Exception as e:
+            logger.error(
+                f"Error invalidating dashboard for user {user_id}: {str(e)}",
+                exc_info=True,
+            )
+
+    transaction.on_commit(_delete)
@@ -0,0 +1,326 @@
+"""
+Assessment grading engine.
+
+Submitting an attempt used to walk its responses several times, issuing
+count/aggregate queries per breakdown and a question lookup per response.
+The engine loads the attempt's responses joined to their questions (and
+answer keys) in one query, grades them in a single pass and derives every
+breakdown from that in-memory table. Responses that already carry a grade,
+from the answer submission or a manual regrade, keep it; only ungraded
+auto-graded responses are evaluated. ``tasks.grade_assessment_attempt`` runs
+the same engine in a Celery worker and pushes the result to the learner's
+notification socket.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.accounts.models import ActivityLog
+
+from .models import UserProgress, UserResponse
+
+logger = logging.getLogger(__name__)
+
+STRENGTH_ACCURACY = 80
+WEAKNESS_ACCURACY = 60
+QUESTION_TEXT_PREVIEW = 100
+# The max_score of a response nobody graded yet
+UNGRADED_MAX_SCORE = UserResponse._meta.get_field("max_score").default
+
+RESPONSE_FIELDS = [
+    "id",
+    "response_data",
+    "is_correct",
+    "is_partially_correct",
+    "score",
+    "max_score",
+    "time_taken_seconds",
+    "question__id",
+    "question__text",
+    "question__question_type",
+    "question__difficulty",
+    "question__points",
+    "question__correct_answers",
+    "question__auto_grading_enabled",
+    "question__recommended_time_seconds",
+]
+
+
+@dataclass
+class GradedResponse:
+    """One row of an attempt's grading table"""
+
+    response: Any
+    question_type: str
+    difficulty: int
+    recommended_time: int
+    is_correct: bool
+    is_partially_correct: bool
+    score: float
+    max_score: float
+    time_taken: int
+    changed: bool = False
+
+
+def evaluate_response(question_type, correct_answers, response_data):
+    """Evaluate a response against a question's answer key"""
+    if question_type == "multiple_choice":
+        return response_data.get("selected_option") in correct_answers
+    elif question_type == "multi_select":
+        selected = set(response_data.get("selected_options", []))
+        return selected == set(correct_answers)
+    elif question_type in ["fill_blank", "short_answer"]:
+        user_answer = response_data.get("answer", "").lower().strip()
+        return any(
+            user_answer == correct.lower().strip() for correct in correct_answers
+        )
+    elif question_type == "true_false":
+        return response_data.get("answer") in correct_answers
+    else:
+        # For complex question types, require manual grading
+        return False
+
+
+def is_graded(response):
+    """Whether a response was graded; ungraded ones keep the model defaults"""
+    return bool(
+        response.is_correct
+        or response.is_partially_correct
+        or response.score
+        or response.max_score != UNGRADED_MAX_SCORE
+    )
+
+
+def grade_for(percentage_score, grade_boundaries):
+    """Highest grade whose boundary the score reaches"""
+    for grade, threshold in sorted(
+        grade_boundaries.items(), key=lambda x: x[1], reverse=True
+    ):
+        if percentage_score >= threshold:
+            return grade
+    return ""
+
+
+def load_grading_table(attempt):
+    """Load and grade an attempt's responses in one query"""
+    responses = (
+        UserResponse.objects.filter(assessment_attempts=attempt)
+        .select_related("question")
+        .only(*RESPONSE_FIELDS)
+        .order_by("created_at")
+    )
+
+    table = []
+    for response in responses:
+        question = response.question
+        row = GradedResponse(
+            response=response,
+            question_type=question.question_type,
+            difficulty=question.difficulty,
+            recommended_time=question.recommended_time_seconds,
+            is_correct=response.is_correct,
+            is_partially_correct=response.is_partially_correct,
+            score=response.score,
+            max_score=response.max_score,
+            time_taken=response.time_taken_seconds,
+        )
+        if question.auto_grading_enabled and not is_graded(response):
+            row.is_correct = evaluate_response(
+                question.question_type,
+                question.correct_answers,
+                response.response_data or {},
+            )
+            row.score = question.points if row.is_correct else 0
+            row.max_score = question.points
+            row.changed = (row.is_correct, row.score, row.max_score) != (
+                response.is_correct,
+                response.score,
+                response.max_score,
+            )
+        table.append(row)
+    return table
+
+
+def _save_regraded_responses(table):
+    """Persist grades that changed since the responses were answered"""
+    changed = []
+    for row in table:
+        if row.changed:
+            row.response.is_correct = row.is_correct
+            row.response.score = row.score
+            row.response.max_score = row.max_score
+            changed.append(row.response)
+    if changed:
+        UserResponse.objects.bulk_update(
+            changed, ["is_correct", "score", "max_score"], batch_size=500
+        )
+
+
+def _accuracy_breakdown(table, key):
+    breakdown = {}
+    for row in table:
+        stats = breakdown.setdefault(getattr(row, key), {"correct": 0, "total": 0})
+        stats["total"] += 1
+        if row.is_correct:
+            stats["correct"] += 1
+    for stats in breakdown.values():
+        stats["accuracy"] = stats["correct"] / stats["total"] * 100
+    return breakdown
+
+
+def _time_efficiency(table):
+    if not table:
+        return 0
+    total_time = sum(row.time_taken for row in table)
+    recommended_time = sum(row.recommended_time for row in table) or total_time
+    return min(100, (recommended_time / total_time * 100)) if total_time > 0 else 100
+
+
+def build_results(attempt, table):
+    """Derive every result breakdown from the grading table"""
+    assessment = attempt.assessment
+    type_performance = _accuracy_breakdown(table, "question_type")
+
+    detailed_results = {
+        "total_questions": len(table),
+        "correct_answers": sum(1 for row in table if row.is_correct),
+        "partially_correct": sum(1 for row in table if row.is_partially_correct),
+        "incorrect_answers": sum(1 for row in table if not row.is_correct),
+        "average_time_per_question": (
+            sum(row.time_taken for row in table) / len(table) if table else 0
+        ),
+        "question_breakdown": [
+            {
+                "question_id": str(row.response.question.id),
+                "question_text": row.response.question.text[:QUESTION_TEXT_PREVIEW],
+                "correct": row.is_correct,
+                "score": row.score,
+                "time_taken": row.time_taken,
+            }
+            for row in table
+        ],
+    }
+
+    performance_analysis = {
+        "overall_accuracy": attempt.percentage_score,
+        "time_efficiency": _time_efficiency(table),
+        "question_type_performance": type_performance,
+        "difficulty_analysis": _accuracy_breakdown(table, "difficulty"),
+        "strengths": [
+            q_type
+            for q_type, stats in type_performance.items()
+            if stats["accuracy"] >= STRENGTH_ACCURACY
+        ],
+        "weaknesses": [
+            q_type
+            for q_type, stats in type_performance.items()
+            if stats["accuracy"] < WEAKNESS_ACCURACY
+        ],
+    }
+
+    improvement_suggestions = []
+    if attempt.percentage_score < 70:
+        improvement_suggestions.append(
+            "Review the course material before retaking the assessment"
+        )
+    if (
+        assessment.time_limit_minutes
+        and attempt.completion_time_seconds > assessment.time_limit_minutes * 60
+    ):
+        improvement_suggestions.append(
+            "Practice time management - focus on answering questions more quickly"
+        )
+
+    if attempt.passed:
+        next_steps = ["Congratulations! You may proceed to the next lesson/module"]
+        if assessment.certificate_required:
+            next_steps.append("You are eligible for course certificate")
+    else:
+        next_steps = [
+            "Review the areas where you scored low and retake the assessment",
+            "Consider reviewing related lessons and practice materials",
+        ]
+
+    return {
+        "attempt": attempt,
+        "detailed_results": detailed_results,
+        "performance_analysis": performance_analysis,
+        "improvement_suggestions": improvement_suggestions,
+        "next_steps": next_steps,
+    }
+
+
+def grade_attempt(attempt, ip_address=None):
+    """
+    Grade a submitted attempt and return its result data.
+
+    Scores the attempt from the grading table, completes it, awards XP when
+    passed and logs the activity, all in one transaction.
+    """
+    assessment = attempt.assessment
+    table = load_grading_table(attempt)
+
+    with transaction.atomic():
+        _save_regraded_responses(table)
+
+        now = timezone.now()
+        attempt.submitted_at = attempt.submitted_at or now
+        attempt.score = sum(row.score for row in table)
+        attempt.max_score = sum(row.max_score for row in table)
+        attempt.percentage_score = (
+            attempt.score / attempt.max_score * 100 if attempt.max_score > 0 else 0
+        )
+        attempt.passed = attempt.percentage_score >= assessment.passing_score
+        attempt.grade = (
+            grade_for(attempt.percentage_score, assessment.grade_boundaries)
+            or attempt.grade
+        )
+        attempt.completed_at = now
+        attempt.status = "completed"
+        attempt.completion_time_seconds = int(
+            (attempt.completed_at - attempt.started_at).total_seconds()
+        )
+        attempt.save()
+
+        if attempt.passed:
+            UserProgress.objects.filter(
+                user_id=attempt.user_id, course_id=assessment.course_id
+            ).update(xp_earned=F("xp_earned") + assessment.xp_reward)
+
+        ActivityLog.objects.create(
+            user_id=attempt.user_id,
+            activity_type=ActivityLog.ActivityType.ASSESSMENT_COMPLETION,
+            description=f"Completed assessment: {assessment.title} (Score: {attempt.percentage_score}%)",
+            ip_address=ip_address,
+        )
+
+    return build_results(attempt, table)
+
+
+def push_attempt_result(user_id, result):
+    """Push serialized attempt results to the learner's notification socket"""
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"user_{user_id}",
+            {
+                "type": "assessment_graded",
+                # Round-trip through JSON so UUIDs and datetimes survive msgpack
+                "result": json.loads(json.dumps(result, cls=DjangoJSONEncoder)),
+                "timestamp": timezone.now().isoformat(),
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error pushing assessment result: {str(e)}", exc_info=True)
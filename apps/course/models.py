@@ -1968,6 +1968,47 @@ class UserAnalytics(BaseModel):
         self.save(update_fields=["accuracy_percentage", "completion_rate"])
 
 
+# Precomputed course-level statistics, maintained incrementally from progress
+class CourseStats(BaseModel):
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, related_name="stats"
+    )
+
+    # Content
+    lesson_count = models.PositiveIntegerField(default=0)
+
+    # Enrollment and completion
+    enrollment_count = models.PositiveBigIntegerField(default=0)
+    completion_count = models.PositiveBigIntegerField(default=0)
+    total_completion_time_seconds = models.PositiveBigIntegerField(default=0)
+    completion_time_histogram = models.JSONField(
+        default=dict, blank=True
+    )  # e.g., {'<1h': 10, '1-5h': 42}
+
+    # Engagement
+    active_learners = models.PositiveIntegerField(default=0)
+    last_rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta(BaseModel.Meta):
+        verbose_name = _("Course Statistics")
+        verbose_name_plural = _("Course Statistics")
+
+    def __str__(self):
+        return f"Statistics for {self.course}"
+
+    @property
+    def completion_rate(self):
+        if self.enrollment_count == 0:
+            return 0
+        return (self.completion_count / self.enrollment_count) * 100
+
+    @property
+    def average_completion_time(self):
+        if self.completion_count == 0:
+            return 0
+        return self.total_completion_time_seconds / self.completion_count
+
+
 # Signal handlers for automated actions
 @receiver(pre_save, sender=Course)
 def course_pre_save(sender, instance, **kwargs):
@@ -1984,6 +2025,10 @@ def course_pre_save(sender, instance, **kwargs):
         instance.slug = f"{original_slug}-{counter}"
         counter += 1
 
+    from .content_tree import invalidate_content_tree
+
+    invalidate_content_tree(instance.pk)
+
 
 @receiver(post_save, sender=Course)
 def course_post_save(sender, instance, created, **kwargs):
@@ -2001,17 +2046,85 @@ def course_post_save(sender, instance, created, **kwargs):
 
 @receiver(pre_save, sender=Module)
 def module_pre_save(sender, instance, **kwargs):
-    """Generate module slug"""
+    """Generate module slug and drop cached course outlines"""
     if not instance.slug:
         instance.slug = slugify(instance.title)
 
+    from .content_tree import invalidate_content_tree
+
+    # A module moved between courses changes both outlines
+    previous_course_id = (
+        Module.objects.filter(pk=instance.pk)
+        .values_list("course_id", flat=True)
+        .first()
+    )
+    invalidate_content_tree(instance.course_id, previous_course_id)
+
 
 @receiver(pre_save, sender=Lesson)
 def lesson_pre_save(sender, instance, **kwargs):
-    """Generate lesson slug"""
+    """Generate lesson slug and drop cached course outlines"""
     if not instance.slug:
         instance.slug = slugify(instance.title)
 
+    from .content_tree import invalidate_content_tree
+
+    # A lesson moved to another course's module changes both outlines
+    course_ids = Module.objects.filter(
+        models.Q(pk=instance.module_id) | models.Q(lessons__pk=instance.pk)
+    ).values_list("course_id", flat=True)
+    invalidate_content_tree(*course_ids)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    """Keep the course rollup's lesson count current"""
+    from .stats import refresh_lesson_count
+
+    module = Module.objects.filter(pk=instance.module_id).only("course_id").first()
+    if module:
+        refresh_lesson_count(module.course_id)
+
+
+@receiver(post_delete, sender=Module)
+def module_post_delete(sender, instance, **kwargs):
+    """Drop the outline of the module's course"""
+    from .content_tree import invalidate_content_tree
+
+    invalidate_content_tree(instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_post_delete(sender, instance, **kwargs):
+    """Drop the outline of the lesson's course"""
+    from .content_tree import invalidate_content_tree
+
+    invalidate_content_tree(
+        Module.objects.filter(pk=instance.module_id)
+        .values_list("course_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Step)
+@receiver(post_delete, sender=Step)
+def step_content_changed(sender, instance, **kwargs):
+    """Drop the outline of the course this step belongs to"""
+    from .content_tree import invalidate_content_tree_for_lesson
+
+    invalidate_content_tree_for_lesson(instance.lesson_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_content_changed(sender, instance, **kwargs):
+    """Keep the question counts in the course outline current"""
+    from .content_tree import invalidate_content_tree_for_step
+
+    if instance.step_id:
+        invalidate_content_tree_for_step(instance.step_id)
+
 
 @receiver(pre_save, sender=Assessment)
 def assessment_pre_save(sender, instance, **kwargs):
@@ -2039,24 +2152,46 @@ def assessment_attempt_post_save(sender, instance, created, **kwargs):
     """Update assessment statistics"""
     if instance.status == "completed":
         assessment = instance.assessment
-        attempts = assessment.user_attempts.filter(status="completed")
+        totals = assessment.user_attempts.filter(status="completed").aggregate(
+            attempts=models.Count("id"),
+            average=models.Avg("percentage_score"),
+            passed=models.Count("id", filter=models.Q(passed=True)),
+        )
 
-        if attempts.exists():
-            assessment.attempt_count = attempts.count()
-            assessment.average_score = (
-                attempts.aggregate(avg=models.Avg("percentage_score"))["avg"] or 0
-            )
-            assessment.completion_rate = (
-                attempts.filter(passed=True).count() / attempts.count()
-            ) * 100
+        if totals["attempts"]:
+            assessment.attempt_count = totals["attempts"]
+            assessment.average_score = totals["average"] or 0
+            assessment.completion_rate = totals["passed"] / totals["attempts"] * 100
             assessment.save(
                 update_fields=["attempt_count", "average_score", "completion_rate"]
             )
 
 
+@receiver(pre_save, sender=UserProgress)
+def user_progress_stats_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Capture completion and activity state for the course rollup"""
+    from .stats import progress_pre_save
+
+    progress_pre_save(instance, update_fields)
+
+
+@receiver(post_save, sender=UserProgress)
+def user_progress_stats_post_save(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    """Move the course rollup by this save's deltas"""
+    from .stats import progress_post_save
+
+    progress_post_save(instance, created, update_fields)
+
+
 @receiver(post_save, sender=UserProgress)
-def user_progress_post_save(sender, instance, created, **kwargs):
+def user_progress_post_save(sender, instance, created, update_fields=None, **kwargs):
     """Handle progress updates"""
+    # update_streak() saves the instance again; don't recurse on that save
+    if update_fields and set(update_fields) <= {"current_streak", "longest_streak"}:
+        return
+
     if instance.is_completed and not instance.completed_at:
         from django.utils import timezone
 
@@ -2092,6 +2227,35 @@ def user_achievement_post_save(sender, instance, created, **kwargs):
         # This would typically be handled by a separate XP system
 
 
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def achievement_rules_changed(sender, instance, update_fields=None, **kwargs):
+    """Recompile the achievement criteria index once the change commits"""
+    from django.db import transaction
+
+    # Unlock counter updates don't touch the rules
+    if update_fields and set(update_fields) <= {"unlock_count"}:
+        return
+
+    from .achievements import invalidate_criteria_index
+
+    transaction.on_commit(invalidate_criteria_index)
+
+
+@receiver(post_save, sender=UserProgress)
+@receiver(post_delete, sender=UserProgress)
+@receiver(post_save, sender=UserResponse)
+@receiver(post_save, sender=UserAchievement)
+@receiver(post_save, sender=UserAnalytics)
+@receiver(post_save, sender=UserSettings)
+@receiver(post_save, sender=SpacedRepetition)
+def learner_activity_changed(sender, instance, **kwargs):
+    """Invalidate the learner's cached dashboard snapshot"""
+    from .dashboard import invalidate_dashboard_snapshot
+
+    invalidate_dashboard_snapshot(instance.user_id)
+
+
 @receiver(pre_save, sender=Certificate)
 def certificate_pre_save(sender, instance, **kwargs):
     """Generate verification code for certificates"""
@@ -1299,6 +1299,7 @@ class CourseStatisticsSerializer(serializers.Serializer):
     completion_rate = serializers.FloatField(read_only=True)
     average_rating = serializers.FloatField(read_only=True)
     average_completion_time = serializers.FloatField(read_only=True)
+    completion_time_histogram = serializers.DictField(read_only=True)
     difficulty_distribution = serializers.DictField(read_only=True)
     engagement_metrics = serializers.DictField(read_only=True)
     feedback_summary = serializers.DictField(read_only=True)
@@ -7,8 +7,8 @@ from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from .achievements import evaluate_achievements, get_user_metrics
 from .models import (
-    Achievement,
     Assessment,
     Certificate,
     Course,
@@ -421,78 +421,24 @@ def _notify_course_published(course):
 def _check_achievements(user, progress):
     """Check and award achievements based on progress"""
     try:
-        achievements_to_check = Achievement.objects.filter(is_active=True)
-
-        for achievement in achievements_to_check:
-            # Check if user already has this achievement
-            if UserAchievement.objects.filter(
-                user=user, achievement=achievement
-            ).exists():
-                continue
-
-            # Check achievement criteria
-            if _meets_achievement_criteria(user, achievement, progress):
-                UserAchievement.objects.create(
-                    user=user,
-                    achievement=achievement,
-                    progress_data={"triggered_by": str(progress.id)},
-                )
-
-    except Exception as e:
-        logger.error(f"Error checking achievements: {str(e)}", exc_info=True)
-
+        metrics = get_user_metrics(user)
 
-def _meets_achievement_criteria(user, achievement, progress):
-    """Check if user meets specific achievement criteria"""
-    try:
-        criteria = achievement.criteria
-
-        # Course completion achievements
-        if "courses_completed" in criteria:
-            completed_courses = UserProgress.objects.filter(
-                user=user, course__isnull=False, is_completed=True
-            ).count()
-            if completed_courses < criteria["courses_completed"]:
-                return False
-
-        # Score-based achievements
-        if "min_average_score" in criteria:
-            avg_score = (
-                UserProgress.objects.filter(user=user).aggregate(
-                    avg_score=models.Avg("average_score")
-                )["avg_score"]
-                or 0
-            )
-            if avg_score < criteria["min_average_score"]:
-                return False
-
-        # Streak achievements
-        if "min_streak_days" in criteria:
-            max_streak = (
-                UserProgress.objects.filter(user=user).aggregate(
-                    max_streak=models.Max("longest_streak")
-                )["max_streak"]
-                or 0
-            )
-            if max_streak < criteria["min_streak_days"]:
-                return False
-
-        # XP achievements
-        if "total_xp" in criteria:
-            total_xp = (
-                UserProgress.objects.filter(user=user).aggregate(
-                    total_xp=models.Sum("xp_earned")
-                )["total_xp"]
-                or 0
-            )
-            if total_xp < criteria["total_xp"]:
-                return False
+        # The completed record moved exactly one of the completion counters
+        previous = {}
+        if progress.lesson_id:
+            previous["lessons_completed"] = metrics["lessons_completed"] - 1
+        elif progress.course_id and not (progress.module_id or progress.step_id):
+            previous["courses_completed"] = metrics["courses_completed"] - 1
 
-        return True
+        evaluate_achievements(
+            user,
+            metrics,
+            previous=previous,
+            context={"triggered_by": str(progress.id)},
+        )
 
     except Exception as e:
-        logger.error(f"Error checking achievement criteria: {str(e)}", exc_info=True)
-        return False
+        logger.error(f"Error checking achievements: {str(e)}", exc_info=True)
 
 
 def _update_user_analytics(user, progress):
@@ -610,18 +556,8 @@ def _update_spaced_repetition_from_response(response):
 def _update_course_statistics(course):
     """Update course-level statistics"""
     try:
-        # Update enrollment and completion counts
-        total_progress = UserProgress.objects.filter(course=course)
-
-        course.enrollment_count = total_progress.values("user").distinct().count()
-        course.completion_count = (
-            total_progress.filter(is_completed=True).values("user").distinct().count()
-        )
-
-        # Update average rating (if ratings system is implemented)
-        # This would depend on how ratings are stored
-
-        course.save(update_fields=["enrollment_count", "completion_count"])
+        # Enrollment and completion counts are maintained by the CourseStats
+        # rollup (see stats.py); only the cached payload needs dropping here
 
         # Clear cache
         cache.delete(f"course_stats_{course.id}")
@@ -655,19 +591,12 @@ def _check_assessment_achievements(user, attempt):
     try:
         # Perfect score achievement
         if attempt.percentage_score == 100:
-            perfect_score_achievement = Achievement.objects.filter(
-                name="Perfect Score", is_active=True
-            ).first()
-
-            if (
-                perfect_score_achievement
-                and not UserAchievement.objects.filter(
-                    user=user, achievement=perfect_score_achievement
-                ).exists()
-            ):
-                UserAchievement.objects.create(
-                    user=user, achievement=perfect_score_achievement
-                )
+            evaluate_achievements(
+                user,
+                {"perfect_assessment": 1},
+                previous={"perfect_assessment": 0},
+                context={"triggered_by": str(attempt.id)},
+            )
 
     except Exception as e:
         logger.error(f"Error checking assessment achievements: {str(e)}", exc_info=True)
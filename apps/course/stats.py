@@ -0,0 +1,322 @@
+"""
+Course statistics rollups.
+
+Instructor statistics used to be recomputed with ad-hoc scans of
+``UserProgress`` on every request and every progress save. ``CourseStats``
+now holds the counters; they are moved by small deltas from the progress
+signals and rebuilt exactly by the nightly ``rebuild_course_stats`` task,
+which also corrects the drift of the 30-day active learner window.
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import Course, CourseStats, Lesson, UserProgress
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_LEARNER_WINDOW_DAYS = 30
+
+# Upper bound in hours (exclusive) and label of each completion time bucket
+COMPLETION_TIME_BUCKETS = [
+    (1, "<1h"),
+    (5, "1-5h"),
+    (10, "5-10h"),
+    (25, "10-25h"),
+    (50, "25-50h"),
+    (None, "50h+"),
+]
+
+# Fields on the progress record that make it more specific than an enrollment
+_SCOPE_FIELDS = ("module_id", "lesson_id", "step_id", "assessment_id")
+
+# Partial saves that touch none of these cannot move the rollup
+_TRACKED_FIELDS = {"is_completed", "is_active", "last_accessed"}
+
+
+def completion_time_bucket(seconds):
+    """Histogram bucket label for a completion time"""
+    for upper_hours, label in COMPLETION_TIME_BUCKETS:
+        if upper_hours is None or seconds < upper_hours * 3600:
+            return label
+
+
+def is_enrollment_record(progress):
+    """Whether a progress record is the course-level enrollment row"""
+    return bool(progress.course_id) and not any(
+        getattr(progress, field) for field in _SCOPE_FIELDS
+    )
+
+
+def _enrollment_records():
+    return UserProgress.objects.filter(
+        course__isnull=False,
+        module__isnull=True,
+        lesson__isnull=True,
+        step__isnull=True,
+        assessment__isnull=True,
+        is_active=True,
+    )
+
+
+def _apply_delta(course_id, **deltas):
+    """Add deltas to a course's counters, seeding the rollup on first use"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    updated = CourseStats.objects.filter(course_id=course_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        # No rollup yet: build it exactly, which already includes this event
+        rebuild_course_stats([course_id])
+        return
+
+    mirrored = {
+        field: F(field) + delta
+        for field, delta in deltas.items()
+        if field in ("enrollment_count", "completion_count")
+    }
+    if mirrored:
+        Course.objects.filter(pk=course_id).update(**mirrored)
+
+
+def record_completion(course_id, time_spent_seconds):
+    """Count a course completion and its completion time"""
+    with transaction.atomic():
+        stats = (
+            CourseStats.objects.select_for_update().filter(course_id=course_id).first()
+        )
+        if stats is None:
+            rebuild_course_stats([course_id])
+            return
+
+        bucket = completion_time_bucket(time_spent_seconds)
+        stats.completion_count += 1
+        stats.total_completion_time_seconds += time_spent_seconds
+        stats.completion_time_histogram[bucket] = (
+            stats.completion_time_histogram.get(bucket, 0) + 1
+        )
+        stats.save(
+            update_fields=[
+                "completion_count",
+                "total_completion_time_seconds",
+                "completion_time_histogram",
+                "updated_at",
+            ]
+        )
+        Course.objects.filter(pk=course_id).update(
+            completion_count=F("completion_count") + 1
+        )
+
+
+def is_new_active_learner(course_id, user_id):
+    """
+    Whether this activity adds the learner to the course's active window.
+
+    Membership of the day's active set is kept as a cache marker, so only the
+    learner's first activity of the day touches the database. That first
+    activity checks whether the learner was already inside the window.
+    Learners ageing out of the window are dropped by the nightly rebuild.
+    """
+    today = timezone.localdate()
+    marker = f"course_active_{course_id}_{user_id}_{today.isoformat()}"
+    if not cache.add(marker, True, 60 * 60 * 24):
+        return False
+
+    cutoff = timezone.now() - timezone.timedelta(days=ACTIVE_LEARNER_WINDOW_DAYS)
+    return not UserProgress.objects.filter(
+        course_id=course_id, user_id=user_id, last_accessed__gte=cutoff
+    ).exists()
+
+
+def refresh_lesson_count(course_id):
+    """Recount a course's active lessons after a content change"""
+    lesson_count = Lesson.objects.filter(
+        module__course_id=course_id, is_active=True
+    ).count()
+    # Courses without a rollup get one, lesson count included, on first read
+    CourseStats.objects.filter(course_id=course_id).update(lesson_count=lesson_count)
+
+
+def _is_tracked_save(update_fields):
+    return not update_fields or bool(_TRACKED_FIELDS & set(update_fields))
+
+
+def progress_pre_save(progress, update_fields=None):
+    """Capture the state needed to turn a progress save into deltas"""
+    if not _is_tracked_save(update_fields):
+        return
+
+    progress._was_completed = False
+    progress._newly_active = False
+    if not progress.course_id or not progress.is_active:
+        return
+
+    if (
+        progress.is_completed
+        and not progress._state.adding
+        and is_enrollment_record(progress)
+    ):
+        progress._was_completed = UserProgress.objects.filter(
+            pk=progress.pk, is_completed=True
+        ).exists()
+
+    # Must run before the save moves last_accessed into the window
+    progress._newly_active = is_new_active_learner(progress.course_id, progress.user_id)
+
+
+def progress_post_save(progress, created, update_fields=None):
+    """Apply enrollment, completion and activity deltas for a saved record"""
+    if not _is_tracked_save(update_fields):
+        return
+    if not progress.course_id or not progress.is_active:
+        return
+
+    enrolled = created and is_enrollment_record(progress)
+    completed = (
+        progress.is_completed
+        and is_enrollment_record(progress)
+        and not getattr(progress, "_was_completed", True)
+    )
+    newly_active = getattr(progress, "_newly_active", False)
+    progress._was_completed = progress.is_completed
+    progress._newly_active = False
+    if not (enrolled or completed or newly_active):
+        return
+
+    if not CourseStats.objects.filter(course_id=progress.course_id).exists():
+        # First event for this course: an exact build already includes it
+        rebuild_course_stats([progress.course_id])
+        return
+
+    if enrolled or newly_active:
+        _apply_delta(
+            progress.course_id,
+            enrollment_count=int(enrolled),
+            active_learners=int(newly_active),
+        )
+    if completed:
+        record_completion(progress.course_id, progress.total_time_spent_seconds)
+
+
+def rebuild_course_stats(course_ids=None):
+    """
+    Rebuild course statistics exactly with grouped queries.
+
+    Rebuilds every course when ``course_ids`` is None. Returns the number of
+    rollups written.
+    """
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    course_ids = list(courses.values_list("pk", flat=True))
+    if not course_ids:
+        return 0
+
+    cutoff = timezone.now() - timezone.timedelta(days=ACTIVE_LEARNER_WINDOW_DAYS)
+    enrollments = _enrollment_records().filter(course_id__in=course_ids)
+
+    counters = {
+        row["course_id"]: row
+        for row in enrollments.values("course_id").annotate(
+            enrollments=Count("user", distinct=True),
+            completions=Count("user", filter=Q(is_completed=True), distinct=True),
+            completion_time=Sum(
+                "total_time_spent_seconds", filter=Q(is_completed=True)
+            ),
+        )
+    }
+
+    bucket_case = Case(
+        *[
+            When(total_time_spent_seconds__lt=upper_hours * 3600, then=Value(label))
+            for upper_hours, label in COMPLETION_TIME_BUCKETS
+            if upper_hours is not None
+        ],
+        default=Value(COMPLETION_TIME_BUCKETS[-1][1]),
+    )
+    histograms = {}
+    for row in (
+        enrollments.filter(is_completed=True)
+        .annotate(bucket=bucket_case)
+        .values("course_id", "bucket")
+        .annotate(learners=Count("id"))
+        .order_by()
+    ):
+        histograms.setdefault(row["course_id"], {})[row["bucket"]] = row["learners"]
+
+    active = dict(
+        UserProgress.objects.filter(
+            course_id__in=course_ids, last_accessed__gte=cutoff, is_active=True
+        )
+        .values("course_id")
+        .annotate(learners=Count("user", distinct=True))
+        .values_list("course_id", "learners")
+        .order_by()
+    )
+    lessons = dict(
+        Lesson.objects.filter(module__course_id__in=course_ids, is_active=True)
+        .values("module__course_id")
+        .annotate(lessons=Count("id"))
+        .values_list("module__course_id", "lessons")
+        .order_by()
+    )
+
+    now = timezone.now()
+    existing = {
+        stats.course_id: stats
+        for stats in CourseStats.objects.filter(course_id__in=course_ids)
+    }
+    to_create, to_update = [], []
+    for course_id in course_ids:
+        row = counters.get(course_id, {})
+        stats = existing.get(course_id) or CourseStats(course_id=course_id)
+        stats.lesson_count = lessons.get(course_id, 0)
+        stats.enrollment_count = row.get("enrollments", 0)
+        stats.completion_count = row.get("completions", 0)
+        stats.total_completion_time_seconds = row.get("completion_time") or 0
+        stats.completion_time_histogram = histograms.get(course_id, {})
+        stats.active_learners = active.get(course_id, 0)
+        stats.last_rebuilt_at = now
+        (to_update if stats.course_id in existing else to_create).append(stats)
+
+    fields = [
+        "lesson_count",
+        "enrollment_count",
+        "completion_count",
+        "total_completion_time_seconds",
+        "completion_time_histogram",
+        "active_learners",
+        "last_rebuilt_at",
+    ]
+    with transaction.atomic():
+        CourseStats.objects.bulk_create(to_create, batch_size=1000)
+        CourseStats.objects.bulk_update(to_update, fields, batch_size=1000)
+
+        # Keep the denormalized counters on Course in step with the rollup
+        Course.objects.bulk_update(
+            [
+                Course(
+                    pk=stats.course_id,
+                    enrollment_count=stats.enrollment_count,
+                    completion_count=stats.completion_count,
+                )
+                for stats in to_create + to_update
+            ],
+            ["enrollment_count", "completion_count"],
+            batch_size=1000,
+        )
+
+    return len(course_ids)
+
+
+def get_course_stats(course):
+    """Return the statistics rollup for a course, building it if missing"""
+    stats = CourseStats.objects.filter(course=course).first()
+    if stats is None:
+        rebuild_course_stats([course.pk])
+        stats = CourseStats.objects.get(course=course)
+    return stats
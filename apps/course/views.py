@@ -2,9 +2,11 @@ import logging
 
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Avg, F, Q, Sum
+from django.db.models import Q, Sum
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
 from rest_framework import filters, permissions, status, viewsets
@@ -17,6 +19,8 @@ from apps.accounts.permissions import IsOwnerOrAdmin
 from apps.accounts.views.user import UserRateThrottle
 from apps.events.views import StandardResultsSetPagination
 
+from .content_tree import get_content_tree
+from .dashboard import get_dashboard_snapshot
 from .filters import (
     CourseFilter,
     DiscussionFilter,
@@ -26,6 +30,7 @@ from .filters import (
     QuestionFilter,
     VocabularyFilter,
 )
+from .grading import evaluate_response, grade_attempt
 from .models import (
     Assessment,
     Course,
@@ -37,8 +42,6 @@ from .models import (
     Question,
     SpacedRepetition,
     Step,
-    UserAchievement,
-    UserAnalytics,
     UserAssessmentAttempt,
     UserProgress,
     UserResponse,
@@ -70,6 +73,8 @@ from .serializers import (
     UserResponseSerializer,
     VocabularySerializer,
 )
+from .stats import get_course_stats
+from .tasks import grade_assessment_attempt
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -227,7 +232,7 @@ class CourseViewSet(BaseViewSet):
         ).prefetch_related("co_instructors", "prerequisites")
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "outline"]:
             permission_classes = [permissions.IsAuthenticated]
         elif self.action in ["create"]:
             permission_classes = [permissions.IsAuthenticated]
@@ -305,10 +310,7 @@ class CourseViewSet(BaseViewSet):
                     user=user, course=course, first_accessed=timezone.now()
                 )
 
-                # Update course enrollment count
-                course.enrollment_count = F("enrollment_count") + 1
-                course.save(update_fields=["enrollment_count"])
-
+                # The enrollment counters are moved by the progress signals
                 # Log activity
                 ActivityLog.objects.create(
                     user=user,
@@ -340,9 +342,7 @@ class CourseViewSet(BaseViewSet):
             progress = get_object_or_404(UserProgress, user=user, course=course)
 
             # Calculate detailed progress
-            total_lessons = Lesson.objects.filter(
-                module__course=course, is_active=True
-            ).count()
+            total_lessons = get_course_stats(course).lesson_count
 
             completed_lessons = UserProgress.objects.filter(
                 user=user, lesson__module__course=course, is_completed=True
@@ -406,6 +406,29 @@ class CourseViewSet(BaseViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @extend_schema(
+        tags=["Courses"],
+        responses={200: {"type": "object"}},
+    )
+    @action(detail=True, methods=["get"])
+    def outline(self, request, pk=None):
+        """Get the full module/lesson/step tree of a course"""
+        try:
+            course = self.get_object()
+            tree = get_content_tree(course)
+
+            etag = quote_etag(tree["version"])
+            response = Response(tree)
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"
+            return get_conditional_response(request, etag=etag, response=response)
+        except Exception as e:
+            logger.error(f"Error getting course outline: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Failed to get course outline"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     @extend_schema(
         tags=["Courses"],
         responses={200: CourseStatisticsSerializer},
@@ -424,18 +447,14 @@ class CourseViewSet(BaseViewSet):
             ):
                 raise PermissionDenied("Not authorized to view course statistics")
 
+            course_stats = get_course_stats(course)
             stats = {
-                "total_enrollments": course.enrollment_count,
-                "active_learners": UserProgress.objects.filter(
-                    course=course,
-                    last_accessed__gte=timezone.now() - timezone.timedelta(days=30),
-                ).count(),
-                "completion_rate": course.completion_rate,
+                "total_enrollments": course_stats.enrollment_count,
+                "active_learners": course_stats.active_learners,
+                "completion_rate": course_stats.completion_rate,
                 "average_rating": course.average_rating,
-                "average_completion_time": UserProgress.objects.filter(
-                    course=course, is_completed=True
-                ).aggregate(avg_time=Avg("total_time_spent_seconds"))["avg_time"]
-                or 0,
+                "average_completion_time": course_stats.average_completion_time,
+                "completion_time_histogram": course_stats.completion_time_histogram,
                 "difficulty_distribution": {},
                 "engagement_metrics": {},
                 "feedback_summary": {},
@@ -547,7 +566,7 @@ class LessonViewSet(BaseViewSet):
         """Get steps for a lesson"""
         try:
             lesson = self.get_object()
-            steps = lesson.steps.filter(is_active=True).order_by("order")
+            steps = lesson.content_blocks.filter(is_active=True).order_by("order")
             serializer = StepSerializer(steps, many=True)
             return Response(serializer.data)
         except Exception as e:
@@ -641,9 +660,7 @@ class LessonViewSet(BaseViewSet):
                     )
 
                     # Recalculate course completion percentage
-                    total_lessons = Lesson.objects.filter(
-                        module__course=lesson.module.course, is_active=True
-                    ).count()
+                    total_lessons = get_course_stats(lesson.module.course).lesson_count
 
                     completed_lessons = UserProgress.objects.filter(
                         user=user,
@@ -663,12 +680,6 @@ class LessonViewSet(BaseViewSet):
                         course_progress.completed_at = timezone.now()
                         course_progress.save()
 
-                        # Update course completion count
-                        lesson.module.course.completion_count = (
-                            F("completion_count") + 1
-                        )
-                        lesson.module.course.save(update_fields=["completion_count"])
-
                     # Log activity
                     ActivityLog.objects.create(
                         user=user,
@@ -959,23 +970,9 @@ class QuestionViewSet(BaseViewSet):
 
     def _evaluate_response(self, question, response_data):
         """Evaluate user response based on question type"""
-        if question.question_type == "multiple_choice":
-            return response_data.get("selected_option") in question.correct_answers
-        elif question.question_type == "multi_select":
-            selected = set(response_data.get("selected_options", []))
-            correct = set(question.correct_answers)
-            return selected == correct
-        elif question.question_type in ["fill_blank", "short_answer"]:
-            user_answer = response_data.get("answer", "").lower().strip()
-            return any(
-                user_answer == correct.lower().strip()
-                for correct in question.correct_answers
-            )
-        elif question.question_type == "true_false":
-            return response_data.get("answer") in question.correct_answers
-        else:
-            # For complex question types, require manual grading
-            return False
+        return evaluate_response(
+            question.question_type, question.correct_answers, response_data
+        )
 
 
 class UserProgressViewSet(BaseViewSet):
@@ -1028,113 +1025,20 @@ class UserProgressViewSet(BaseViewSet):
 
     @extend_schema(
         tags=["Progress"],
-        responses={200: UserProgressSerializer(many=True)},
+        responses={200: DashboardSerializer},
     )
     @action(detail=False, methods=["get"])
     def dashboard(self, request):
         """Get user's learning dashboard data"""
         try:
-            user = request.user
-
-            # Get recent progress
-            recent_progress = self.get_queryset().filter(
-                user=user,
-                last_accessed__gte=timezone.now() - timezone.timedelta(days=7),
-            )[:10]
-
-            # Get learning path recommendations
-            next_lesson = (
-                self.get_queryset()
-                .filter(user=user, lesson__isnull=False, is_completed=False)
-                .select_related("lesson")
-                .first()
-            )
-
-            # Get review items
-            review_items_count = SpacedRepetition.objects.filter(
-                user=user, is_due=True
-            ).count()
-
-            # Get recent achievements
-            achievements_this_week = UserAchievement.objects.filter(
-                user=user, unlocked_at__gte=timezone.now() - timezone.timedelta(days=7)
-            ).select_related("achievement")
-
-            # Calculate daily goal progress
-            today_analytics = UserAnalytics.objects.filter(
-                user=user, date=timezone.now().date()
-            ).first()
-
-            daily_goal_progress = {
-                "minutes_studied": (
-                    today_analytics.total_time_spent_minutes if today_analytics else 0
-                ),
-                "daily_goal": (
-                    user.course_settings.daily_goal_minutes
-                    if hasattr(user, "course_settings")
-                    else 15
-                ),
-                "percentage": 0,
-            }
-
-            if daily_goal_progress["daily_goal"] > 0:
-                daily_goal_progress["percentage"] = min(
-                    100,
-                    (
-                        daily_goal_progress["minutes_studied"]
-                        / daily_goal_progress["daily_goal"]
-                    )
-                    * 100,
-                )
-
-            dashboard_data = {
-                "user_stats": {
-                    "total_xp": self.get_queryset().aggregate(Sum("xp_earned"))[
-                        "xp_earned__sum"
-                    ]
-                    or 0,
-                    "courses_enrolled": self.get_queryset()
-                    .filter(course__isnull=False)
-                    .values("course")
-                    .distinct()
-                    .count(),
-                    "lessons_completed": self.get_queryset()
-                    .filter(lesson__isnull=False, is_completed=True)
-                    .count(),
-                    "current_streak": self.get_queryset()
-                    .filter(course__isnull=False)
-                    .aggregate(avg_streak=Avg("current_streak"))["avg_streak"]
-                    or 0,
-                },
-                "recent_activity": [
-                    {
-                        "type": "progress",
-                        "description": f"Studied {p.lesson.title if p.lesson else p.course.title}",
-                        "timestamp": p.last_accessed,
-                        "xp_earned": p.xp_earned,
-                    }
-                    for p in recent_progress
-                ],
-                "progress_summary": {
-                    "active_courses": recent_progress.filter(course__isnull=False)
-                    .values("course")
-                    .distinct()
-                    .count(),
-                    "completion_rate": recent_progress.filter(is_completed=True).count()
-                    / max(recent_progress.count(), 1)
-                    * 100,
-                },
-                "upcoming_lessons": (
-                    [next_lesson.lesson] if next_lesson and next_lesson.lesson else []
-                ),
-                "review_items_count": review_items_count,
-                "achievements_this_week": achievements_this_week,
-                "daily_goal_progress": daily_goal_progress,
-                "recommendations": [],  # Would be populated by recommendation engine
-            }
+            snapshot = get_dashboard_snapshot(request.user)
 
-            serializer = DashboardSerializer(dashboard_data)
-            return Response(serializer.data)
+            # Let mobile clients revalidate with If-None-Match
+            etag = quote_etag(snapshot["version"])
+            response = Response(snapshot)
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"
+            return get_conditional_response(request, etag=etag, response=response)
 
         except Exception as e:
             logger.error(f"Error getting dashboard: {str(e)}", exc_info=True)
@@ -1282,44 +1186,23 @@ class AssessmentViewSet(BaseViewSet):
                 status="in_progress",
             )
 
-            with transaction.atomic():
-                # Mark as submitted
+            if str(request.data.get("async", "")).lower() in ("1", "true"):
+                # Timed exams submit in bursts; grade in a worker and push the
+                # result over the learner's notification socket
                 attempt.submitted_at = timezone.now()
                 attempt.status = "submitted"
-
-                # Calculate score and grade
-                attempt.calculate_score()
-
-                # Mark as completed
-                attempt.completed_at = timezone.now()
-                attempt.status = "completed"
-                attempt.completion_time_seconds = int(
-                    (attempt.completed_at - attempt.started_at).total_seconds()
-                )
-                attempt.save()
-
-                # Award XP if passed
-                if attempt.passed:
-                    UserProgress.objects.filter(
-                        user=user, course=assessment.course
-                    ).update(xp_earned=F("xp_earned") + assessment.xp_reward)
-
-                # Log activity
-                ActivityLog.objects.create(
-                    user=user,
-                    activity_type=ActivityLog.ActivityType.ASSESSMENT_COMPLETION,
-                    description=f"Completed assessment: {assessment.title} (Score: {attempt.percentage_score}%)",
-                    ip_address=request.META.get("REMOTE_ADDR"),
+                attempt.save(update_fields=["submitted_at", "status"])
+                transaction.on_commit(
+                    lambda: grade_assessment_attempt.delay(
+                        str(attempt.id), request.META.get("REMOTE_ADDR")
+                    )
                 )
+                serializer = UserAssessmentAttemptSerializer(attempt)
+                return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
-            # Prepare result data
-            result_data = {
-                "attempt": attempt,
-                "detailed_results": self._calculate_detailed_results(attempt),
-                "performance_analysis": self._analyze_performance(attempt),
-                "improvement_suggestions": self._get_improvement_suggestions(attempt),
-                "next_steps": self._get_next_steps(attempt),
-            }
+            result_data = grade_attempt(
+                attempt, ip_address=request.META.get("REMOTE_ADDR")
+            )
 
             serializer = AssessmentResultSerializer(result_data)
             return Response(serializer.data)
@@ -1336,155 +1219,6 @@ class AssessmentViewSet(BaseViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-    def _calculate_detailed_results(self, attempt):
-        """Calculate detailed results breakdown"""
-        responses = attempt.responses.all()
-        return {
-            "total_questions": responses.count(),
-            "correct_answers": responses.filter(is_correct=True).count(),
-            "partially_correct": responses.filter(is_partially_correct=True).count(),
-            "incorrect_answers": responses.filter(is_correct=False).count(),
-            "average_time_per_question": responses.aggregate(Avg("time_taken_seconds"))[
-                "time_taken_seconds__avg"
-            ]
-            or 0,
-            "question_breakdown": [
-                {
-                    "question_id": str(r.question.id),
-                    "question_text": r.question.text[:100],
-                    "correct": r.is_correct,
-                    "score": r.score,
-                    "time_taken": r.time_taken_seconds,
-                }
-                for r in responses
-            ],
-        }
-
-    def _analyze_performance(self, attempt):
-        """Analyze performance and identify patterns"""
-        responses = attempt.responses.select_related("question").all()
-
-        # Group by question type
-        type_performance = {}
-        for response in responses:
-            q_type = response.question.question_type
-            if q_type not in type_performance:
-                type_performance[q_type] = {"correct": 0, "total": 0}
-            type_performance[q_type]["total"] += 1
-            if response.is_correct:
-                type_performance[q_type]["correct"] += 1
-
-        # Calculate accuracy by type
-        for q_type in type_performance:
-            type_performance[q_type]["accuracy"] = (
-                type_performance[q_type]["correct"]
-                / type_performance[q_type]["total"]
-                * 100
-            )
-
-        return {
-            "overall_accuracy": attempt.percentage_score,
-            "time_efficiency": self._calculate_time_efficiency(attempt),
-            "question_type_performance": type_performance,
-            "difficulty_analysis": self._analyze_difficulty_performance(responses),
-            "strengths": self._identify_strengths(type_performance),
-            "weaknesses": self._identify_weaknesses(type_performance),
-        }
-
-    def _calculate_time_efficiency(self, attempt):
-        """Calculate time efficiency metrics"""
-        responses = attempt.responses.all()
-        if not responses:
-            return 0
-
-        total_time = (
-            responses.aggregate(Sum("time_taken_seconds"))["time_taken_seconds__sum"]
-            or 0
-        )
-        recommended_time = (
-            responses.aggregate(Sum("question__recommended_time_seconds"))[
-                "question__recommended_time_seconds__sum"
-            ]
-            or total_time
-        )
-
-        return (
-            min(100, (recommended_time / total_time * 100)) if total_time > 0 else 100
-        )
-
-    def _analyze_difficulty_performance(self, responses):
-        """Analyze performance by question difficulty"""
-        difficulty_stats = {}
-        for response in responses:
-            difficulty = response.question.difficulty
-            if difficulty not in difficulty_stats:
-                difficulty_stats[difficulty] = {"correct": 0, "total": 0}
-            difficulty_stats[difficulty]["total"] += 1
-            if response.is_correct:
-                difficulty_stats[difficulty]["correct"] += 1
-
-        for difficulty in difficulty_stats:
-            difficulty_stats[difficulty]["accuracy"] = (
-                difficulty_stats[difficulty]["correct"]
-                / difficulty_stats[difficulty]["total"]
-                * 100
-            )
-
-        return difficulty_stats
-
-    def _identify_strengths(self, type_performance):
-        """Identify question types where user performed well"""
-        return [
-            q_type
-            for q_type, stats in type_performance.items()
-            if stats["accuracy"] >= 80
-        ]
-
-    def _identify_weaknesses(self, type_performance):
-        """Identify question types where user needs improvement"""
-        return [
-            q_type
-            for q_type, stats in type_performance.items()
-            if stats["accuracy"] < 60
-        ]
-
-    def _get_improvement_suggestions(self, attempt):
-        """Generate improvement suggestions based on performance"""
-        suggestions = []
-
-        if attempt.percentage_score < 70:
-            suggestions.append(
-                "Review the course material before retaking the assessment"
-            )
-
-        if attempt.completion_time_seconds > attempt.assessment.time_limit_minutes * 60:
-            suggestions.append(
-                "Practice time management - focus on answering questions more quickly"
-            )
-
-        # Add more sophisticated suggestions based on performance analysis
-        return suggestions
-
-    def _get_next_steps(self, attempt):
-        """Suggest next steps based on assessment results"""
-        next_steps = []
-
-        if attempt.passed:
-            next_steps.append(
-                "Congratulations! You may proceed to the next lesson/module"
-            )
-            if attempt.assessment.certificate_required:
-                next_steps.append("You are eligible for course certificate")
-        else:
-            next_steps.append(
-                "Review the areas where you scored low and retake the assessment"
-            )
-            next_steps.append(
-                "Consider reviewing related lessons and practice materials"
-            )
-
-        return next_steps
-
 
 class FeedbackViewSet(BaseViewSet):
     """ViewSet for managing feedback"""
@@ -1,7 +1,11 @@
+from collections import defaultdict
+
 from django.contrib import admin
 from django.utils.html import format_html
 from mptt.admin import MPTTModelAdmin
 
+from . import checkin
+from .analytics import rebuild_event_analytics
 from .models import (
     Event,
     EventAnalytics,
@@ -647,14 +651,14 @@ class ParticipantAdmin(admin.ModelAdmin):
     approve_registrations.short_description = "Approve selected registrations"
 
     def check_in_participants(self, request, queryset):
+        scans = defaultdict(list)
+        for event_id, participant_id in queryset.values_list("event_id", "pk"):
+            scans[event_id].append(checkin.Scan(str(participant_id)))
+
         count = 0
-        for participant in queryset:
-            if (
-                participant.attendance_status
-                == Participant.AttendanceStatus.NOT_ATTENDED
-            ):
-                participant.check_in()
-                count += 1
+        for event in Event.objects.filter(pk__in=scans):
+            result = checkin.check_in_participants(event, scans[event.pk])
+            count += len(result.checked_in)
         self.message_user(request, f"{count} participants checked in.")
 
     check_in_participants.short_description = "Check in selected participants"
@@ -880,8 +884,7 @@ class EventAnalyticsAdmin(admin.ModelAdmin):
     actions = ["recalculate_analytics"]
 
     def recalculate_analytics(self, request, queryset):
-        for analytics in queryset:
-            analytics.recalculate()
+        rebuild_event_analytics(queryset.values("event_id"))
         self.message_user(
             request, f"Recalculated analytics for {queryset.count()} events."
         )
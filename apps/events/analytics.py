@@ -0,0 +1,253 @@
+"""
+Set-based event analytics rebuild.
+
+``EventAnalytics.recalculate`` used to run about ten counts and aggregates
+per event, and the maintenance command repeated that pattern for every
+active event. Analytics are now rebuilt for a chunk of events at a time with
+one grouped query per related table (conditional ``Count``s split the
+participants by status) and merged in memory. Rows whose metrics did not
+change are skipped, and rows ending up with the same metrics share a single
+UPDATE; ``bulk_update`` was measured at several milliseconds per row here,
+as it builds a CASE expression for every row and field.
+
+The incremental mode only rebuilds events whose own row or related
+participants, sessions, views, exhibitors or products changed since the
+previous run. Deleted related rows leave no trace to detect, so a periodic
+full rebuild is still needed to pick those up.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Event,
+    EventAnalytics,
+    EventView,
+    Exhibitor,
+    Participant,
+    Product,
+    Session,
+)
+from .tracking import is_sampled
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_CHUNK_SIZE = 5000
+ANALYTICS_BATCH_SIZE = 1000
+
+# When the previous incremental run started
+LAST_REBUILD_CACHE_KEY = "event_analytics_last_rebuild"
+
+REGISTRATION_FIELDS = [
+    "total_registrations",
+    "confirmed_registrations",
+    "cancelled_registrations",
+    "waitlist_registrations",
+    "total_attendance",
+    "attendance_rate",
+    "no_show_rate",
+]
+VIEW_FIELDS = ["total_views", "unique_views"]
+CONTENT_FIELDS = [
+    "total_sessions",
+    "avg_session_rating",
+    "total_exhibitors",
+    "total_products",
+]
+METRIC_FIELDS = REGISTRATION_FIELDS + VIEW_FIELDS + CONTENT_FIELDS
+
+ATTENDED_STATUSES = [
+    Participant.AttendanceStatus.CHECKED_IN,
+    Participant.AttendanceStatus.ATTENDED,
+]
+
+
+def _grouped(queryset, event_ids, **aggregates):
+    """Aggregate ``queryset`` per event, keyed by event id"""
+    return {
+        row.pop("event_id"): row
+        for row in queryset.filter(event_id__in=event_ids)
+        .order_by()
+        .values("event_id")
+        .annotate(**aggregates)
+    }
+
+
+def _percentage(part, whole):
+    return (part / whole) * 100 if whole else 0.0
+
+
+def _unique_views(event_ids):
+    """
+    Distinct visitors per event and local day, summed per event: ingestion
+    counts a visitor's first view of each day as unique
+    """
+    unique_views = defaultdict(int)
+    rows = (
+        EventView.objects.filter(event_id__in=event_ids)
+        .order_by()
+        .values("event_id", day=TruncDate("created_at"))
+        .annotate(
+            users=Count("user", distinct=True),
+            anonymous=Count("ip_address", distinct=True, filter=Q(user__isnull=True)),
+        )
+    )
+    for row in rows:
+        unique_views[row["event_id"]] += row["users"] + row["anonymous"]
+    return unique_views
+
+
+def _collect_metrics(event_ids):
+    """Run one grouped query per related table for a chunk of events"""
+    status = Participant.RegistrationStatus
+    registrations = _grouped(
+        Participant.objects.all(),
+        event_ids,
+        total=Count("id"),
+        confirmed=Count("id", filter=Q(registration_status=status.CONFIRMED)),
+        cancelled=Count("id", filter=Q(registration_status=status.CANCELLED)),
+        waitlist=Count("id", filter=Q(registration_status=status.WAITLIST)),
+        no_show=Count("id", filter=Q(registration_status=status.NO_SHOW)),
+        attended=Count("id", filter=Q(attendance_status__in=ATTENDED_STATUSES)),
+    )
+    views = _grouped(EventView.objects.all(), event_ids, total=Count("id"))
+    for event_id, unique_views in _unique_views(event_ids).items():
+        views[event_id]["unique"] = unique_views
+    sessions = _grouped(
+        Session.objects.all(), event_ids, total=Count("id"), rating=Avg("rating_avg")
+    )
+    exhibitors = _grouped(Exhibitor.objects.all(), event_ids, total=Count("id"))
+    products = _grouped(Product.objects.all(), event_ids, total=Count("id"))
+    return registrations, views, sessions, exhibitors, products
+
+
+def _metric_values(event_id, metrics, sampled, current):
+    """The analytics field values of one event, merged from the grouped rows"""
+    registrations, views, sessions, exhibitors, products = metrics
+    empty = defaultdict(int)
+    registration = registrations.get(event_id, empty)
+    values = {
+        "total_registrations": registration["total"],
+        "confirmed_registrations": registration["confirmed"],
+        "cancelled_registrations": registration["cancelled"],
+        "waitlist_registrations": registration["waitlist"],
+        "total_attendance": registration["attended"],
+        "attendance_rate": _percentage(
+            registration["attended"], registration["confirmed"]
+        ),
+        "no_show_rate": _percentage(registration["no_show"], registration["confirmed"]),
+    }
+
+    # Busy events only keep a sample of their view rows; their ingested view
+    # counters are exact and are left alone
+    if event_id in sampled:
+        values.update({field: current[field] for field in VIEW_FIELDS})
+    else:
+        view = views.get(event_id, empty)
+        values["total_views"] = view["total"]
+        values["unique_views"] = view["unique"]
+
+    session = sessions.get(event_id, empty)
+    values["total_sessions"] = session["total"]
+    values["avg_session_rating"] = session["rating"] or 0.0
+    values["total_exhibitors"] = exhibitors.get(event_id, empty)["total"]
+    values["total_products"] = products.get(event_id, empty)["total"]
+    return values
+
+
+def _rebuild_chunk(event_ids, now):
+    # Events created through bulk_create never got their analytics row
+    missing = Event.objects.filter(
+        pk__in=event_ids, analytics__isnull=True
+    ).values_list("pk", flat=True)
+    EventAnalytics.objects.bulk_create(
+        [EventAnalytics(event_id=event_id) for event_id in missing],
+        batch_size=ANALYTICS_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    metrics = _collect_metrics(event_ids)
+    sampled = {
+        event_id
+        for event_id, view_count in Event.objects.filter(pk__in=event_ids).values_list(
+            "pk", "view_count"
+        )
+        if is_sampled(view_count)
+    }
+    rows = EventAnalytics.objects.filter(event_id__in=event_ids)
+
+    # Group the rows that need the same new values; unchanged rows are not
+    # written at all
+    changed = defaultdict(list)
+    for current in rows.values("pk", "event_id", *METRIC_FIELDS):
+        values = _metric_values(current["event_id"], metrics, sampled, current)
+        if any(values[field] != current[field] for field in METRIC_FIELDS):
+            changed[tuple(values[field] for field in METRIC_FIELDS)].append(
+                current["pk"]
+            )
+
+    with transaction.atomic():
+        for values, pks in changed.items():
+            for start in range(0, len(pks), ANALYTICS_BATCH_SIZE):
+                EventAnalytics.objects.filter(
+                    pk__in=pks[start : start + ANALYTICS_BATCH_SIZE]
+                ).update(**dict(zip(METRIC_FIELDS, values)))
+        return rows.update(last_calculated=now)
+
+
+def events_changed_since(since, events=None):
+    """Ids of events whose analytics inputs changed since ``since``"""
+    events = events if events is not None else Event.objects.all()
+    changed = (
+        Q(updated_at__gte=since)
+        | Q(analytics__isnull=True)
+        | Q(pk__in=Participant.objects.filter(updated_at__gte=since).values("event"))
+        | Q(pk__in=Session.objects.filter(updated_at__gte=since).values("event"))
+        | Q(pk__in=EventView.objects.filter(created_at__gte=since).values("event"))
+        | Q(pk__in=Exhibitor.objects.filter(updated_at__gte=since).values("event"))
+        | Q(pk__in=Product.objects.filter(updated_at__gte=since).values("event"))
+    )
+    return list(events.filter(changed).values_list("pk", flat=True))
+
+
+def rebuild_event_analytics(event_ids=None, since=None):
+    """
+    Recompute the analytics of events with grouped queries.
+
+    Rebuilds every event when ``event_ids`` is None, and only the events
+    changed since ``since`` when it is given. Returns the number of
+    analytics rows written.
+    """
+    events = Event.objects.all()
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+
+    if since is not None:
+        ids = events_changed_since(since, events)
+    else:
+        ids = list(events.values_list("pk", flat=True))
+
+    now = timezone.now()
+    updated = 0
+    for start in range(0, len(ids), ANALYTICS_CHUNK_SIZE):
+        updated += _rebuild_chunk(ids[start : start + ANALYTICS_CHUNK_SIZE], now)
+    return updated
+
+
+def rebuild_changed_event_analytics(event_ids=None):
+    """
+    Rebuild the analytics changed since the previous call.
+
+    Falls back to a full rebuild when there is no previous run on record.
+    """
+    started = timezone.now()
+    since = cache.get(LAST_REBUILD_CACHE_KEY)
+    updated = rebuild_event_analytics(event_ids, since=since)
+    cache.set(LAST_REBUILD_CACHE_KEY, started, None)
+    return updated
@@ -0,0 +1,353 @@
+"""
+Set-based participant check-in.
+
+Checking a participant in used to ``save()`` the participant, which fired
+``participant_post_save`` (re-reading the row, checking badges and
+broadcasting an attendance update), then awarded points with more saves,
+one badge scan at a time.
+
+Scans are now checked in per batch. Each event's roster of participant ids,
+ticket codes and attendance states is loaded once into process memory, so
+scans are validated with dictionary lookups. Scans the roster would reject
+are read again from the database, with one query per batch, since another
+process may have confirmed them or undone a check-in since the roster
+loaded. The remaining scans are checked in with one conditional
+UPDATE per ``CHECK_IN_CHUNK_SIZE`` participants that only matches confirmed
+participants who are not checked in yet, so two gates scanning the same
+badge check it in once. Points, counters and the live attendance update
+are applied after commit by a Celery task, once for the whole batch.
+
+Scanners that were offline upload their scans later with the time each
+badge was scanned, and ``check_in_time`` keeps that time. Rosters are
+reloaded after ``ROSTER_MAX_AGE`` seconds; participants missing from a
+roster are looked up when they are scanned, and the registration engine
+updates the loaded roster as it confirms, promotes or cancels participants.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.common import helpers
+
+from .fanout import event_group, fanout
+from .models import Event, EventAnalytics, Participant
+from .signals import award_level
+
+logger = logging.getLogger(__name__)
+
+CHECK_IN_POINTS = 10
+MAX_LEVEL = 10
+
+CHECK_IN_CHUNK_SIZE = 1000
+CHECK_IN_BATCH_LIMIT = 10000
+ROSTER_MAX_AGE = 60
+
+CHECKED_IN = "checked_in"
+ALREADY_CHECKED_IN = "already_checked_in"
+NOT_CONFIRMED = "not_confirmed"
+NOT_REGISTERED = "not_registered"
+INVALID = "invalid"
+
+
+@dataclass
+class Scan:
+    """A badge scan: a participant id or ticket code, and when it was scanned"""
+
+    code: str
+    scanned_at: Optional[datetime] = None
+
+
+@dataclass
+class RosterEntry:
+    participant_id: str
+    registration_status: str
+    attendance_status: str
+
+
+@dataclass
+class CheckInResult:
+    """Participants checked in by a batch, and why the other scans were not"""
+
+    checked_in: list = field(default_factory=list)
+    rejected: dict = field(default_factory=dict)
+
+
+def _participant_id(code):
+    """The canonical participant id a code spells, or None"""
+    try:
+        return str(Participant._meta.pk.to_python(str(code)))
+    except ValidationError:
+        return None
+
+
+def _normalize(code):
+    """Participant ids in canonical form; ticket codes as they are"""
+    return _participant_id(code) or str(code)
+
+
+class EventRoster:
+    """In-memory lookup of an event's participants by id and ticket code"""
+
+    def __init__(self, event_id):
+        self.event_id = event_id
+        self.loaded_at = time.monotonic()
+        self._entries = {}
+
+    @property
+    def expired(self):
+        return time.monotonic() - self.loaded_at >= ROSTER_MAX_AGE
+
+    def get(self, code):
+        return self._entries.get(code)
+
+    def put(self, pk, ticket_code, registration_status, attendance_status):
+        entry = RosterEntry(str(pk), registration_status, attendance_status)
+        self._entries[entry.participant_id] = entry
+        if ticket_code:
+            self._entries[ticket_code] = entry
+
+    def load(self, codes=None):
+        """Load the event's participants, or only the ones matching ``codes``"""
+        participants = Participant.objects.filter(event_id=self.event_id).order_by()
+        batches = (
+            [None] if codes is None else helpers.chunks(codes, CHECK_IN_CHUNK_SIZE)
+        )
+        for batch in batches:
+            rows = participants
+            if batch is not None:
+                ids = [code for code in batch if _participant_id(code)]
+                rows = rows.filter(Q(pk__in=ids) | Q(ticket_code__in=batch))
+            for row in rows.values_list(
+                "pk", "ticket_code", "registration_status", "attendance_status"
+            ).iterator(chunk_size=CHECK_IN_CHUNK_SIZE):
+                self.put(*row)
+
+
+_rosters = {}
+_rosters_lock = threading.Lock()
+
+
+def get_roster(event_id):
+    """The event's roster, loading it when missing or expired"""
+    with _rosters_lock:
+        roster = _rosters.get(event_id)
+        if roster is None or roster.expired:
+            roster = EventRoster(event_id)
+            roster.load()
+            _rosters[event_id] = roster
+        return roster
+
+
+def forget_roster(event_id=None):
+    """Drop a cached roster, or all of them"""
+    with _rosters_lock:
+        if event_id is None:
+            _rosters.clear()
+        else:
+            _rosters.pop(event_id, None)
+
+
+def update_roster(participant):
+    """Refresh a participant in its event's loaded roster, if there is one"""
+    with _rosters_lock:
+        roster = _rosters.get(participant.event_id)
+    if roster is not None:
+        roster.put(
+            participant.pk,
+            participant.ticket_code,
+            participant.registration_status,
+            participant.attendance_status,
+        )
+
+
+def _check_in_time(times):
+    """The check_in_time of a chunk, as a plain value when scans share it"""
+    if len(times) == 1:
+        return Value(next(iter(times)))
+    return Case(
+        *[When(pk__in=pks, then=Value(when)) for when, pks in times.items()],
+        output_field=DateTimeField(),
+    )
+
+
+def _check_in_rows(event_id, scanned_at):
+    """Check in the participants still waiting to be; returns their ids"""
+    now = timezone.now()
+    checked_in = []
+    with transaction.atomic():
+        for participant_ids in helpers.chunks(scanned_at, CHECK_IN_CHUNK_SIZE):
+            eligible = list(
+                Participant.objects.select_for_update()
+                .filter(
+                    pk__in=participant_ids,
+                    event_id=event_id,
+                    registration_status=Participant.RegistrationStatus.CONFIRMED,
+                    attendance_status=Participant.AttendanceStatus.NOT_ATTENDED,
+                )
+                .values_list("pk", flat=True)
+            )
+            if not eligible:
+                continue
+
+            times = defaultdict(list)
+            for pk in eligible:
+                times[scanned_at[str(pk)]].append(pk)
+            Participant.objects.filter(pk__in=eligible).update(
+                attendance_status=Participant.AttendanceStatus.CHECKED_IN,
+                check_in_time=_check_in_time(times),
+                updated_at=now,
+            )
+            checked_in.extend(str(pk) for pk in eligible)
+
+        if checked_in:
+            from .tasks import apply_check_in_side_effects
+
+            transaction.on_commit(
+                lambda: apply_check_in_side_effects.delay(str(event_id), checked_in)
+            )
+    return checked_in
+
+
+def _outcome(entry):
+    if entry is None:
+        return NOT_REGISTERED
+    if entry.registration_status != Participant.RegistrationStatus.CONFIRMED:
+        return NOT_CONFIRMED
+    if entry.attendance_status != Participant.AttendanceStatus.NOT_ATTENDED:
+        return ALREADY_CHECKED_IN
+    return CHECKED_IN
+
+
+def check_in_participants(event, scans):
+    """
+    Check in a batch of badge scans for an event.
+
+    Scans of participants who are not confirmed, or already checked in, are
+    rejected. A participant scanned several times keeps the earliest scan.
+    """
+    now = timezone.now()
+    roster = get_roster(event.pk)
+    codes = [_normalize(scan.code) for scan in scans]
+    # Codes the roster does not know or would reject; the rejections may be
+    # out of date, so both are read from the database
+    unsure = {code for code in codes if _outcome(roster.get(code)) != CHECKED_IN}
+    if unsure:
+        roster.load(unsure)
+
+    result = CheckInResult()
+    scanned_at = {}
+    for scan, code in zip(scans, codes):
+        entry = roster.get(code)
+        outcome = _outcome(entry)
+        if outcome != CHECKED_IN:
+            result.rejected[scan.code] = outcome
+            continue
+        when = min(scan.scanned_at or now, now)
+        previous = scanned_at.get(entry.participant_id)
+        scanned_at[entry.participant_id] = min(previous or when, when)
+
+    result.checked_in = _check_in_rows(event.pk, scanned_at)
+    for participant_id in result.checked_in:
+        roster.get(participant_id).attendance_status = (
+            Participant.AttendanceStatus.CHECKED_IN
+        )
+
+    # Anything left was checked in, or changed, by someone else meanwhile
+    stale = set(scanned_at) - set(result.checked_in)
+    if stale:
+        roster.load(stale)
+        for scan, code in zip(scans, codes):
+            entry = roster.get(code)
+            if entry is not None and entry.participant_id in stale:
+                outcome = _outcome(entry)
+                result.rejected[scan.code] = (
+                    ALREADY_CHECKED_IN if outcome == CHECKED_IN else outcome
+                )
+    return result
+
+
+def scans_from_payload(payload):
+    """
+    Parse uploaded scans: dicts with a ``participant_id`` or ``ticket_code``
+    and an optional ISO 8601 ``scanned_at``.
+
+    Returns the scans and the codes of the malformed ones.
+    """
+    scans, invalid = [], {}
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        code = item.get("participant_id") or item.get("ticket_code")
+        if not code:
+            continue
+        scanned_at = item.get("scanned_at")
+        if scanned_at:
+            try:
+                scanned_at = parse_datetime(str(scanned_at))
+            except ValueError:
+                scanned_at = None
+            if scanned_at is None:
+                invalid[str(code)] = INVALID
+                continue
+            if timezone.is_naive(scanned_at):
+                scanned_at = timezone.make_aware(scanned_at)
+        scans.append(Scan(str(code), scanned_at or None))
+    return scans, invalid
+
+
+def apply_check_in_side_effects(event_id, participant_ids):
+    """
+    Award check-in points and move the attendance counters for a batch, then
+    reward the participants the points moved up a level.
+    """
+    leveled = []
+    with transaction.atomic():
+        for chunk in helpers.chunks(participant_ids, CHECK_IN_CHUNK_SIZE):
+            # The update below skips participant_post_save, so level ups are
+            # spotted here
+            for pk, points, level in Participant.objects.filter(
+                pk__in=chunk
+            ).values_list("pk", "points", "level"):
+                if min(MAX_LEVEL, (points + CHECK_IN_POINTS) // 100 + 1) > level:
+                    leveled.append(pk)
+            # Levels follow Participant.add_points: one level per 100 points
+            Participant.objects.filter(pk__in=chunk).update(
+                points=F("points") + CHECK_IN_POINTS,
+                level=Least(
+                    Value(MAX_LEVEL), (F("points") + CHECK_IN_POINTS) / 100 + 1
+                ),
+            )
+        Event.objects.filter(pk=event_id).update(
+            attendance_count=F("attendance_count") + len(participant_ids)
+        )
+        EventAnalytics.objects.filter(event_id=event_id).update(
+            total_attendance=F("total_attendance") + len(participant_ids)
+        )
+
+    attendance_count = (
+        Event.objects.filter(pk=event_id)
+        .values_list("attendance_count", flat=True)
+        .first()
+    )
+    fanout.send_sync(
+        event_group(event_id),
+        "attendance_update",
+        {"checked_in": len(participant_ids), "attendance_count": attendance_count},
+    )
+
+    for participant in Participant.objects.filter(pk__in=leveled).select_related(
+        "user", "event"
+    ):
+        award_level(participant)
@@ -4,7 +4,10 @@ import logging
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 
+from .fanout import event_group, fanout, session_group, user_group
 from .models import Event, EventView, Participant, Session
 
 logger = logging.getLogger(__name__)
@@ -22,20 +25,26 @@ class EventConsumer(AsyncWebsocketConsumer):
     - Real-time messaging and notifications
     - Live polls and Q&A
     - Networking connections
+
+    Outgoing updates go through ``fanout``, which delivers them in batches;
+    session-scoped updates only reach clients watching that session.
     """
 
     async def connect(self):
         self.event_id = self.scope["url_route"]["kwargs"]["event_id"]
-        self.event_group_name = f"event_{self.event_id}"
+        self.event_group_name = event_group(self.event_id)
         self.user = self.scope["user"]
+        self.watched_sessions = set()
 
         # Verify user has access to this event
         if not await self.user_can_access_event():
             await self.close()
             return
 
-        # Join event group
+        # Join event group, and the user's own group for direct messages
+        self.user_group_name = user_group(self.event_id, self.user.id)
         await self.channel_layer.group_add(self.event_group_name, self.channel_name)
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
 
         await self.accept()
 
@@ -48,8 +57,15 @@ class EventConsumer(AsyncWebsocketConsumer):
         logger.info(f"User {self.user} connected to event {self.event_id}")
 
     async def disconnect(self, close_code):
-        # Leave event group
+        # Connections refused in connect never joined any group
+        if not hasattr(self, "user_group_name"):
+            return
+
+        # Leave event, user and session groups
         await self.channel_layer.group_discard(self.event_group_name, self.channel_name)
+        await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+        for session_id in list(self.watched_sessions):
+            await self.unwatch_session(session_id)
 
         # Track user disconnection
         await self.track_user_disconnection()
@@ -71,6 +87,12 @@ class EventConsumer(AsyncWebsocketConsumer):
             elif message_type == "leave_session":
                 await self.handle_leave_session(data)
 
+            elif message_type == "watch_session":
+                await self.handle_watch_session(data)
+
+            elif message_type == "unwatch_session":
+                await self.handle_unwatch_session(data)
+
             elif message_type == "update_location":
                 await self.handle_location_update(data)
 
@@ -136,6 +158,12 @@ class EventConsumer(AsyncWebsocketConsumer):
         """Send chat message to client."""
         await self.send_json({"type": "chat_message", "data": event["data"]})
 
+    async def batch_update(self, event):
+        """Send a batch of coalesced updates and poll tallies to client."""
+        await self.send_json(
+            {"type": "batch", "updates": event["updates"], "polls": event["polls"]}
+        )
+
     # Helper methods
     @database_sync_to_async
     def user_can_access_event(self):
@@ -235,16 +263,16 @@ class EventConsumer(AsyncWebsocketConsumer):
 
         success = await self.join_session(session_id)
         if success:
-            # Notify other participants
-            await self.channel_layer.group_send(
-                self.event_group_name,
+            await self.watch_session(session_id)
+
+            # Notify the session's other participants
+            await fanout.send(
+                session_group(session_id),
+                "attendance_update",
                 {
-                    "type": "attendance_update",
-                    "data": {
-                        "session_id": session_id,
-                        "user_id": str(self.user.id),
-                        "action": "joined",
-                    },
+                    "session_id": session_id,
+                    "user_id": str(self.user.id),
+                    "action": "joined",
                 },
             )
 
@@ -257,19 +285,62 @@ class EventConsumer(AsyncWebsocketConsumer):
 
         success = await self.leave_session(session_id)
         if success:
-            # Notify other participants
-            await self.channel_layer.group_send(
-                self.event_group_name,
+            await self.unwatch_session(session_id)
+
+            # Notify the session's other participants
+            await fanout.send(
+                session_group(session_id),
+                "attendance_update",
                 {
-                    "type": "attendance_update",
-                    "data": {
-                        "session_id": session_id,
-                        "user_id": str(self.user.id),
-                        "action": "left",
-                    },
+                    "session_id": session_id,
+                    "user_id": str(self.user.id),
+                    "action": "left",
                 },
             )
 
+    async def handle_watch_session(self, data):
+        """Subscribe to a session's updates without attending it."""
+        session_id = data.get("session_id")
+        if not session_id:
+            await self.send_error("Missing session_id")
+            return
+
+        if not await self.session_in_event(session_id):
+            await self.send_error("Unknown session")
+            return
+
+        await self.watch_session(session_id)
+
+    async def handle_unwatch_session(self, data):
+        """Stop receiving a session's updates."""
+        session_id = data.get("session_id")
+        if session_id:
+            await self.unwatch_session(session_id)
+
+    async def watch_session(self, session_id):
+        if session_id not in self.watched_sessions:
+            self.watched_sessions.add(session_id)
+            await self.channel_layer.group_add(
+                session_group(session_id), self.channel_name
+            )
+
+    async def unwatch_session(self, session_id):
+        if session_id in self.watched_sessions:
+            self.watched_sessions.discard(session_id)
+            await self.channel_layer.group_discard(
+                session_group(session_id), self.channel_name
+            )
+
+    @database_sync_to_async
+    def session_in_event(self, session_id):
+        """Check that a session belongs to this event."""
+        try:
+            return Session.objects.filter(
+                id=session_id, event_id=self.event_id
+            ).exists()
+        except (ValidationError, ValueError):
+            return False
+
     @database_sync_to_async
     def join_session(self, session_id):
         """Mark user as attending a session."""
@@ -334,18 +405,13 @@ class EventConsumer(AsyncWebsocketConsumer):
             await self.send_error("Missing poll_id or response")
             return
 
-        # Process poll response and broadcast results
-        await self.channel_layer.group_send(
-            self.event_group_name,
-            {
-                "type": "poll_update",
-                "data": {
-                    "poll_id": poll_id,
-                    "response": response,
-                    "user_id": str(self.user.id),
-                },
-            },
-        )
+        # Tally the vote; watchers receive the updated tally, not the vote
+        session_id = data.get("session_id")
+        if session_id and not await self.session_in_event(session_id):
+            await self.send_error("Unknown session")
+            return
+        group = session_group(session_id) if session_id else self.event_group_name
+        await fanout.send_vote(group, poll_id, self.user.id, response)
 
     async def handle_qa_question(self, data):
         """Handle Q&A question from user."""
@@ -356,18 +422,20 @@ class EventConsumer(AsyncWebsocketConsumer):
             await self.send_error("Missing question or session_id")
             return
 
-        # Broadcast Q&A question to moderators and speakers
-        await self.channel_layer.group_send(
-            self.event_group_name,
+        if not await self.session_in_event(session_id):
+            await self.send_error("Unknown session")
+            return
+
+        # Broadcast Q&A question to the session's watchers
+        await fanout.send(
+            session_group(session_id),
+            "qa_update",
             {
-                "type": "qa_update",
-                "data": {
-                    "question": question,
-                    "session_id": session_id,
-                    "user_id": str(self.user.id),
-                    "user_name": self.user.get_full_name() or self.user.username,
-                    "timestamp": json.dumps(timezone.now(), default=str),
-                },
+                "question": question,
+                "session_id": session_id,
+                "user_id": str(self.user.id),
+                "user_name": self.user.get_full_name() or self.user.username,
+                "timestamp": timezone.now().isoformat(),
             },
         )
 
@@ -380,19 +448,17 @@ class EventConsumer(AsyncWebsocketConsumer):
             await self.send_error("Missing target_user_id")
             return
 
-        # Send networking request to target user
-        await self.channel_layer.group_send(
-            self.event_group_name,
+        # Send networking request to target user only
+        await fanout.send(
+            user_group(self.event_id, target_user_id),
+            "networking_update",
             {
-                "type": "networking_update",
-                "data": {
-                    "type": "connection_request",
-                    "from_user_id": str(self.user.id),
-                    "from_user_name": self.user.get_full_name() or self.user.username,
-                    "to_user_id": target_user_id,
-                    "message": message,
-                    "timestamp": json.dumps(timezone.now(), default=str),
-                },
+                "type": "connection_request",
+                "from_user_id": str(self.user.id),
+                "from_user_name": self.user.get_full_name() or self.user.username,
+                "to_user_id": target_user_id,
+                "message": message,
+                "timestamp": timezone.now().isoformat(),
             },
         )
 
@@ -408,19 +474,28 @@ class EventConsumer(AsyncWebsocketConsumer):
             await self.send_error("Missing message")
             return
 
-        # Broadcast chat message
-        await self.channel_layer.group_send(
-            self.event_group_name,
+        # Session chat reaches the session's watchers, direct messages the
+        # recipient, and anything else the whole event
+        if chat_type == "session" and target_id:
+            if not await self.session_in_event(target_id):
+                await self.send_error("Unknown session")
+                return
+            group = session_group(target_id)
+        elif chat_type == "networking" and target_id:
+            group = user_group(self.event_id, target_id)
+        else:
+            group = self.event_group_name
+
+        await fanout.send(
+            group,
+            "chat_message",
             {
-                "type": "chat_message",
-                "data": {
-                    "message": message,
-                    "chat_type": chat_type,
-                    "target_id": target_id,
-                    "user_id": str(self.user.id),
-                    "user_name": self.user.get_full_name() or self.user.username,
-                    "timestamp": json.dumps(timezone.now(), default=str),
-                },
+                "message": message,
+                "chat_type": chat_type,
+                "target_id": target_id,
+                "user_id": str(self.user.id),
+                "user_name": self.user.get_full_name() or self.user.username,
+                "timestamp": timezone.now().isoformat(),
             },
         )
 
@@ -439,7 +514,7 @@ class SessionConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         self.session_id = self.scope["url_route"]["kwargs"]["session_id"]
-        self.session_group_name = f"session_{self.session_id}"
+        self.session_group_name = session_group(self.session_id)
         self.user = self.scope["user"]
 
         # Verify user has access to this session
@@ -511,6 +586,12 @@ class SessionConsumer(AsyncWebsocketConsumer):
         """Send JSON data to WebSocket."""
         await self.send(text_data=json.dumps(data))
 
+    async def batch_update(self, event):
+        """Send a batch of coalesced updates and poll tallies to client."""
+        await self.send_json(
+            {"type": "batch", "updates": event["updates"], "polls": event["polls"]}
+        )
+
 
 class NetworkingConsumer(AsyncWebsocketConsumer):
     """
@@ -0,0 +1,183 @@
+"""
+Denormalized event counters.
+
+Listing events used to join participants, sessions and session ratings and
+group the whole result to count them per event. ``Event`` carries those
+counters instead: ``registration_count`` (confirmed participants),
+``attendance_count`` (checked in participants), ``session_count`` and
+``rating_count``/``rating_sum``/``rating_avg`` over the ratings of all of its
+sessions. The signals in ``signals.py`` and the check-in service keep them
+current and ``rebuild_event_counters`` recomputes them exactly.
+
+Sessions keep the same running rating aggregates plus a per-star histogram.
+A rating change moves them by ``F()`` deltas instead of re-reading every
+rating of the session, and ``rating_avg`` is derived from the sum and count
+in the same UPDATE so it cannot drift from them.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Count,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Event, Participant, Session, SessionRating
+
+logger = logging.getLogger(__name__)
+
+# Session histogram counter per star rating
+RATING_BUCKETS = {stars: f"rating_{stars}_count" for stars in range(1, 6)}
+
+
+def _per_event(queryset, aggregate, event_field="event", default=0):
+    """Correlated subquery aggregating ``queryset`` for the outer event"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{event_field: OuterRef("pk")})
+            .order_by()
+            .values(event_field)
+            .annotate(value=aggregate)
+            .values("value")[:1]
+        ),
+        Value(default),
+        output_field=aggregate.output_field,
+    )
+
+
+def _average(rating_sum, rating_count):
+    return Coalesce(
+        Cast(rating_sum, FloatField()) / NullIf(rating_count, 0),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def _rating_deltas(sum_delta, count_delta):
+    """Updates moving rating_sum/rating_count, deriving rating_avg from them"""
+    rating_sum = F("rating_sum") + sum_delta
+    rating_count = F("rating_count") + count_delta
+    return {
+        "rating_sum": rating_sum,
+        "rating_count": rating_count,
+        "rating_avg": _average(rating_sum, rating_count),
+    }
+
+
+def apply_rating_change(session_id, added=None, removed=None):
+    """
+    Move the rating aggregates of a session and its event by one change.
+
+    ``added`` is the new rating value and ``removed`` the old one; either is
+    None when a rating was created or deleted.
+    """
+    if added == removed:
+        return
+
+    sum_delta = (added or 0) - (removed or 0)
+    count_delta = int(added is not None) - int(removed is not None)
+
+    session_updates = _rating_deltas(sum_delta, count_delta)
+    if added is not None:
+        bucket = RATING_BUCKETS[added]
+        session_updates[bucket] = F(bucket) + 1
+    if removed is not None:
+        bucket = RATING_BUCKETS[removed]
+        session_updates[bucket] = F(bucket) - 1
+
+    with transaction.atomic():
+        Session.objects.filter(pk=session_id).update(**session_updates)
+        Event.objects.filter(sessions__pk=session_id).update(
+            **_rating_deltas(sum_delta, count_delta)
+        )
+
+
+def rebuild_event_counters(event_ids=None):
+    """
+    Recompute the denormalized counters of events exactly.
+
+    Runs as one set-based UPDATE over every event when ``event_ids`` is
+    None. Returns the number of events updated.
+    """
+    events = Event.objects.all()
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+
+    return events.update(
+        registration_count=_per_event(
+            Participant.objects.filter(
+                registration_status=Participant.RegistrationStatus.CONFIRMED
+            ),
+            Count("id"),
+        ),
+        attendance_count=_per_event(
+            Participant.objects.filter(
+                attendance_status__in=[
+                    Participant.AttendanceStatus.CHECKED_IN,
+                    Participant.AttendanceStatus.ATTENDED,
+                ]
+            ),
+            Count("id"),
+        ),
+        session_count=_per_event(Session.objects.all(), Count("id")),
+        rating_count=_per_event(
+            SessionRating.objects.all(), Count("id"), event_field="session__event"
+        ),
+        rating_sum=_per_event(
+            SessionRating.objects.all(),
+            Sum("rating", output_field=IntegerField()),
+            event_field="session__event",
+        ),
+        rating_avg=_per_event(
+            SessionRating.objects.all(),
+            Avg("rating", output_field=FloatField()),
+            event_field="session__event",
+            default=0.0,
+        ),
+    )
+
+
+def rebuild_rating_counters(session_ids=None):
+    """
+    Recompute the session rating aggregates and participant rating counters.
+
+    Runs as one set-based UPDATE per table; returns the number of sessions
+    updated.
+    """
+    sessions = Session.objects.all()
+    participants = Participant.objects.all()
+    if session_ids is not None:
+        sessions = sessions.filter(pk__in=session_ids)
+        participants = participants.filter(session_ratings__session__in=session_ids)
+
+    ratings = SessionRating.objects.all()
+    participants.update(
+        ratings_given=_per_event(ratings, Count("id"), event_field="participant")
+    )
+    return sessions.update(
+        rating_count=_per_event(ratings, Count("id"), event_field="session"),
+        rating_sum=_per_event(
+            ratings, Sum("rating", output_field=IntegerField()), event_field="session"
+        ),
+        rating_avg=_per_event(
+            ratings,
+            Avg("rating", output_field=FloatField()),
+            event_field="session",
+            default=0.0,
+        ),
+        **{
+            bucket: _per_event(
+                ratings.filter(rating=stars), Count("id"), event_field="session"
+            )
+            for stars, bucket in RATING_BUCKETS.items()
+        },
+    )
@@ -0,0 +1,258 @@
+"""
+Batched WebSocket fan-out for live events.
+
+``EventConsumer`` used to ``group_send`` every poll response, Q&A question,
+networking request and chat message to the whole ``event_{id}`` group, and
+every participant save broadcast an attendance update the same way. With
+thousands of attendees connected, each of those became one channel layer
+message per connection.
+
+Updates are now queued per group and sent as a single ``batch_update``
+message every ``FANOUT_INTERVAL`` seconds, or as soon as ``FANOUT_MAX_BATCH``
+updates are waiting. Poll votes are not forwarded at all: they are tallied
+here, one vote per user, and each batch carries the current tally of the
+polls that changed. Session-scoped updates go to the ``session_{id}`` group
+that clients join while watching a session, and direct messages to the
+recipient's own group instead of the whole event.
+
+Tallies live in the cache, so every ASGI worker counts into and broadcasts
+the same totals whichever worker the voters are connected to. Each user's
+vote has its own key and each response an atomic counter, and a tally
+expires ``FANOUT_POLL_TIMEOUT`` seconds after its poll's first vote, so
+finished polls do not pile up.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds updates wait to be coalesced into one channel layer message
+FANOUT_INTERVAL = 0.1
+FANOUT_MAX_BATCH = 200
+# Poll tallies expire from the cache this long after the poll's first vote
+FANOUT_POLL_TIMEOUT = 24 * 60 * 60
+
+
+def event_group(event_id):
+    return f"event_{event_id}"
+
+
+def session_group(session_id):
+    return f"session_{session_id}"
+
+
+def user_group(event_id, user_id):
+    return f"event_{event_id}_user_{user_id}"
+
+
+def _response_key(response):
+    """Hashable tally key of a poll response"""
+    if isinstance(response, str):
+        return response
+    return json.dumps(response, sort_keys=True)
+
+
+class PollTally:
+    """
+    Tally of a poll kept in the cache, counting each user's latest vote once
+
+    Every response gets a numbered slot on its first vote, so the tally can
+    be read back without listing keys.
+    """
+
+    def __init__(self, group, poll_id, timeout=FANOUT_POLL_TIMEOUT):
+        self.key = f"poll_tally:{group}:{poll_id}"
+        self.timeout = timeout
+
+    def _slot(self, response_key):
+        """The slot counting a response, claimed on its first vote"""
+        digest = hashlib.sha1(response_key.encode()).hexdigest()
+        slot_key = f"{self.key}:slot:{digest}"
+        slot = cache.get(slot_key)
+        if slot is None:
+            slots_key = f"{self.key}:slots"
+            cache.add(slots_key, 0, self.timeout)
+            claimed = cache.incr(slots_key)
+            if cache.add(slot_key, claimed, self.timeout):
+                cache.set(f"{self.key}:response:{claimed}", response_key, self.timeout)
+                return claimed
+            # Another worker claimed a slot for the response first
+            slot = cache.get(slot_key)
+        return slot
+
+    def _count(self, response_key, delta):
+        count_key = f"{self.key}:count:{self._slot(response_key)}"
+        cache.add(count_key, 0, self.timeout)
+        cache.incr(count_key, delta)
+
+    def vote(self, user_id, response):
+        """Record a vote; False when it does not change the tally"""
+        key = _response_key(response)
+        vote_key = f"{self.key}:vote:{user_id}"
+        previous = None
+        if not cache.add(vote_key, key, self.timeout):
+            previous = cache.get(vote_key)
+            if previous == key:
+                return False
+            cache.set(vote_key, key, self.timeout)
+        self._count(key, 1)
+        if previous is not None:
+            self._count(previous, -1)
+        return True
+
+    def snapshot(self):
+        """{"counts": {response: votes}, "total": voters}, None before any vote"""
+        slots = range(1, (cache.get(f"{self.key}:slots") or 0) + 1)
+        responses = cache.get_many([f"{self.key}:response:{slot}" for slot in slots])
+        if not responses:
+            return None
+        counts = cache.get_many([f"{self.key}:count:{slot}" for slot in slots])
+        tally = {}
+        for slot in slots:
+            response = responses.get(f"{self.key}:response:{slot}")
+            count = counts.get(f"{self.key}:count:{slot}", 0)
+            if response is not None and count > 0:
+                tally[response] = count
+        return {"counts": tally, "total": sum(tally.values())}
+
+
+class FanOut:
+    """Coalesces live updates per channel layer group"""
+
+    def __init__(
+        self,
+        interval=FANOUT_INTERVAL,
+        max_batch=FANOUT_MAX_BATCH,
+        poll_timeout=FANOUT_POLL_TIMEOUT,
+    ):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.poll_timeout = poll_timeout
+        self._lock = threading.Lock()
+        self._updates = defaultdict(list)
+        self._changed_polls = defaultdict(set)
+        self._scheduled = set()
+        self._tasks = set()
+        # Channel layer messages sent, for monitoring and the load tests
+        self.sent = 0
+
+    def _pending(self, group):
+        """Whether a new flush is needed: (schedule one, flush right away)"""
+        schedule = group not in self._scheduled
+        self._scheduled.add(group)
+        waiting = len(self._updates[group]) + len(self._changed_polls[group])
+        return schedule, waiting >= self.max_batch
+
+    def add(self, group, kind, data):
+        """Queue an update for a group"""
+        with self._lock:
+            self._updates[group].append({"type": kind, "data": data})
+            return self._pending(group)
+
+    def vote(self, group, poll_id, user_id, response):
+        """Tally a poll vote; only the tally is broadcast"""
+        tally = PollTally(group, poll_id, self.poll_timeout)
+        if not tally.vote(str(user_id), response):
+            return False, False
+        with self._lock:
+            self._changed_polls[group].add(str(poll_id))
+            return self._pending(group)
+
+    def tally(self, group, poll_id):
+        return PollTally(group, poll_id, self.poll_timeout).snapshot()
+
+    def drain(self, group):
+        """Take a group's queued updates as one ``batch_update`` message"""
+        with self._lock:
+            self._scheduled.discard(group)
+            updates = self._updates.pop(group, [])
+            changed = self._changed_polls.pop(group, set())
+        # The shared tally, which may include votes through other workers
+        polls = [
+            {"poll_id": poll_id, **(self.tally(group, poll_id) or {})}
+            for poll_id in sorted(changed)
+        ]
+        if not updates and not polls:
+            return None
+        return {"type": "batch_update", "updates": updates, "polls": polls}
+
+    def clear(self, group=None):
+        """Forget queued updates, e.g. once an event is over"""
+        with self._lock:
+            for state in (self._updates, self._changed_polls):
+                if group is None:
+                    state.clear()
+                else:
+                    state.pop(group, None)
+            if group is None:
+                self._scheduled.clear()
+            else:
+                self._scheduled.discard(group)
+
+    async def flush(self, group):
+        """Send a group's queued updates now"""
+        message = await sync_to_async(self.drain)(group)
+        if message is None:
+            return False
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return False
+        try:
+            await channel_layer.group_send(group, message)
+        except Exception as e:
+            logger.error(f"Error flushing updates to {group}: {str(e)}", exc_info=True)
+            return False
+        self.sent += 1
+        return True
+
+    async def flush_all(self):
+        with self._lock:
+            groups = set(self._updates) | set(self._changed_polls)
+        for group in groups:
+            await self.flush(group)
+
+    async def _flush_later(self, group):
+        await asyncio.sleep(self.interval)
+        await self.flush(group)
+
+    async def _dispatch(self, group, pending):
+        schedule, full = pending
+        if full:
+            await self.flush(group)
+        elif schedule:
+            task = asyncio.create_task(self._flush_later(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def send(self, group, kind, data):
+        """Queue an update from async code, e.g. a consumer"""
+        await self._dispatch(group, self.add(group, kind, data))
+
+    async def send_vote(self, group, poll_id, user_id, response):
+        pending = await sync_to_async(self.vote)(group, poll_id, user_id, response)
+        await self._dispatch(group, pending)
+
+    def send_sync(self, group, kind, data):
+        """Queue an update from sync code, e.g. a signal handler"""
+        schedule, full = self.add(group, kind, data)
+        if full:
+            async_to_sync(self.flush)(group)
+        elif schedule:
+            timer = threading.Timer(self.interval, self._flush_sync, [group])
+            timer.daemon = True
+            timer.start()
+
+    def _flush_sync(self, group):
+        async_to_sync(self.flush)(group)
+
+
+fanout = FanOut()
@@ -0,0 +1,115 @@
+"""
+Denormalized category and tag filter indexes on Event.
+
+Filtering events by category or tag joined ``EventCategoryRelation`` or
+``EventTagRelation`` and needed ``DISTINCT``, and the events of a category
+and its subcategories also went through the category tree first. Next to
+the list annotations these became multi-way joins.
+
+Each event now stores the ids it is filed under as delimited text, e.g.
+``",3,7,"``:
+
+* ``category_index``: its categories.
+* ``category_tree_index``: its categories and all of their ancestors, read
+  from the MPTT ``lft``/``rght`` ranges, so an event filed under "Python"
+  also matches "Programming".
+* ``tag_index``: its tags.
+
+A category or tag filter is then a ``LIKE`` predicate on the event row, OR-ed
+for several ids, without joins or ``DISTINCT``. The relation signals keep the
+indexes in step, and a category moving in the tree re-indexes its events.
+Relations written with ``bulk_create`` skip the signals, so
+``rebuild_filter_indexes`` recomputes every event.
+"""
+
+import logging
+from collections import defaultdict
+
+from apps.common import helpers
+
+from .models import Event, EventCategory, EventCategoryRelation, EventTagRelation
+
+logger = logging.getLogger(__name__)
+
+INDEX_BATCH_SIZE = 500
+INDEX_FIELDS = ["category_index", "category_tree_index", "tag_index"]
+
+
+def _tokens(ids):
+    if not ids:
+        return ""
+    return "," + ",".join(str(pk) for pk in sorted(ids)) + ","
+
+
+def _ancestors(category_ids):
+    """Each category's ancestors, itself included, from the MPTT ranges"""
+    nodes = list(
+        EventCategory.objects.filter(pk__in=category_ids).values_list(
+            "pk", "tree_id", "lft", "rght"
+        )
+    )
+    trees = defaultdict(list)
+    for node in EventCategory.objects.filter(
+        tree_id__in={tree_id for _, tree_id, _, _ in nodes}
+    ).values_list("pk", "tree_id", "lft", "rght"):
+        trees[node[1]].append(node)
+
+    return {
+        pk: [
+            other
+            for other, _, other_lft, other_rght in trees[tree_id]
+            if other_lft <= lft and other_rght >= rght
+        ]
+        for pk, tree_id, lft, rght in nodes
+    }
+
+
+def index_events(event_ids):
+    """Recompute the filter indexes of the given events"""
+    indexed = 0
+    for batch in helpers.chunks(event_ids, INDEX_BATCH_SIZE):
+        categories, tags = defaultdict(set), defaultdict(set)
+        for event_id, category_id in EventCategoryRelation.objects.filter(
+            event_id__in=batch
+        ).values_list("event_id", "category_id"):
+            categories[event_id].add(category_id)
+        for event_id, tag_id in EventTagRelation.objects.filter(
+            event_id__in=batch
+        ).values_list("event_id", "tag_id"):
+            tags[event_id].add(tag_id)
+        ancestors = _ancestors(set().union(*categories.values()))
+
+        events = []
+        for event_id in Event.objects.filter(pk__in=batch).values_list("pk", flat=True):
+            filed_under = categories[event_id]
+            tree = {
+                ancestor
+                for category_id in filed_under
+                for ancestor in ancestors.get(category_id, [category_id])
+            }
+            events.append(
+                Event(
+                    pk=event_id,
+                    category_index=_tokens(filed_under),
+                    category_tree_index=_tokens(tree),
+                    tag_index=_tokens(tags[event_id]),
+                )
+            )
+        Event.objects.bulk_update(events, INDEX_FIELDS)
+        indexed += len(events)
+    return indexed
+
+
+def index_category_events(category):
+    """Re-index the events of a category and its subcategories"""
+    descendants = category.get_descendants(include_self=True).values("pk")
+    return index_events(
+        EventCategoryRelation.objects.filter(category__in=descendants)
+        .values_list("event_id", flat=True)
+        .distinct()
+    )
+
+
+def rebuild_filter_indexes():
+    """Recompute every event's filter indexes; returns the number indexed"""
+    return index_events(Event.objects.values_list("pk", flat=True))
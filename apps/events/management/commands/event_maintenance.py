@@ -1,18 +1,26 @@
 import logging
+import time
 from datetime import timedelta
 
 from django.core.management.base import BaseCommand
-from django.db import models, transaction
+from django.db import transaction
 from django.utils import timezone
 
+from apps.events.analytics import (
+    rebuild_changed_event_analytics,
+    rebuild_event_analytics,
+)
+from apps.events.counters import rebuild_event_counters, rebuild_rating_counters
+from apps.events.filter_index import rebuild_filter_indexes
 from apps.events.models import (
     Event,
-    EventAnalytics,
     EventTag,
     EventView,
     Participant,
     Session,
 )
+from apps.events.recommendations import refresh_changed_recommendations
+from apps.events.trending import compute_event_scores, refresh_trending_scores
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +39,31 @@ class Command(BaseCommand):
             action="store_true",
             help="Update event analytics data",
         )
+        parser.add_argument(
+            "--full-analytics",
+            action="store_true",
+            help="Rebuild analytics for every event, not only the changed ones",
+        )
         parser.add_argument(
             "--update-trending",
             action="store_true",
             help="Update trending tags and events",
         )
+        parser.add_argument(
+            "--update-recommendations",
+            action="store_true",
+            help="Refresh the event recommendations",
+        )
+        parser.add_argument(
+            "--full-recommendations",
+            action="store_true",
+            help="Rebuild every recommendation, not only the changed ones",
+        )
+        parser.add_argument(
+            "--rebuild-counters",
+            action="store_true",
+            help="Recompute the denormalized event counters and filter indexes",
+        )
         parser.add_argument(
             "--archive-old-events",
             action="store_true",
@@ -55,6 +83,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.dry_run = options["dry_run"]
+        self.full_analytics = options["full_analytics"]
+        self.full_recommendations = options["full_recommendations"]
 
         if self.dry_run:
             self.stdout.write(
@@ -70,6 +100,12 @@ class Command(BaseCommand):
         if options["update_trending"]:
             self.update_trending_data()
 
+        if options["update_recommendations"]:
+            self.update_recommendations()
+
+        if options["rebuild_counters"]:
+            self.rebuild_counters()
+
         if options["archive_old_events"]:
             self.archive_old_events(options["days"])
 
@@ -79,6 +115,8 @@ class Command(BaseCommand):
                 options["cleanup_expired"],
                 options["update_analytics"],
                 options["update_trending"],
+                options["update_recommendations"],
+                options["rebuild_counters"],
                 options["archive_old_events"],
             ]
         ):
@@ -86,6 +124,8 @@ class Command(BaseCommand):
             self.cleanup_expired_events()
             self.update_event_analytics()
             self.update_trending_data()
+            self.update_recommendations()
+            self.rebuild_counters()
             self.archive_old_events(options["days"])
 
         self.stdout.write(
@@ -138,89 +178,69 @@ class Command(BaseCommand):
 
         active_events = Event.objects.filter(
             status__in=["published", "live", "completed"]
-        )
-
-        updated_count = 0
-        for event in active_events:
-            if not self.dry_run:
-                analytics, created = EventAnalytics.objects.get_or_create(event=event)
+        ).values("pk")
 
-                # Update registration metrics
-                participants = event.participants.all()
-                analytics.total_registrations = participants.count()
-                analytics.confirmed_attendees = participants.filter(
-                    registration_status="confirmed"
-                ).count()
-                analytics.no_shows = participants.filter(
-                    attendance_status="no_show"
-                ).count()
-
-                # Update view metrics
-                analytics.total_views = event.views.count()
-                analytics.unique_views = event.views.values("user").distinct().count()
-
-                # Calculate engagement metrics
-                if analytics.total_views > 0:
-                    analytics.engagement_rate = (
-                        analytics.total_registrations / analytics.total_views
-                    ) * 100
+        if self.dry_run:
+            self.stdout.write(
+                f"Would update analytics for {active_events.count()} events"
+            )
+            return
 
-                analytics.save()
-                updated_count += 1
+        started = time.monotonic()
+        if self.full_analytics:
+            updated_count = rebuild_event_analytics(active_events)
+        else:
+            updated_count = rebuild_changed_event_analytics(active_events)
 
-        self.stdout.write(f"Updated analytics for {updated_count} events")
+        self.stdout.write(
+            f"Updated analytics for {updated_count} events "
+            f"in {time.monotonic() - started:.2f}s"
+        )
 
     def update_trending_data(self):
         """Update trending tags and events."""
         self.stdout.write("Updating trending data...")
 
-        # Update trending tags based on recent usage
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-
-        if not self.dry_run:
-            # Reset all trending flags
-            EventTag.objects.update(is_trending=False)
-
-            # Find tags used in recent events
-            trending_tags = (
-                EventTag.objects.filter(
-                    events__created_at__gte=thirty_days_ago,
-                    events__status__in=["published", "live"],
-                )
-                .annotate(recent_usage=models.Count("events"))
-                .filter(recent_usage__gte=3)  # Used in at least 3 recent events
-                .order_by("-recent_usage")[:10]
+        if self.dry_run:
+            self.stdout.write(
+                f"Would score {len(compute_event_scores())} events with recent activity"
             )
+            return
 
-            # Mark as trending
-            trending_tag_ids = list(trending_tags.values_list("id", flat=True))
-            EventTag.objects.filter(id__in=trending_tag_ids).update(is_trending=True)
-
-            self.stdout.write(f"Updated {len(trending_tag_ids)} trending tags")
-
-        # Update event trending scores
-        recent_events = Event.objects.filter(
-            created_at__gte=thirty_days_ago, status__in=["published", "live"]
+        started = time.monotonic()
+        event_count, tag_count = refresh_trending_scores()
+        self.stdout.write(
+            f"Refreshed trending scores for {event_count} events and {tag_count} "
+            f"tags in {time.monotonic() - started:.2f}s"
         )
 
-        trending_count = 0
-        for event in recent_events:
-            if not self.dry_run:
-                # Calculate trending score based on various factors
-                views = event.views.count()
-                registrations = event.participants.count()
-                favorites = event.favorites.count()
+    def update_recommendations(self):
+        """Refresh the precomputed event recommendations."""
+        self.stdout.write("Updating event recommendations...")
 
-                # Simple trending score calculation
-                (views * 0.1) + (registrations * 2) + (favorites * 5)
+        if self.dry_run:
+            return
 
-                # Update the event's trending score (if field exists)
-                # Note: This would require adding a trending_score field to Event model
-                pass
+        started = time.monotonic()
+        event_count, user_count = refresh_changed_recommendations(
+            full=self.full_recommendations
+        )
+        self.stdout.write(
+            f"Ranked similar events for {event_count} events and recommendations "
+            f"for {user_count} users in {time.monotonic() - started:.2f}s"
+        )
 
-            trending_count += 1
+    def rebuild_counters(self):
+        """Recompute the event counters, rating aggregates and filter indexes."""
+        self.stdout.write("Rebuilding event counters...")
 
-        self.stdout.write(f"Processed trending data for {trending_count} events")
+        if not self.dry_run:
+            updated = rebuild_event_counters()
+            self.stdout.write(f"Rebuilt counters for {updated} events")
+            updated = rebuild_rating_counters()
+            self.stdout.write(f"Rebuilt rating aggregates for {updated} sessions")
+            updated = rebuild_filter_indexes()
+            self.stdout.write(f"Rebuilt filter indexes for {updated} events")
 
     def archive_old_events(self, days):
         """Archive events older than specified days."""
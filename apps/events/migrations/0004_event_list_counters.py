@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:12
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_event_counters(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    Session = apps.get_model("events", "Session")
+    SessionRating = apps.get_model("events", "SessionRating")
+
+    sessions = (
+        Session.objects.filter(event=OuterRef("pk"))
+        .order_by()
+        .values("event")
+        .annotate(value=Count("id"))
+        .values("value")[:1]
+    )
+    ratings = (
+        SessionRating.objects.filter(session__event=OuterRef("pk"))
+        .order_by()
+        .values("session__event")
+    )
+    Event.objects.update(
+        session_count=Coalesce(Subquery(sessions), Value(0)),
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(value=Count("id")).values("value")[:1]),
+            Value(0),
+        ),
+        rating_avg=Coalesce(
+            Subquery(
+                ratings.annotate(value=Avg("rating", output_field=FloatField())).values(
+                    "value"
+                )[:1]
+            ),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_alter_eventfavorite_options_alter_eventview_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="rating_avg",
+            field=models.FloatField(
+                default=0.0, editable=False, verbose_name="Average Rating"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="rating_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Rating Count"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="session_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Session Count"
+            ),
+        ),
+        migrations.RunPython(backfill_event_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:28
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_total_views(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    EventAnalytics = apps.get_model("events", "EventAnalytics")
+    EventAnalytics.objects.update(
+        total_views=Subquery(
+            Event.objects.filter(pk=OuterRef("event_id")).values("view_count")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0004_event_list_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="eventanalytics",
+            name="total_views",
+            field=models.PositiveIntegerField(default=0, verbose_name="Total Views"),
+        ),
+        migrations.AddField(
+            model_name="eventanalytics",
+            name="unique_views",
+            field=models.PositiveIntegerField(default=0, verbose_name="Unique Views"),
+        ),
+        migrations.RunPython(backfill_total_views, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0005_eventanalytics_view_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="trending_score",
+            field=models.FloatField(
+                default=0.0, editable=False, verbose_name="Trending Score"
+            ),
+        ),
+        migrations.AddField(
+            model_name="eventtag",
+            name="trending_score",
+            field=models.FloatField(
+                default=0.0, editable=False, verbose_name="Trending Score"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["-trending_score"], name="events_even_trendin_ba659a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="eventtag",
+            index=models.Index(
+                fields=["-trending_score"], name="events_even_trendin_71b040_idx"
+            ),
+        ),
+    ]
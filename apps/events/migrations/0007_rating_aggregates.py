@@ -0,0 +1,108 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:04
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    Participant = apps.get_model("events", "Participant")
+    Session = apps.get_model("events", "Session")
+    SessionRating = apps.get_model("events", "SessionRating")
+
+    def per_row(ratings, field, aggregate):
+        return Coalesce(
+            Subquery(
+                ratings.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(value=aggregate)
+                .values("value")[:1]
+            ),
+            Value(0),
+            output_field=IntegerField(),
+        )
+
+    ratings = SessionRating.objects.all()
+    rating_sum = Sum("rating", output_field=IntegerField())
+    Event.objects.update(rating_sum=per_row(ratings, "session__event", rating_sum))
+    Session.objects.update(
+        rating_sum=per_row(ratings, "session", rating_sum),
+        **{
+            f"rating_{stars}_count": per_row(
+                ratings.filter(rating=stars), "session", Count("id")
+            )
+            for stars in range(1, 6)
+        },
+    )
+    Participant.objects.update(
+        ratings_given=per_row(ratings, "participant", Count("id"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0006_trending_scores"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Rating Sum"
+            ),
+        ),
+        migrations.AddField(
+            model_name="participant",
+            name="ratings_given",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Ratings Given"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="1 Star Ratings"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="2 Star Ratings"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="3 Star Ratings"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="4 Star Ratings"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="5 Star Ratings"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Rating Sum"
+            ),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0007_rating_aggregates"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Score")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Event Recommendation",
+                "verbose_name_plural": "Event Recommendations",
+            },
+        ),
+        migrations.CreateModel(
+            name="EventSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Score")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Event Similarity",
+                "verbose_name_plural": "Event Similarities",
+            },
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="interaction_norm",
+            field=models.FloatField(
+                default=0.0, editable=False, verbose_name="Interaction Norm"
+            ),
+        ),
+        migrations.AddField(
+            model_name="eventrecommendation",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="recommendations",
+                to="events.event",
+                verbose_name="Event",
+            ),
+        ),
+        migrations.AddField(
+            model_name="eventrecommendation",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="event_recommendations",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="User",
+            ),
+        ),
+        migrations.AddField(
+            model_name="eventsimilarity",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="similar_events",
+                to="events.event",
+                verbose_name="Event",
+            ),
+        ),
+        migrations.AddField(
+            model_name="eventsimilarity",
+            name="similar_event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="events.event",
+                verbose_name="Similar Event",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="eventrecommendation",
+            index=models.Index(
+                fields=["user", "-score"], name="events_even_user_id_b6b67d_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="eventrecommendation",
+            unique_together={("user", "event")},
+        ),
+        migrations.AddIndex(
+            model_name="eventsimilarity",
+            index=models.Index(
+                fields=["event", "-score"], name="events_even_event_i_a6b7cc_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="eventsimilarity",
+            unique_together={("event", "similar_event")},
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:55
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_filter_indexes(apps, schema_editor):
+    Event = apps.get_model("events", "Event")
+    EventCategory = apps.get_model("events", "EventCategory")
+    EventCategoryRelation = apps.get_model("events", "EventCategoryRelation")
+    EventTagRelation = apps.get_model("events", "EventTagRelation")
+
+    def tokens(ids):
+        return "," + ",".join(str(pk) for pk in sorted(ids)) + "," if ids else ""
+
+    nodes = list(EventCategory.objects.values_list("pk", "tree_id", "lft", "rght"))
+    ancestors = {
+        pk: [
+            other
+            for other, other_tree, other_lft, other_rght in nodes
+            if other_tree == tree_id and other_lft <= lft and other_rght >= rght
+        ]
+        for pk, tree_id, lft, rght in nodes
+    }
+
+    categories, tags = defaultdict(set), defaultdict(set)
+    for event_id, category_id in EventCategoryRelation.objects.values_list(
+        "event_id", "category_id"
+    ):
+        categories[event_id].add(category_id)
+    for event_id, tag_id in EventTagRelation.objects.values_list("event_id", "tag_id"):
+        tags[event_id].add(tag_id)
+
+    events = [
+        Event(
+            pk=event_id,
+            category_index=tokens(categories[event_id]),
+            category_tree_index=tokens(
+                {a for c in categories[event_id] for a in ancestors.get(c, [c])}
+            ),
+            tag_index=tokens(tags[event_id]),
+        )
+        for event_id in set(categories) | set(tags)
+    ]
+    Event.objects.bulk_update(
+        events, ["category_index", "category_tree_index", "tag_index"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0008_recommendations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="category_index",
+            field=models.TextField(
+                blank=True, default="", editable=False, verbose_name="Category Index"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="category_tree_index",
+            field=models.TextField(
+                blank=True,
+                default="",
+                editable=False,
+                verbose_name="Category Tree Index",
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="tag_index",
+            field=models.TextField(
+                blank=True, default="", editable=False, verbose_name="Tag Index"
+            ),
+        ),
+        migrations.RunPython(backfill_filter_indexes, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 import hashlib
 import uuid
+from datetime import timedelta
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
@@ -15,6 +16,9 @@ from mptt.models import MPTTModel, TreeForeignKey
 
 User = get_user_model()
 
+# Analytics served by the API are recomputed once they are older than this
+ANALYTICS_STALE_AFTER = timedelta(hours=1)
+
 
 class EventQuerySet(models.QuerySet):
     """Custom queryset for Event with useful filters and annotations."""
@@ -46,14 +50,28 @@ class EventQuerySet(models.QuerySet):
         )
 
     def with_capacity(self):
+        # A capacity of 0 means the event is unlimited
         return self.filter(
-            models.Q(max_participants__isnull=True)
-            | models.Q(max_participants__gt=models.F("participants_count"))
+            models.Q(capacity=0) | models.Q(capacity__gt=models.F("registration_count"))
         )
 
     def by_organizer(self, user):
         return self.filter(organizer=user)
 
+    def _indexed(self, field, ids):
+        """Events whose filter index ``field`` lists any of ``ids``"""
+        condition = models.Q()
+        for pk in ids:
+            condition |= models.Q(**{f"{field}__contains": f",{pk},"})
+        return self.filter(condition) if condition else self.none()
+
+    def in_categories(self, category_ids, include_descendants=False):
+        field = "category_tree_index" if include_descendants else "category_index"
+        return self._indexed(field, category_ids)
+
+    def with_tags(self, tag_ids):
+        return self._indexed("tag_index", tag_ids)
+
     def search(self, query):
         return self.filter(
             models.Q(title__icontains=query)
@@ -272,6 +290,14 @@ class Event(models.Model):
     engagement_score = models.FloatField(
         _("Engagement Score"), default=0.0, editable=False
     )
+    session_count = models.PositiveIntegerField(
+        _("Session Count"), default=0, editable=False
+    )
+    rating_count = models.PositiveIntegerField(
+        _("Rating Count"), default=0, editable=False
+    )
+    rating_sum = models.PositiveIntegerField(_("Rating Sum"), default=0, editable=False)
+    rating_avg = models.FloatField(_("Average Rating"), default=0.0, editable=False)
 
     # Languages and translations
     language = models.CharField(_("Primary Language"), max_length=10, default="en")
@@ -284,6 +310,19 @@ class Event(models.Model):
     )
     is_featured = models.BooleanField(_("Is Featured"), default=False)
     is_trending = models.BooleanField(_("Is Trending"), default=False)
+    trending_score = models.FloatField(_("Trending Score"), default=0.0, editable=False)
+    interaction_norm = models.FloatField(
+        _("Interaction Norm"), default=0.0, editable=False
+    )
+
+    # Denormalized filter indexes, maintained by apps/events/filter_index.py
+    category_index = models.TextField(
+        _("Category Index"), blank=True, default="", editable=False
+    )
+    category_tree_index = models.TextField(
+        _("Category Tree Index"), blank=True, default="", editable=False
+    )
+    tag_index = models.TextField(_("Tag Index"), blank=True, default="", editable=False)
     is_verified = models.BooleanField(_("Is Verified"), default=False)
 
     # Timestamps
@@ -304,6 +343,7 @@ class Event(models.Model):
             models.Index(fields=["type", "status"]),
             models.Index(fields=["-created_at"]),
             models.Index(fields=["is_featured", "is_trending"]),
+            models.Index(fields=["-trending_score"]),
         ]
         permissions = [
             ("can_moderate_event", "Can moderate events"),
@@ -444,6 +484,7 @@ class EventTag(models.Model):
         _("Usage Count"), default=0, editable=False
     )
     is_trending = models.BooleanField(_("Is Trending"), default=False)
+    trending_score = models.FloatField(_("Trending Score"), default=0.0, editable=False)
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
 
     class Meta:
@@ -453,6 +494,7 @@ class EventTag(models.Model):
         indexes = [
             models.Index(fields=["slug"]),
             models.Index(fields=["-usage_count"]),
+            models.Index(fields=["-trending_score"]),
         ]
 
     objects = EventTagQuerySet.as_manager()
@@ -631,6 +673,24 @@ class Session(models.Model):
     rating_count = models.PositiveIntegerField(
         _("Rating Count"), default=0, editable=False
     )
+    rating_sum = models.PositiveIntegerField(_("Rating Sum"), default=0, editable=False)
+
+    # Rating histogram, one counter per star
+    rating_1_count = models.PositiveIntegerField(
+        _("1 Star Ratings"), default=0, editable=False
+    )
+    rating_2_count = models.PositiveIntegerField(
+        _("2 Star Ratings"), default=0, editable=False
+    )
+    rating_3_count = models.PositiveIntegerField(
+        _("3 Star Ratings"), default=0, editable=False
+    )
+    rating_4_count = models.PositiveIntegerField(
+        _("4 Star Ratings"), default=0, editable=False
+    )
+    rating_5_count = models.PositiveIntegerField(
+        _("5 Star Ratings"), default=0, editable=False
+    )
 
     # Timestamps
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
@@ -678,6 +738,10 @@ class Session(models.Model):
     def duration_minutes(self):
         return int((self.end_time - self.start_time).total_seconds() / 60)
 
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f"rating_{stars}_count") for stars in range(1, 6)}
+
 
 class ParticipantQuerySet(models.QuerySet):
     """Custom queryset for Participant with useful filters."""
@@ -794,6 +858,9 @@ class Participant(models.Model):
     points = models.PositiveIntegerField(_("Points"), default=0)
     level = models.PositiveIntegerField(_("Level"), default=1)
     badges = models.JSONField(_("Badges"), default=list, blank=True)
+    ratings_given = models.PositiveIntegerField(
+        _("Ratings Given"), default=0, editable=False
+    )
 
     # Preferences
     interests = models.JSONField(_("Interests"), default=list, blank=True)
@@ -864,18 +931,23 @@ class Participant(models.Model):
             self.save(update_fields=["level"])
 
     def check_in(self):
-        """Check in the participant."""
-        self.check_in_time = timezone.now()
-        self.attendance_status = self.AttendanceStatus.CHECKED_IN
-        self.save(update_fields=["check_in_time", "attendance_status"])
-        self.add_points(10, "Event check-in")
+        """Check in the participant through the batch check-in service."""
+        from .checkin import Scan, check_in_participants
+
+        check_in_participants(self.event, [Scan(str(self.pk))])
+        self.refresh_from_db(fields=["check_in_time", "attendance_status"])
 
     def check_out(self):
         """Check out the participant."""
         self.check_out_time = timezone.now()
         if self.attendance_status == self.AttendanceStatus.CHECKED_IN:
             self.attendance_status = self.AttendanceStatus.ATTENDED
-        self.save(update_fields=["check_out_time", "attendance_status"])
+        # Checking out has no side effects, skip the post_save handlers
+        Participant.objects.filter(pk=self.pk).update(
+            check_out_time=self.check_out_time,
+            attendance_status=self.attendance_status,
+            updated_at=self.check_out_time,
+        )
 
 
 class ExhibitorQuerySet(models.QuerySet):
@@ -1161,6 +1233,10 @@ class EventAnalytics(models.Model):
         _("Waitlist Registrations"), default=0
     )
 
+    # View metrics
+    total_views = models.PositiveIntegerField(_("Total Views"), default=0)
+    unique_views = models.PositiveIntegerField(_("Unique Views"), default=0)
+
     # Attendance metrics
     total_attendance = models.PositiveIntegerField(_("Total Attendance"), default=0)
     attendance_rate = models.FloatField(_("Attendance Rate"), default=0.0)
@@ -1231,48 +1307,16 @@ class EventAnalytics(models.Model):
     def __str__(self):
         return f"Analytics for {self.event.name}"
 
+    def should_recalculate(self):
+        """Whether the stored metrics are older than the staleness window."""
+        return timezone.now() - self.last_calculated > ANALYTICS_STALE_AFTER
+
     def recalculate(self):
         """Recalculate all analytics metrics."""
-        # Registration metrics
-        participants = self.event.participants.all()
-        self.total_registrations = participants.count()
-        self.confirmed_registrations = participants.filter(
-            registration_status=Participant.RegistrationStatus.CONFIRMED
-        ).count()
-        self.cancelled_registrations = participants.filter(
-            registration_status=Participant.RegistrationStatus.CANCELLED
-        ).count()
-        self.waitlist_registrations = participants.filter(
-            registration_status=Participant.RegistrationStatus.WAITLIST
-        ).count()
-
-        # Attendance metrics
-        attended = participants.filter(
-            attendance_status__in=[
-                Participant.AttendanceStatus.CHECKED_IN,
-                Participant.AttendanceStatus.ATTENDED,
-            ]
-        )
-        self.total_attendance = attended.count()
-        if self.confirmed_registrations > 0:
-            self.attendance_rate = (
-                self.total_attendance / self.confirmed_registrations
-            ) * 100
-
-        # Session metrics
-        sessions = self.event.sessions.all()
-        self.total_sessions = sessions.count()
-        if sessions.exists():
-            self.avg_session_rating = (
-                sessions.aggregate(avg_rating=models.Avg("rating_avg"))["avg_rating"]
-                or 0.0
-            )
-
-        # Exhibitor and product metrics
-        self.total_exhibitors = self.event.exhibitors.count()
-        self.total_products = self.event.products.count()
+        from .analytics import rebuild_event_analytics
 
-        self.save()
+        rebuild_event_analytics([self.event_id])
+        self.refresh_from_db()
 
 
 class EventBadgeQuerySet(models.QuerySet):
@@ -1597,6 +1641,62 @@ class EventFavorite(models.Model):
         return f"{self.user.get_full_name()} favorites {self.event.name}"
 
 
+class EventSimilarity(models.Model):
+    """Precomputed similar events, from the users interacting with both."""
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="similar_events",
+        verbose_name=_("Event"),
+    )
+    similar_event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Similar Event"),
+    )
+    score = models.FloatField(_("Score"))
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        unique_together = [["event", "similar_event"]]
+        verbose_name = _("Event Similarity")
+        verbose_name_plural = _("Event Similarities")
+        indexes = [models.Index(fields=["event", "-score"])]
+
+    def __str__(self):
+        return f"{self.event_id} ~ {self.similar_event_id} ({self.score:.3f})"
+
+
+class EventRecommendation(models.Model):
+    """Precomputed event recommendations for a user."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="event_recommendations",
+        verbose_name=_("User"),
+    )
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="recommendations",
+        verbose_name=_("Event"),
+    )
+    score = models.FloatField(_("Score"))
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        unique_together = [["user", "event"]]
+        verbose_name = _("Event Recommendation")
+        verbose_name_plural = _("Event Recommendations")
+        indexes = [models.Index(fields=["user", "-score"])]
+
+    def __str__(self):
+        return f"{self.event_id} for {self.user_id} ({self.score:.3f})"
+
+
 class EventViewQuerySet(models.QuerySet):
     """Custom queryset for EventView with useful filters."""
 
@@ -0,0 +1,374 @@
+"""
+Item-based event recommendations.
+
+Event discovery only offered featured, trending and category listings, even
+though favorites, registrations and views record which events each user
+cares about. An offline job now turns those interactions into:
+
+* ``EventSimilarity``: the ``SIMILAR_EVENTS_LIMIT`` upcoming events most
+  similar to each event. Similarity is the cosine of the events' user
+  vectors, where a user weighs an event by their strongest interaction with
+  it (``RECOMMENDATION_WEIGHTS``).
+* ``EventRecommendation``: up to ``USER_RECOMMENDATIONS_LIMIT`` upcoming
+  events per user, scored by how similar they are to the events the user
+  interacted with. Events the user already interacted with are left out.
+
+The interaction matrix is held sparsely, as per-user dicts of event weights
+plus an inverted event index, and streamed in from the database in chunks.
+Co-occurrences are accumulated one chunk of events at a time, so only the
+rows being ranked are in memory. Users with more than ``MAX_USER_ITEMS``
+interactions only contribute their strongest ones, which bounds the
+quadratic pair count of very active accounts.
+
+The incremental mode, run every hour by the ``refresh_event_recommendations``
+task, only recomputes the events touched by users who interacted since the
+previous run, and those users' recommendations. Deletions (an unfavorite,
+a cancelled registration) leave nothing to detect, so the
+``rebuild_event_recommendations`` task runs a full build every week.
+"""
+
+import heapq
+import logging
+import math
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common import helpers
+
+from .models import (
+    Event,
+    EventFavorite,
+    EventRecommendation,
+    EventSimilarity,
+    EventView,
+    Participant,
+)
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_WEIGHTS = {"view": 1.0, "registration": 3.0, "favorite": 5.0}
+
+SIMILAR_EVENTS_LIMIT = 20
+USER_RECOMMENDATIONS_LIMIT = 20
+MAX_USER_ITEMS = 200
+
+INTERACTION_CHUNK_SIZE = 5000
+SIMILARITY_CHUNK_SIZE = 1000
+WRITE_BATCH_SIZE = 1000
+
+# When the previous incremental build started
+LAST_BUILD_CACHE_KEY = "event_recommendations_last_build"
+
+RECOMMENDABLE_STATUSES = [
+    Event.EventStatus.PUBLISHED,
+    Event.EventStatus.SCHEDULED,
+    Event.EventStatus.LIVE,
+]
+
+
+def _interaction_sources():
+    """Querysets of every interaction kind, with their timestamp field"""
+    return [
+        ("view", EventView.objects.filter(user__isnull=False), "created_at"),
+        (
+            "registration",
+            Participant.objects.exclude(
+                registration_status=Participant.RegistrationStatus.CANCELLED
+            ),
+            "updated_at",
+        ),
+        ("favorite", EventFavorite.objects.all(), "created_at"),
+    ]
+
+
+class InteractionMatrix:
+    """
+    Sparse user x event interaction weights.
+
+    Events are numbered densely in the order they are first seen, so the
+    inner loops hash small ints instead of UUIDs; ``event_ids`` maps the
+    numbers back.
+    """
+
+    def __init__(self):
+        self.event_ids = []
+        self.user_items = defaultdict(dict)
+        self._index = {}
+        self._item_users = None
+
+    def __len__(self):
+        return sum(len(items) for items in self.user_items.values())
+
+    def index(self, event_id):
+        """The number of an event, assigning the next one to new events"""
+        index = self._index.get(event_id)
+        if index is None:
+            index = self._index[event_id] = len(self.event_ids)
+            self.event_ids.append(event_id)
+        return index
+
+    def indexes(self, event_ids):
+        """Numbers of the given events that have interactions"""
+        return {self._index[e] for e in event_ids if e in self._index}
+
+    def add(self, user_id, event_id, weight):
+        items = self.user_items[user_id]
+        index = self.index(event_id)
+        if weight > items.get(index, 0.0):
+            items[index] = weight
+        self._item_users = None
+
+    def prune(self, limit=MAX_USER_ITEMS):
+        """Keep only the strongest interactions of very active users"""
+        for user_id, items in self.user_items.items():
+            if len(items) > limit:
+                strongest = heapq.nlargest(limit, items.items(), key=lambda i: i[1])
+                self.user_items[user_id] = dict(strongest)
+        self._item_users = None
+
+    @property
+    def item_users(self):
+        """Inverted index: the users who interacted with each event"""
+        if self._item_users is None:
+            item_users = defaultdict(list)
+            for user_id, items in self.user_items.items():
+                for index in items:
+                    item_users[index].append(user_id)
+            self._item_users = item_users
+        return self._item_users
+
+    def norm(self, index):
+        user_items = self.user_items
+        return math.sqrt(
+            sum(
+                user_items[user_id][index] ** 2
+                for user_id in self.item_users.get(index, ())
+            )
+        )
+
+
+def load_interactions(user_ids=None):
+    """Stream the interactions of every user, or only of ``user_ids``"""
+    matrix = InteractionMatrix()
+    for kind, queryset, _ in _interaction_sources():
+        weight = RECOMMENDATION_WEIGHTS[kind]
+        batches = (
+            [None] if user_ids is None else helpers.chunks(user_ids, WRITE_BATCH_SIZE)
+        )
+        for batch in batches:
+            rows = queryset if batch is None else queryset.filter(user_id__in=batch)
+            for user_id, event_id in (
+                rows.order_by()
+                .values_list("user_id", "event_id")
+                .iterator(chunk_size=INTERACTION_CHUNK_SIZE)
+            ):
+                matrix.add(user_id, event_id, weight)
+    matrix.prune()
+    return matrix
+
+
+def recommendable_event_ids(now=None):
+    """Events worth recommending: published and not over yet"""
+    now = now or timezone.now()
+    return set(
+        Event.objects.filter(
+            status__in=RECOMMENDABLE_STATUSES, end_date__gte=now
+        ).values_list("pk", flat=True)
+    )
+
+
+def similar_events(matrix, indexes, candidates, norms):
+    """
+    Top cosine neighbours among ``candidates`` of each of the numbered
+    events, as (score, number) pairs.
+    """
+    item_users = matrix.item_users
+    user_items = matrix.user_items
+    for index in indexes:
+        dots = defaultdict(float)
+        for user_id in item_users.get(index, ()):
+            items = user_items[user_id]
+            weight = items[index]
+            for other, other_weight in items.items():
+                if other in candidates:
+                    dots[other] += weight * other_weight
+        dots.pop(index, None)
+
+        norm = norms[index]
+        scores = []
+        for other, dot in dots.items():
+            denominator = norm * norms.get(other, 0.0)
+            if denominator:
+                scores.append((dot / denominator, other))
+        yield index, heapq.nlargest(SIMILAR_EVENTS_LIMIT, scores)
+
+
+def user_recommendations(matrix, user_ids, similar):
+    """Top numbered events for each user, from the neighbours of their events"""
+    for user_id in user_ids:
+        items = matrix.user_items.get(user_id, {})
+        scores = defaultdict(float)
+        for index, weight in items.items():
+            for score, other in similar.get(index, ()):
+                if other not in items:
+                    scores[other] += weight * score
+        yield user_id, heapq.nlargest(
+            USER_RECOMMENDATIONS_LIMIT, ((s, e) for e, s in scores.items())
+        )
+
+
+def _write_norms(matrix, norms):
+    """Store interaction norms, one UPDATE per distinct value"""
+    by_value = defaultdict(list)
+    for index, norm in norms.items():
+        by_value[round(norm, 6)].append(matrix.event_ids[index])
+    for norm, event_ids in by_value.items():
+        for batch in helpers.chunks(event_ids, WRITE_BATCH_SIZE):
+            Event.objects.filter(pk__in=batch).update(interaction_norm=norm)
+
+
+def _write_similarities(matrix, rows):
+    event_ids = matrix.event_ids
+    with transaction.atomic():
+        EventSimilarity.objects.filter(
+            event_id__in=[event_ids[index] for index, _ in rows]
+        ).delete()
+        EventSimilarity.objects.bulk_create(
+            [
+                EventSimilarity(
+                    event_id=event_ids[index],
+                    similar_event_id=event_ids[other],
+                    score=score,
+                )
+                for index, neighbours in rows
+                for score, other in neighbours
+            ],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+
+
+def _write_recommendations(matrix, rows):
+    event_ids = matrix.event_ids
+    with transaction.atomic():
+        EventRecommendation.objects.filter(
+            user_id__in=[user_id for user_id, _ in rows]
+        ).delete()
+        EventRecommendation.objects.bulk_create(
+            [
+                EventRecommendation(
+                    user_id=user_id, event_id=event_ids[other], score=score
+                )
+                for user_id, top in rows
+                for score, other in top
+            ],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+
+
+def _build(matrix, indexes, user_ids, norms):
+    """Rank and store the given events' neighbours and users' recommendations"""
+    candidates = matrix.indexes(recommendable_event_ids())
+    similar = {}
+    for chunk in helpers.chunks(indexes, SIMILARITY_CHUNK_SIZE):
+        rows = list(similar_events(matrix, chunk, candidates, norms))
+        _write_similarities(matrix, rows)
+        similar.update(rows)
+
+    for chunk in helpers.chunks(user_ids, WRITE_BATCH_SIZE):
+        rows = list(user_recommendations(matrix, chunk, similar))
+        _write_recommendations(matrix, rows)
+    return len(similar), len(user_ids)
+
+
+def build_recommendations():
+    """
+    Rebuild every similarity and recommendation from all interactions.
+
+    Returns the number of events and users ranked.
+    """
+    started = timezone.now()
+    matrix = load_interactions()
+    indexes = list(matrix.item_users)
+    norms = {index: matrix.norm(index) for index in indexes}
+
+    Event.objects.filter(interaction_norm__gt=0).update(interaction_norm=0.0)
+    _write_norms(matrix, norms)
+    result = _build(matrix, indexes, list(matrix.user_items), norms)
+
+    # Rows of events and users without interactions any more
+    EventSimilarity.objects.filter(updated_at__lt=started).delete()
+    EventRecommendation.objects.filter(updated_at__lt=started).delete()
+    return result
+
+
+def users_active_since(since):
+    """Users with an interaction recorded since ``since``"""
+    user_ids = set()
+    for _, queryset, timestamp in _interaction_sources():
+        user_ids.update(
+            queryset.filter(**{f"{timestamp}__gte": since})
+            .order_by()
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+    user_ids.discard(None)
+    return user_ids
+
+
+def refresh_recommendations(since):
+    """
+    Recompute the events touched by users active since ``since``.
+
+    Their rows are exact: every user who interacted with a touched event is
+    loaded. Returns the number of events and users ranked.
+    """
+    active = users_active_since(since)
+    if not active:
+        return 0, 0
+
+    touched = load_interactions(active).event_ids
+    related = set(active)
+    for _, queryset, _ in _interaction_sources():
+        for batch in helpers.chunks(touched, WRITE_BATCH_SIZE):
+            related.update(
+                queryset.filter(event_id__in=batch)
+                .order_by()
+                .values_list("user_id", flat=True)
+                .distinct()
+            )
+    related.discard(None)
+
+    matrix = load_interactions(related)
+    indexes = matrix.indexes(touched)
+    norms = {index: matrix.norm(index) for index in indexes}
+    _write_norms(matrix, norms)
+
+    # Neighbours nobody touched keep their stored norms
+    neighbours = set(matrix.event_ids).difference(touched)
+    for batch in helpers.chunks(neighbours, WRITE_BATCH_SIZE):
+        for event_id, norm in Event.objects.filter(pk__in=batch).values_list(
+            "pk", "interaction_norm"
+        ):
+            norms[matrix.index(event_id)] = norm
+
+    return _build(matrix, list(indexes), list(active), norms)
+
+
+def refresh_changed_recommendations(full=False):
+    """
+    Refresh recommendations changed since the previous call.
+
+    Falls back to a full build when asked to, or when there is no previous
+    run on record.
+    """
+    started = timezone.now()
+    since = cache.get(LAST_BUILD_CACHE_KEY)
+    if full or since is None:
+        result = build_recommendations()
+    else:
+        result = refresh_recommendations(since)
+    cache.set(LAST_BUILD_CACHE_KEY, started, None)
+    return result
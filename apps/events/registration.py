@@ -0,0 +1,249 @@
+"""
+Event registration engine.
+
+Registering used to check ``spots_remaining`` in Python and then create the
+participant, so two requests arriving together could both see the last free
+seat. A seat is now claimed with a single conditional UPDATE of
+``Event.registration_count`` that only succeeds while the count is below
+capacity; the database serializes concurrent claims on the event row, so an
+event can never be oversold. Registrations that lose the race go to the
+waitlist, and cancelling a confirmed registration promotes the longest
+waiting participant into the freed seat.
+
+Requests can carry an idempotency key. The outcome of the first request with
+a key is remembered, and retries with the same key replay it instead of
+registering or cancelling twice.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+
+from .checkin import update_roster
+from .models import Event, EventAnalytics, Participant
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+IDEMPOTENCY_PENDING = "pending"
+
+CONFIRMED = "confirmed"
+WAITLISTED = "waitlisted"
+CANCELLED = "cancelled"
+ALREADY_REGISTERED = "already_registered"
+NOT_REGISTERED = "not_registered"
+REGISTRATION_CLOSED = "registration_closed"
+EVENT_FULL = "event_full"
+IN_PROGRESS = "in_progress"
+
+# Participants holding, or queued for, a seat
+ACTIVE_STATUSES = [
+    Participant.RegistrationStatus.CONFIRMED,
+    Participant.RegistrationStatus.WAITLIST,
+]
+
+
+@dataclass
+class RegistrationResult:
+    """Outcome of a registration or cancellation request"""
+
+    outcome: str
+    participant: Optional[Participant] = None
+    promoted: Optional[Participant] = None
+    replayed: bool = False
+
+    @property
+    def succeeded(self):
+        return self.outcome in (CONFIRMED, WAITLISTED, CANCELLED)
+
+
+def claim_seat(event_id):
+    """Take a seat if one is free; True when the seat was taken"""
+    # A capacity of 0 means the event is unlimited
+    return bool(
+        Event.objects.filter(pk=event_id)
+        .filter(Q(capacity=0) | Q(registration_count__lt=F("capacity")))
+        .update(registration_count=F("registration_count") + 1)
+    )
+
+
+def release_seat(event_id):
+    """Give a confirmed seat back"""
+    Event.objects.filter(pk=event_id, registration_count__gt=0).update(
+        registration_count=F("registration_count") - 1
+    )
+
+
+def _record_analytics(event_id, **deltas):
+    updates = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+        if delta
+    }
+    if updates:
+        EventAnalytics.objects.filter(event_id=event_id).update(**updates)
+
+
+def _idempotency_cache_key(action, event_id, user_id, key):
+    return f"event_registration_{action}_{event_id}_{user_id}_{key}"
+
+
+def _replay(cache_key):
+    """Return the remembered result for a key, or None if it is new"""
+    if cache.add(cache_key, IDEMPOTENCY_PENDING, IDEMPOTENCY_TIMEOUT):
+        return None
+
+    stored = cache.get(cache_key)
+    if stored is None or stored == IDEMPOTENCY_PENDING:
+        return RegistrationResult(IN_PROGRESS)
+
+    participant = Participant.objects.filter(pk=stored["participant_id"]).first()
+    return RegistrationResult(stored["outcome"], participant, replayed=True)
+
+
+def _remember(cache_key, result):
+    if not result.succeeded:
+        # Failed attempts may be retried with the same key
+        cache.delete(cache_key)
+        return
+    cache.set(
+        cache_key,
+        {"outcome": result.outcome, "participant_id": result.participant.pk},
+        IDEMPOTENCY_TIMEOUT,
+    )
+
+
+def _with_idempotency(action, event, user, idempotency_key, handler):
+    if not idempotency_key:
+        return handler()
+
+    cache_key = _idempotency_cache_key(action, event.pk, user.pk, idempotency_key)
+    replayed = _replay(cache_key)
+    if replayed is not None:
+        return replayed
+
+    try:
+        result = handler()
+    except Exception:
+        cache.delete(cache_key)
+        raise
+    _remember(cache_key, result)
+    return result
+
+
+def _register(event, user, registration_data):
+    if not event.is_registration_open:
+        return RegistrationResult(REGISTRATION_CLOSED)
+
+    existing = Participant.objects.filter(event=event, user=user).first()
+    if existing and existing.registration_status in ACTIVE_STATUSES:
+        return RegistrationResult(ALREADY_REGISTERED, existing)
+
+    try:
+        with transaction.atomic():
+            if claim_seat(event.pk):
+                status = Participant.RegistrationStatus.CONFIRMED
+            elif event.waitlist_enabled:
+                status = Participant.RegistrationStatus.WAITLIST
+            else:
+                return RegistrationResult(EVENT_FULL)
+
+            participant = existing or Participant(
+                event=event, user=user, role=Participant.Role.ATTENDEE
+            )
+            participant.registration_status = status
+            participant.registration_data = registration_data or {}
+            # The seat was counted by claim_seat; keep the signal from
+            # counting it again
+            participant._seat_claimed = True
+            participant.save()
+            transaction.on_commit(lambda: update_roster(participant))
+    except IntegrityError:
+        # A concurrent request registered the same user first
+        existing = Participant.objects.filter(event=event, user=user).first()
+        return RegistrationResult(ALREADY_REGISTERED, existing)
+
+    confirmed = status == Participant.RegistrationStatus.CONFIRMED
+    _record_analytics(
+        event.pk,
+        total_registrations=int(existing is None),
+        confirmed_registrations=int(confirmed),
+        waitlist_registrations=int(not confirmed),
+    )
+    return RegistrationResult(CONFIRMED if confirmed else WAITLISTED, participant)
+
+
+def promote_from_waitlist(event):
+    """Move the longest waiting participant into a free seat, if any"""
+    with transaction.atomic():
+        candidate = (
+            Participant.objects.select_for_update(skip_locked=True)
+            .filter(
+                event=event, registration_status=Participant.RegistrationStatus.WAITLIST
+            )
+            .order_by("registered_at")
+            .first()
+        )
+        if candidate is None or not claim_seat(event.pk):
+            return None
+
+        candidate.registration_status = Participant.RegistrationStatus.CONFIRMED
+        candidate._seat_claimed = True
+        candidate.save(update_fields=["registration_status", "updated_at"])
+        transaction.on_commit(lambda: update_roster(candidate))
+
+    _record_analytics(event.pk, confirmed_registrations=1, waitlist_registrations=-1)
+    logger.info(f"Promoted {candidate.user_id} from the waitlist of event {event.pk}")
+    return candidate
+
+
+def _cancel(event, user):
+    with transaction.atomic():
+        participant = (
+            Participant.objects.select_for_update()
+            .filter(event=event, user=user, registration_status__in=ACTIVE_STATUSES)
+            .first()
+        )
+        if participant is None:
+            return RegistrationResult(NOT_REGISTERED)
+
+        was_confirmed = (
+            participant.registration_status == Participant.RegistrationStatus.CONFIRMED
+        )
+        participant.registration_status = Participant.RegistrationStatus.CANCELLED
+        participant.save(update_fields=["registration_status", "updated_at"])
+        transaction.on_commit(lambda: update_roster(participant))
+        if was_confirmed:
+            release_seat(event.pk)
+
+    _record_analytics(
+        event.pk,
+        cancelled_registrations=1,
+        confirmed_registrations=-int(was_confirmed),
+        waitlist_registrations=-int(not was_confirmed),
+    )
+    promoted = promote_from_waitlist(event) if was_confirmed else None
+    return RegistrationResult(CANCELLED, participant, promoted=promoted)
+
+
+def register_participant(event, user, registration_data=None, idempotency_key=None):
+    """Register a user for an event, waitlisting them when it is full"""
+    return _with_idempotency(
+        "register",
+        event,
+        user,
+        idempotency_key,
+        lambda: _register(event, user, registration_data),
+    )
+
+
+def cancel_registration(event, user, idempotency_key=None):
+    """Cancel a user's registration and hand the seat to the waitlist"""
+    return _with_idempotency(
+        "cancel", event, user, idempotency_key, lambda: _cancel(event, user)
+    )
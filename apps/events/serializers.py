@@ -73,16 +73,9 @@ class EventCategorySerializer(serializers.ModelSerializer):
         if hasattr(obj, "event_count_cache"):
             return obj.event_count_cache
 
-        # Use prefetch_related in viewset to optimize this
-        descendant_ids = obj.get_descendants(include_self=True).values_list(
-            "id", flat=True
-        )
         return (
-            Event.objects.filter(
-                eventcategoryrelation__category__in=descendant_ids,
-                status__in=[Event.EventStatus.PUBLISHED, Event.EventStatus.LIVE],
-            )
-            .distinct()
+            Event.objects.in_categories([obj.pk], include_descendants=True)
+            .filter(status__in=[Event.EventStatus.PUBLISHED, Event.EventStatus.LIVE])
             .count()
         )
 
@@ -126,19 +119,8 @@ class EventTagSerializer(serializers.ModelSerializer):
         ).count()
 
     def get_trending_score(self, obj):
-        """Calculate trending score based on recent event activity."""
-        if hasattr(obj, "trending_score_cache"):
-            return obj.trending_score_cache
-
-        recent_events = Event.objects.filter(
-            eventtagrelation__tag=obj,
-            created_at__gte=timezone.now() - timezone.timedelta(days=30),
-        ).count()
-        total_events = Event.objects.filter(eventtagrelation__tag=obj).count()
-
-        if total_events == 0:
-            return 0.0
-        return round((recent_events / total_events) * 100, 2)
+        """Time-decayed activity score of the tag's events."""
+        return round(obj.trending_score, 2)
 
 
 class UserMinimalSerializer(serializers.ModelSerializer):
@@ -193,13 +175,13 @@ class SessionMinimalSerializer(serializers.ModelSerializer):
                 for speaker in obj.prefetched_speakers
             ]
         return [
-            p.user.get_full_name() or p.user.username
-            for p in obj.participants.filter(role=Participant.Role.SPEAKER)
+            speaker.get_full_name() or speaker.username
+            for speaker in obj.speakers.all()
         ]
 
     def get_duration_display(self, obj) -> str:
         """Get human-readable duration."""
-        duration = obj.duration_minutes()
+        duration = obj.duration_minutes
         if duration < 60:
             return f"{duration}m"
         hours = duration // 60
@@ -208,7 +190,7 @@ class SessionMinimalSerializer(serializers.ModelSerializer):
 
     def get_is_live(self, obj) -> bool:
         """Check if session is currently live."""
-        return obj.is_live()
+        return obj.is_live
 
 
 class EventAttachmentSerializer(serializers.ModelSerializer):
@@ -491,6 +473,8 @@ class EventListSerializer(serializers.ModelSerializer):
             "tags",
             "capacity",  # Changed from "capacity" to match model
             "participant_count",
+            "session_count",
+            "rating_avg",
             "is_free",  # Changed from "registration_fee" to align with model's pricing field
             "currency",
             "is_featured",
@@ -498,7 +482,6 @@ class EventListSerializer(serializers.ModelSerializer):
             "registration_status",
             "upcoming_session",
             "created_at",
-            # "rating_avg" removed as it doesn't exist in the model
         ]
 
     def get_logo_url(self, obj):
@@ -513,6 +496,8 @@ class EventListSerializer(serializers.ModelSerializer):
     def get_is_favorited(self, obj):
         request = self.context.get("request")
         if request and hasattr(request, "user") and request.user.is_authenticated:
+            if hasattr(obj, "user_has_favorited"):
+                return obj.user_has_favorited
             return EventFavorite.objects.filter(event=obj, user=request.user).exists()
         return False
 
@@ -521,6 +506,9 @@ class EventListSerializer(serializers.ModelSerializer):
 
     def get_upcoming_session(self, obj):
         """Get the next upcoming session for this event."""
+        if hasattr(obj, "upcoming_sessions"):
+            session = obj.upcoming_sessions[0] if obj.upcoming_sessions else None
+            return SessionMinimalSerializer(session).data if session else None
         try:
             session = (
                 obj.sessions.filter(
@@ -625,8 +613,10 @@ class EventDetailSerializer(serializers.ModelSerializer):
             return obj.participant_count_cache
         return obj.registration_count
 
-    def get_spots_remaining(self, obj) -> float:
-        """Get remaining spots for registration."""
+    def get_spots_remaining(self, obj) -> Optional[int]:
+        """Get remaining spots for registration, None when unlimited."""
+        if obj.capacity == 0:
+            return None
         return obj.spots_remaining
 
     def get_is_favorited(self, obj) -> bool:
@@ -946,6 +936,8 @@ class SessionSerializer(serializers.ModelSerializer):
             "user_attendance_status",
             "is_featured",
             "rating_avg",
+            "rating_count",
+            "rating_histogram",
             "location",
             "virtual_link",
             "recording_url",
@@ -953,7 +945,14 @@ class SessionSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "rating_avg", "created_at", "updated_at"]
+        read_only_fields = [
+            "id",
+            "rating_avg",
+            "rating_count",
+            "rating_histogram",
+            "created_at",
+            "updated_at",
+        ]
 
     def get_participant_count(self, obj) -> int:
         """Get current participant count for session."""
@@ -1168,21 +1167,17 @@ class ParticipantSerializer(serializers.ModelSerializer):
         ]
 
     def get_sessions_count(self, obj) -> int:
-        """Get count of sessions participant is registered for."""
-        return obj.sessions.count()
+        """Get count of sessions participant attended."""
+        return obj.sessions_attended.count()
 
     def get_attendance_rate(self, obj) -> float:
         """Calculate participant's attendance rate."""
-        total_sessions = obj.sessions.count()
+        total_sessions = obj.event.session_count
         if total_sessions == 0:
             return 0.0
 
-        attended_sessions = obj.sessions.filter(
-            # This would need to be tracked via session attendance
-            # For now, we'll use a placeholder
-        ).count()
-
-        return round((attended_sessions / total_sessions) * 100, 2)
+        attended_sessions = obj.sessions_attended.count()
+        return round(min(attended_sessions / total_sessions, 1) * 100, 2)
 
 
 class ExhibitorSerializer(serializers.ModelSerializer):
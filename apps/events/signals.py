@@ -4,17 +4,28 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.db import transaction
 from django.db.models import F
-from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 
 from apps.notifications.models import Notification
 
+from .analytics import rebuild_event_analytics
+from .counters import apply_rating_change
+from .fanout import event_group, fanout
+from .filter_index import index_category_events, index_events
 from .models import (
     Event,
     EventAnalytics,
     EventBadge,
     EventCategory,
     EventCategoryRelation,
+    EventFavorite,
     EventTag,
     EventTagRelation,
     EventView,
@@ -25,10 +36,18 @@ from .models import (
     Session,
     SessionRating,
 )
+from .recommendations import refresh_changed_recommendations
+from .trending import record_activity, refresh_trending_scores
 
 logger = logging.getLogger(__name__)
 channel_layer = get_channel_layer()
 
+# Reviewer badges by the number of sessions a participant has rated
+REVIEWER_BADGES = {
+    1: ("First Reviewer", "First session review"),
+    5: ("Active Reviewer", "Reviewed 5 sessions"),
+}
+
 
 @receiver(post_save, sender=Event)
 def event_post_save(sender, instance, created, **kwargs):
@@ -92,9 +111,11 @@ def event_post_save(sender, instance, created, **kwargs):
 def session_post_save(sender, instance, created, **kwargs):
     """Handle post-save operations for sessions."""
     try:
-        # Update event session count
-        instance.event.session_count = instance.event.sessions.count()
-        instance.event.save(update_fields=["session_count"])
+        if created:
+            # Update event session count
+            Event.objects.filter(id=instance.event_id).update(
+                session_count=F("session_count") + 1
+            )
 
         # Send real-time updates for session changes
         if channel_layer:
@@ -137,21 +158,38 @@ def session_post_save(sender, instance, created, **kwargs):
         logger.error(f"Error in session_post_save signal: {e}", exc_info=True)
 
 
+@receiver(post_delete, sender=Session)
+def session_post_delete(sender, instance, **kwargs):
+    """Handle post-delete operations for sessions."""
+    try:
+        Event.objects.filter(id=instance.event_id).update(
+            session_count=F("session_count") - 1
+        )
+
+    except Exception as e:
+        logger.error(f"Error in session_post_delete signal: {e}", exc_info=True)
+
+
 @receiver(post_save, sender=Participant)
 def participant_post_save(sender, instance, created, **kwargs):
     """Handle post-save operations for participants."""
     try:
+        # Update event registration count outside the side effects below, so
+        # a failing notification cannot roll the counter back. Seats taken
+        # through the registration engine are already counted.
+        if (
+            created
+            and instance.registration_status == Participant.RegistrationStatus.CONFIRMED
+            and not getattr(instance, "_seat_claimed", False)
+        ):
+            Event.objects.filter(id=instance.event_id).update(
+                registration_count=F("registration_count") + 1
+            )
+        if created:
+            record_activity(instance.event_id, "registration")
+
         with transaction.atomic():
             if created:
-                # Update event registration count
-                if (
-                    instance.registration_status
-                    == Participant.RegistrationStatus.CONFIRMED
-                ):
-                    Event.objects.filter(id=instance.event.id).update(
-                        registration_count=F("registration_count") + 1
-                    )
-
                 # Send welcome notification
                 Notification.objects.create(
                     recipient=instance.user,
@@ -183,19 +221,17 @@ def participant_post_save(sender, instance, created, **kwargs):
             if old_instance and old_instance.points != instance.points:
                 check_level_up(instance)
 
-            # Send real-time updates
+            # Send real-time updates, batched with the event's other updates
             if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    f"event_{instance.event.id}",
+                fanout.send_sync(
+                    event_group(instance.event_id),
+                    "attendance_update",
                     {
-                        "type": "attendance_update",
-                        "data": {
-                            "participant_id": str(instance.id),
-                            "user_id": str(instance.user.id),
-                            "registration_status": instance.registration_status,
-                            "attendance_status": instance.attendance_status,
-                            "points": instance.points,
-                        },
+                        "participant_id": str(instance.id),
+                        "user_id": str(instance.user_id),
+                        "registration_status": instance.registration_status,
+                        "attendance_status": instance.attendance_status,
+                        "points": instance.points,
                     },
                 )
 
@@ -217,53 +253,72 @@ def participant_pre_delete(sender, instance, **kwargs):
         logger.error(f"Error in participant_pre_delete signal: {e}", exc_info=True)
 
 
+@receiver(pre_save, sender=SessionRating)
+def session_rating_pre_save(sender, instance, **kwargs):
+    """Remember the rating being replaced so aggregates can move by a delta."""
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = (
+            SessionRating.objects.filter(pk=instance.pk)
+            .values_list("session_id", "rating")
+            .first()
+        )
+
+
 @receiver(post_save, sender=SessionRating)
 def session_rating_post_save(sender, instance, created, **kwargs):
     """Handle post-save operations for session ratings."""
     try:
-        # Update session average rating
-        session = instance.session
-        ratings = session.ratings.all()
-        avg_rating = sum(r.rating for r in ratings) / len(ratings) if ratings else 0
-
-        Session.objects.filter(id=session.id).update(
-            rating_avg=avg_rating, rating_count=len(ratings)
+        # Move the session and event rating aggregates
+        previous = getattr(instance, "_previous", None)
+        if previous and previous[0] != instance.session_id:
+            apply_rating_change(previous[0], removed=previous[1])
+            previous = None
+        apply_rating_change(
+            instance.session_id,
+            added=instance.rating,
+            removed=previous[1] if previous else None,
         )
 
         # Award badges for rating activities
         if created:
             participant = instance.participant
-            rating_count = participant.session_ratings.count()
+            Participant.objects.filter(pk=participant.pk).update(
+                ratings_given=F("ratings_given") + 1
+            )
 
-            # Award reviewer badges
-            if rating_count == 1:
-                try:
-                    reviewer_badge = EventBadge.objects.get(name="First Reviewer")
-                    ParticipantBadge.objects.get_or_create(
-                        participant=participant,
-                        badge=reviewer_badge,
-                        defaults={"reason": "First session review"},
-                    )
-                except EventBadge.DoesNotExist:
-                    pass
-            elif rating_count == 5:
+            # Add points for rating; this also reloads the participant
+            participant.add_points(2, f"Rated session: {instance.session.title}")
+
+            badge = REVIEWER_BADGES.get(participant.ratings_given)
+            if badge:
                 try:
-                    reviewer_badge = EventBadge.objects.get(name="Active Reviewer")
+                    reviewer_badge = EventBadge.objects.get(name=badge[0])
                     ParticipantBadge.objects.get_or_create(
                         participant=participant,
                         badge=reviewer_badge,
-                        defaults={"reason": "Reviewed 5 sessions"},
+                        defaults={"reason": badge[1]},
                     )
                 except EventBadge.DoesNotExist:
                     pass
 
-            # Add points for rating
-            participant.add_points(2, f"Rated session: {session.title}")
-
     except Exception as e:
         logger.error(f"Error in session_rating_post_save signal: {e}", exc_info=True)
 
 
+@receiver(post_delete, sender=SessionRating)
+def session_rating_post_delete(sender, instance, **kwargs):
+    """Handle post-delete operations for session ratings."""
+    try:
+        apply_rating_change(instance.session_id, removed=instance.rating)
+        Participant.objects.filter(
+            pk=instance.participant_id, ratings_given__gt=0
+        ).update(ratings_given=F("ratings_given") - 1)
+
+    except Exception as e:
+        logger.error(f"Error in session_rating_post_delete signal: {e}", exc_info=True)
+
+
 @receiver(m2m_changed, sender=Participant.sessions_attended.through)
 def participant_sessions_changed(sender, instance, action, pk_set, **kwargs):
     """Handle changes to participant's attended sessions."""
@@ -336,6 +391,44 @@ def event_tag_relation_pre_delete(sender, instance, **kwargs):
         )
 
 
+@receiver(post_save, sender=EventCategoryRelation)
+@receiver(post_delete, sender=EventCategoryRelation)
+@receiver(post_save, sender=EventTagRelation)
+@receiver(post_delete, sender=EventTagRelation)
+def event_relation_changed(sender, instance, origin=None, **kwargs):
+    """Keep the event's category and tag filter indexes in step."""
+    try:
+        # Relations cascading from a deleted event leave nothing to index
+        if isinstance(origin, Event) or getattr(origin, "model", None) is Event:
+            return
+        index_events([instance.event_id])
+
+    except Exception as e:
+        logger.error(f"Error in event_relation_changed signal: {e}", exc_info=True)
+
+
+@receiver(pre_save, sender=EventCategory)
+def event_category_pre_save(sender, instance, **kwargs):
+    """Note whether a category is moving to another parent."""
+    instance._moved = bool(
+        instance.pk
+        and EventCategory.objects.filter(pk=instance.pk)
+        .exclude(parent_id=instance.parent_id)
+        .exists()
+    )
+
+
+@receiver(post_save, sender=EventCategory)
+def event_category_post_save(sender, instance, created, **kwargs):
+    """Re-index the events under a category that moved in the tree."""
+    try:
+        if getattr(instance, "_moved", False):
+            index_category_events(instance)
+
+    except Exception as e:
+        logger.error(f"Error in event_category_post_save signal: {e}", exc_info=True)
+
+
 @receiver(post_save, sender=Exhibitor)
 def exhibitor_post_save(sender, instance, created, **kwargs):
     """Handle post-save operations for exhibitors."""
@@ -386,11 +479,23 @@ def event_view_post_save(sender, instance, created, **kwargs):
             Event.objects.filter(id=instance.event.id).update(
                 view_count=F("view_count") + 1
             )
+            record_activity(instance.event_id, "view")
 
     except Exception as e:
         logger.error(f"Error in event_view_post_save signal: {e}", exc_info=True)
 
 
+@receiver(post_save, sender=EventFavorite)
+def event_favorite_post_save(sender, instance, created, **kwargs):
+    """Handle post-save operations for event favorites."""
+    try:
+        if created:
+            record_activity(instance.event_id, "favorite")
+
+    except Exception as e:
+        logger.error(f"Error in event_favorite_post_save signal: {e}", exc_info=True)
+
+
 def check_level_up(participant):
     """Check if participant should level up and award badges."""
     try:
@@ -400,48 +505,58 @@ def check_level_up(participant):
         if new_level > participant.level:
             participant.level = new_level
             participant.save(update_fields=["level"])
+            award_level(participant)
 
-            # Award level badges
-            try:
-                level_badge = EventBadge.objects.get(name=f"Level {new_level}")
-                ParticipantBadge.objects.get_or_create(
-                    participant=participant,
-                    badge=level_badge,
-                    defaults={"reason": f"Reached level {new_level}"},
-                )
-            except EventBadge.DoesNotExist:
-                pass
+    except Exception as e:
+        logger.error(f"Error in check_level_up: {e}", exc_info=True)
 
-            # Send level up notification
-            Notification.objects.create(
-                recipient=participant.user,
-                notification_type="level_up",
-                title=f"Level Up! You are now level {new_level}",
-                message=f"Congratulations! You've reached level {new_level} in {participant.event.name}",
-                data={
-                    "event_id": str(participant.event.id),
-                    "new_level": new_level,
-                    "points": participant.points,
-                },
+
+def award_level(participant):
+    """Award the badge, notification and live update of a participant's level."""
+    try:
+        new_level = participant.level
+
+        # Award level badges
+        try:
+            level_badge = EventBadge.objects.get(name=f"Level {new_level}")
+            ParticipantBadge.objects.get_or_create(
+                participant=participant,
+                badge=level_badge,
+                defaults={"reason": f"Reached level {new_level}"},
             )
+        except EventBadge.DoesNotExist:
+            pass
+
+        # Send level up notification
+        Notification.objects.create(
+            recipient=participant.user,
+            notification_type="level_up",
+            title=f"Level Up! You are now level {new_level}",
+            message=f"Congratulations! You've reached level {new_level} in {participant.event.name}",
+            data={
+                "event_id": str(participant.event.id),
+                "new_level": new_level,
+                "points": participant.points,
+            },
+        )
 
-            # Send real-time notification
-            if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    f"event_{participant.event.id}",
-                    {
-                        "type": "notification",
-                        "data": {
-                            "user_id": str(participant.user.id),
-                            "type": "level_up",
-                            "level": new_level,
-                            "points": participant.points,
-                        },
+        # Send real-time notification
+        if channel_layer:
+            async_to_sync(channel_layer.group_send)(
+                f"event_{participant.event.id}",
+                {
+                    "type": "notification",
+                    "data": {
+                        "user_id": str(participant.user.id),
+                        "type": "level_up",
+                        "level": new_level,
+                        "points": participant.points,
                     },
-                )
+                },
+            )
 
     except Exception as e:
-        logger.error(f"Error in check_level_up: {e}", exc_info=True)
+        logger.error(f"Error in award_level: {e}", exc_info=True)
 
 
 def check_networking_badges(participant):
@@ -474,80 +589,19 @@ def check_networking_badges(participant):
         logger.error(f"Error in check_networking_badges: {e}", exc_info=True)
 
 
-def update_trending_tags():
-    """Update trending status for tags based on recent usage."""
-    try:
-        # Get tags used in events created in the last 7 days
-        from datetime import timedelta
-
-        from django.utils import timezone
-
-        week_ago = timezone.now() - timedelta(days=7)
-
-        recent_tag_usage = (
-            EventTagRelation.objects.filter(event__created_at__gte=week_ago)
-            .values("tag")
-            .annotate(recent_count=models.Count("tag"))
-            .order_by("-recent_count")[:10]
-        )
-
-        # Reset all trending status
-        EventTag.objects.update(is_trending=False)
-
-        # Set trending for top tags
-        trending_tag_ids = [item["tag"] for item in recent_tag_usage]
-        EventTag.objects.filter(id__in=trending_tag_ids).update(is_trending=True)
-
-    except Exception as e:
-        logger.error(f"Error updating trending tags: {e}", exc_info=True)
-
-
-def update_trending_events():
-    """Update trending status for events based on engagement."""
-    try:
-        from datetime import timedelta
-
-        from django.utils import timezone
-
-        # Calculate trending score based on recent activity
-        week_ago = timezone.now() - timedelta(days=7)
-
-        # Reset all trending status
-        Event.objects.update(is_trending=False)
-
-        # Get events with high recent engagement
-        trending_events = (
-            Event.objects.filter(created_at__gte=week_ago)
-            .annotate(
-                engagement_score=models.F("view_count")
-                + models.F("registration_count") * 2
-            )
-            .order_by("-engagement_score")[:20]
-        )
-
-        for event in trending_events:
-            event.is_trending = True
-            event.save(update_fields=["is_trending"])
-
-    except Exception as e:
-        logger.error(f"Error updating trending events: {e}", exc_info=True)
-
-
 # Periodic tasks (to be called by Celery or cron)
 def daily_maintenance():
     """Daily maintenance tasks."""
     try:
-        update_trending_tags()
-        update_trending_events()
+        refresh_trending_scores()
 
         # Recalculate analytics for active events
         active_events = Event.objects.filter(
             status__in=[Event.EventStatus.LIVE, Event.EventStatus.SCHEDULED]
         )
+        rebuild_event_analytics(active_events.values("pk"))
 
-        for event in active_events:
-            if hasattr(event, "analytics"):
-                event.analytics.recalculate()
+        refresh_changed_recommendations()
 
     except Exception as e:
         logger.error(f"Error in daily_maintenance: {e}", exc_info=True)
@@ -0,0 +1,71 @@
+import logging
+
+from celery import shared_task
+
+from . import checkin, recommendations, tracking, trending
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def apply_check_in_side_effects(event_id, participant_ids):
+    """Apply the deferred side effects of a batch of check-ins"""
+    try:
+        checkin.apply_check_in_side_effects(event_id, participant_ids)
+        return len(participant_ids)
+
+    except Exception as e:
+        # Points and counters move by deltas, so a retry could apply them
+        # twice; the maintenance counter rebuild corrects a lost batch
+        logger.error(
+            f"Error applying check-in side effects for event {event_id}: {str(e)}",
+            exc_info=True,
+        )
+        return 0
+
+
+@shared_task
+def flush_event_views():
+    """
+    Ingest buffered event views into rows, counters and trending scores.
+    """
+    return {"status": "flushed", "views": tracking.flush_event_views()}
+
+
+@shared_task
+def apply_trending_activity():
+    """
+    Apply the buffered trending score deltas of events and their tags.
+    """
+    return {"status": "applied", "events": trending.apply_activity()}
+
+
+@shared_task
+def refresh_event_recommendations():
+    """
+    Refresh the recommendations of the events and users with interactions
+    since the previous run.
+    """
+    try:
+        event_count, user_count = recommendations.refresh_changed_recommendations()
+        return {"status": "refreshed", "events": event_count, "users": user_count}
+
+    except Exception as e:
+        logger.error(f"Error refreshing event recommendations: {str(e)}", exc_info=True)
+        return {"status": "failed"}
+
+
+@shared_task
+def rebuild_event_recommendations():
+    """
+    Rebuild every event recommendation, dropping those of deleted interactions.
+    """
+    try:
+        event_count, user_count = recommendations.refresh_changed_recommendations(
+            full=True
+        )
+        return {"status": "rebuilt", "events": event_count, "users": user_count}
+
+    except Exception as e:
+        logger.error(f"Error rebuilding event recommendations: {str(e)}", exc_info=True)
+        return {"status": "failed"}
@@ -0,0 +1,193 @@
+"""
+Persisted trending scores for events and tags.
+
+The trending endpoints used to count participants and views of every
+upcoming event on each cache miss, and the maintenance command computed a
+score per event and then discarded it. ``Event.trending_score`` and
+``EventTag.trending_score`` now hold a time-decayed activity score: each
+registration, view and favorite weighs ``TRENDING_WEIGHTS[kind]`` halved
+every ``TRENDING_HALF_LIFE``. The endpoints read the indexed scores
+directly.
+
+Activity bumps the scores at full weight, but not as it happens: tags are
+shared by many events, so an ``F()`` update of their rows per registration,
+view or favorite made them contended hot rows. ``record_activity`` only
+appends the delta to the minute's cache buffer (see
+``apps.common.buffers``) and ``apply_activity``, run every minute by the
+``apply_trending_activity`` task, moves each event and tag once per minute
+by its summed deltas. ``refresh_trending_scores`` then recomputes the
+decayed scores exactly from daily grouped counts over ``TRENDING_WINDOW``,
+up to the current minute whose deltas are still queued, and flags the top events and tags as trending; the maintenance command runs
+it.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.common import buffers, helpers
+
+from .models import (
+    Event,
+    EventFavorite,
+    EventTag,
+    EventTagRelation,
+    EventView,
+    Participant,
+)
+
+logger = logging.getLogger(__name__)
+
+TRENDING_WEIGHTS = {"view": 1.0, "registration": 3.0, "favorite": 5.0}
+TRENDING_HALF_LIFE = timedelta(days=3)
+TRENDING_WINDOW = timedelta(days=14)
+
+TRENDING_EVENTS_LIMIT = 20
+TRENDING_TAGS_LIMIT = 10
+
+SCORE_BATCH_SIZE = 1000
+
+# Cache buffer of pending (event id, score delta) pairs
+ACTIVITY_BUFFER = "trending_activity"
+
+
+def record_activity(event_id, kind, count=1):
+    """Queue a bump of the trending scores of an event and its tags"""
+    buffers.append(ACTIVITY_BUFFER, (event_id, TRENDING_WEIGHTS[kind] * count))
+
+
+def _apply_deltas(deltas):
+    """Move each event and its tags once by their summed deltas"""
+    event_deltas = defaultdict(float)
+    for event_id, weight in deltas:
+        event_deltas[event_id] += weight
+
+    tag_deltas = defaultdict(float)
+    relations = EventTagRelation.objects.filter(event_id__in=list(event_deltas))
+    for tag_id, event_id in relations.values_list("tag_id", "event_id"):
+        tag_deltas[tag_id] += event_deltas[event_id]
+
+    with transaction.atomic():
+        # In key order, so concurrent writers lock the rows in the same order
+        for model, scores in [(Event, event_deltas), (EventTag, tag_deltas)]:
+            for pk in sorted(scores):
+                model.objects.filter(pk=pk).update(
+                    trending_score=F("trending_score") + scores[pk]
+                )
+    return len(event_deltas)
+
+
+def apply_activity(now=None):
+    """
+    Apply the queued score deltas of every finished minute; returns how
+    many events moved.
+    """
+    moved = 0
+    try:
+        for _, deltas in buffers.drain(ACTIVITY_BUFFER, now):
+            moved += _apply_deltas(deltas)
+    except Exception as e:
+        # The failed minute stays buffered and is retried by the next run
+        logger.error(f"Error applying trending activity: {str(e)}", exc_info=True)
+    return moved
+
+
+def _decay(age):
+    return 0.5 ** (age / TRENDING_HALF_LIFE)
+
+
+def _daily_activity(queryset, date_field, since, until):
+    """Per event and day activity counts from ``since`` until ``until``"""
+    return (
+        queryset.filter(**{f"{date_field}__gte": since, f"{date_field}__lt": until})
+        .annotate(day=TruncDate(date_field))
+        .order_by()
+        .values("event_id", "day")
+        .annotate(count=Count("id"))
+    )
+
+
+def compute_event_scores(now=None, until=None):
+    """
+    Decayed trending scores of every event with activity in the window, up
+    to ``until`` (``now`` by default)
+    """
+    now = now or timezone.now()
+    until = until or now
+    since = now - TRENDING_WINDOW
+    today = timezone.localdate(now)
+
+    from .tracking import sampled_event_ids, view_sample_rate
+
+    # Busy events only keep a sample of their view rows, scale those back up
+    sampled = sampled_event_ids()
+    rate = view_sample_rate()
+    view_scale = 1 / rate if rate > 0 else 1.0
+
+    scores = defaultdict(float)
+    for kind, queryset, date_field in [
+        ("view", EventView.objects.all(), "created_at"),
+        ("registration", Participant.objects.all(), "registered_at"),
+        ("favorite", EventFavorite.objects.all(), "created_at"),
+    ]:
+        for row in _daily_activity(queryset, date_field, since, until):
+            event_id = row["event_id"]
+            age = timedelta(days=(today - row["day"]).days)
+            weight = TRENDING_WEIGHTS[kind] * row["count"] * _decay(age)
+            if kind == "view" and event_id in sampled:
+                weight *= view_scale
+            scores[event_id] += weight
+    return scores
+
+
+def _write_scores(model, scores):
+    """Store scores, zeroing rows that fell out of the window"""
+    model.objects.filter(trending_score__gt=0).update(trending_score=0.0)
+    rows = [model(pk=pk, trending_score=score) for pk, score in scores.items()]
+    model.objects.bulk_update(rows, ["trending_score"], batch_size=SCORE_BATCH_SIZE)
+
+
+def _flag_top(model, limit):
+    top = model.objects.filter(trending_score__gt=0).order_by("-trending_score")
+    top_ids = list(top.values_list("pk", flat=True)[:limit])
+    model.objects.filter(is_trending=True).exclude(pk__in=top_ids).update(
+        is_trending=False
+    )
+    model.objects.filter(pk__in=top_ids).update(is_trending=True)
+    return top_ids
+
+
+def refresh_trending_scores(now=None):
+    """
+    Recompute the trending scores of all events and tags.
+
+    Returns the number of events and tags with a non-zero score.
+    """
+    now = now or timezone.now()
+    # The recompute counts the rows behind the queued deltas of finished
+    # minutes, drop those instead of adding them on top. The current minute
+    # is left out of the recompute; apply_activity adds its deltas.
+    for _ in buffers.drain(ACTIVITY_BUFFER, now):
+        pass
+
+    event_scores = compute_event_scores(now, buffers.minute_of(buffers.bucket_of(now)))
+
+    # A tag trends with the events carrying it
+    tag_scores = defaultdict(float)
+    for event_ids in helpers.chunks(event_scores, SCORE_BATCH_SIZE):
+        relations = EventTagRelation.objects.filter(event_id__in=event_ids)
+        for tag_id, event_id in relations.values_list("tag_id", "event_id"):
+            tag_scores[tag_id] += event_scores[event_id]
+
+    with transaction.atomic():
+        _write_scores(Event, event_scores)
+        _write_scores(EventTag, tag_scores)
+        _flag_top(Event, TRENDING_EVENTS_LIMIT)
+        _flag_top(EventTag, TRENDING_TAGS_LIMIT)
+
+    return len(event_scores), len(tag_scores)
@@ -1,10 +1,8 @@
 import logging
-from datetime import timedelta
 
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Avg, Count, F, Prefetch, Q
+from django.db.models import Avg, Count, Exists, F, OuterRef, Prefetch, Q
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
@@ -20,6 +18,7 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from . import checkin, recommendations, registration
 from .models import (
     Event,
     EventAnalytics,
@@ -27,7 +26,6 @@ from .models import (
     EventFavorite,
     EventModerationLog,
     EventTag,
-    EventView,
     Exhibitor,
     Participant,
     Product,
@@ -54,10 +52,35 @@ from .serializers import (
     SessionRatingSerializer,
     SessionSerializer,
 )
+from .tracking import record_event_view
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Error responses for registration engine outcomes
+REGISTRATION_ERRORS = {
+    registration.REGISTRATION_CLOSED: (
+        "Registration is not open for this event.",
+        status.HTTP_400_BAD_REQUEST,
+    ),
+    registration.ALREADY_REGISTERED: (
+        "You are already registered for this event.",
+        status.HTTP_400_BAD_REQUEST,
+    ),
+    registration.EVENT_FULL: (
+        "This event has reached its maximum capacity.",
+        status.HTTP_400_BAD_REQUEST,
+    ),
+    registration.NOT_REGISTERED: (
+        "You are not registered for this event.",
+        status.HTTP_400_BAD_REQUEST,
+    ),
+    registration.IN_PROGRESS: (
+        "A request with this idempotency key is still being processed.",
+        status.HTTP_409_CONFLICT,
+    ),
+}
+
 
 class StandardResultsSetPagination(PageNumberPagination):
     """Standard pagination for API responses."""
@@ -101,15 +124,21 @@ class EventFilter(django_filters.FilterSet):
         field_name="end_date", lookup_expr="lte"
     )
 
+    # Category and tag filters read the denormalized indexes on Event
     categories = django_filters.ModelMultipleChoiceFilter(
-        field_name="eventcategoryrelation__category",
         queryset=EventCategory.objects.all(),
         to_field_name="id",
+        method="filter_categories",
+    )
+    category_tree = django_filters.ModelMultipleChoiceFilter(
+        queryset=EventCategory.objects.all(),
+        to_field_name="id",
+        method="filter_category_tree",
     )
     tags = django_filters.ModelMultipleChoiceFilter(
-        field_name="eventtagrelation__tag",
         queryset=EventTag.objects.all(),
         to_field_name="id",
+        method="filter_tags",
     )
 
     organizer = django_filters.ModelChoiceFilter(queryset=User.objects.all())
@@ -143,6 +172,7 @@ class EventFilter(django_filters.FilterSet):
             "end_date_after",
             "end_date_before",
             "categories",
+            "category_tree",
             "tags",
             "organizer",
             "is_free",
@@ -155,6 +185,26 @@ class EventFilter(django_filters.FilterSet):
             "is_featured",
         ]
 
+    def filter_categories(self, queryset, name, value):
+        """Filter events filed under any of the categories."""
+        if not value:
+            return queryset
+        return queryset.in_categories([category.pk for category in value])
+
+    def filter_category_tree(self, queryset, name, value):
+        """Filter events under any of the categories or their subcategories."""
+        if not value:
+            return queryset
+        return queryset.in_categories(
+            [category.pk for category in value], include_descendants=True
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Filter events with any of the tags."""
+        if not value:
+            return queryset
+        return queryset.with_tags([tag.pk for tag in value])
+
     def filter_is_free(self, queryset, name, value):
         """Filter events by free/paid status."""
         if value is True:
@@ -187,28 +237,10 @@ class EventFilter(django_filters.FilterSet):
     def filter_has_capacity(self, queryset, name, value):
         """Filter events by available capacity."""
         if value is True:
-            return queryset.annotate(
-                participant_count=Count(
-                    "participants",
-                    filter=Q(
-                        participants__registration_status=Participant.RegistrationStatus.CONFIRMED
-                    ),
-                )
-            ).filter(
-                Q(max_participants__isnull=True)
-                | Q(participant_count__lt=F("max_participants"))
-            )
+            return queryset.with_capacity()
         elif value is False:
-            return queryset.annotate(
-                participant_count=Count(
-                    "participants",
-                    filter=Q(
-                        participants__registration_status=Participant.RegistrationStatus.CONFIRMED
-                    ),
-                )
-            ).filter(
-                max_participants__isnull=False,
-                participant_count__gte=F("max_participants"),
+            return queryset.filter(
+                capacity__gt=0, capacity__lte=F("registration_count")
             )
         return queryset
 
@@ -252,12 +284,22 @@ class EventViewSet(viewsets.ModelViewSet):
         "end_date",
         "created_at",
         "updated_at",
-        "registration_fee",
+        "registration_count",
+        "session_count",
+        "rating_avg",
+        "participant_count",
         "average_rating",
     ]
     ordering = ["-created_at"]
     pagination_class = StandardResultsSetPagination
 
+    # Ordering names served by a denormalized counter on Event instead of an
+    # aggregate over participants or session ratings
+    ordering_aliases = {
+        "participant_count": "registration_count",
+        "average_rating": "rating_avg",
+    }
+
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == "list":
@@ -268,64 +310,46 @@ class EventViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """
-        Get optimized queryset with proper prefetching and permission filtering.
+        Plan the queryset for the current action.
+
+        Listings read the denormalized counters on Event, retrieving an event
+        prefetches what the detail serializer renders, and every other action
+        works on the visible events alone.
         """
-        queryset = (
-            Event.objects.select_related("organizer")
-            .prefetch_related(
-                "eventcategoryrelation__category",
-                "eventtagrelation__tag",
-                "co_organizers",
-                Prefetch(
-                    "participants",
-                    queryset=Participant.objects.select_related("user").filter(
-                        registration_status=Participant.RegistrationStatus.CONFIRMED
-                    ),
-                ),
-                Prefetch(
-                    "sessions",
-                    queryset=Session.objects.filter(is_featured=True).order_by(
-                        "start_time"
-                    )[:3],
-                ),
-            )
-            .annotate(
-                participant_count=Count(
-                    "participants",
-                    filter=Q(
-                        participants__registration_status=Participant.RegistrationStatus.CONFIRMED
-                    ),
-                ),
-                session_count=Count("sessions"),
-                average_rating=Avg("sessions__ratings__rating"),
-            )
-        )
+        queryset = self.get_visible_events()
+        if self.action in ("list", "trending", "recommended"):
+            return self.get_list_queryset(queryset)
+        if self.action == "retrieve":
+            return self.get_detail_queryset(queryset)
+        return queryset
 
+    def get_visible_events(self):
+        """Events the requesting user may see, filtered without joins."""
+        queryset = Event.objects.all()
         user = self.request.user
 
         # Apply visibility and permission filters
-        if user.is_authenticated:
-            # Users can see public events, their own events, and events they have permissions for
-            try:
-                accessible_events = get_objects_for_user(
-                    user,
-                    "view_event",
-                    klass=Event.objects.all(),
-                    accept_global_perms=False,
-                )
-                accessible_event_ids = list(
-                    accessible_events.values_list("id", flat=True)
-                )
-            except Exception:
-                accessible_event_ids = []
+        if user.is_authenticated and not user.is_superuser:
+            # Users can see public events, their own events, and events they
+            # have object permissions for. Both relations stay subqueries so
+            # neither an id list nor a DISTINCT over the join is needed.
+            co_organized = Event.co_organizers.through.objects.filter(user=user).values(
+                "event_id"
+            )
+            permitted = get_objects_for_user(
+                user,
+                "view_event",
+                klass=Event,
+                accept_global_perms=False,
+            ).values("pk")
 
             queryset = queryset.filter(
                 Q(visibility=Event.Visibility.PUBLIC)
                 | Q(organizer=user)
-                | Q(co_organizers=user)
-                | Q(id__in=accessible_event_ids)
-            ).distinct()
-        else:
+                | Q(pk__in=co_organized)
+                | Q(pk__in=permitted)
+            )
+        elif not user.is_authenticated:
             # Anonymous users can only see public published events
             queryset = queryset.filter(
                 visibility=Event.Visibility.PUBLIC,
@@ -342,7 +366,62 @@ class EventViewSet(viewsets.ModelViewSet):
                 ]
             )
 
-        return queryset.filter(is_active=True)
+        return queryset
+
+    def get_list_queryset(self, queryset):
+        """Light list queryset: counters, the organizer and the next session."""
+        queryset = queryset.select_related("organizer").prefetch_related(
+            Prefetch(
+                "sessions",
+                queryset=Session.objects.filter(
+                    start_time__gte=timezone.now(),
+                    status=Session.SessionStatus.SCHEDULED,
+                )
+                .order_by("start_time")
+                .prefetch_related(Prefetch("speakers", to_attr="prefetched_speakers")),
+                to_attr="upcoming_sessions",
+            )
+        )
+
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                user_has_favorited=Exists(
+                    EventFavorite.objects.filter(event=OuterRef("pk"), user=user)
+                )
+            )
+
+        # Only alias the counters the requested ordering refers to
+        ordering_param = self.request.query_params.get(
+            filters.OrderingFilter.ordering_param, ""
+        )
+        requested = {term.strip().lstrip("-") for term in ordering_param.split(",")}
+        aliases = {
+            name: F(field)
+            for name, field in self.ordering_aliases.items()
+            if name in requested
+        }
+        if aliases:
+            queryset = queryset.alias(**aliases)
+
+        return queryset
+
+    def get_detail_queryset(self, queryset):
+        """Rich detail queryset prefetching everything the event page shows."""
+        return queryset.select_related("organizer").prefetch_related(
+            "eventcategoryrelation_set__category",
+            "eventtagrelation_set__tag",
+            "co_organizers",
+            # Sliced prefetches cannot be filtered per event; featured
+            # sessions are few, so fetch them all
+            Prefetch(
+                "sessions",
+                queryset=Session.objects.filter(is_featured=True).order_by(
+                    "start_time"
+                ),
+                to_attr="featured_sessions",
+            ),
+        )
 
     def get_permissions(self):
         """
@@ -350,7 +429,7 @@ class EventViewSet(viewsets.ModelViewSet):
         """
         if self.action == "create":
             permission_classes = [permissions.IsAuthenticated]
-        elif self.action in ["update", "partial_update"]:
+        elif self.action in ["update", "partial_update", "check_ins"]:
             permission_classes = [IsEventOrganizerOrCollaborator]
         elif self.action == "destroy":
             permission_classes = [IsOwnerOrReadOnly]
@@ -425,120 +504,65 @@ class EventViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     def _track_event_view(self, event: Event, request) -> None:
-        """Track event view for analytics."""
+        """Track event view for analytics through the buffered ingestion."""
         try:
-            # Only track unique views per user/IP per day
-            cache_key = f"event_view_{event.id}_{request.user.id if request.user.is_authenticated else request.META.get('REMOTE_ADDR')}"
-
-            if not cache.get(cache_key):
-                EventView.objects.create(
-                    event=event,
-                    user=request.user if request.user.is_authenticated else None,
-                    ip_address=request.META.get("REMOTE_ADDR"),
-                    user_agent=request.META.get("HTTP_USER_AGENT", "")[:200],
-                )
-
-                # Update analytics
-                analytics, created = EventAnalytics.objects.get_or_create(event=event)
-                analytics.total_views = F("total_views") + 1
-                if not cache.get(f"unique_view_{cache_key}"):
-                    analytics.unique_views = F("unique_views") + 1
-                    cache.set(
-                        f"unique_view_{cache_key}", True, 60 * 60 * 24
-                    )  # 24 hours
-                analytics.save()
-
-                # Set cache to prevent duplicate tracking
-                cache.set(cache_key, True, 60 * 60)  # 1 hour
-
+            record_event_view(event, request)
         except Exception as e:
             logger.error(f"Error tracking event view: {e}")
 
     @extend_schema(
         summary="Register for event",
-        description="Register the authenticated user for an event.",
+        description=(
+            "Register the authenticated user for an event. When the event is "
+            "full the user joins the waitlist. Send an Idempotency-Key header "
+            "to make retries safe."
+        ),
         request=None,
-        responses={201: ParticipantSerializer},
+        responses={201: ParticipantSerializer, 202: ParticipantSerializer},
     )
     @action(
         detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated]
     )
     @method_decorator(ratelimit(key="user", rate="5/m", method="POST"))
-    @transaction.atomic
     def register(self, request, pk=None):
-        """Register user for event with comprehensive validation."""
+        """Register user for event, waitlisting them when it is full."""
         event = self.get_object()
         user = request.user
 
-        # Validation checks
-        if not event.is_registration_open():
-            return Response(
-                {"error": "Registration is not open for this event."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # Check if user is already registered
-        existing_participant = Participant.objects.filter(
-            user=user, event=event
-        ).first()
-
-        if existing_participant:
-            if (
-                existing_participant.registration_status
-                == Participant.RegistrationStatus.CONFIRMED
-            ):
-                return Response(
-                    {"error": "You are already registered for this event."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            elif (
-                existing_participant.registration_status
-                == Participant.RegistrationStatus.CANCELLED
-            ):
-                # Reactivate cancelled registration
-                existing_participant.registration_status = (
-                    Participant.RegistrationStatus.CONFIRMED
-                )
-                existing_participant.save()
-
-                serializer = ParticipantSerializer(
-                    existing_participant, context={"request": request}
-                )
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-        # Check capacity
-        if event.spots_remaining() is not None and event.spots_remaining() <= 0:
-            return Response(
-                {"error": "This event has reached its maximum capacity."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # Check if event requires approval (implement business logic)
-        registration_status = Participant.RegistrationStatus.CONFIRMED
-
-        # Create participant
-        participant = Participant.objects.create(
-            user=user,
-            event=event,
-            role=Participant.Role.ATTENDEE,
-            registration_status=registration_status,
+        result = registration.register_participant(
+            event,
+            user,
             registration_data=request.data.get("registration_data", {}),
+            idempotency_key=request.headers.get("Idempotency-Key"),
         )
 
-        # Update analytics
-        analytics, created = EventAnalytics.objects.get_or_create(event=event)
-        analytics.total_registrations = F("total_registrations") + 1
-        analytics.save()
+        if result.outcome in REGISTRATION_ERRORS:
+            message, status_code = REGISTRATION_ERRORS[result.outcome]
+            return Response({"error": message}, status=status_code)
 
         # Log registration
-        logger.info(f"User {user.username} registered for event {event.title}")
+        logger.info(
+            f"User {user.username} registration for event {event.name}: {result.outcome}"
+        )
 
-        serializer = ParticipantSerializer(participant, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        serializer = ParticipantSerializer(
+            result.participant, context={"request": request}
+        )
+        return Response(
+            serializer.data,
+            status=(
+                status.HTTP_201_CREATED
+                if result.outcome == registration.CONFIRMED
+                else status.HTTP_202_ACCEPTED
+            ),
+        )
 
     @extend_schema(
         summary="Unregister from event",
-        description="Cancel registration for an event.",
+        description=(
+            "Cancel registration for an event. A freed seat goes to the "
+            "longest waiting participant."
+        ),
         request=None,
         responses={200: {"description": "Successfully unregistered"}},
     )
@@ -546,24 +570,11 @@ class EventViewSet(viewsets.ModelViewSet):
         detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated]
     )
     @method_decorator(ratelimit(key="user", rate="10/m", method="POST"))
-    @transaction.atomic
     def unregister(self, request, pk=None):
         """Unregister user from event."""
         event = self.get_object()
         user = request.user
 
-        try:
-            participant = Participant.objects.get(
-                user=user,
-                event=event,
-                registration_status=Participant.RegistrationStatus.CONFIRMED,
-            )
-        except Participant.DoesNotExist:
-            return Response(
-                {"error": "You are not registered for this event."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         # Check cancellation policy (implement business logic)
         hours_until_event = (event.start_date - timezone.now()).total_seconds() / 3600
         if hours_until_event < 24:  # Less than 24 hours
@@ -574,12 +585,15 @@ class EventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Cancel registration
-        participant.registration_status = Participant.RegistrationStatus.CANCELLED
-        participant.save()
+        result = registration.cancel_registration(
+            event, user, idempotency_key=request.headers.get("Idempotency-Key")
+        )
+        if result.outcome in REGISTRATION_ERRORS:
+            message, status_code = REGISTRATION_ERRORS[result.outcome]
+            return Response({"error": message}, status=status_code)
 
         # Log cancellation
-        logger.info(f"User {user.username} unregistered from event {event.title}")
+        logger.info(f"User {user.username} unregistered from event {event.name}")
 
         return Response(
             {"message": "Successfully unregistered from the event."},
@@ -670,6 +684,55 @@ class EventViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    @extend_schema(
+        summary="Sync check-in scans",
+        description=(
+            "Check in a batch of badge scans, e.g. uploaded by a gate scanner "
+            "after working offline. Each scan has a participant_id or "
+            "ticket_code and optionally the ISO 8601 time it was scanned at."
+        ),
+        responses={200: {"description": "Checked in count and rejected scans"}},
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="check-ins",
+        permission_classes=[IsEventOrganizerOrCollaborator],
+    )
+    def check_ins(self, request, pk=None):
+        """Check in a batch of scans (organizers only)."""
+        event = self.get_object()
+
+        payload = request.data.get("scans")
+        if not isinstance(payload, list) or not payload:
+            return Response(
+                {"error": "scans must be a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(payload) > checkin.CHECK_IN_BATCH_LIMIT:
+            return Response(
+                {
+                    "error": f"At most {checkin.CHECK_IN_BATCH_LIMIT} scans "
+                    "can be synced at once."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            scans, rejected = checkin.scans_from_payload(payload)
+            result = checkin.check_in_participants(event, scans)
+            rejected.update(result.rejected)
+            return Response(
+                {"checked_in": len(result.checked_in), "rejected": rejected}
+            )
+
+        except Exception as e:
+            logger.error(f"Error syncing check-ins: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Failed to sync check-ins"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     @extend_schema(
         summary="Toggle event favorite",
         description="Add or remove event from user's favorites.",
@@ -729,25 +792,14 @@ class EventViewSet(viewsets.ModelViewSet):
     @method_decorator(cache_page(60 * 10))  # Cache for 10 minutes
     def trending(self, request):
         """Get trending events based on recent activity."""
-        # Calculate trending score based on recent registrations, views, and ratings
-        one_week_ago = timezone.now() - timedelta(days=7)
-
+        # Scores are kept current by the trending subsystem
         events = (
             self.get_queryset()
             .filter(
                 status__in=[Event.EventStatus.PUBLISHED, Event.EventStatus.LIVE],
                 start_date__gte=timezone.now(),
+                trending_score__gt=0,
             )
-            .annotate(
-                recent_registrations=Count(
-                    "participants", filter=Q(participants__created_at__gte=one_week_ago)
-                ),
-                recent_views=Count(
-                    "views", filter=Q(views__created_at__gte=one_week_ago)
-                ),
-                trending_score=F("recent_registrations") * 3 + F("recent_views"),
-            )
-            .filter(trending_score__gt=0)
             .order_by("-trending_score")[:20]
         )
 
@@ -756,6 +808,42 @@ class EventViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    @extend_schema(
+        summary="Get recommended events",
+        description=(
+            "Get upcoming events recommended for the authenticated user from "
+            "their favorites, registrations and views. Falls back to trending "
+            "events for users without recommendations yet."
+        ),
+        responses={200: EventListSerializer(many=True)},
+    )
+    @action(
+        detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated]
+    )
+    def recommended(self, request):
+        """Get the precomputed recommendations of the user."""
+        events = self.get_queryset().filter(
+            status__in=recommendations.RECOMMENDABLE_STATUSES,
+            end_date__gte=timezone.now(),
+        )
+        recommended = events.filter(recommendations__user=request.user).order_by(
+            "-recommendations__score"
+        )[: recommendations.USER_RECOMMENDATIONS_LIMIT]
+
+        serializer = EventListSerializer(
+            recommended, many=True, context={"request": request}
+        )
+        if serializer.data:
+            return Response(serializer.data)
+
+        trending = events.filter(trending_score__gt=0).order_by("-trending_score")[
+            : recommendations.USER_RECOMMENDATIONS_LIMIT
+        ]
+        serializer = EventListSerializer(
+            trending, many=True, context={"request": request}
+        )
+        return Response(serializer.data)
+
     @extend_schema(
         summary="Get user's events",
         description="Get events organized by or participated in by the authenticated user.",
@@ -850,18 +938,11 @@ class EventCategoryViewSet(viewsets.ReadOnlyModelViewSet):
         """Get events in category."""
         category = self.get_object()
 
-        # Get events in this category and its descendants
-        descendant_categories = category.get_descendants(include_self=True)
-
+        # Events in this category and its descendants, from the tree index
         events = (
-            Event.objects.filter(
-                categories__category__in=descendant_categories,
-                is_active=True,
-                status__in=[Event.EventStatus.PUBLISHED, Event.EventStatus.LIVE],
-            )
+            Event.objects.in_categories([category.pk], include_descendants=True)
+            .filter(status__in=[Event.EventStatus.PUBLISHED, Event.EventStatus.LIVE])
             .select_related("organizer")
-            .prefetch_related("categories__category", "tags__tag")
-            .distinct()
             .order_by("-created_at")
         )
 
@@ -901,19 +982,9 @@ class EventTagViewSet(viewsets.ReadOnlyModelViewSet):
     @method_decorator(cache_page(60 * 30))  # Cache for 30 minutes
     def trending(self, request):
         """Get trending tags."""
-        one_month_ago = timezone.now() - timedelta(days=30)
-
-        trending_tags = (
-            EventTag.objects.filter(
-                events__created_at__gte=one_month_ago,
-                events__status__in=[
-                    Event.EventStatus.PUBLISHED,
-                    Event.EventStatus.LIVE,
-                ],
-            )
-            .annotate(usage_count=Count("events"))
-            .order_by("-usage_count")[:20]
-        )
+        trending_tags = EventTag.objects.filter(trending_score__gt=0).order_by(
+            "-trending_score"
+        )[:20]
 
         serializer = self.get_serializer(trending_tags, many=True)
         return Response(serializer.data)
@@ -1084,23 +1155,23 @@ class ParticipantViewSet(viewsets.ModelViewSet):
         )
 
     def perform_create(self, serializer):
-        """Register user for event."""
-        event = serializer.validated_data["event"]
-
-        # Check if registration is open
-        now = timezone.now()
-        if event.registration_end_date and event.registration_end_date < now:
-            raise ValidationError("Registration has closed for this event")
-
-        # Check capacity
-        if event.max_participants:
-            current_count = event.participants.filter(
-                registration_status=Participant.RegistrationStatus.CONFIRMED
-            ).count()
-            if current_count >= event.max_participants:
-                raise ValidationError("Event is at full capacity")
+        """Register user for event through the registration engine."""
+        result = registration.register_participant(
+            serializer.validated_data["event"],
+            self.request.user,
+            registration_data=serializer.validated_data.get("registration_data"),
+            idempotency_key=self.request.headers.get("Idempotency-Key"),
+        )
+        if result.outcome in REGISTRATION_ERRORS:
+            raise ValidationError(REGISTRATION_ERRORS[result.outcome][0])
 
-        serializer.save(user=self.request.user)
+        # Seat status is decided by the engine, never by the request body
+        participant = result.participant
+        notes = serializer.validated_data.get("notes")
+        if notes and not result.replayed:
+            participant.notes = notes
+            participant.save(update_fields=["notes", "updated_at"])
+        serializer.instance = participant
 
     @extend_schema(
         summary="Check in participant",
@@ -1115,10 +1186,17 @@ class ParticipantViewSet(viewsets.ModelViewSet):
     def check_in(self, request, pk=None):
         """Check in a participant."""
         participant = self.get_object()
-        participant.check_in_time = timezone.now()
-        participant.attendance_status = Participant.AttendanceStatus.CHECKED_IN
-        participant.save()
+        result = checkin.check_in_participants(
+            participant.event, [checkin.Scan(str(participant.pk))]
+        )
+        outcome = result.rejected.get(str(participant.pk))
+        if outcome in (checkin.NOT_CONFIRMED, checkin.NOT_REGISTERED):
+            return Response(
+                {"error": "Only confirmed participants can be checked in."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        participant.refresh_from_db(fields=["check_in_time", "attendance_status"])
         serializer = self.get_serializer(participant)
         return Response(serializer.data)
 
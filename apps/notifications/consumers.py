@@ -100,6 +100,17 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
         )
 
+    async def assessment_graded(self, event):
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "assessment_graded",
+                    "result": event["result"],
+                    "timestamp": event["timestamp"],
+                }
+            )
+        )
+
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
         try:
@@ -2,6 +2,7 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
 from django.utils.translation import gettext_lazy as _
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -159,7 +160,7 @@ AUTHENTICATION_BACKENDS = (
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.accounts.authentication.JWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
@@ -275,6 +276,40 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Tehran"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+CELERY_BEAT_SCHEDULE = {
+    "flush-user-activity": {
+        "task": "apps.accounts.tasks.flush_user_activity",
+        "schedule": 60.0,
+    },
+    "flush-profile-views": {
+        "task": "apps.accounts.tasks.flush_profile_views",
+        "schedule": 60.0,
+    },
+    "age-profile-view-counters": {
+        "task": "apps.accounts.tasks.age_profile_view_counters",
+        "schedule": crontab(minute=15, hour=2),
+    },
+    "flush-event-views": {
+        "task": "apps.events.tasks.flush_event_views",
+        "schedule": 60.0,
+    },
+    "apply-trending-activity": {
+        "task": "apps.events.tasks.apply_trending_activity",
+        "schedule": 60.0,
+    },
+    "refresh-event-recommendations": {
+        "task": "apps.events.tasks.refresh_event_recommendations",
+        "schedule": crontab(minute=45),
+    },
+    "rebuild-event-recommendations": {
+        "task": "apps.events.tasks.rebuild_event_recommendations",
+        "schedule": crontab(minute=0, hour=3, day_of_week="sunday"),
+    },
+    "rebuild-course-stats": {
+        "task": "apps.course.tasks.rebuild_all_course_stats",
+        "schedule": crontab(minute=30, hour=2),
+    },
+}
 
 
 SENTRY_DSN = os.environ.get("SENTRY_DSN", "")
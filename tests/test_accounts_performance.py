@@ -0,0 +1,1944 @@
+import csv
+import io
+import json
+import os
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.http import HttpRequest
+from django.test import TestCase, TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt import authentication as simplejwt_authentication
+from rest_framework_simplejwt import tokens as simplejwt_tokens
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from apps.accounts import (
+    activity,
+    authentication,
+    engagement,
+    graph,
+    profile_views,
+    reports,
+    search,
+    stats,
+    suggestions,
+)
+from apps.accounts import tasks as account_tasks
+from apps.accounts.models import (
+    ActivityLog,
+    Connection,
+    ConnectionSuggestion,
+    Department,
+    Education,
+    Experience,
+    Follow,
+    Message,
+    Notification,
+    ProfileSearchDocument,
+    ProfileStats,
+    ProfileView,
+    Project,
+    Recommendation,
+    Role,
+    Skill,
+    SkillEndorsement,
+    UserDepartment,
+    UserProfile,
+    UserRole,
+)
+from apps.accounts.permissions import (
+    HasRole,
+    IsDepartmentHead,
+    IsDepartmentMember,
+    can_view_user_profile,
+    has_role,
+    is_department_head,
+    is_same_department,
+)
+from apps.accounts.signals import (
+    calculate_profile_engagement_score,
+    send_connection_suggestions,
+    update_skill_trending_scores,
+)
+from apps.accounts.views.auth import get_tokens_for_user
+from apps.accounts.views.user import UserViewSet
+from apps.common import buffers
+
+User = get_user_model()
+
+# Scale of the load simulations; the target benchmark is a 1M-edge social
+# graph, raise these locally for realistic numbers
+LOAD_TEST_GRAPH_USERS = int(os.environ.get("ACCOUNTS_LOAD_TEST_GRAPH_USERS", 5000))
+LOAD_TEST_GRAPH_EDGES = int(os.environ.get("ACCOUNTS_LOAD_TEST_GRAPH_EDGES", 100000))
+LOAD_TEST_GRAPH_CHECKS = int(os.environ.get("ACCOUNTS_LOAD_TEST_GRAPH_CHECKS", 2000))
+LOAD_TEST_SUGGESTION_USERS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_SUGGESTION_USERS", 10000)
+)
+LOAD_TEST_SUGGESTION_DEGREE = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_SUGGESTION_DEGREE", 10)
+)
+LOAD_TEST_ENGAGEMENT_USERS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_ENGAGEMENT_USERS", 10000)
+)
+LOAD_TEST_SEARCH_PROFILES = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_SEARCH_PROFILES", 20000)
+)
+LOAD_TEST_SEARCH_QUERIES = int(os.environ.get("ACCOUNTS_LOAD_TEST_SEARCH_QUERIES", 20))
+LOAD_TEST_ANALYTICS_USERS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_ANALYTICS_USERS", 10000)
+)
+LOAD_TEST_ANALYTICS_REQUESTS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_ANALYTICS_REQUESTS", 200)
+)
+LOAD_TEST_PERMISSION_REQUESTS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_PERMISSION_REQUESTS", 200)
+)
+LOAD_TEST_PERMISSION_PAGE_SIZE = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_PERMISSION_PAGE_SIZE", 50)
+)
+LOAD_TEST_AUTH_USERS = int(os.environ.get("ACCOUNTS_LOAD_TEST_AUTH_USERS", 1000))
+LOAD_TEST_AUTH_REQUESTS = int(os.environ.get("ACCOUNTS_LOAD_TEST_AUTH_REQUESTS", 2000))
+LOAD_TEST_ACTIVITY_USERS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_ACTIVITY_USERS", 10000)
+)
+LOAD_TEST_ACTIVITY_EVENTS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_ACTIVITY_EVENTS", 50000)
+)
+LOAD_TEST_ACTIVITY_MINUTES = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_ACTIVITY_MINUTES", 10)
+)
+LOAD_TEST_PROFILE_VIEW_USERS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_PROFILE_VIEW_USERS", 1000)
+)
+LOAD_TEST_PROFILE_VIEW_REQUESTS = int(
+    os.environ.get("ACCOUNTS_LOAD_TEST_PROFILE_VIEW_REQUESTS", 500)
+)
+# The target benchmark is 1M users
+LOAD_TEST_REPORT_USERS = int(os.environ.get("ACCOUNTS_LOAD_TEST_REPORT_USERS", 20000))
+LOAD_TEST_REPORT_DAYS = int(os.environ.get("ACCOUNTS_LOAD_TEST_REPORT_DAYS", 90))
+
+# Load simulations seed thousands of rows and run for minutes, so they are
+# opt-in: RUN_LOAD_TESTS=1 pytest -m load tests/test_*_performance.py
+RUN_LOAD_TESTS = bool(os.environ.get("RUN_LOAD_TESTS"))
+
+
+def load_test(test):
+    """Tag a load simulation ``load`` and skip it unless RUN_LOAD_TESTS is set"""
+    test = skipUnless(RUN_LOAD_TESTS, "load tests run with RUN_LOAD_TESTS=1")(test)
+    return tag("load")(test)
+
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 1000000},
+    }
+}
+
+
+def app_queries(context):
+    """Queries issued by the code under test, without silk's bookkeeping"""
+    return [
+        q
+        for q in context.captured_queries
+        if not q["sql"].startswith(("EXPLAIN", "SAVEPOINT", "RELEASE SAVEPOINT"))
+        and "silk_" not in q["sql"]
+    ]
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username,
+        email=f"{username}@example.com",
+        password="testpass123",
+        **kwargs,
+    )
+
+
+def connect(from_user, to_user, status=Connection.ConnectionStatus.ACCEPTED):
+    return Connection.objects.create(
+        from_user=from_user, to_user=to_user, status=status
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SocialGraphCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = create_user("alice")
+        self.bob = create_user("bob")
+        self.carol = create_user("carol")
+        self.dave = create_user("dave")
+
+    def test_neighbors_are_connected_and_mutual(self):
+        connect(self.alice, self.bob)
+        connect(self.carol, self.alice)
+        connect(self.bob, self.carol)
+        connect(self.dave, self.alice, status=Connection.ConnectionStatus.PENDING)
+
+        self.assertEqual(graph.neighbors(self.alice), {self.bob.pk, self.carol.pk})
+        self.assertTrue(graph.are_connected(self.alice, self.carol))
+        self.assertTrue(graph.are_connected(self.carol.pk, self.alice.pk))
+        self.assertFalse(graph.are_connected(self.alice, self.dave))
+        self.assertFalse(graph.are_connected(self.alice, self.alice))
+        self.assertEqual(graph.mutual(self.alice, self.bob), {self.carol.pk})
+        self.assertEqual(graph.neighbors(self.dave), frozenset())
+
+    def test_cached_reads_skip_the_database(self):
+        connect(self.alice, self.bob)
+        graph.neighbors(self.alice)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(graph.are_connected(self.alice, self.bob))
+            self.assertEqual(graph.mutual(self.alice, self.bob), frozenset())
+        # Only bob's set was not cached yet
+        self.assertEqual(len(app_queries(context)), 1)
+
+    def test_signals_refresh_connections(self):
+        request = connect(
+            self.alice, self.bob, status=Connection.ConnectionStatus.PENDING
+        )
+        self.assertFalse(graph.are_connected(self.alice, self.bob))
+
+        request.status = Connection.ConnectionStatus.ACCEPTED
+        request.save()
+        self.assertTrue(graph.are_connected(self.alice, self.bob))
+        self.assertTrue(graph.are_connected(self.bob, self.alice))
+
+        request.delete()
+        self.assertFalse(graph.are_connected(self.alice, self.bob))
+        self.assertFalse(graph.are_connected(self.bob, self.alice))
+
+    def test_signals_refresh_follows(self):
+        self.assertFalse(graph.is_following(self.alice, self.bob))
+        self.assertEqual(graph.followers(self.bob), frozenset())
+
+        follow = Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertTrue(graph.is_following(self.alice, self.bob))
+        self.assertEqual(graph.followers(self.bob), {self.alice.pk})
+        self.assertFalse(graph.is_following(self.bob, self.alice))
+
+        follow.delete()
+        self.assertFalse(graph.is_following(self.alice, self.bob))
+        self.assertEqual(graph.followers(self.bob), frozenset())
+
+    def test_connections_only_profiles(self):
+        UserProfile.objects.filter(user__in=[self.bob, self.carol]).update(
+            profile_visibility=UserProfile.ProfileVisibility.CONNECTIONS_ONLY
+        )
+        self.bob.refresh_from_db()
+        self.assertFalse(can_view_user_profile(self.alice, self.bob))
+
+        connect(self.alice, self.bob)
+        self.assertTrue(can_view_user_profile(self.alice, self.bob))
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(can_view_user_profile(self.alice, self.bob))
+        self.assertFalse(
+            [q for q in app_queries(context) if "accounts_connection" in q["sql"]]
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.get(reverse("user-list"), {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        results = response.data.get("results", response.data)
+        usernames = {row["username"] for row in results}
+        self.assertIn("bob", usernames)
+        self.assertNotIn("carol", usernames)
+
+    def test_warm_loads_every_user(self):
+        connect(self.alice, self.bob)
+        connect(self.bob, self.carol)
+        Follow.objects.create(follower=self.dave, following=self.alice)
+
+        self.assertEqual(graph.warm(), 3)
+        self.assertEqual(graph.warm(graph.FOLLOWING), 1)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(graph.neighbors(self.bob), {self.alice.pk, self.carol.pk})
+            self.assertTrue(graph.is_following(self.dave, self.alice))
+        self.assertEqual(app_queries(context), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class SocialGraphLoadTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _seed(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_GRAPH_USERS)
+            ],
+            batch_size=1000,
+        )
+        ids = [user.pk for user in users]
+        rng = random.Random(41)
+        edges = set()
+        while len(edges) < LOAD_TEST_GRAPH_EDGES:
+            from_id, to_id = rng.sample(ids, 2)
+            if (to_id, from_id) not in edges:
+                edges.add((from_id, to_id))
+        Connection.objects.bulk_create(
+            [
+                Connection(
+                    from_user_id=from_id,
+                    to_user_id=to_id,
+                    status=Connection.ConnectionStatus.ACCEPTED,
+                )
+                for from_id, to_id in edges
+            ],
+            batch_size=5000,
+        )
+        return ids, edges
+
+    @staticmethod
+    def _query_connected(user_id, other_id):
+        """The per-call OR query ``are_connected`` used to run"""
+        return Connection.objects.filter(
+            Q(from_user_id=user_id, to_user_id=other_id)
+            | Q(from_user_id=other_id, to_user_id=user_id),
+            status=Connection.ConnectionStatus.ACCEPTED,
+        ).exists()
+
+    def test_graph_matches_queries_and_is_faster(self):
+        ids, edges = self._seed()
+        rng = random.Random(7)
+        pairs = [tuple(rng.sample(ids, 2)) for _ in range(LOAD_TEST_GRAPH_CHECKS)]
+        pairs += rng.sample(sorted(edges), min(len(edges), LOAD_TEST_GRAPH_CHECKS))
+
+        started = time.perf_counter()
+        expected = [self._query_connected(a, b) for a, b in pairs]
+        queried = time.perf_counter() - started
+
+        graph.warm()
+
+        started = time.perf_counter()
+        actual = [graph.are_connected(a, b) for a, b in pairs]
+        cached = time.perf_counter() - started
+
+        self.assertEqual(actual, expected)
+        self.assertLess(cached, queried)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConnectionSuggestionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol, self.dave, self.erin, self.frank = (
+            create_user(name)
+            for name in ["alice", "bob", "carol", "dave", "erin", "frank"]
+        )
+        UserProfile.objects.update(
+            profile_visibility=UserProfile.ProfileVisibility.PUBLIC
+        )
+        # alice knows bob and carol, who both know dave; bob also knows erin
+        connect(self.alice, self.bob)
+        connect(self.carol, self.alice)
+        connect(self.bob, self.dave)
+        connect(self.dave, self.carol)
+        connect(self.bob, self.erin)
+
+    def _experience(self, user, company, is_current=True):
+        return Experience.objects.create(
+            user=user,
+            title="Engineer",
+            company=company,
+            start_date=date(2020, 1, 1),
+            is_current=is_current,
+        )
+
+    def _suggested(self, user):
+        return list(
+            ConnectionSuggestion.objects.filter(user=user)
+            .order_by("-score")
+            .values_list("suggested_user__username", "mutual_connections")
+        )
+
+    def test_mutual_connections_rank_first(self):
+        active = User.objects.filter(status=User.UserStatus.ACTIVE).count()
+        self.assertEqual(suggestions.build_suggestions(), active)
+        self.assertEqual(self._suggested(self.alice), [("dave", 2), ("erin", 1)])
+        self.assertCountEqual(self._suggested(self.erin), [("alice", 1), ("dave", 1)])
+
+    def test_companies_and_schools(self):
+        self._experience(self.alice, "Acme")
+        self._experience(self.frank, " acme ")
+        self._experience(self.erin, "Acme", is_current=False)
+        Education.objects.create(
+            user=self.frank,
+            institution="MIT",
+            degree="BSc",
+            field_of_study="CS",
+            start_date=date(2010, 1, 1),
+        )
+        Education.objects.create(
+            user=self.dave,
+            institution="MIT",
+            degree="MSc",
+            field_of_study="CS",
+            start_date=date(2014, 1, 1),
+        )
+
+        suggestions.build_suggestions()
+        row = ConnectionSuggestion.objects.get(
+            user=self.alice, suggested_user=self.frank
+        )
+        self.assertEqual((row.shared_companies, row.mutual_connections), (1, 0))
+        self.assertEqual(row.score, suggestions.SUGGESTION_WEIGHTS["company"])
+        self.assertTrue(
+            ConnectionSuggestion.objects.filter(
+                user=self.dave, suggested_user=self.frank, shared_schools=1
+            ).exists()
+        )
+        self.assertFalse(
+            ConnectionSuggestion.objects.filter(
+                user=self.alice, suggested_user=self.erin, shared_companies__gt=0
+            ).exists()
+        )
+
+    def test_requests_and_inactive_users_are_skipped(self):
+        connect(self.erin, self.alice, status=Connection.ConnectionStatus.DECLINED)
+        self.dave.status = User.UserStatus.SUSPENDED
+        self.dave.save()
+
+        suggestions.build_suggestions()
+        self.assertEqual(self._suggested(self.alice), [])
+        self.assertFalse(ConnectionSuggestion.objects.filter(user=self.dave).exists())
+
+    def test_sending_a_request_drops_the_suggestion(self):
+        suggestions.build_suggestions()
+        connect(self.dave, self.alice, status=Connection.ConnectionStatus.PENDING)
+        self.assertEqual(self._suggested(self.alice), [("erin", 1)])
+        self.assertFalse(
+            ConnectionSuggestion.objects.filter(
+                user=self.dave, suggested_user=self.alice
+            ).exists()
+        )
+
+    def test_suggestions_endpoint_reads_stored_rows(self):
+        suggestions.build_suggestions()
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        response = client.get(reverse("user-suggestions"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["username"] for row in response.data], ["dave", "erin"])
+
+    def test_notifications_are_batched(self):
+        def reads(context):
+            # Bulk inserts are split into batches the database accepts
+            return len(
+                [q for q in app_queries(context) if not q["sql"].startswith("INSERT")]
+            )
+
+        suggestions.build_suggestions()
+        with CaptureQueriesContext(connection) as context:
+            send_connection_suggestions()
+        first_run = reads(context)
+
+        notifications = Notification.objects.filter(title__startswith="You might know")
+        self.assertEqual(notifications.filter(recipient=self.alice).count(), 2)
+        self.assertEqual(notifications.count(), ConnectionSuggestion.objects.count())
+
+        # More users do not mean more queries
+        for index in range(20):
+            connect(self.erin, create_user(f"friend{index}"))
+        with CaptureQueriesContext(connection) as context:
+            send_connection_suggestions()
+        self.assertEqual(reads(context), first_run)
+        # At most five a day per user
+        self.assertEqual(notifications.filter(recipient=self.bob).count(), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class ConnectionSuggestionLoadTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_build_suggestions_at_scale(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_SUGGESTION_USERS)
+            ],
+            batch_size=1000,
+        )
+        ids = [user.pk for user in users]
+        rng = random.Random(42)
+        edges = set()
+        for from_id in ids:
+            for to_id in rng.sample(ids, LOAD_TEST_SUGGESTION_DEGREE // 2):
+                if from_id != to_id and (to_id, from_id) not in edges:
+                    edges.add((from_id, to_id))
+        Connection.objects.bulk_create(
+            [
+                Connection(
+                    from_user_id=from_id,
+                    to_user_id=to_id,
+                    status=Connection.ConnectionStatus.ACCEPTED,
+                )
+                for from_id, to_id in edges
+            ],
+            batch_size=5000,
+        )
+        Experience.objects.bulk_create(
+            [
+                Experience(
+                    user_id=user_id,
+                    title="Engineer",
+                    company=f"Company {rng.randrange(len(ids) // 50)}",
+                    start_date=date(2020, 1, 1),
+                    is_current=True,
+                )
+                for user_id in ids
+            ],
+            batch_size=5000,
+        )
+
+        processed = suggestions.build_suggestions()
+
+        adjacency = suggestions.load_adjacency()
+        memberships = suggestions.load_memberships()
+
+        self.assertGreaterEqual(processed, len(ids))
+        self.assertEqual(len(adjacency), len(ids))
+        self.assertTrue(memberships["company"])
+        self.assertGreater(
+            ConnectionSuggestion.objects.count(),
+            len(ids) * (suggestions.SUGGESTIONS_LIMIT - 1),
+        )
+
+
+def create_skill(user, name="Python"):
+    return Skill.objects.create(user=user, name=name, category="Programming", level=3)
+
+
+class EngagementScoreTestCase(TestCase):
+    def setUp(self):
+        self.alice = create_user("alice")
+        self.bob = create_user("bob")
+        self.carol = create_user("carol")
+        self.python = create_skill(self.alice)
+
+    def _engage(self):
+        """alice: 2 views, 1 endorsement, 1 recommendation, 1 connection, 1 message"""
+        ProfileView.objects.create(viewer=self.bob, profile_owner=self.alice)
+        ProfileView.objects.create(viewer=self.carol, profile_owner=self.alice)
+        SkillEndorsement.objects.create(skill=self.python, endorser=self.bob)
+        Recommendation.objects.create(
+            recommender=self.carol,
+            recommendee=self.alice,
+            relationship_type=Recommendation.RecommendationType.COLLEAGUE,
+            title="Great",
+            content="Great to work with",
+        )
+        connect(self.alice, self.bob)
+        Message.objects.create(sender=self.bob, recipient=self.alice, content="Hi")
+
+    def _score(self, user):
+        return ProfileStats.objects.get(user=user).engagement_score
+
+    def test_weekly_scores(self):
+        self._engage()
+        # Outside the window
+        old = ProfileView.objects.create(viewer=self.carol, profile_owner=self.bob)
+        ProfileView.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=8)
+        )
+
+        calculate_profile_engagement_score()
+        self.assertEqual(self._score(self.alice), 2 * 1 + 3 + 5 + 4 + 2)
+        # One connection and one message
+        self.assertEqual(self._score(self.bob), 4 + 2)
+        self.assertEqual(self._score(self.carol), 0)
+
+    @override_settings(PROFILE_ENGAGEMENT_WEIGHTS={"profile_views": 10.0})
+    def test_configurable_weights(self):
+        self._engage()
+        engagement.update_engagement_scores()
+        self.assertEqual(self._score(self.alice), 20)
+        self.assertEqual(self._score(self.bob), 0)
+
+    def test_inactive_users_and_missing_stats(self):
+        self._engage()
+        engagement.update_engagement_scores()
+        ProfileStats.objects.filter(user=self.bob).delete()
+        self.alice.status = User.UserStatus.SUSPENDED
+        self.alice.save()
+
+        self.assertEqual(engagement.update_engagement_scores(), 1)
+        self.assertEqual(self._score(self.alice), 0)
+        self.assertEqual(self._score(self.bob), 6)
+
+    def test_query_count_does_not_grow_with_users(self):
+        def distinct_scores():
+            return (
+                ProfileStats.objects.exclude(engagement_score=0)
+                .values("engagement_score")
+                .distinct()
+                .count()
+            )
+
+        self._engage()
+        with CaptureQueriesContext(connection) as context:
+            engagement.update_engagement_scores()
+        # One UPDATE per distinct score on top of a fixed number of queries
+        fixed = len(app_queries(context)) - distinct_scores()
+
+        for index in range(20):
+            user = create_user(f"viewer{index}")
+            ProfileView.objects.create(viewer=user, profile_owner=self.carol)
+            Message.objects.create(sender=user, recipient=self.bob, content="Hi")
+        with CaptureQueriesContext(connection) as context:
+            engagement.update_engagement_scores()
+        self.assertEqual(len(app_queries(context)), fixed + distinct_scores())
+
+    def test_skill_trending_scores_are_stored(self):
+        rust = create_skill(self.bob, "Rust")
+        for endorser in [self.alice, self.carol]:
+            SkillEndorsement.objects.create(skill=rust, endorser=endorser)
+        SkillEndorsement.objects.create(skill=self.python, endorser=self.bob)
+        stale = create_skill(self.carol, "Perl")
+        Skill.objects.filter(pk=stale.pk).update(
+            created_at=timezone.now() - timedelta(days=30), trending_score=9
+        )
+
+        update_skill_trending_scores()
+        scores = dict(Skill.objects.values_list("name", "trending_score"))
+        # recent endorsements x3 + new skill + total endorsements
+        self.assertEqual(
+            scores, {"Rust": 2 * 3 + 1 + 2, "Python": 3 + 1 + 1, "Perl": 0}
+        )
+
+        SkillEndorsement.objects.update(created_at=timezone.now() - timedelta(days=8))
+        Skill.objects.update(created_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(engagement.update_skill_scores(), 0)
+        self.assertFalse(Skill.objects.filter(trending_score__gt=0).exists())
+
+
+@load_test
+class EngagementScoreLoadTestCase(TestCase):
+    def test_scores_at_scale(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_ENGAGEMENT_USERS)
+            ],
+            batch_size=1000,
+        )
+        ids = [user.pk for user in users]
+        ProfileStats.objects.bulk_create(
+            [ProfileStats(user_id=user_id) for user_id in ids], batch_size=5000
+        )
+        rng = random.Random(43)
+        ProfileView.objects.bulk_create(
+            [
+                ProfileView(viewer_id=rng.choice(ids), profile_owner_id=rng.choice(ids))
+                for _ in range(len(ids) * 2)
+            ],
+            batch_size=5000,
+        )
+        Message.objects.bulk_create(
+            [
+                Message(
+                    sender_id=rng.choice(ids),
+                    recipient_id=rng.choice(ids),
+                    content="Hi",
+                )
+                for _ in range(len(ids))
+            ],
+            batch_size=5000,
+        )
+
+        scored = engagement.update_engagement_scores()
+
+        self.assertGreater(scored, len(ids) // 2)
+        self.assertEqual(
+            ProfileStats.objects.filter(engagement_score__gt=0).count(), scored
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfileSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice = create_user(
+                "alice",
+                first_name="Alice",
+                last_name="Smith",
+                headline="Backend engineer",
+                location="Berlin",
+            )
+            self.bob = create_user(
+                "bob", first_name="Bob", last_name="Jones", location="Berlin"
+            )
+            self.carol = create_user(
+                "carol", first_name="Carol", last_name="White", location="Paris"
+            )
+            self.viewer = create_user("viewer")
+            create_skill(self.alice, "Python")
+            create_skill(self.bob, "Python")
+            create_skill(self.carol, "Go")
+            Experience.objects.create(
+                user=self.alice,
+                title="Senior Developer",
+                company="Acme",
+                start_date=date(2020, 1, 1),
+                is_current=True,
+            )
+            Education.objects.create(
+                user=self.bob,
+                institution="TU Berlin",
+                degree="MSc",
+                field_of_study="Computer Science",
+                start_date=date(2015, 1, 1),
+            )
+        UserProfile.objects.update(
+            profile_visibility=UserProfile.ProfileVisibility.PUBLIC
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _search(self, **data):
+        response = self.client.post(
+            reverse("user-search-profiles"), data, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _usernames(self, data):
+        return [row["username"] for row in data["results"]]
+
+    def test_documents_follow_profile_content(self):
+        document = ProfileSearchDocument.objects.get(user=self.alice)
+        self.assertIn("Alice Smith", document.name)
+        self.assertEqual(document.headline, "Backend engineer")
+        self.assertEqual(document.skills, "Python")
+        self.assertEqual(document.skill_index, ",python,")
+        self.assertEqual(document.titles, "Senior Developer")
+        self.assertEqual(document.companies, "Acme")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.filter(user=self.alice).get().delete()
+            self.alice.location = "Hamburg"
+            self.alice.save()
+        document.refresh_from_db()
+        self.assertEqual(document.skill_index, "")
+        self.assertEqual(document.location, "Hamburg")
+
+    def test_unsearchable_profiles_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.carol.profile.searchable = False
+            self.carol.profile.save()
+        self.assertFalse(ProfileSearchDocument.objects.filter(user=self.carol).exists())
+        self.assertNotIn("carol", self._usernames(self._search(query="Carol")))
+
+    def test_text_search_uses_the_full_text_index(self):
+        self.assertEqual(search._backend(connection), "fts5")
+        # Prefix matches across name, skills, companies and schools
+        self.assertEqual(list(search.match("ali")), [self.alice.pk])
+        self.assertEqual(list(search.match("acme")), [self.alice.pk])
+        self.assertEqual(list(search.match("berlin tu")), [self.bob.pk])
+        self.assertCountEqual(search.match("python"), [self.alice.pk, self.bob.pk])
+        self.assertEqual(search.match("!!!"), {})
+
+    def test_filters_and_facets(self):
+        data = self._search(skills=["python"], location="berlin")
+        self.assertCountEqual(self._usernames(data), ["alice", "bob"])
+        self.assertEqual(data["facets"]["skills"], [{"value": "Python", "count": 2}])
+        self.assertEqual(data["facets"]["locations"], [{"value": "Berlin", "count": 2}])
+
+        self.assertEqual(self._usernames(self._search(company="acme")), ["alice"])
+        self.assertEqual(self._usernames(self._search(education="TU")), ["bob"])
+        self.assertEqual(
+            self._usernames(self._search(experience="developer")), ["alice"]
+        )
+
+    def test_connections_rank_first(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            connect(self.viewer, self.bob)
+        self.assertEqual(
+            ProfileSearchDocument.objects.get(user=self.bob).connections_count, 1
+        )
+        self.assertEqual(
+            self._usernames(self._search(query="python")), ["bob", "alice"]
+        )
+        self.assertEqual(
+            self._usernames(
+                self._search(query="python", sort_by="name", sort_order="asc")
+            ),
+            ["alice", "bob"],
+        )
+
+    def test_private_profiles_are_hidden(self):
+        UserProfile.objects.filter(user=self.alice).update(
+            profile_visibility=UserProfile.ProfileVisibility.PRIVATE
+        )
+        data = self._search(query="python")
+        self.assertEqual(self._usernames(data), ["bob"])
+        self.assertEqual(data["facets"]["locations"], [{"value": "Berlin", "count": 1}])
+
+    def test_hidden_profiles_do_not_take_candidate_slots(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            connect(self.alice, self.bob)
+        # The two best connected profiles are hidden from the viewer
+        UserProfile.objects.filter(user__in=[self.alice, self.bob]).update(
+            profile_visibility=UserProfile.ProfileVisibility.PRIVATE
+        )
+        with mock.patch.object(search, "SEARCH_CANDIDATE_LIMIT", 2):
+            usernames = self._usernames(self._search())
+        self.assertEqual(len(usernames), 2)
+        self.assertIn("carol", usernames)
+        UserProfile.objects.filter(user=self.bob).update(
+            profile_visibility=UserProfile.ProfileVisibility.PUBLIC
+        )
+        with mock.patch.object(search, "SEARCH_CANDIDATE_LIMIT", 1):
+            self.assertEqual(self._usernames(self._search(query="python")), ["bob"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class ProfileSearchLoadTestCase(TestCase):
+    def test_search_at_scale(self):
+        rng = random.Random(44)
+        skills = [f"skill{index}" for index in range(200)]
+        cities = [f"City {index}" for index in range(100)]
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"member{index}",
+                    email=f"member{index}@example.com",
+                    first_name=f"First{index % 5000}",
+                    last_name=f"Last{index % 7919}",
+                    location=rng.choice(cities),
+                )
+                for index in range(LOAD_TEST_SEARCH_PROFILES)
+            ],
+            batch_size=5000,
+        )
+        ids = [user.pk for user in users]
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user_id=user_id,
+                    profile_visibility=UserProfile.ProfileVisibility.PUBLIC,
+                )
+                for user_id in ids
+            ],
+            batch_size=5000,
+        )
+        Skill.objects.bulk_create(
+            [
+                Skill(user_id=user_id, name=name, category="Programming", level=3)
+                for user_id in ids
+                for name in rng.sample(skills, 3)
+            ],
+            batch_size=5000,
+        )
+
+        indexed = search.rebuild_search_documents()
+        self.assertEqual(indexed, User.objects.count())
+
+        viewer = User.objects.get(pk=ids[0])
+        visible = User.objects.filter(
+            profile__profile_visibility=UserProfile.ProfileVisibility.PUBLIC
+        )
+        terms = [
+            (f"First{rng.randrange(5000)}", rng.choice(skills))
+            for _ in range(LOAD_TEST_SEARCH_QUERIES)
+        ]
+
+        expected = [
+            set(
+                visible.filter(
+                    Q(first_name__icontains=name)
+                    | Q(last_name__icontains=name)
+                    | Q(username__icontains=name)
+                    | Q(profile__bio__icontains=name),
+                    skills__name__in=[skill],
+                )
+                .distinct()
+                .values_list("pk", flat=True)
+            )
+            for name, skill in terms
+        ]
+
+        found = [
+            search.search(viewer, visible, query=name, skills=[skill])[0]
+            for name, skill in terms
+        ]
+        self.assertEqual([set(ranked) for ranked in found], expected)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfileStatsTestCase(TestCase):
+    def setUp(self):
+        self.alice = create_user("alice")
+        self.bob = create_user("bob")
+
+    def _stats(self, user):
+        return ProfileStats.objects.get(user=user)
+
+    def test_connection_and_follow_counters_follow_signals(self):
+        request = connect(self.alice, self.bob, Connection.ConnectionStatus.PENDING)
+        self.assertEqual(self._stats(self.alice).pending_sent_count, 1)
+        self.assertEqual(self._stats(self.bob).pending_received_count, 1)
+
+        request.status = Connection.ConnectionStatus.ACCEPTED
+        request.save()
+        for user in [self.alice, self.bob]:
+            self.assertEqual(self._stats(user).connections_count, 1)
+        self.assertEqual(self._stats(self.alice).pending_sent_count, 0)
+
+        request.delete()
+        self.assertEqual(self._stats(self.bob).connections_count, 0)
+
+        follow = Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertEqual(self._stats(self.alice).following_count, 1)
+        self.assertEqual(self._stats(self.bob).followers_count, 1)
+        follow.delete()
+        self.assertEqual(self._stats(self.bob).followers_count, 0)
+
+    def test_endorsement_and_view_counters(self):
+        skill = create_skill(self.alice)
+        SkillEndorsement.objects.create(skill=skill, endorser=self.bob)
+        ProfileView.objects.create(viewer=self.bob, profile_owner=self.alice)
+        ProfileView.objects.create(viewer=None, profile_owner=self.alice)
+
+        alice = self._stats(self.alice)
+        self.assertEqual(alice.endorsements_count, 1)
+        self.assertEqual(alice.profile_views, 2)
+        self.assertEqual(alice.profile_views_this_week, 2)
+
+        # Views age out of the weekly count with the daily task
+        ProfileView.objects.update(created_at=timezone.now() - timedelta(days=10))
+        account_tasks.age_profile_view_counters()
+        alice.refresh_from_db()
+        self.assertEqual(
+            (
+                alice.profile_views,
+                alice.profile_views_this_week,
+                alice.profile_views_this_month,
+            ),
+            (2, 0, 2),
+        )
+        tasks = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn("apps.accounts.tasks.age_profile_view_counters", tasks)
+
+    def test_completeness_is_shared_and_kept_current(self):
+        self.assertEqual(self._stats(self.alice).profile_completeness, 0)
+
+        self.alice.first_name = "Alice"
+        self.alice.bio = "Engineer"
+        self.alice.save()
+        create_skill(self.alice)
+        Experience.objects.create(
+            user=self.alice,
+            title="Developer",
+            company="Acme",
+            start_date=date(2020, 1, 1),
+        )
+        # 2 of 8 fields (15) and 2 of 4 sections (20)
+        self.assertEqual(stats.profile_completeness(self.alice), 35)
+        self.assertEqual(self._stats(self.alice).profile_completeness, 35)
+
+        Skill.objects.filter(user=self.alice).delete()
+        self.assertEqual(self._stats(self.alice).profile_completeness, 25)
+        self.assertEqual(
+            stats.completeness_scores([self.alice.pk, self.bob.pk]),
+            {self.alice.pk: 25, self.bob.pk: 0},
+        )
+
+    def test_bulk_refresh_matches_signals(self):
+        carol = create_user("carol")
+        connect(self.alice, self.bob)
+        connect(carol, self.alice, Connection.ConnectionStatus.PENDING)
+        Follow.objects.create(follower=carol, following=self.alice)
+        maintained = {
+            row["user_id"]: row
+            for row in ProfileStats.objects.values("user_id", *stats.COUNTERS)
+        }
+
+        ProfileStats.objects.update(**dict.fromkeys(stats.COUNTERS, 0))
+        ProfileStats.objects.filter(user=carol).delete()
+        refreshed = stats.refresh_counters()
+
+        self.assertEqual(refreshed, User.objects.count())
+        self.assertEqual(
+            {
+                row["user_id"]: row
+                for row in ProfileStats.objects.values("user_id", *stats.COUNTERS)
+                if row["user_id"] in maintained
+            },
+            maintained,
+        )
+        self.assertEqual(self._stats(carol).following_count, 1)
+
+    def test_analytics_endpoint_is_one_read(self):
+        connect(self.alice, self.bob)
+        ProfileView.objects.create(viewer=self.bob, profile_owner=self.alice)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        url = reverse("user-analytics", args=[self.alice.pk])
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["connections"]["total"], 1)
+        self.assertEqual(response.data["profile_views"]["total"], 1)
+        queries = [q["sql"] for q in app_queries(context)]
+        self.assertEqual(
+            len([sql for sql in queries if '"accounts_profilestats"' in sql]), 1
+        )
+        self.assertFalse([sql for sql in queries if "COUNT(" in sql or "SUM(" in sql])
+        for table in ["accounts_follow", "accounts_profileview", "accounts_skill"]:
+            self.assertFalse([sql for sql in queries if f'"{table}"' in sql])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class ProfileStatsLoadTestCase(TestCase):
+    def test_analytics_at_scale(self):
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"member{index}",
+                    email=f"member{index}@example.com",
+                    first_name="Member",
+                )
+                for index in range(LOAD_TEST_ANALYTICS_USERS)
+            ],
+            batch_size=1000,
+        )
+        ids = [user.pk for user in users]
+        rng = random.Random(45)
+        pairs = {tuple(rng.sample(ids, 2)) for _ in range(len(ids) * 5)}
+        Connection.objects.bulk_create(
+            [
+                Connection(
+                    from_user_id=a,
+                    to_user_id=b,
+                    status=rng.choice(
+                        [
+                            Connection.ConnectionStatus.ACCEPTED,
+                            Connection.ConnectionStatus.PENDING,
+                        ]
+                    ),
+                )
+                for a, b in pairs
+            ],
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        Follow.objects.bulk_create(
+            [Follow(follower_id=a, following_id=b) for a, b in pairs],
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        ProfileView.objects.bulk_create(
+            [
+                ProfileView(viewer_id=rng.choice(ids), profile_owner_id=rng.choice(ids))
+                for _ in range(len(ids) * 10)
+            ],
+            batch_size=5000,
+        )
+
+        stats.refresh_counters()
+        stats.update_completeness()
+
+        now = timezone.now()
+        sample = [rng.choice(ids) for _ in range(LOAD_TEST_ANALYTICS_REQUESTS)]
+
+        def aggregates(user_id):
+            views = ProfileView.objects.filter(profile_owner_id=user_id)
+            connections = Connection.objects.filter(
+                Q(from_user_id=user_id) | Q(to_user_id=user_id)
+            )
+            pending = Connection.objects.filter(
+                status=Connection.ConnectionStatus.PENDING
+            )
+            return {
+                "views": (
+                    views.count(),
+                    views.filter(created_at__gte=now - timedelta(days=7)).count(),
+                    views.filter(created_at__gte=now - timedelta(days=30)).count(),
+                ),
+                "connections": (
+                    connections.filter(
+                        status=Connection.ConnectionStatus.ACCEPTED
+                    ).count(),
+                    pending.filter(from_user_id=user_id).count(),
+                    pending.filter(to_user_id=user_id).count(),
+                ),
+                "follows": (
+                    Follow.objects.filter(following_id=user_id).count(),
+                    Follow.objects.filter(follower_id=user_id).count(),
+                ),
+            }
+
+        expected = [aggregates(user_id) for user_id in sample]
+
+        users_by_id = User.objects.in_bulk(sample)
+        stored = [stats.analytics(users_by_id[user_id]) for user_id in sample]
+
+        self.assertEqual(
+            [
+                {
+                    "views": tuple(row["profile_views"].values()),
+                    "connections": tuple(row["connections"].values()),
+                    "follows": (row["followers"], row["following"]),
+                }
+                for row in stored
+            ],
+            expected,
+        )
+
+        client = APIClient()
+        for user_id in sample:
+            client.force_authenticate(users_by_id[user_id])
+            response = client.get(reverse("user-analytics", args=[user_id]))
+            self.assertEqual(response.status_code, 200)
+
+
+def permission_request(user):
+    request = HttpRequest()
+    request.user = user
+    return request
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AccessResolverTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = create_user("alice")
+        self.bob = create_user("bob")
+        self.manager = Role.objects.create(name="manager")
+        self.engineering = Department.objects.create(name="Engineering")
+        self.sales = Department.objects.create(name="Sales")
+
+    def test_roles_are_cached_until_they_change(self):
+        self.assertFalse(has_role(self.alice, "manager"))
+        with self.assertNumQueries(0):
+            self.assertFalse(has_role(self.alice, "manager"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = UserRole.objects.create(user=self.alice, role=self.manager)
+        self.assertTrue(has_role(self.alice, "manager"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.name = "lead"
+            self.manager.save()
+        self.assertFalse(has_role(self.alice, "manager"))
+        self.assertTrue(has_role(self.alice, "lead"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.is_active = False
+            assignment.save()
+        self.assertFalse(has_role(self.alice, "lead"))
+
+    def test_expired_roles_do_not_count(self):
+        UserRole.objects.create(
+            user=self.alice,
+            role=self.manager,
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        self.assertFalse(has_role(self.alice, "manager"))
+
+    def test_request_resolves_the_user_once(self):
+        UserRole.objects.create(user=self.alice, role=self.manager)
+        request = permission_request(self.alice)
+        permission = HasRole("manager")
+        self.assertTrue(permission.has_permission(request, None))
+
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertTrue(permission.has_permission(request, None))
+            self.assertFalse(HasRole("admin").has_permission(request, None))
+
+    def test_department_head_changes_refresh_both_heads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engineering.head = self.alice
+            self.engineering.save()
+        self.assertTrue(is_department_head(self.alice, self.engineering))
+        self.assertTrue(
+            IsDepartmentHead().has_object_permission(
+                permission_request(self.alice), None, self.engineering
+            )
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.engineering.head = self.bob
+            self.engineering.save()
+        self.assertFalse(is_department_head(self.alice))
+        self.assertTrue(is_department_head(self.bob, self.engineering))
+
+    def test_bulk_object_checks_match_single_checks(self):
+        carol = create_user("carol")
+        with self.captureOnCommitCallbacks(execute=True):
+            UserDepartment.objects.create(user=self.alice, department=self.engineering)
+            UserDepartment.objects.create(user=self.bob, department=self.engineering)
+            UserDepartment.objects.create(user=carol, department=self.sales)
+        self.assertTrue(is_same_department(self.alice, self.bob))
+        self.assertFalse(is_same_department(self.alice, carol))
+
+        skills = [create_skill(user) for user in [self.alice, self.bob, carol]]
+        permission = IsDepartmentMember()
+        request = permission_request(self.alice)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            allowed = permission.filter_objects(request, skills)
+        self.assertEqual(len(app_queries(context)), 3)
+        self.assertEqual(
+            allowed,
+            [
+                skill
+                for skill in skills
+                if permission.has_object_permission(request, None, skill)
+            ],
+        )
+        self.assertEqual([skill.user for skill in allowed], [self.alice, self.bob])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class AccessResolverLoadTestCase(TestCase):
+    def test_permission_overhead_per_list_request(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_PERMISSION_PAGE_SIZE * 20)
+            ],
+            batch_size=1000,
+        )
+        departments = Department.objects.bulk_create(
+            [Department(name=f"Department {index}") for index in range(20)]
+        )
+        roles = Role.objects.bulk_create(
+            [Role(name=f"role{index}") for index in range(10)]
+        )
+        rng = random.Random(46)
+        UserDepartment.objects.bulk_create(
+            [
+                UserDepartment(user=user, department=department)
+                for user in users
+                for department in rng.sample(departments, 2)
+            ]
+        )
+        UserRole.objects.bulk_create(
+            [UserRole(user=user, role=rng.choice(roles)) for user in users]
+        )
+        objects = Skill.objects.bulk_create(
+            [
+                Skill(user=user, name="Python", category="Programming", level=3)
+                for user in users
+            ]
+        )
+
+        def old_checks(user, page):
+            UserRole.objects.filter(
+                user=user, role__name="role0", is_active=True
+            ).exists()
+            UserDepartment.objects.filter(user=user).exists()
+            mine = set(
+                UserDepartment.objects.filter(user=user).values_list(
+                    "department", flat=True
+                )
+            )
+            return [
+                obj
+                for obj in page
+                if mine.intersection(
+                    UserDepartment.objects.filter(user_id=obj.user_id).values_list(
+                        "department", flat=True
+                    )
+                )
+            ]
+
+        def new_checks(user, page):
+            request = permission_request(user)
+            HasRole("role0").has_permission(request, None)
+            permission = IsDepartmentMember()
+            permission.has_permission(request, None)
+            return permission.filter_objects(request, page)
+
+        requests = [
+            (
+                rng.choice(users),
+                rng.sample(objects, LOAD_TEST_PERMISSION_PAGE_SIZE),
+            )
+            for _ in range(LOAD_TEST_PERMISSION_REQUESTS)
+        ]
+        results = {}
+        for name, checks in [("old", old_checks), ("new", new_checks)]:
+            cache.clear()
+            results[name], results[name + "_queries"] = [], 0
+            for user, page in requests:
+                # The query log is capped and the setup filled it
+                connection.queries_log.clear()
+                with CaptureQueriesContext(connection) as context:
+                    results[name].append(checks(user, page))
+                results[name + "_queries"] += len(app_queries(context))
+
+        self.assertEqual(results["new"], results["old"])
+        self.assertLess(results["new_queries"], results["old_queries"] / 10)
+
+
+def token_request(token, method="get", view=None):
+    header = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+    request = getattr(APIRequestFactory(), method)("/", **header)
+    return Request(request, parser_context={"view": view})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatelessAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = create_user("alice", bio="Engineer")
+        self.tokens = get_tokens_for_user(self.alice)
+        self.access = self.tokens["access_token"]
+
+    def authenticate(self, **kwargs):
+        request = token_request(self.access, **kwargs)
+        return authentication.JWTAuthentication().authenticate(request)[0]
+
+    def test_read_only_request_uses_snapshot(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user, self.alice)
+            self.assertEqual(user.username, "alice")
+            self.assertFalse(user.is_staff)
+            self.assertTrue(user.is_authenticated)
+
+        # The rest of the user is loaded when read
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(user.bio, "Engineer")
+        self.assertEqual(len(app_queries(context)), 1)
+        self.assertFalse(Skill.objects.filter(user=user).exists())
+
+    def test_writes_and_opted_out_views_load_user(self):
+        self.authenticate()
+        for kwargs in [
+            {"method": "post"},
+            {"view": type("View", (), {"stateless_authentication": False})()},
+        ]:
+            with CaptureQueriesContext(connection) as context:
+                user = self.authenticate(**kwargs)
+            self.assertEqual(len(app_queries(context)), 1)
+            self.assertEqual(user.get_deferred_fields(), set())
+
+    def test_snapshot_follows_user_changes(self):
+        self.assertFalse(self.authenticate().is_staff)
+
+        self.alice.is_staff = True
+        self.alice.save()
+        self.assertTrue(self.authenticate().is_staff)
+
+        self.alice.is_active = False
+        self.alice.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_revoked_refresh_token_is_refused_immediately(self):
+        refresh = self.tokens["refresh_token"]
+        authentication.RefreshToken(refresh)
+        with self.assertNumQueries(0):
+            authentication.RefreshToken(refresh)
+
+        # As LogoutView does
+        authentication.RefreshToken(refresh).blacklist()
+
+        # The very next check sees the revocation, without a query
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                authentication.RefreshToken(refresh)
+        response = APIClient().post(reverse("refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 401)
+
+        # Releasing the token is picked up the same way
+        BlacklistedToken.objects.all().delete()
+        with self.assertNumQueries(0):
+            authentication.RefreshToken(refresh)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class StatelessAuthenticationLoadTestCase(TestCase):
+    def test_auth_overhead_per_request(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_AUTH_USERS)
+            ],
+            batch_size=1000,
+        )
+        rng = random.Random(47)
+        tokens = {
+            user.pk: (
+                str(simplejwt_tokens.AccessToken.for_user(user)),
+                str(simplejwt_tokens.RefreshToken.for_user(user)),
+            )
+            for user in users
+        }
+        sample = [rng.choice(users).pk for _ in range(LOAD_TEST_AUTH_REQUESTS)]
+
+        def fetched(access, refresh):
+            user = simplejwt_authentication.JWTAuthentication().authenticate(
+                token_request(access)
+            )[0]
+            simplejwt_tokens.RefreshToken(refresh)
+            return user.pk, user.is_staff, user.is_active
+
+        def snapshot(access, refresh):
+            user = authentication.JWTAuthentication().authenticate(
+                token_request(access)
+            )[0]
+            authentication.RefreshToken(refresh)
+            return user.pk, user.is_staff, user.is_active
+
+        results = {}
+        for name, authenticate in [("fetched", fetched), ("snapshot", snapshot)]:
+            cache.clear()
+            results[name], results[name + "_queries"] = [], 0
+            for user_id in sample:
+                connection.queries_log.clear()
+                with CaptureQueriesContext(connection) as context:
+                    results[name].append(authenticate(*tokens[user_id]))
+                results[name + "_queries"] += len(app_queries(context))
+
+        self.assertEqual(results["snapshot"], results["fetched"])
+        self.assertLess(results["snapshot_queries"], results["fetched_queries"] / 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ActivityTrackerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = create_user("alice")
+        self.minute = timezone.now().replace(second=0, microsecond=0)
+
+    def test_touch_buffers_once_per_minute(self):
+        with CaptureQueriesContext(connection) as context:
+            self.alice.update_last_activity()
+            first = self.alice.last_activity
+            self.assertFalse(activity.touch(self.alice))
+        self.assertEqual(app_queries(context), [])
+        self.assertTrue(activity.touch(self.alice, self.minute + timedelta(minutes=1)))
+
+        self.alice.refresh_from_db()
+        self.assertNotEqual(self.alice.last_activity, first)
+
+    def test_flush_writes_finished_minutes(self):
+        User.objects.filter(pk=self.alice.pk).update(last_activity=None)
+        activity.touch(self.alice, self.minute)
+        self.assertEqual(activity.flush(self.minute + timedelta(seconds=30)), 0)
+        self.assertEqual(activity.flush(self.minute + timedelta(minutes=1)), 1)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.last_activity, self.minute)
+
+        # Flushed minutes are not written again, nor older ones over newer
+        self.assertEqual(activity.flush(self.minute + timedelta(minutes=2)), 0)
+        later = self.minute + timedelta(minutes=5)
+        User.objects.filter(pk=self.alice.pk).update(last_activity=later)
+        activity.touch(self.alice, self.minute + timedelta(minutes=2))
+        activity.flush(self.minute + timedelta(minutes=3))
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.last_activity, later)
+
+    def test_last_seen_includes_pending_activity(self):
+        bob = create_user("bob")
+        earlier = self.minute - timedelta(days=1)
+        User.objects.filter(pk__in=[self.alice.pk, bob.pk]).update(
+            last_activity=earlier
+        )
+        activity.touch(self.alice, self.minute)
+        self.alice.refresh_from_db()
+
+        self.assertEqual(activity.last_seen(self.alice), self.minute)
+        self.assertEqual(
+            activity.last_seen_many([self.alice.pk, bob.pk]),
+            {self.alice.pk: self.minute, bob.pk: earlier},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class ActivityTrackerLoadTestCase(TestCase):
+    def test_update_volume_under_load(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_ACTIVITY_USERS)
+            ],
+            batch_size=1000,
+        )
+        ids = [user.pk for user in users]
+        rng = random.Random(48)
+        # A few users are far more active than the rest
+        weights = [rng.paretovariate(1.2) for _ in ids]
+        start = timezone.now().replace(second=0, microsecond=0)
+        span = LOAD_TEST_ACTIVITY_MINUTES * 60
+        events = sorted(
+            (start + timedelta(seconds=rng.uniform(0, span)), user_id)
+            for user_id in rng.choices(ids, weights, k=LOAD_TEST_ACTIVITY_EVENTS)
+        )
+
+        def count_updates(run):
+            updates = []
+
+            def counter(execute, sql, params, many, context):
+                if sql.startswith("UPDATE"):
+                    updates.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(counter):
+                run()
+            return len(updates)
+
+        def per_event():
+            for at, user_id in events:
+                User.objects.filter(pk=user_id).update(last_activity=at)
+
+        def buffered():
+            minute = start
+            for at, user_id in events:
+                if at - minute >= timedelta(minutes=1):
+                    minute = at.replace(second=0, microsecond=0)
+                    activity.flush(minute)
+                activity.touch(user_id, at)
+            activity.flush(minute + timedelta(minutes=1))
+
+        old_updates = count_updates(per_event)
+        expected = {
+            user_id: at.replace(second=0, microsecond=0)
+            for user_id, at in User.objects.filter(
+                last_activity__isnull=False
+            ).values_list("pk", "last_activity")
+        }
+        User.objects.update(last_activity=None)
+        cache.clear()
+        new_updates = count_updates(buffered)
+
+        self.assertEqual(
+            dict(
+                User.objects.filter(last_activity__isnull=False).values_list(
+                    "pk", "last_activity"
+                )
+            ),
+            expected,
+        )
+        self.assertLess(new_updates, old_updates / 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfileViewPipelineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = create_user("alice")
+        self.bob = create_user("bob")
+        self.carol = create_user("carol")
+        self.minute = timezone.now().replace(second=0, microsecond=0)
+
+    def test_repeat_views_count_once_per_window(self):
+        # Start of the current window, so a minute later is still inside it
+        window = profile_views.PROFILE_VIEW_WINDOW
+        start = self.minute - timedelta(seconds=self.minute.timestamp() % window)
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(profile_views.record(self.bob, self.alice, now=start))
+            self.assertFalse(
+                profile_views.record(
+                    self.bob, self.alice, now=start + timedelta(minutes=1)
+                )
+            )
+        self.assertEqual(app_queries(context), [])
+        self.assertTrue(profile_views.record(self.carol, self.alice, now=start))
+        self.assertTrue(
+            profile_views.record(
+                self.bob, self.alice, now=start + timedelta(seconds=window)
+            )
+        )
+
+    def test_flush_stores_views_and_counters(self):
+        for viewer in [self.bob, self.carol]:
+            profile_views.record(viewer, self.alice, now=self.minute)
+        profile_views.record(self.alice, self.bob, now=self.minute)
+        self.assertEqual(profile_views.flush(self.minute), 0)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(profile_views.flush(self.minute + timedelta(minutes=1)), 3)
+        stats_updates = [
+            query
+            for query in app_queries(context)
+            if query["sql"].startswith('UPDATE "accounts_profilestats"')
+        ]
+        self.assertEqual(len(stats_updates), 1)
+        self.assertEqual(
+            set(ProfileView.objects.values_list("viewer_id", "profile_owner_id")),
+            {
+                (self.bob.pk, self.alice.pk),
+                (self.carol.pk, self.alice.pk),
+                (self.alice.pk, self.bob.pk),
+            },
+        )
+        self.assertEqual(
+            stats.analytics(self.alice)["profile_views"],
+            {"total": 2, "this_week": 2, "this_month": 2},
+        )
+        self.assertEqual(stats.analytics(self.bob)["profile_views"]["total"], 1)
+        self.assertEqual(profile_views.flush(self.minute + timedelta(minutes=2)), 0)
+
+    def test_overlapping_flushes_store_views_once(self):
+        profile_views.record(self.bob, self.alice, now=self.minute)
+        later = self.minute + timedelta(minutes=1)
+
+        # A second flush while the first is between minutes finds it running
+        draining = buffers.drain(profile_views.BUFFER, later)
+        next(draining)
+        self.assertEqual(profile_views.flush(later), 0)
+        draining.close()
+        self.assertFalse(ProfileView.objects.exists())
+
+        self.assertEqual(profile_views.flush(later), 1)
+        self.assertEqual(profile_views.flush(later), 0)
+        self.assertEqual(stats.analytics(self.alice)["profile_views"]["total"], 1)
+
+    def test_retrieve_records_view(self):
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        for _ in range(3):
+            response = client.get(reverse("user-detail", args=[self.alice.pk]))
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(ProfileView.objects.exists())
+
+        profile_views.flush(timezone.now() + timedelta(minutes=1))
+        self.assertEqual(
+            list(ProfileView.objects.values_list("viewer_id", "profile_owner_id")),
+            [(self.bob.pk, self.alice.pk)],
+        )
+
+
+class SynchronousProfileViewSet(UserViewSet):
+    """Writes every profile view during the request, as before the pipeline"""
+
+    def track_profile_view(self, viewer, viewed):
+        ProfileView.objects.create(viewer=viewer, profile_owner=viewed)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class ProfileViewPipelineLoadTestCase(TestCase):
+    def test_retrieve_latency(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"member{index}", email=f"member{index}@example.com")
+                for index in range(LOAD_TEST_PROFILE_VIEW_USERS)
+            ],
+            batch_size=1000,
+        )
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        ProfileStats.objects.bulk_create([ProfileStats(user=user) for user in users])
+        rng = random.Random(49)
+        # Popular profiles get most of the views
+        weights = [rng.paretovariate(1.2) for _ in users]
+        requests = [
+            (rng.choice(users), owner)
+            for owner in rng.choices(users, weights, k=LOAD_TEST_PROFILE_VIEW_REQUESTS)
+        ]
+        requests = [(viewer, owner) for viewer, owner in requests if viewer != owner]
+        factory = APIRequestFactory()
+
+        def retrieve(viewset):
+            view = viewset.as_view({"get": "retrieve"})
+            writes = 0
+
+            def counter(execute, sql, params, many, context):
+                nonlocal writes
+                if sql.startswith(("INSERT", "UPDATE")):
+                    writes += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(counter):
+                for viewer, owner in requests:
+                    request = factory.get(f"/api/users/{owner.pk}/")
+                    force_authenticate(request, viewer)
+                    response = view(request, pk=owner.pk)
+                    self.assertEqual(response.status_code, 200)
+                profile_views.flush(timezone.now() + timedelta(minutes=1))
+            return writes
+
+        cache.clear()
+        old_writes = retrieve(SynchronousProfileViewSet)
+        ProfileView.objects.all().delete()
+        ProfileStats.objects.update(**{field: 0 for field in stats.VIEW_COUNTERS})
+
+        cache.clear()
+        new_writes = retrieve(UserViewSet)
+        pairs = {(viewer.pk, owner.pk) for viewer, owner in requests}
+        self.assertEqual(ProfileView.objects.count(), len(pairs))
+        self.assertEqual(
+            sum(ProfileStats.objects.values_list("profile_views", flat=True)),
+            len(pairs),
+        )
+        self.assertLess(new_writes, old_writes / 5)
+
+
+def completeness_distribution(scores):
+    """Users per completeness range, bucketed in Python like the old command"""
+    return {
+        label: sum(1 for score in scores if low <= score <= high)
+        for _, low, high, label in reports.COMPLETENESS_RANGES
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnalyticsReportTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = create_user("alice", first_name="Alice", bio="Engineer")
+        self.bob = create_user("bob")
+        self.carol = create_user("carol", status=User.UserStatus.SUSPENDED)
+        SkillEndorsement.objects.create(
+            skill=create_skill(self.alice), endorser=self.bob
+        )
+        Experience.objects.create(
+            user=self.alice,
+            title="Engineer",
+            company="Acme",
+            start_date=date(2020, 1, 1),
+        )
+        connect(self.alice, self.bob)
+        connect(self.bob, self.carol, Connection.ConnectionStatus.PENDING)
+        self.now = timezone.now()
+
+    def generate(self, *names, days=7):
+        return dict(
+            reports.generate(
+                list(names), self.now - timedelta(days=days), self.now, workers=1
+            )
+        )
+
+    def test_completeness_matches_stats(self):
+        report = self.generate("profile_completeness")["profile_completeness"]
+        scores = stats.completeness_scores(
+            User.objects.filter(status=User.UserStatus.ACTIVE).values_list(
+                "pk", flat=True
+            )
+        ).values()
+
+        self.assertEqual(
+            report["completeness_distribution"], completeness_distribution(scores)
+        )
+        self.assertEqual(
+            report["average_completeness"], round(sum(scores) / len(scores), 2)
+        )
+        self.assertEqual(
+            report["improvement_opportunities"]["users_without_skills"],
+            User.objects.filter(status=User.UserStatus.ACTIVE).count() - 1,
+        )
+
+    def test_reports(self):
+        generated = self.generate("network_growth", "skill_trends", "admin_summary")
+
+        network = generated["network_growth"]
+        self.assertEqual(network["total_connections"], 1)
+        self.assertEqual(network["pending_connections"], 1)
+        self.assertEqual(network["new_connections"], 1)
+        self.assertEqual(len(network["daily_growth"]), 8)
+        self.assertEqual(network["daily_growth"][-1]["new_connections"], 1)
+
+        skills = generated["skill_trends"]
+        self.assertEqual(skills["total_endorsements"], 1)
+        self.assertEqual(skills["top_endorsed_skills"][0]["user"], "Alice")
+        self.assertIn({"skill_count": 1, "user_count": 1}, skills["skill_distribution"])
+
+        self.assertEqual(
+            generated["admin_summary"]["system_health"]["suspended_users"], 1
+        )
+
+    def test_finished_days_are_cached(self):
+        days = reports.period_days(
+            self.now - timedelta(days=10), self.now - timedelta(days=1)
+        )
+        reports.events("users_joined", days)
+        with self.assertNumQueries(0):
+            reports.events("users_joined", days)
+
+        # Extending the period only counts the days not cached yet
+        with CaptureQueriesContext(connection) as context:
+            counts = reports.events(
+                "users_joined",
+                reports.period_days(self.now - timedelta(days=10), self.now),
+            )
+        self.assertEqual(len(app_queries(context)), 1)
+        self.assertEqual(reports._total(counts), User.objects.count())
+
+        # Today is never cached
+        with CaptureQueriesContext(connection) as context:
+            reports.events("users_joined", [timezone.localdate()])
+        self.assertEqual(len(app_queries(context)), 1)
+
+    def test_streamed_rows(self):
+        def run(output):
+            out = io.StringIO()
+            call_command(
+                "generate_analytics",
+                "--report-type=network-growth",
+                f"--output={output}",
+                "--workers=1",
+                stdout=out,
+            )
+            # Without the progress and success messages
+            return out.getvalue().splitlines()[1:-1]
+
+        rows = [json.loads(line) for line in run("jsonl")]
+        self.assertEqual({row["report"] for row in rows}, {"network_growth"})
+        values = {row["metric"]: row["value"] for row in rows}
+        self.assertEqual(values["period"], "weekly")
+        self.assertEqual(values["total_connections"], 1)
+        self.assertEqual(values["most_connected_users.0.connections"], 1)
+
+        rows = csv.DictReader(run("csv"))
+        self.assertEqual(
+            {row["metric"]: row["value"] for row in rows},
+            {metric: str(value) for metric, value in values.items()},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class AnalyticsReportLoadTestCase(TransactionTestCase):
+    """Committed data, so the report threads can read it"""
+
+    def test_generation_time_and_memory(self):
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"member{index}",
+                    email=f"member{index}@example.com",
+                    first_name=f"Member{index}" if index % 2 else "",
+                    bio="Bio" if index % 3 else "",
+                )
+                for index in range(LOAD_TEST_REPORT_USERS)
+            ],
+            batch_size=1000,
+        )
+        ProfileStats.objects.bulk_create(
+            [ProfileStats(user=user) for user in users], batch_size=1000
+        )
+        rng = random.Random(50)
+        sample = rng.sample(users, len(users) // 5)
+        Skill.objects.bulk_create(
+            [
+                Skill(user=user, name="Python", category="Programming", level=3)
+                for user in sample
+            ],
+            batch_size=1000,
+        )
+        Project.objects.bulk_create(
+            [
+                Project(
+                    user=user,
+                    title="Project",
+                    description="Project",
+                    start_date=date(2020, 1, 1),
+                    technologies=rng.sample(["Django", "Redis", "React", "Go"], 2),
+                )
+                for user in sample[::2]
+            ],
+            batch_size=1000,
+        )
+        Connection.objects.bulk_create(
+            [
+                Connection(
+                    from_user=user,
+                    to_user=rng.choice(users),
+                    status=Connection.ConnectionStatus.ACCEPTED,
+                )
+                for user in sample
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        ActivityLog.objects.bulk_create(
+            [
+                ActivityLog(
+                    user=rng.choice(users),
+                    activity_type=ActivityLog.ActivityType.LOGIN,
+                    description="Login",
+                )
+                for _ in range(len(users))
+            ],
+            batch_size=1000,
+        )
+        # Spread the events over the period
+        ids = list(User.objects.values_list("pk", flat=True))
+        for day in range(LOAD_TEST_REPORT_DAYS):
+            moment = now - timedelta(days=day)
+            batch = ids[day::LOAD_TEST_REPORT_DAYS]
+            User.objects.filter(pk__in=batch).update(date_joined=moment)
+            ActivityLog.objects.filter(user_id__in=batch).update(created_at=moment)
+            Connection.objects.filter(from_user_id__in=batch).update(updated_at=moment)
+        start = now - timedelta(days=LOAD_TEST_REPORT_DAYS)
+
+        # The old command scored completeness user by user and counted the
+        # network growth one day at a time
+        tracemalloc.start()
+        scores = stats.completeness_scores(
+            User.objects.filter(status=User.UserStatus.ACTIVE).values_list(
+                "pk", flat=True
+            )
+        ).values()
+        old_distribution = completeness_distribution(scores)
+        for day in reports.period_days(start, now):
+            Connection.objects.filter(
+                status=Connection.ConnectionStatus.ACCEPTED, updated_at__date=day
+            ).count()
+        old_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        def run(workers):
+            tracemalloc.start()
+            generated = dict(
+                reports.generate(list(reports.REPORTS), start, now, workers)
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            for report in generated.values():
+                self.assertNotIn("error", report)
+            generated["admin_summary"].pop("generated_at")
+            return generated, peak
+
+        cache.clear()
+        sequential, _ = run(1)
+        cache.clear()
+        threaded, threaded_peak = run(reports.REPORT_WORKERS)
+        # Every finished day is cached now
+        incremental, _ = run(reports.REPORT_WORKERS)
+
+        self.assertEqual(sequential, threaded)
+        self.assertEqual(threaded, incremental)
+        self.assertEqual(
+            threaded["profile_completeness"]["completeness_distribution"],
+            old_distribution,
+        )
+        self.assertLess(threaded_peak, old_peak)
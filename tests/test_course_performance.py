@@ -0,0 +1,978 @@
+import json
+import os
+import time
+from unittest import mock, skipUnless
+from unittest.mock import AsyncMock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.course.achievements import (
+    compile_criteria_index,
+    evaluate_achievements,
+    get_criteria_index,
+)
+from apps.course.content_tree import build_content_tree, get_content_tree
+from apps.course.grading import grade_attempt
+from apps.course.dashboard import (
+    build_dashboard_snapshot,
+    get_dashboard_snapshot,
+    get_user_stats,
+)
+from apps.course.models import (
+    Achievement,
+    Assessment,
+    AssessmentQuestion,
+    Course,
+    CourseStats,
+    Language,
+    Lesson,
+    Module,
+    Question,
+    SpacedRepetition,
+    Step,
+    UserAchievement,
+    UserAssessmentAttempt,
+    UserProgress,
+    UserResponse,
+    Vocabulary,
+)
+from apps.course.stats import get_course_stats, rebuild_course_stats
+from apps.course.tasks import grade_assessment_attempt
+from apps.notifications.consumers import NotificationConsumer
+
+User = get_user_model()
+
+# Scale of the load simulations; raise locally for realistic benchmark numbers
+LOAD_TEST_USERS = int(os.environ.get("COURSE_LOAD_TEST_USERS", 1000))
+LOAD_TEST_ENROLLMENTS = int(os.environ.get("COURSE_LOAD_TEST_ENROLLMENTS", 5000))
+LOAD_TEST_STEPS_PER_LESSON = 20
+LOAD_TEST_ACHIEVEMENT_RULES = int(
+    os.environ.get("COURSE_LOAD_TEST_ACHIEVEMENT_RULES", 10000)
+)
+LOAD_TEST_SUBMISSIONS = int(os.environ.get("COURSE_LOAD_TEST_SUBMISSIONS", 200))
+
+# Load simulations seed thousands of rows and run for minutes, so they are
+# opt-in: RUN_LOAD_TESTS=1 pytest -m load tests/test_*_performance.py
+RUN_LOAD_TESTS = bool(os.environ.get("RUN_LOAD_TESTS"))
+
+
+def load_test(test):
+    """Tag a load simulation ``load`` and skip it unless RUN_LOAD_TESTS is set"""
+    test = skipUnless(RUN_LOAD_TESTS, "load tests run with RUN_LOAD_TESTS=1")(test)
+    return tag("load")(test)
+
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }
+}
+
+
+def app_queries(context):
+    """Queries issued by the code under test, without silk's EXPLAIN probes"""
+    return [q for q in context.captured_queries if not q["sql"].startswith("EXPLAIN")]
+
+
+def create_course_tree(instructor, modules=1, lessons=1, title="Basic Spanish"):
+    """Create a published course with the given number of modules and lessons"""
+    language, _ = Language.objects.get_or_create(
+        code="es", defaults={"name": "Spanish", "native_name": "Español"}
+    )
+    course = Course.objects.create(
+        title=title,
+        target_language=language,
+        instructor=instructor,
+        level="beginner",
+        is_published=True,
+    )
+    for m in range(modules):
+        module = Module.objects.create(course=course, title=f"Module {m}", order=m + 1)
+        for lesson_index in range(lessons):
+            Lesson.objects.create(
+                module=module,
+                title=f"Lesson {m}.{lesson_index}",
+                order=lesson_index + 1,
+                content_type="vocabulary",
+            )
+    return course
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardSnapshotTestCase(TestCase):
+    """Test the cached learner dashboard snapshot"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="student", email="student@test.com", password="testpass123"
+        )
+        self.course = create_course_tree(self.user, modules=1, lessons=2)
+        self.lessons = list(
+            Lesson.objects.filter(module__course=self.course).order_by("order")
+        )
+
+        UserProgress.objects.create(
+            user=self.user, course=self.course, xp_earned=50, current_streak=4
+        )
+        UserProgress.objects.create(
+            user=self.user,
+            course=self.course,
+            lesson=self.lessons[0],
+            is_completed=True,
+            xp_earned=30,
+        )
+        UserProgress.objects.create(
+            user=self.user, course=self.course, lesson=self.lessons[1], xp_earned=20
+        )
+
+    def test_user_stats_single_query(self):
+        """Headline stats come from one conditional aggregate"""
+        with CaptureQueriesContext(connection) as queries:
+            stats = get_user_stats(self.user)
+
+        self.assertEqual(len(app_queries(queries)), 1)
+        self.assertEqual(stats["total_xp"], 100)
+        self.assertEqual(stats["courses_enrolled"], 1)
+        self.assertEqual(stats["lessons_completed"], 1)
+
+    def test_snapshot_is_versioned(self):
+        """Identical data produces the same version"""
+        first = build_dashboard_snapshot(self.user)
+        second = build_dashboard_snapshot(self.user)
+
+        self.assertEqual(first["version"], second["version"])
+        self.assertEqual(first["user_stats"]["total_xp"], 100)
+        self.assertEqual(len(first["recent_activity"]), 3)
+        self.assertEqual(first["upcoming_lessons"][0]["title"], "Lesson 0.1")
+
+    def test_warm_snapshot_uses_no_queries(self):
+        """A cached snapshot is served without touching the database"""
+        get_dashboard_snapshot(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            get_dashboard_snapshot(self.user)
+
+        self.assertEqual(len(app_queries(queries)), 0)
+
+    def test_progress_invalidates_snapshot(self):
+        """Progress events drop the cached snapshot"""
+        before = get_dashboard_snapshot(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            progress = UserProgress.objects.get(lesson=self.lessons[1])
+            progress.is_completed = True
+            progress.save()
+
+        after = get_dashboard_snapshot(self.user)
+        self.assertNotEqual(before["version"], after["version"])
+        self.assertEqual(after["user_stats"]["lessons_completed"], 2)
+
+    def test_review_items_invalidate_snapshot(self):
+        """Spaced repetition changes refresh the review count"""
+        self.assertEqual(get_dashboard_snapshot(self.user)["review_items_count"], 0)
+
+        vocabulary = Vocabulary.objects.create(
+            word="hola", language=self.course.target_language
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            SpacedRepetition.objects.create(
+                user=self.user,
+                content_type=ContentType.objects.get_for_model(Vocabulary),
+                object_id=vocabulary.id,
+            )
+
+        self.assertEqual(get_dashboard_snapshot(self.user)["review_items_count"], 1)
+
+    def test_dashboard_conditional_get(self):
+        """Clients holding the current version receive 304 Not Modified"""
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get("/progress/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(etag, f'"{response.data["version"]}"')
+
+        response = self.client.get("/progress/dashboard/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class DashboardLoadTestCase(TestCase):
+    """Simulate many learners opening the app at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@test.com", password="testpass123"
+        )
+        course = create_course_tree(instructor, modules=2, lessons=5)
+        lessons = list(Lesson.objects.filter(module__course=course))
+
+        User.objects.bulk_create(
+            [
+                User(username=f"learner_{i}", email=f"learner_{i}@test.com")
+                for i in range(LOAD_TEST_USERS)
+            ]
+        )
+        cls.users = list(User.objects.filter(username__startswith="learner_"))
+
+        now = timezone.now()
+        progress = []
+        for user in cls.users:
+            progress.append(UserProgress(user=user, course=course, xp_earned=10))
+            for i, lesson in enumerate(lessons[:3]):
+                progress.append(
+                    UserProgress(
+                        user=user,
+                        course=course,
+                        lesson=lesson,
+                        is_completed=i < 2,
+                        completed_at=now if i < 2 else None,
+                        xp_earned=5,
+                    )
+                )
+        UserProgress.objects.bulk_create(progress)
+
+    def setUp(self):
+        cache.clear()
+
+    def _percentile(self, samples, percentile):
+        samples = sorted(samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def test_dashboard_p95_latency(self):
+        """Warm dashboard reads stay fast and query-free at scale"""
+        cold, warm = [], []
+
+        for user in self.users:
+            start_time = time.perf_counter()
+            get_dashboard_snapshot(user)
+            cold.append(time.perf_counter() - start_time)
+
+        with CaptureQueriesContext(connection) as queries:
+            for user in self.users:
+                start_time = time.perf_counter()
+                get_dashboard_snapshot(user)
+                warm.append(time.perf_counter() - start_time)
+
+        self.assertEqual(len(app_queries(queries)), 0)
+        self.assertLess(self._percentile(warm, 95), self._percentile(cold, 95))
+        self.assertLess(self._percentile(warm, 95), 0.01)
+
+    def test_cold_snapshot_query_count_is_constant(self):
+        """Building a snapshot does not scale queries with the user's history"""
+        with CaptureQueriesContext(connection) as queries:
+            build_dashboard_snapshot(self.users[0])
+
+        self.assertLessEqual(len(app_queries(queries)), 8)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CourseStatsTestCase(TestCase):
+    """Test the incrementally maintained course statistics"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            username="instructor",
+            email="instructor@test.com",
+            password="testpass123",
+            is_staff=True,
+        )
+        self.course = create_course_tree(self.instructor, modules=2, lessons=2)
+        self.learners = [
+            User.objects.create_user(
+                username=f"learner_{i}",
+                email=f"learner_{i}@test.com",
+                password="testpass123",
+            )
+            for i in range(3)
+        ]
+
+    def _stats(self):
+        return CourseStats.objects.get(course=self.course)
+
+    def test_enrollment_and_completion_deltas(self):
+        """Enrollments and completions move the rollup without rescans"""
+        records = [
+            UserProgress.objects.create(user=learner, course=self.course)
+            for learner in self.learners
+        ]
+        stats = self._stats()
+        self.assertEqual(stats.enrollment_count, 3)
+        self.assertEqual(stats.completion_count, 0)
+        self.assertEqual(stats.lesson_count, 4)
+        self.assertEqual(stats.active_learners, 3)
+
+        records[0].total_time_spent_seconds = 2 * 3600
+        records[0].is_completed = True
+        records[0].save()
+        # Saving a completed record again is not another completion
+        records[0].save()
+
+        stats = self._stats()
+        self.assertEqual(stats.completion_count, 1)
+        self.assertEqual(stats.completion_time_histogram, {"1-5h": 1})
+        self.assertEqual(stats.average_completion_time, 2 * 3600)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 3)
+        self.assertEqual(self.course.completion_count, 1)
+
+    def test_lesson_progress_does_not_count_as_enrollment(self):
+        """Only the course-level record is an enrollment"""
+        UserProgress.objects.create(user=self.learners[0], course=self.course)
+        lesson = Lesson.objects.filter(module__course=self.course).first()
+        UserProgress.objects.create(
+            user=self.learners[0], course=self.course, lesson=lesson, is_completed=True
+        )
+
+        stats = self._stats()
+        self.assertEqual(stats.enrollment_count, 1)
+        self.assertEqual(stats.completion_count, 0)
+        self.assertEqual(stats.active_learners, 1)
+
+    def test_lesson_changes_update_lesson_count(self):
+        """Adding or deactivating lessons keeps the lesson count current"""
+        get_course_stats(self.course)
+        module = self.course.modules.first()
+        lesson = Lesson.objects.create(module=module, title="Extra", order=9)
+        self.assertEqual(self._stats().lesson_count, 5)
+
+        lesson.is_active = False
+        lesson.save()
+        self.assertEqual(self._stats().lesson_count, 4)
+
+    def test_rebuild_matches_incremental(self):
+        """The nightly rebuild agrees with the incremental counters"""
+        for i, learner in enumerate(self.learners):
+            UserProgress.objects.create(
+                user=learner,
+                course=self.course,
+                is_completed=i > 0,
+                total_time_spent_seconds=i * 20 * 3600,
+            )
+        incremental = self._stats()
+
+        rebuild_course_stats([self.course.pk])
+        rebuilt = self._stats()
+
+        for field in (
+            "lesson_count",
+            "enrollment_count",
+            "completion_count",
+            "total_completion_time_seconds",
+            "completion_time_histogram",
+            "active_learners",
+        ):
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field))
+        self.assertEqual(rebuilt.completion_time_histogram, {"10-25h": 1, "25-50h": 1})
+        self.assertIsNotNone(rebuilt.last_rebuilt_at)
+
+    def test_rebuild_runs_nightly(self):
+        tasks = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn("apps.course.tasks.rebuild_all_course_stats", tasks)
+
+    def test_statistics_endpoint_reads_rollup(self):
+        """Course statistics never scan the progress table"""
+        for learner in self.learners:
+            UserProgress.objects.create(user=learner, course=self.course)
+        self.client.force_authenticate(user=self.instructor)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/courses/{self.course.pk}/statistics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_enrollments"], 3)
+        self.assertEqual(response.data["active_learners"], 3)
+        for query in app_queries(queries):
+            self.assertNotIn("course_userprogress", query["sql"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class CourseStatsLoadTestCase(TestCase):
+    """Benchmark statistics reads on a heavily enrolled course"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor",
+            email="instructor@test.com",
+            password="testpass123",
+            is_staff=True,
+        )
+        cls.course = create_course_tree(cls.instructor, modules=2, lessons=5)
+
+        User.objects.bulk_create(
+            [
+                User(username=f"learner_{i}", email=f"learner_{i}@test.com")
+                for i in range(LOAD_TEST_ENROLLMENTS)
+            ],
+            batch_size=1000,
+        )
+        # bulk_create skips the signals, so the rollup starts out stale
+        UserProgress.objects.bulk_create(
+            [
+                UserProgress(
+                    user=user,
+                    course=cls.course,
+                    is_completed=i % 4 == 0,
+                    total_time_spent_seconds=(i % 60) * 3600,
+                )
+                for i, user in enumerate(
+                    User.objects.filter(username__startswith="learner_")
+                )
+            ],
+            batch_size=1000,
+        )
+
+    def test_rebuild_is_exact(self):
+        """A full rebuild counts every enrollment with grouped queries"""
+        start_time = time.time()
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_course_stats()
+        rebuild_time = time.time() - start_time
+
+        stats = CourseStats.objects.get(course=self.course)
+        self.assertEqual(stats.enrollment_count, LOAD_TEST_ENROLLMENTS)
+        self.assertEqual(stats.completion_count, (LOAD_TEST_ENROLLMENTS + 3) // 4)
+        self.assertEqual(
+            sum(stats.completion_time_histogram.values()), stats.completion_count
+        )
+        self.assertLessEqual(len(app_queries(queries)), 12)
+        self.assertLess(rebuild_time, 10.0)
+
+    def test_statistics_read_is_constant(self):
+        """Statistics reads cost the same regardless of enrollment count"""
+        rebuild_course_stats([self.course.pk])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.instructor)
+
+        start_time = time.time()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/courses/{self.course.pk}/statistics/")
+        read_time = time.time() - start_time
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_enrollments"], LOAD_TEST_ENROLLMENTS)
+        for query in app_queries(queries):
+            self.assertNotIn("course_userprogress", query["sql"])
+        self.assertLess(read_time, 1.0)
+
+
+def create_steps(lessons, per_lesson):
+    """Bulk create steps without firing the content signals"""
+    Step.objects.bulk_create(
+        [
+            Step(lesson=lesson, order=i + 1, title=f"Step {i}", content_type="text")
+            for lesson in lessons
+            for i in range(per_lesson)
+        ],
+        batch_size=1000,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ContentTreeTestCase(TestCase):
+    """Test the compiled course content tree"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="student", email="student@test.com", password="testpass123"
+        )
+        self.course = create_course_tree(self.user, modules=2, lessons=2)
+        self.lessons = list(
+            Lesson.objects.filter(module__course=self.course).order_by(
+                "module__order", "order"
+            )
+        )
+        create_steps(self.lessons, 3)
+
+    def test_tree_structure_and_counts(self):
+        """The tree nests modules, lessons and steps in order with counts"""
+        tree = build_content_tree(self.course)
+
+        self.assertEqual(
+            tree["counts"], {"modules": 2, "lessons": 4, "steps": 12, "questions": 0}
+        )
+        first_module = tree["modules"][0]
+        self.assertEqual(first_module["title"], "Module 0")
+        self.assertEqual(first_module["lessons_count"], 2)
+        self.assertEqual(first_module["steps_count"], 6)
+        self.assertEqual(
+            [step["order"] for step in first_module["lessons"][0]["steps"]], [1, 2, 3]
+        )
+
+    def test_warm_tree_uses_no_queries(self):
+        """A cached tree is served without touching the database"""
+        get_content_tree(self.course)
+
+        with CaptureQueriesContext(connection) as queries:
+            get_content_tree(self.course)
+
+        self.assertEqual(len(app_queries(queries)), 0)
+
+    def test_content_changes_invalidate_tree(self):
+        """Lesson and step changes drop the cached tree"""
+        before = get_content_tree(self.course)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = self.lessons[0]
+            lesson.title = "Greetings"
+            lesson.save()
+        after_lesson = get_content_tree(self.course)
+        self.assertNotEqual(before["version"], after_lesson["version"])
+        self.assertEqual(after_lesson["modules"][0]["lessons"][0]["title"], "Greetings")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Step.objects.create(
+                lesson=self.lessons[0], order=4, title="Extra", content_type="text"
+            )
+        self.assertEqual(get_content_tree(self.course)["counts"]["steps"], 13)
+
+    def test_outline_conditional_get(self):
+        """Clients holding the current version receive 304 Not Modified"""
+        self.client.force_authenticate(user=self.user)
+        url = f"/courses/{self.course.pk}/outline/"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["counts"]["steps"], 12)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class ContentTreeLoadTestCase(TestCase):
+    """Benchmark outline fetches for a 2k-step course"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@test.com", password="testpass123"
+        )
+        cls.course = create_course_tree(instructor, modules=10, lessons=10)
+        create_steps(
+            Lesson.objects.filter(module__course=cls.course), LOAD_TEST_STEPS_PER_LESSON
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cold_vs_warm_outline(self):
+        """Warm outline fetches are query-free and faster than compiling"""
+        with CaptureQueriesContext(connection) as queries:
+            start_time = time.perf_counter()
+            tree = get_content_tree(self.course)
+            cold_time = time.perf_counter() - start_time
+
+        self.assertEqual(tree["counts"]["steps"], 100 * LOAD_TEST_STEPS_PER_LESSON)
+        self.assertLessEqual(len(app_queries(queries)), 4)
+
+        with CaptureQueriesContext(connection) as queries:
+            start_time = time.perf_counter()
+            for _ in range(10):
+                get_content_tree(self.course)
+            warm_time = (time.perf_counter() - start_time) / 10
+
+        self.assertEqual(len(app_queries(queries)), 0)
+        self.assertLess(warm_time, cold_time)
+
+
+def create_exam(course, questions=10):
+    """Create an assessment with alternating multiple choice and fill-in questions"""
+    assessment = Assessment.objects.create(
+        title="Final exam",
+        course=course,
+        passing_score=60,
+        grade_boundaries={"A": 90, "B": 80, "C": 70, "D": 60},
+    )
+    question_list = [
+        Question(
+            question_type="multiple_choice" if i % 2 == 0 else "fill_blank",
+            text=f"Question {i}",
+            correct_answers=["a"] if i % 2 == 0 else ["Hola"],
+            points=2,
+            difficulty=i % 3 + 1,
+        )
+        for i in range(questions)
+    ]
+    Question.objects.bulk_create(question_list)
+    AssessmentQuestion.objects.bulk_create(
+        [
+            AssessmentQuestion(
+                assessment=assessment, question=question, order=i + 1, points=2
+            )
+            for i, question in enumerate(question_list)
+        ]
+    )
+    return assessment, question_list
+
+
+def answer_exam(user, assessment, questions, correct, attempt_number=1):
+    """Start an attempt and attach answers, the first ``correct`` of them right"""
+    attempt = UserAssessmentAttempt.objects.create(
+        user=user, assessment=assessment, attempt_number=attempt_number
+    )
+    responses = UserResponse.objects.bulk_create(
+        [
+            UserResponse(
+                user=user,
+                question=question,
+                response_data=(
+                    {"selected_option": "a" if i < correct else "b"}
+                    if question.question_type == "multiple_choice"
+                    else {"answer": " hola " if i < correct else "adios"}
+                ),
+                time_taken_seconds=20,
+                attempt_number=attempt_number,
+            )
+            for i, question in enumerate(questions)
+        ]
+    )
+    attempt.responses.set(responses)
+    return attempt
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class AssessmentGradingTestCase(TestCase):
+    """Test the bulk assessment grading engine"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="student", email="student@test.com", password="testpass123"
+        )
+        self.course = create_course_tree(self.user)
+        UserProgress.objects.create(user=self.user, course=self.course)
+        self.assessment, self.questions = create_exam(self.course)
+
+    def test_grading_breakdowns(self):
+        """Scores and breakdowns are computed from a single table"""
+        attempt = answer_exam(self.user, self.assessment, self.questions, correct=9)
+
+        result = grade_attempt(attempt)
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, "completed")
+        self.assertEqual(attempt.score, 18)
+        self.assertEqual(attempt.max_score, 20)
+        self.assertEqual(attempt.percentage_score, 90)
+        self.assertEqual(attempt.grade, "A")
+        self.assertTrue(attempt.passed)
+
+        detailed = result["detailed_results"]
+        self.assertEqual(detailed["total_questions"], 10)
+        self.assertEqual(detailed["correct_answers"], 9)
+        self.assertEqual(detailed["incorrect_answers"], 1)
+        self.assertEqual(detailed["average_time_per_question"], 20)
+        analysis = result["performance_analysis"]
+        self.assertEqual(
+            analysis["question_type_performance"]["multiple_choice"]["accuracy"], 100
+        )
+        self.assertEqual(
+            analysis["question_type_performance"]["fill_blank"]["accuracy"], 80
+        )
+        self.assertCountEqual(analysis["strengths"], ["multiple_choice", "fill_blank"])
+        self.assertEqual(
+            UserResponse.objects.filter(
+                assessment_attempts=attempt, is_correct=True
+            ).count(),
+            9,
+        )
+
+    def test_stored_grades_are_kept(self):
+        """Partial credit and manual regrades survive grading"""
+        attempt = answer_exam(self.user, self.assessment, self.questions, correct=8)
+        responses = list(attempt.responses.order_by("created_at"))
+        UserResponse.objects.filter(pk=responses[8].pk).update(
+            is_partially_correct=True, score=1, max_score=2
+        )
+        # A wrong answer an instructor accepted
+        UserResponse.objects.filter(pk=responses[9].pk).update(
+            is_correct=True, score=2, max_score=2
+        )
+
+        grade_attempt(attempt)
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, 19)
+        self.assertEqual(attempt.max_score, 20)
+        response = UserResponse.objects.get(pk=responses[8].pk)
+        self.assertEqual((response.is_partially_correct, response.score), (True, 1))
+        self.assertTrue(UserResponse.objects.get(pk=responses[9].pk).is_correct)
+
+    def test_grading_query_count_is_constant(self):
+        """Grading cost does not grow with the number of questions"""
+        small = answer_exam(self.user, self.assessment, self.questions[:2], correct=1)
+        with CaptureQueriesContext(connection) as small_queries:
+            grade_attempt(small)
+
+        large = answer_exam(
+            self.user, self.assessment, self.questions, correct=5, attempt_number=2
+        )
+        with CaptureQueriesContext(connection) as large_queries:
+            grade_attempt(large)
+
+        self.assertEqual(
+            len(app_queries(small_queries)), len(app_queries(large_queries))
+        )
+
+    def test_async_submit_pushes_result(self):
+        """Queued submissions are graded in a worker and pushed to the learner"""
+        attempt = answer_exam(self.user, self.assessment, self.questions, correct=10)
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"user_{self.user.id}", channel)
+        self.client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                f"/assessments/{self.assessment.pk}/submit/",
+                {"attempt_id": str(attempt.id), "async": True},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        # Run the queued task the way a worker would
+        grade_assessment_attempt.apply(args=[str(attempt.id)])
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message["type"], "assessment_graded")
+        self.assertEqual(message["result"]["attempt"]["percentage_score"], 100)
+
+        # The learner's socket forwards it as is
+        consumer = NotificationConsumer()
+        consumer.send = AsyncMock()
+        async_to_sync(consumer.assessment_graded)(message)
+        sent = json.loads(consumer.send.call_args.kwargs["text_data"])
+        self.assertEqual(sent["type"], "assessment_graded")
+        self.assertEqual(sent["result"], message["result"])
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, "completed")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class AssessmentSubmissionStormTestCase(TestCase):
+    """Benchmark many learners submitting a timed exam at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@test.com", password="testpass123"
+        )
+        course = create_course_tree(instructor)
+        cls.assessment, questions = create_exam(course, questions=20)
+
+        User.objects.bulk_create(
+            [
+                User(username=f"learner_{i}", email=f"learner_{i}@test.com")
+                for i in range(LOAD_TEST_SUBMISSIONS)
+            ]
+        )
+        cls.attempts = [
+            answer_exam(user, cls.assessment, questions, correct=i % 21)
+            for i, user in enumerate(
+                User.objects.filter(username__startswith="learner_")
+            )
+        ]
+
+    def test_submission_storm(self):
+        """Every submission costs a small, bounded number of queries"""
+        per_submission = set()
+        start_time = time.time()
+        for attempt in self.attempts:
+            with CaptureQueriesContext(connection) as queries:
+                grade_attempt(attempt)
+            per_submission.add(len(app_queries(queries)))
+        storm_time = time.time() - start_time
+
+        # Passing attempts add one XP update; nothing scales with the exam
+        self.assertLessEqual(max(per_submission) - min(per_submission), 1)
+        self.assertLessEqual(max(per_submission), 12)
+        self.assertEqual(
+            UserAssessmentAttempt.objects.filter(status="completed").count(),
+            LOAD_TEST_SUBMISSIONS,
+        )
+        self.assertLess(storm_time / LOAD_TEST_SUBMISSIONS, 0.1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AchievementIndexTestCase(TestCase):
+    """Test the compiled achievement criteria index"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="student", email="student@test.com", password="testpass123"
+        )
+        self.course = create_course_tree(self.user)
+        for name, criteria in [
+            ("XP 100", {"total_xp": 100}),
+            ("XP 500", {"total_xp": 500}),
+            ("Streak and XP", {"total_xp": 100, "min_streak_days": 7}),
+            ("Perfect Score", {"perfect_assessment": True}),
+            ("Vocabulary", {"vocabulary_learned": 500}),
+        ]:
+            Achievement.objects.create(
+                name=name, description=name, category="progress", criteria=criteria
+            )
+
+    def test_index_sorts_thresholds_and_skips_unknown_metrics(self):
+        """Rules are indexed per metric; rules it can't evaluate are left out"""
+        index = compile_criteria_index()
+
+        self.assertEqual(index.thresholds["total_xp"], [100, 100, 500])
+        self.assertEqual(len(index.rules), 4)
+        self.assertNotIn("vocabulary_learned", index.thresholds)
+
+    def test_only_crossed_thresholds_are_awarded(self):
+        """Moving XP from 50 to 150 unlocks exactly the 100 XP rule"""
+        UserProgress.objects.create(
+            user=self.user, course=self.course, xp_earned=150, longest_streak=3
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            awarded = evaluate_achievements(
+                self.user, {"total_xp": 150}, previous={"total_xp": 50}
+            )
+
+        names = set(
+            UserAchievement.objects.filter(user=self.user).values_list(
+                "achievement__name", flat=True
+            )
+        )
+        self.assertEqual(len(awarded), 1)
+        self.assertEqual(names, {"XP 100"})
+        self.assertEqual(Achievement.objects.get(name="XP 100").unlock_count, 1)
+
+        # Re-evaluating never awards twice
+        self.assertEqual(evaluate_achievements(self.user, {"total_xp": 150}), [])
+
+    def test_unlocks_lost_to_a_concurrent_award_are_not_counted(self):
+        """Only the rows actually inserted move unlock_count"""
+        UserProgress.objects.create(user=self.user, course=self.course, xp_earned=150)
+        achievement = Achievement.objects.get(name="XP 100")
+        bulk_create = UserAchievement.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # Another worker awards the same achievement first
+            UserAchievement.objects.create(user=self.user, achievement=achievement)
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(
+            UserAchievement.objects, "bulk_create", side_effect=racing_bulk_create
+        ):
+            awarded = evaluate_achievements(
+                self.user, {"total_xp": 150}, previous={"total_xp": 50}
+            )
+
+        self.assertEqual(awarded, [])
+        achievement.refresh_from_db()
+        self.assertEqual(achievement.unlock_count, 1)
+
+    def test_perfect_score_rule(self):
+        """Event metrics unlock without reading aggregates"""
+        with CaptureQueriesContext(connection) as queries:
+            evaluate_achievements(
+                self.user, {"perfect_assessment": 1}, previous={"perfect_assessment": 0}
+            )
+
+        self.assertTrue(
+            UserAchievement.objects.filter(
+                user=self.user, achievement__name="Perfect Score"
+            ).exists()
+        )
+        self.assertNotIn(
+            "course_userprogress", " ".join(q["sql"] for q in app_queries(queries))
+        )
+
+    def test_achievement_save_rebuilds_index(self):
+        """Saving an achievement recompiles the index"""
+        before = get_criteria_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Achievement.objects.create(
+                name="XP 1000", description="XP", criteria={"total_xp": 1000}
+            )
+
+        after = get_criteria_index()
+        self.assertNotEqual(before.version, after.version)
+        self.assertEqual(after.thresholds["total_xp"][-1], 1000)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class AchievementIndexLoadTestCase(TestCase):
+    """Benchmark achievement evaluation against many rules"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="student", email="student@test.com", password="testpass123"
+        )
+        metrics = ["courses_completed", "total_xp", "min_streak_days"]
+        Achievement.objects.bulk_create(
+            [
+                Achievement(
+                    name=f"Rule {i}",
+                    description="Generated rule",
+                    criteria={metrics[i % 3]: (i // 3 + 1) * 10},
+                )
+                for i in range(LOAD_TEST_ACHIEVEMENT_RULES)
+            ],
+            batch_size=1000,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_evaluation_cost_with_many_rules(self):
+        """A small XP gain only evaluates the rules it crossed"""
+        start_time = time.perf_counter()
+        index = get_criteria_index()
+        compile_time = time.perf_counter() - start_time
+        self.assertEqual(len(index.rules), LOAD_TEST_ACHIEVEMENT_RULES)
+
+        timings = []
+        for xp in range(1000, 1100, 10):
+            with CaptureQueriesContext(connection) as queries:
+                start_time = time.perf_counter()
+                awarded = evaluate_achievements(
+                    self.user, {"total_xp": xp}, previous={"total_xp": xp - 10}
+                )
+                timings.append(time.perf_counter() - start_time)
+
+            # Each 10 XP step crosses exactly one generated threshold
+            self.assertEqual(len(awarded), 1)
+            # Ownership check, insert, inserted rows, counter bump; no
+            # per-rule queries
+            self.assertLessEqual(len(app_queries(queries)), 4)
+
+        self.assertLess(max(timings), compile_time)
@@ -0,0 +1,1853 @@
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, reset_queries
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from guardian.shortcuts import assign_perm
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.common import buffers
+from apps.events import checkin, fanout, filter_index, recommendations, tracking
+from apps.events import tasks as event_tasks
+from apps.events import trending
+from apps.events.analytics import (
+    rebuild_changed_event_analytics,
+    rebuild_event_analytics,
+)
+from apps.events.consumers import EventConsumer
+from apps.events.counters import rebuild_event_counters, rebuild_rating_counters
+from apps.events.models import (
+    Event,
+    EventAnalytics,
+    EventBadge,
+    EventCategory,
+    EventCategoryRelation,
+    EventFavorite,
+    EventRecommendation,
+    EventSimilarity,
+    EventTag,
+    EventTagRelation,
+    EventView,
+    Participant,
+    ParticipantBadge,
+    Session,
+    SessionRating,
+)
+from apps.events.registration import register_participant
+
+User = get_user_model()
+
+# Scale of the load simulations; the target benchmark is 100k events with 5M
+# participants, raise these locally for realistic numbers
+LOAD_TEST_EVENTS = int(os.environ.get("EVENTS_LOAD_TEST_EVENTS", 2000))
+LOAD_TEST_PARTICIPANTS = int(os.environ.get("EVENTS_LOAD_TEST_PARTICIPANTS", 20000))
+LOAD_TEST_USERS = int(os.environ.get("EVENTS_LOAD_TEST_USERS", 500))
+LOAD_TEST_VIEWS = int(os.environ.get("EVENTS_LOAD_TEST_VIEWS", 20000))
+LOAD_TEST_ANALYTICS_EVENTS = int(
+    os.environ.get("EVENTS_LOAD_TEST_ANALYTICS_EVENTS", 5000)
+)
+LOAD_TEST_TRENDING_VIEWS = int(
+    os.environ.get("EVENTS_LOAD_TEST_TRENDING_VIEWS", 100000)
+)
+LOAD_TEST_RATINGS = int(os.environ.get("EVENTS_LOAD_TEST_RATINGS", 2000))
+LOAD_TEST_REGISTRATIONS = int(os.environ.get("EVENTS_LOAD_TEST_REGISTRATIONS", 1000))
+LOAD_TEST_LIVE_CONNECTIONS = int(
+    os.environ.get("EVENTS_LOAD_TEST_LIVE_CONNECTIONS", 200)
+)
+LOAD_TEST_LIVE_UPDATES = int(os.environ.get("EVENTS_LOAD_TEST_LIVE_UPDATES", 2000))
+LOAD_TEST_CHECK_INS = int(os.environ.get("EVENTS_LOAD_TEST_CHECK_INS", 10000))
+LOAD_TEST_INTERACTIONS = int(os.environ.get("EVENTS_LOAD_TEST_INTERACTIONS", 100000))
+LOAD_TEST_TAGGED_EVENTS = int(os.environ.get("EVENTS_LOAD_TEST_TAGGED_EVENTS", 20000))
+
+# Load simulations seed thousands of rows and run for minutes, so they are
+# opt-in: RUN_LOAD_TESTS=1 pytest -m load tests/test_*_performance.py
+RUN_LOAD_TESTS = bool(os.environ.get("RUN_LOAD_TESTS"))
+
+
+def load_test(test):
+    """Tag a load simulation ``load`` and skip it unless RUN_LOAD_TESTS is set"""
+    test = skipUnless(RUN_LOAD_TESTS, "load tests run with RUN_LOAD_TESTS=1")(test)
+    return tag("load")(test)
+
+
+LIVE_CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "CONFIG": {"capacity": 100000},
+    }
+}
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }
+}
+
+
+def app_queries(context):
+    """Queries issued by the code under test, without silk's bookkeeping"""
+    return [
+        q
+        for q in context.captured_queries
+        if not q["sql"].startswith(("EXPLAIN", "SAVEPOINT", "RELEASE SAVEPOINT"))
+        and "silk_" not in q["sql"]
+    ]
+
+
+def create_event(organizer, name="PyCon", **kwargs):
+    """Create a published public event starting next month"""
+    start = timezone.now() + timedelta(days=30)
+    defaults = {
+        "slug": f"{name.lower().replace(' ', '-')}-{uuid.uuid4().hex[:6]}",
+        "status": Event.EventStatus.PUBLISHED,
+        "visibility": Event.Visibility.PUBLIC,
+        "start_date": start,
+        "end_date": start + timedelta(days=2),
+    }
+    defaults.update(kwargs)
+    return Event.objects.create(name=name, organizer=organizer, **defaults)
+
+
+def create_session(event, title="Keynote", days=30):
+    start = timezone.now() + timedelta(days=days)
+    return Session.objects.create(
+        event=event,
+        title=title,
+        slug=f"{title.lower()}-{uuid.uuid4().hex[:6]}",
+        start_time=start,
+        end_time=start + timedelta(hours=1),
+    )
+
+
+def create_participant(event, user):
+    return Participant.objects.create(
+        event=event,
+        user=user,
+        registration_status=Participant.RegistrationStatus.CONFIRMED,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventListQueryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.viewer = User.objects.create_user(
+            username="viewer", email="viewer@example.com", password="pass12345"
+        )
+        self.url = reverse("events:event-list")
+
+    def _names(self, response):
+        return {event["name"] for event in response.data["results"]}
+
+    def test_counters_follow_sessions_and_ratings(self):
+        event = create_event(self.organizer)
+        keynote = create_session(event)
+        workshop = create_session(event, title="Workshop")
+        attendee = create_participant(event, self.viewer)
+        other = create_participant(event, self.organizer)
+
+        SessionRating.objects.create(session=keynote, participant=attendee, rating=5)
+        SessionRating.objects.create(session=workshop, participant=attendee, rating=3)
+        SessionRating.objects.create(session=workshop, participant=other, rating=4)
+
+        event.refresh_from_db()
+        self.assertEqual(event.registration_count, 2)
+        self.assertEqual(event.session_count, 2)
+        self.assertEqual(event.rating_count, 3)
+        self.assertAlmostEqual(event.rating_avg, 4.0)
+
+        workshop.delete()
+        event.refresh_from_db()
+        self.assertEqual(event.session_count, 1)
+        self.assertEqual(event.rating_count, 1)
+        self.assertAlmostEqual(event.rating_avg, 5.0)
+
+    def test_rebuild_repairs_drifted_counters(self):
+        event = create_event(self.organizer)
+        session = create_session(event)
+        attendee = create_participant(event, self.viewer)
+        SessionRating.objects.create(session=session, participant=attendee, rating=2)
+        Event.objects.filter(pk=event.pk).update(
+            registration_count=40, session_count=7, rating_count=0, rating_avg=0
+        )
+
+        self.assertEqual(rebuild_event_counters(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual(
+            (event.registration_count, event.session_count, event.rating_count),
+            (1, 1, 1),
+        )
+        self.assertAlmostEqual(event.rating_avg, 2.0)
+
+    def test_private_events_follow_object_permissions(self):
+        create_event(self.organizer, name="Open Day")
+        granted = create_event(
+            self.organizer, name="Board Meeting", visibility=Event.Visibility.PRIVATE
+        )
+        co_organized = create_event(
+            self.organizer, name="Planning", visibility=Event.Visibility.PRIVATE
+        )
+        create_event(
+            self.organizer, name="Retreat", visibility=Event.Visibility.PRIVATE
+        )
+        assign_perm("view_event", self.viewer, granted)
+        co_organized.co_organizers.add(self.viewer)
+
+        self.client.force_authenticate(self.viewer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._names(response), {"Open Day", "Board Meeting", "Planning"}
+        )
+
+        self.client.force_authenticate(self.organizer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 4)
+
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url)
+        self.assertEqual(self._names(response), {"Open Day"})
+
+    def test_list_reads_counters_without_aggregating(self):
+        for index in range(5):
+            event = create_event(self.organizer, name=f"Event {index}")
+            create_session(event)
+            create_participant(event, self.viewer)
+
+        self.client.force_authenticate(self.viewer)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"ordering": "-average_rating"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 5)
+        first = response.data["results"][0]
+        self.assertEqual(first["participant_count"], 1)
+        self.assertEqual(first["session_count"], 1)
+        self.assertEqual(first["upcoming_session"]["title"], "Keynote")
+
+        event_queries = [
+            q["sql"] for q in app_queries(context) if '"events_event"' in q["sql"]
+        ]
+        for sql in event_queries:
+            self.assertNotIn("GROUP BY", sql)
+            self.assertNotIn("DISTINCT", sql)
+            self.assertNotIn('JOIN "events_participant"', sql)
+        # Count, page and the upcoming-session prefetch, independent of page size
+        self.assertLessEqual(len(event_queries), 3)
+
+    def test_ordering_by_counter_aliases(self):
+        quiet = create_event(self.organizer, name="Quiet")
+        busy = create_event(self.organizer, name="Busy")
+        Event.objects.filter(pk=busy.pk).update(registration_count=10, rating_avg=4.5)
+        Event.objects.filter(pk=quiet.pk).update(registration_count=1, rating_avg=2.0)
+
+        response = self.client.get(self.url, {"ordering": "-participant_count"})
+        self.assertEqual(
+            [event["name"] for event in response.data["results"]], ["Busy", "Quiet"]
+        )
+        response = self.client.get(self.url, {"ordering": "average_rating"})
+        self.assertEqual(
+            [event["name"] for event in response.data["results"]], ["Quiet", "Busy"]
+        )
+
+    def test_capacity_filter_uses_registration_counter(self):
+        create_event(self.organizer, name="Unlimited", capacity=0)
+        full = create_event(self.organizer, name="Full", capacity=1)
+        create_event(self.organizer, name="Roomy", capacity=10)
+        create_participant(full, self.viewer)
+
+        response = self.client.get(self.url, {"has_capacity": "true"})
+        self.assertEqual(self._names(response), {"Unlimited", "Roomy"})
+        response = self.client.get(self.url, {"has_capacity": "false"})
+        self.assertEqual(self._names(response), {"Full"})
+
+    def test_retrieve_uses_detail_queryset(self):
+        event = create_event(self.organizer)
+        event.co_organizers.add(self.viewer)
+
+        self.client.force_authenticate(self.viewer)
+        response = self.client.get(reverse("events:event-detail", args=[event.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["name"], "PyCon")
+        self.assertTrue(response.data["can_edit"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class EventListLoadTestCase(TestCase):
+    """Event listing against a large catalogue"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"attendee{index}", email=f"attendee{index}@example.com")
+                for index in range(LOAD_TEST_USERS)
+            ]
+        )
+        cls.viewer = users[0]
+        start = timezone.now() + timedelta(days=30)
+        statuses = [Event.EventStatus.PUBLISHED, Event.EventStatus.DRAFT]
+        visibilities = [Event.Visibility.PUBLIC, Event.Visibility.PRIVATE]
+        events = Event.objects.bulk_create(
+            [
+                Event(
+                    name=f"Event {index}",
+                    slug=f"event-{index}",
+                    organizer=users[index % LOAD_TEST_USERS],
+                    status=statuses[index % 5 == 0],
+                    visibility=visibilities[index % 7 == 0],
+                    start_date=start,
+                    end_date=start + timedelta(days=1),
+                )
+                for index in range(LOAD_TEST_EVENTS)
+            ],
+            batch_size=1000,
+        )
+
+        per_event = max(1, LOAD_TEST_PARTICIPANTS // LOAD_TEST_EVENTS)
+        batch = []
+        for event_index, event in enumerate(events):
+            for offset in range(min(per_event, LOAD_TEST_USERS)):
+                user = users[(event_index + offset) % LOAD_TEST_USERS]
+                batch.append(
+                    Participant(
+                        event=event,
+                        user=user,
+                        ticket_code=f"{event_index}-{offset}",
+                        registration_status=Participant.RegistrationStatus.CONFIRMED,
+                    )
+                )
+            if len(batch) >= 10000:
+                Participant.objects.bulk_create(batch, batch_size=2000)
+                batch = []
+        Participant.objects.bulk_create(batch, batch_size=2000)
+
+        for index, event in enumerate(events[:50]):
+            assign_perm("view_event", cls.viewer, event)
+
+        # bulk_create skips the signals that maintain the counters
+        rebuild_event_counters()
+
+    def test_list_latency_and_query_shape(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        url = reverse("events:event-list")
+
+        for ordering in ["-created_at", "-participant_count", "-average_rating"]:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, {"ordering": ordering, "page_size": 50})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), 50)
+            queries = app_queries(context)
+            for query in queries:
+                self.assertNotIn("GROUP BY", query["sql"])
+            self.assertLessEqual(len(queries), 5)
+
+        counts = [event["participant_count"] for event in response.data["results"]]
+        self.assertTrue(all(count > 0 for count in counts))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventRegistrationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.users = [
+            User.objects.create_user(
+                username=f"attendee{index}",
+                email=f"attendee{index}@example.com",
+                password="pass12345",
+            )
+            for index in range(4)
+        ]
+        self.event = create_event(self.organizer, capacity=2)
+
+    def _register(self, user, **headers):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            reverse("events:event-register", args=[self.event.pk]), **headers
+        )
+
+    def _unregister(self, user, **headers):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            reverse("events:event-unregister", args=[self.event.pk]), **headers
+        )
+
+    def test_full_event_waitlists_and_promotes_on_cancellation(self):
+        statuses = [self._register(user).status_code for user in self.users]
+        self.assertEqual(statuses, [201, 201, 202, 202])
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 2)
+
+        response = self._unregister(self.users[0])
+        self.assertEqual(response.status_code, 200)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 2)
+        registrations = dict(
+            Participant.objects.filter(event=self.event).values_list(
+                "user__username", "registration_status"
+            )
+        )
+        self.assertEqual(
+            registrations,
+            {
+                "attendee0": Participant.RegistrationStatus.CANCELLED,
+                "attendee1": Participant.RegistrationStatus.CONFIRMED,
+                # First in line takes the freed seat
+                "attendee2": Participant.RegistrationStatus.CONFIRMED,
+                "attendee3": Participant.RegistrationStatus.WAITLIST,
+            },
+        )
+
+    def test_cancelled_user_can_register_again(self):
+        self._register(self.users[0])
+        self._unregister(self.users[0])
+
+        response = self._register(self.users[0])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Participant.objects.filter(event=self.event).count(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+
+    def test_duplicate_registration_is_rejected(self):
+        self._register(self.users[0])
+        response = self._register(self.users[0])
+
+        self.assertEqual(response.status_code, 400)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+
+    def test_idempotency_key_replays_the_first_outcome(self):
+        first = self._register(self.users[0], HTTP_IDEMPOTENCY_KEY="ticket-drop-1")
+        retry = self._register(self.users[0], HTTP_IDEMPOTENCY_KEY="ticket-drop-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data["id"], first.data["id"])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 1)
+
+        cancel = self._unregister(self.users[0], HTTP_IDEMPOTENCY_KEY="cancel-1")
+        retry = self._unregister(self.users[0], HTTP_IDEMPOTENCY_KEY="cancel-1")
+        self.assertEqual((cancel.status_code, retry.status_code), (200, 200))
+
+    def test_closed_registration_is_rejected(self):
+        Event.objects.filter(pk=self.event.pk).update(
+            registration_end=timezone.now() - timedelta(days=1)
+        )
+
+        response = self._register(self.users[0])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Participant.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@load_test
+class RegistrationConcurrencyTestCase(TransactionTestCase):
+    """A ticket drop: many parallel registrations racing for 100 seats"""
+
+    seats = 100
+
+    def _register_with_retry(self, event, user):
+        # SQLite reports lock contention instead of waiting like a server
+        # database would; retry the way a client would
+        for _ in range(200):
+            try:
+                return register_participant(event, user).outcome
+            except OperationalError:
+                time.sleep(0.005)
+            finally:
+                connection.close()
+        return "failed"
+
+    def test_no_oversell_under_parallel_registrations(self):
+        organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        users = User.objects.bulk_create(
+            [
+                User(username=f"fan{index}", email=f"fan{index}@example.com")
+                for index in range(LOAD_TEST_REGISTRATIONS)
+            ]
+        )
+        event = create_event(organizer, capacity=self.seats)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            outcomes = list(
+                pool.map(lambda user: self._register_with_retry(event, user), users)
+            )
+
+        event.refresh_from_db()
+        registrations = Counter(
+            Participant.objects.filter(event=event).values_list(
+                "registration_status", flat=True
+            )
+        )
+        # A retried request may find its own earlier, committed registration
+        self.assertNotIn("failed", outcomes)
+        self.assertLessEqual(outcomes.count("confirmed"), self.seats)
+        self.assertEqual(
+            registrations,
+            {
+                Participant.RegistrationStatus.CONFIRMED: self.seats,
+                Participant.RegistrationStatus.WAITLIST: len(users) - self.seats,
+            },
+        )
+        self.assertEqual(event.registration_count, self.seats)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventViewTrackingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.event = create_event(self.organizer)
+
+    def _request(self, user=None, ip="10.0.0.1"):
+        request = self.factory.get("/", REMOTE_ADDR=ip, HTTP_USER_AGENT="pytest")
+        request.user = user or AnonymousUser()
+        return request
+
+    def _later(self):
+        """A moment after the current minute, when its views can be flushed"""
+        return timezone.now() + timedelta(minutes=1)
+
+    def test_views_are_deduplicated_and_flushed_in_bulk(self):
+        self.assertTrue(tracking.record_event_view(self.event, self._request()))
+        self.assertFalse(tracking.record_event_view(self.event, self._request()))
+        tracking.record_event_view(self.event, self._request(ip="10.0.0.2"))
+        tracking.record_event_view(self.event, self._request(user=self.organizer))
+
+        # Nothing is written inside the requests
+        self.assertFalse(EventView.objects.exists())
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(tracking.flush_event_views(self._later()), 3)
+        # One bulk insert, then one delta per counter row
+        self.assertLessEqual(len(app_queries(context)), 3)
+
+        self.event.refresh_from_db()
+        analytics = EventAnalytics.objects.get(event=self.event)
+        self.assertEqual(EventView.objects.filter(event=self.event).count(), 3)
+        self.assertEqual(self.event.view_count, 3)
+        self.assertEqual((analytics.total_views, analytics.unique_views), (3, 3))
+
+    def test_views_wait_for_the_periodic_flush(self):
+        now = timezone.now()
+        for index in range(3):
+            tracking.record_event_view(self.event, self._request(ip=f"10.0.0.{index}"))
+
+        # Only finished minutes are flushed, and only once
+        self.assertEqual(tracking.flush_event_views(now), 0)
+        self.assertFalse(EventView.objects.exists())
+        self.assertEqual(tracking.flush_event_views(self._later()), 3)
+        self.assertEqual(tracking.flush_event_views(self._later()), 0)
+        self.assertEqual(EventView.objects.count(), 3)
+
+        tasks = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn("apps.events.tasks.flush_event_views", tasks)
+
+    def test_rebuild_keeps_the_ingested_unique_views(self):
+        today = timezone.now()
+        visitors = ["ip_10.0.0.1", "ip_10.0.0.2", f"user_{self.organizer.id}"]
+        for day in (today, today + timedelta(days=1)):
+            # The previous day's views are past the dedupe window
+            cache.delete_many([f"event_view_{self.event.id}_{v}" for v in visitors])
+            with mock.patch("django.utils.timezone.now", return_value=day):
+                for ip in ("10.0.0.1", "10.0.0.2"):
+                    tracking.record_event_view(self.event, self._request(ip=ip))
+                tracking.record_event_view(self.event, self._request(self.organizer))
+                # A repeat view after the dedupe window is not unique that day
+                cache.delete(f"event_view_{self.event.id}_ip_10.0.0.1")
+                tracking.record_event_view(self.event, self._request())
+                tracking.flush_event_views(day + timedelta(minutes=1))
+
+        analytics = EventAnalytics.objects.get(event=self.event)
+        self.assertEqual((analytics.total_views, analytics.unique_views), (8, 6))
+        rebuild_event_analytics([self.event.pk])
+        analytics.refresh_from_db()
+        self.assertEqual((analytics.total_views, analytics.unique_views), (8, 6))
+
+    @override_settings(EVENT_VIEW_SAMPLING_THRESHOLD=100, EVENT_VIEW_SAMPLE_RATE=0.0)
+    def test_busy_events_sample_raw_rows_but_keep_exact_counters(self):
+        Event.objects.filter(pk=self.event.pk).update(view_count=100)
+        self.event.refresh_from_db()
+
+        for index in range(5):
+            tracking.record_event_view(self.event, self._request(ip=f"10.0.1.{index}"))
+        tracking.flush_event_views(self._later())
+
+        self.event.refresh_from_db()
+        self.assertFalse(EventView.objects.exists())
+        self.assertEqual(self.event.view_count, 105)
+        self.assertEqual(EventAnalytics.objects.get(event=self.event).total_views, 5)
+
+    @load_test
+    def test_ingestion_throughput(self):
+        events = [self.event] + [
+            create_event(self.organizer, name=f"Meetup {index}") for index in range(9)
+        ]
+        views = LOAD_TEST_VIEWS
+
+        with CaptureQueriesContext(connection) as context:
+            first_minute = buffers.bucket_of(timezone.now())
+            for index in range(views):
+                # One visitor per view, so none are deduplicated
+                tracking.record_event_view(
+                    events[index % len(events)],
+                    self._request(ip=f"10.{index // 256 % 256}.{index % 256}.1"),
+                )
+            tracking.flush_event_views(self._later())
+            minutes = buffers.bucket_of(timezone.now()) - first_minute + 1
+
+        queries = app_queries(context)
+        # Nothing is read per view; each minute moves two counters per event
+        # besides its bulk insert batches
+        self.assertFalse([q for q in queries if q["sql"].startswith("SELECT")])
+        self.assertLessEqual(
+            len([q for q in queries if q["sql"].startswith("UPDATE")]),
+            minutes * 2 * len(events),
+        )
+        self.assertEqual(
+            sum(
+                Event.objects.filter(pk__in=[e.pk for e in events]).values_list(
+                    "view_count", flat=True
+                )
+            ),
+            views,
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventAnalyticsRebuildTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.attendees = [
+            User.objects.create_user(
+                username=f"attendee{index}", email=f"attendee{index}@example.com"
+            )
+            for index in range(4)
+        ]
+
+    def _populate(self, event):
+        status = Participant.RegistrationStatus
+        for user, registration_status in zip(
+            self.attendees,
+            [status.CONFIRMED, status.CONFIRMED, status.CANCELLED, status.WAITLIST],
+        ):
+            Participant.objects.create(
+                event=event, user=user, registration_status=registration_status
+            )
+        Participant.objects.filter(event=event, user=self.attendees[0]).update(
+            attendance_status=Participant.AttendanceStatus.ATTENDED
+        )
+        create_session(event)
+        EventView.objects.bulk_create(
+            [
+                EventView(event=event, user=self.attendees[0]),
+                EventView(event=event, user=self.attendees[0]),
+                EventView(event=event, ip_address="10.0.0.1"),
+                EventView(event=event, ip_address="10.0.0.2"),
+            ]
+        )
+
+    def test_rebuild_matches_event_data(self):
+        event = create_event(self.organizer)
+        self._populate(event)
+        EventAnalytics.objects.filter(event=event).delete()
+
+        self.assertEqual(rebuild_event_analytics([event.pk]), 1)
+
+        analytics = EventAnalytics.objects.get(event=event)
+        self.assertEqual(analytics.total_registrations, 4)
+        self.assertEqual(analytics.confirmed_registrations, 2)
+        self.assertEqual(analytics.cancelled_registrations, 1)
+        self.assertEqual(analytics.waitlist_registrations, 1)
+        self.assertEqual(analytics.total_attendance, 1)
+        self.assertAlmostEqual(analytics.attendance_rate, 50.0)
+        self.assertEqual((analytics.total_views, analytics.unique_views), (4, 3))
+        self.assertEqual(analytics.total_sessions, 1)
+
+    def test_query_count_does_not_grow_with_events(self):
+        events = [create_event(self.organizer, name=f"Meetup {i}") for i in range(3)]
+        for event in events:
+            self._populate(event)
+
+        def rebuild_queries(event_ids):
+            with CaptureQueriesContext(connection) as context:
+                rebuild_event_analytics(event_ids)
+            return len(app_queries(context))
+
+        self.assertEqual(
+            rebuild_queries([events[0].pk]),
+            rebuild_queries([event.pk for event in events]),
+        )
+
+    def test_incremental_rebuild_only_touches_changed_events(self):
+        events = [create_event(self.organizer, name=f"Meetup {i}") for i in range(3)]
+        self.assertEqual(rebuild_changed_event_analytics(), 3)
+        self.assertEqual(rebuild_changed_event_analytics(), 0)
+
+        Participant.objects.create(event=events[1], user=self.attendees[0])
+        self.assertEqual(rebuild_changed_event_analytics(), 1)
+        self.assertEqual(
+            EventAnalytics.objects.get(event=events[1]).total_registrations, 1
+        )
+
+    def test_maintenance_command_reports_runtime(self):
+        create_event(self.organizer)
+        out = StringIO()
+        call_command(
+            "event_maintenance", "--update-analytics", "--full-analytics", stdout=out
+        )
+        self.assertIn("Updated analytics for 1 events", out.getvalue())
+
+    @load_test
+    def test_rebuild_runtime(self):
+        start = timezone.now() + timedelta(days=30)
+        events = Event.objects.bulk_create(
+            [
+                Event(
+                    name=f"Event {index}",
+                    slug=f"event-{index}",
+                    organizer=self.organizer,
+                    status=Event.EventStatus.PUBLISHED,
+                    start_date=start,
+                    end_date=start + timedelta(days=1),
+                )
+                for index in range(LOAD_TEST_ANALYTICS_EVENTS)
+            ],
+            batch_size=1000,
+        )
+        Participant.objects.bulk_create(
+            [
+                Participant(
+                    event=event,
+                    user=user,
+                    ticket_code=f"{index}-{user.pk}",
+                    registration_status=Participant.RegistrationStatus.CONFIRMED,
+                )
+                for index, event in enumerate(events)
+                for user in self.attendees[: index % 4 + 1]
+            ],
+            batch_size=2000,
+        )
+
+        # The first run also creates the analytics rows bulk_create skipped
+        updated = rebuild_event_analytics()
+
+        Participant.objects.filter(event__in=events[::10]).update(
+            registration_status=Participant.RegistrationStatus.CANCELLED
+        )
+        rebuild_event_analytics()
+
+        self.assertEqual(updated, LOAD_TEST_ANALYTICS_EVENTS)
+        self.assertEqual(
+            EventAnalytics.objects.aggregate(total=Sum("total_registrations"))["total"],
+            Participant.objects.count(),
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TrendingScoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.attendee = User.objects.create_user(
+            username="attendee", email="attendee@example.com", password="pass12345"
+        )
+        self.tag = EventTag.objects.create(name="Python", slug="python")
+
+    def test_activity_bumps_event_and_tag_scores(self):
+        event = create_event(self.organizer)
+        EventTagRelation.objects.create(event=event, tag=self.tag)
+
+        create_participant(event, self.attendee)
+        EventFavorite.objects.create(event=event, user=self.attendee)
+        tracking.ingest_views(
+            [
+                tracking.PendingView(event.pk, None, "10.0.0.1", "", True, True),
+                tracking.PendingView(event.pk, None, "10.0.0.2", "", True, True),
+            ]
+        )
+
+        # The scores only move once the minute's deltas are applied
+        event.refresh_from_db()
+        self.assertEqual(event.trending_score, 0)
+
+        later = timezone.now() + timedelta(minutes=1)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(trending.apply_activity(later), 1)
+        # The tag lookup, then one delta for the event and one for its tag
+        self.assertEqual(len(app_queries(context)), 3)
+        self.assertEqual(trending.apply_activity(later), 0)
+
+        expected = sum(
+            [
+                trending.TRENDING_WEIGHTS["registration"],
+                trending.TRENDING_WEIGHTS["favorite"],
+                trending.TRENDING_WEIGHTS["view"] * 2,
+            ]
+        )
+        event.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertAlmostEqual(event.trending_score, expected)
+        self.assertAlmostEqual(self.tag.trending_score, expected)
+        tasks = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn("apps.events.tasks.apply_trending_activity", tasks)
+
+    def test_refresh_decays_old_activity(self):
+        fresh = create_event(self.organizer, name="Fresh")
+        stale = create_event(self.organizer, name="Stale")
+        gone = create_event(self.organizer, name="Gone")
+        EventTagRelation.objects.create(event=stale, tag=self.tag)
+
+        now = timezone.now()
+        half_life = trending.TRENDING_HALF_LIFE
+        for event, age in [
+            (fresh, timedelta(minutes=1)),
+            (stale, half_life),
+            (gone, trending.TRENDING_WINDOW + timedelta(days=1)),
+        ]:
+            views = EventView.objects.bulk_create(
+                [EventView(event=event, ip_address=f"10.0.0.{i}") for i in range(4)]
+            )
+            EventView.objects.filter(pk__in=[view.pk for view in views]).update(
+                created_at=now - age
+            )
+        Event.objects.filter(pk=gone.pk).update(trending_score=50.0)
+
+        self.assertEqual(trending.refresh_trending_scores(now), (2, 1))
+
+        scores = dict(Event.objects.values_list("name", "trending_score"))
+        self.assertAlmostEqual(scores["Fresh"], 4.0)
+        self.assertAlmostEqual(scores["Stale"], 2.0)
+        self.assertEqual(scores["Gone"], 0.0)
+        self.tag.refresh_from_db()
+        self.assertAlmostEqual(self.tag.trending_score, 2.0)
+        self.assertTrue(self.tag.is_trending)
+        self.assertEqual(
+            set(Event.objects.filter(is_trending=True).values_list("name", flat=True)),
+            {"Fresh", "Stale"},
+        )
+
+    def test_refresh_leaves_the_current_minute_to_its_deltas(self):
+        event = create_event(self.organizer)
+        now = timezone.now()
+        create_participant(event, self.attendee)
+        EventFavorite.objects.create(event=event, user=self.attendee)
+
+        # Both rows are still queued as deltas of the current minute
+        trending.refresh_trending_scores(now)
+        trending.apply_activity(now + timedelta(minutes=2))
+
+        event.refresh_from_db()
+        self.assertAlmostEqual(
+            event.trending_score,
+            trending.TRENDING_WEIGHTS["registration"]
+            + trending.TRENDING_WEIGHTS["favorite"],
+        )
+
+    def test_endpoints_read_the_stored_scores(self):
+        for name, score in [("Quiet", 1.0), ("Busy", 9.0), ("Idle", 0.0)]:
+            event = create_event(self.organizer, name=name)
+            Event.objects.filter(pk=event.pk).update(trending_score=score)
+        EventTag.objects.filter(pk=self.tag.pk).update(trending_score=3.0)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("events:event-trending"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event["name"] for event in response.data], ["Busy", "Quiet"])
+        for query in app_queries(context):
+            self.assertNotIn("GROUP BY", query["sql"])
+
+        response = self.client.get(reverse("events:eventtag-trending"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["trending_score"], 3.0)
+
+    @load_test
+    def test_trending_with_many_views(self):
+        events = Event.objects.bulk_create(
+            [
+                Event(
+                    name=f"Event {index}",
+                    slug=f"event-{index}",
+                    organizer=self.organizer,
+                    status=Event.EventStatus.PUBLISHED,
+                    visibility=Event.Visibility.PUBLIC,
+                    start_date=timezone.now() + timedelta(days=30),
+                    end_date=timezone.now() + timedelta(days=31),
+                )
+                for index in range(1000)
+            ]
+        )
+        batch = []
+        for index in range(LOAD_TEST_TRENDING_VIEWS):
+            # Skew the views so a few events dominate
+            event = events[(index * index) % len(events)]
+            batch.append(EventView(event=event, ip_address="10.0.0.1"))
+            if len(batch) >= 50000:
+                EventView.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        EventView.objects.bulk_create(batch, batch_size=5000)
+
+        trending.refresh_trending_scores(timezone.now() + timedelta(minutes=1))
+
+        url = reverse("events:event-trending")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 20)
+        self.assertLessEqual(len(app_queries(context)), 4)
+
+
+class SessionRatingAggregateTestCase(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.event = create_event(self.organizer)
+        self.keynote = create_session(self.event)
+        self.participants = [
+            create_participant(
+                self.event,
+                User.objects.create_user(
+                    username=f"attendee{index}", email=f"attendee{index}@example.com"
+                ),
+            )
+            for index in range(3)
+        ]
+
+    def _aggregates(self, obj):
+        obj.refresh_from_db()
+        return obj.rating_count, obj.rating_sum, obj.rating_avg
+
+    def test_aggregates_follow_create_update_and_delete(self):
+        first, second, third = [
+            SessionRating.objects.create(
+                session=self.keynote, participant=participant, rating=rating
+            )
+            for participant, rating in zip(self.participants, [5, 4, 3])
+        ]
+        self.assertEqual(self._aggregates(self.keynote), (3, 12, 4.0))
+        self.assertEqual(self.keynote.rating_histogram, {1: 0, 2: 0, 3: 1, 4: 1, 5: 1})
+
+        third.rating = 1
+        third.save()
+        self.assertEqual(self._aggregates(self.keynote), (3, 10, 10 / 3))
+        self.assertEqual(self.keynote.rating_histogram, {1: 1, 2: 0, 3: 0, 4: 1, 5: 1})
+
+        first.delete()
+        self.assertEqual(self._aggregates(self.keynote), (2, 5, 2.5))
+        self.assertEqual(self._aggregates(self.event), (2, 5, 2.5))
+
+        workshop = create_session(self.event, title="Workshop")
+        second.session = workshop
+        second.save()
+        self.assertEqual(self._aggregates(self.keynote), (1, 1, 1.0))
+        self.assertEqual(self._aggregates(workshop), (1, 4, 4.0))
+        self.assertEqual(self._aggregates(self.event), (2, 5, 2.5))
+
+    def test_rebuild_repairs_drifted_aggregates(self):
+        for participant, rating in zip(self.participants, [5, 4, 3]):
+            SessionRating.objects.create(
+                session=self.keynote, participant=participant, rating=rating
+            )
+        Session.objects.filter(pk=self.keynote.pk).update(
+            rating_count=0, rating_sum=0, rating_avg=0.0, rating_5_count=7
+        )
+        Participant.objects.update(ratings_given=9)
+
+        rebuild_rating_counters()
+
+        self.assertEqual(self._aggregates(self.keynote), (3, 12, 4.0))
+        self.assertEqual(self.keynote.rating_5_count, 1)
+        self.assertEqual(
+            set(Participant.objects.values_list("ratings_given", flat=True)), {1}
+        )
+
+    def test_reviewer_badges_use_the_rating_counter(self):
+        badge = EventBadge.objects.create(name="First Reviewer")
+        participant = self.participants[0]
+
+        with CaptureQueriesContext(connection) as context:
+            SessionRating.objects.create(
+                session=self.keynote, participant=participant, rating=5
+            )
+
+        self.assertTrue(
+            ParticipantBadge.objects.filter(
+                participant=participant, badge=badge
+            ).exists()
+        )
+        for query in app_queries(context):
+            self.assertNotIn("AVG(", query["sql"].upper())
+            self.assertNotIn("COUNT(", query["sql"].upper())
+
+    @load_test
+    def test_keynote_rating_burst(self):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"fan{index}", email=f"fan{index}@example.com")
+                for index in range(LOAD_TEST_RATINGS)
+            ]
+        )
+        participants = Participant.objects.bulk_create(
+            [
+                Participant(
+                    event=self.event,
+                    user=user,
+                    ticket_code=f"fan-{index}",
+                    registration_status=Participant.RegistrationStatus.CONFIRMED,
+                )
+                for index, user in enumerate(users)
+            ],
+            batch_size=2000,
+        )
+
+        query_counts = []
+        for index, participant in enumerate(participants):
+            # Keep the bounded query log from filling up
+            reset_queries()
+            with CaptureQueriesContext(connection) as context:
+                SessionRating.objects.create(
+                    session=self.keynote, participant=participant, rating=index % 5 + 1
+                )
+            query_counts.append(len(app_queries(context)))
+
+        # The cost of a rating does not grow with the ratings already stored
+        self.assertEqual(query_counts[1], query_counts[-1])
+        count, total, average = self._aggregates(self.keynote)
+        self.assertEqual(count, LOAD_TEST_RATINGS)
+        self.assertEqual(
+            total,
+            SessionRating.objects.aggregate(total=Sum("rating"))["total"],
+        )
+        self.assertAlmostEqual(average, total / count)
+
+
+@override_settings(CHANNEL_LAYERS=LIVE_CHANNEL_LAYERS)
+@override_settings(CACHES=LOCMEM_CACHES)
+class LiveFanOutTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.layer = get_channel_layer()
+        self.fanout = fanout.FanOut(interval=0.01)
+
+    def tearDown(self):
+        fanout.fanout.clear()
+
+    def _connect(self, count, *groups):
+        async def connect():
+            channels = []
+            for _ in range(count):
+                channel = await self.layer.new_channel()
+                for group in groups:
+                    await self.layer.group_add(group, channel)
+                channels.append(channel)
+            return channels
+
+        return async_to_sync(connect)()
+
+    def _inbox(self, channel):
+        """Every message waiting on a channel"""
+        queue = self.layer.channels.get(channel)
+        messages = []
+        while queue is not None and not queue.empty():
+            messages.append(queue.get_nowait()[1])
+        return messages
+
+    def test_updates_are_coalesced_per_group(self):
+        group = fanout.event_group("live")
+        (channel,) = self._connect(1, group)
+
+        async def burst():
+            for index in range(50):
+                await self.fanout.send(group, "chat_message", {"message": index})
+            await asyncio.sleep(0.05)
+
+        async_to_sync(burst)()
+
+        (message,) = self._inbox(channel)
+        self.assertEqual(message["type"], "batch_update")
+        self.assertEqual(
+            [update["data"]["message"] for update in message["updates"]],
+            list(range(50)),
+        )
+        self.assertEqual(self.fanout.sent, 1)
+
+    def test_full_batches_are_sent_without_waiting(self):
+        self.fanout.max_batch = 10
+        group = fanout.event_group("live")
+        (channel,) = self._connect(1, group)
+
+        async def burst():
+            for index in range(25):
+                await self.fanout.send(group, "chat_message", {"message": index})
+
+        async_to_sync(burst)()
+
+        self.assertEqual(
+            [len(message["updates"]) for message in self._inbox(channel)], [10, 10]
+        )
+
+    def test_poll_votes_are_tallied_server_side(self):
+        group = fanout.event_group("live")
+        (channel,) = self._connect(1, group)
+
+        async def vote():
+            await self.fanout.send_vote(group, "poll", 1, "yes")
+            await self.fanout.send_vote(group, "poll", 2, "yes")
+            await self.fanout.send_vote(group, "poll", 3, "no")
+            # A changed vote moves, a repeated one is ignored
+            await self.fanout.send_vote(group, "poll", 2, "no")
+            await self.fanout.send_vote(group, "poll", 3, "no")
+            await self.fanout.flush_all()
+
+        async_to_sync(vote)()
+
+        (message,) = self._inbox(channel)
+        self.assertEqual(message["updates"], [])
+        self.assertEqual(
+            message["polls"],
+            [{"poll_id": "poll", "counts": {"yes": 1, "no": 2}, "total": 3}],
+        )
+
+    def test_poll_tallies_are_shared_between_workers(self):
+        group = fanout.event_group("live")
+        first, second = fanout.FanOut(), fanout.FanOut()
+        first.vote(group, "poll", 1, "yes")
+        second.vote(group, "poll", 2, "yes")
+        # A vote changed through another worker moves, it is not counted twice
+        second.vote(group, "poll", 1, {"choice": "no"})
+        self.assertEqual(first.vote(group, "poll", 1, {"choice": "no"}), (False, False))
+
+        expected = {"counts": {"yes": 1, '{"choice": "no"}': 1}, "total": 2}
+        for worker in (first, second):
+            (poll,) = worker.drain(group)["polls"]
+            self.assertEqual(poll, {"poll_id": "poll", **expected})
+        self.assertIsNone(first.tally(group, "other"))
+
+    def test_session_updates_only_reach_watchers(self):
+        event = fanout.event_group("live")
+        session = fanout.session_group("keynote")
+        (watcher,) = self._connect(1, event, session)
+        (other,) = self._connect(1, event)
+
+        async def ask():
+            await self.fanout.send(session, "qa_update", {"question": "Why?"})
+            await self.fanout.flush_all()
+
+        async_to_sync(ask)()
+
+        self.assertEqual(len(self._inbox(watcher)), 1)
+        self.assertEqual(self._inbox(other), [])
+
+    def test_session_messages_stay_in_the_event(self):
+        organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        event = create_event(organizer)
+        own = create_session(event)
+        foreign = create_session(create_event(organizer, name="DjangoCon"))
+        consumer = EventConsumer()
+        consumer.event_id = event.id
+        consumer.event_group_name = fanout.event_group(event.id)
+        consumer.user = organizer
+        consumer.send_error = mock.AsyncMock()
+
+        def messages(session_id):
+            return [
+                (
+                    consumer.handle_qa_question,
+                    {"question": "Why?", "session_id": session_id},
+                ),
+                (
+                    consumer.handle_chat_message,
+                    {"message": "Hi", "chat_type": "session", "target_id": session_id},
+                ),
+                (
+                    consumer.handle_poll_response,
+                    {"poll_id": "poll", "response": "yes", "session_id": session_id},
+                ),
+            ]
+
+        with (
+            mock.patch.object(fanout.fanout, "send", mock.AsyncMock()) as send,
+            mock.patch.object(
+                fanout.fanout, "send_vote", mock.AsyncMock()
+            ) as send_vote,
+        ):
+            for handle, data in messages(str(foreign.id)) + messages("not-a-uuid"):
+                async_to_sync(handle)(data)
+            send.assert_not_called()
+            send_vote.assert_not_called()
+            self.assertEqual(consumer.send_error.await_count, 6)
+
+            for handle, data in messages(str(own.id)):
+                async_to_sync(handle)(data)
+        groups = [
+            call.args[0] for call in send.call_args_list + send_vote.call_args_list
+        ]
+        self.assertEqual(groups, [fanout.session_group(str(own.id))] * 3)
+
+    def test_participant_saves_batch_attendance_updates(self):
+        organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        event = create_event(organizer)
+        participant = create_participant(event, organizer)
+        fanout.fanout.clear()
+
+        with mock.patch.object(fanout.fanout, "interval", 60):
+            for status in Participant.AttendanceStatus.values[:3]:
+                participant.attendance_status = status
+                participant.save()
+
+        message = fanout.fanout.drain(fanout.event_group(event.id))
+        self.assertEqual(
+            [update["data"]["attendance_status"] for update in message["updates"]],
+            Participant.AttendanceStatus.values[:3],
+        )
+
+    def _live_traffic(self, index, polls, sessions):
+        """A live event's mix of votes, Q&A and chat"""
+        if index % 10 < 7:
+            return "vote", polls[index % len(polls)], index
+        if index % 10 < 8:
+            return "qa_update", sessions[index % len(sessions)], index
+        return "chat_message", None, index
+
+    @load_test
+    def test_live_event_fan_out_load(self):
+        event = fanout.event_group("live")
+        polls = ["poll-1", "poll-2", "poll-3"]
+        sessions = [fanout.session_group(name) for name in ("keynote", "workshop")]
+        channels = self._connect(LOAD_TEST_LIVE_CONNECTIONS, event)
+        # A quarter of the attendees watch each session
+        watchers = len(channels) // 4
+        for session, offset in zip(sessions, (0, watchers)):
+            for channel in channels[offset : offset + watchers]:
+                async_to_sync(self.layer.group_add)(session, channel)
+        traffic = [
+            self._live_traffic(index, polls, sessions)
+            for index in range(LOAD_TEST_LIVE_UPDATES)
+        ]
+
+        async def direct():
+            for kind, target, index in traffic:
+                group = event if kind != "qa_update" else target
+                await self.layer.group_send(
+                    group, {"type": kind, "data": {"index": index, "poll": target}}
+                )
+
+        async def batched():
+            for kind, target, index in traffic:
+                if kind == "vote":
+                    await self.fanout.send_vote(event, target, index, index % 4)
+                elif kind == "qa_update":
+                    await self.fanout.send(target, kind, {"index": index})
+                else:
+                    await self.fanout.send(event, kind, {"index": index})
+            await self.fanout.flush_all()
+
+        results = {}
+        for name, run in [("direct", direct), ("batched", batched)]:
+            async_to_sync(run)()
+            delivered = sum(len(self._inbox(channel)) for channel in channels)
+            results[name] = delivered
+
+        self.assertLess(results["batched"] * 10, results["direct"])
+        tally = self.fanout.tally(event, "poll-1")
+        self.assertEqual(tally["total"], len([t for t in traffic if t[1] == "poll-1"]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CheckInTestCase(TestCase):
+    def setUp(self):
+        checkin.forget_roster()
+        self.client = APIClient()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.event = create_event(self.organizer)
+        self.participants = self._attendees(20)
+
+    def tearDown(self):
+        checkin.forget_roster()
+        fanout.fanout.clear()
+
+    def _attendees(self, count, prefix="attendee"):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{prefix}{index}", email=f"{prefix}{index}@example.com")
+                for index in range(count)
+            ]
+        )
+        return Participant.objects.bulk_create(
+            [
+                Participant(
+                    event=self.event,
+                    user=user,
+                    ticket_code=f"{prefix}-{index}",
+                    registration_status=Participant.RegistrationStatus.CONFIRMED,
+                )
+                for index, user in enumerate(users)
+            ],
+            batch_size=2000,
+        )
+
+    def _scans(self, participants, **kwargs):
+        return [
+            checkin.Scan(str(participant.pk), **kwargs) for participant in participants
+        ]
+
+    def _checked_in(self):
+        return set(
+            Participant.objects.filter(
+                attendance_status=Participant.AttendanceStatus.CHECKED_IN
+            ).values_list("pk", flat=True)
+        )
+
+    def test_batch_is_checked_in_with_set_based_updates(self):
+        pending = self.participants[-1]
+        Participant.objects.filter(pk=pending.pk).update(
+            registration_status=Participant.RegistrationStatus.PENDING
+        )
+        scans = self._scans(self.participants)
+        scans += [checkin.Scan("attendee-0"), checkin.Scan("no-such-ticket")]
+
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as context:
+                    result = checkin.check_in_participants(self.event, scans)
+
+        self.assertEqual(len(result.checked_in), 19)
+        self.assertEqual(
+            result.rejected,
+            {
+                str(pending.pk): checkin.NOT_CONFIRMED,
+                "no-such-ticket": checkin.NOT_REGISTERED,
+            },
+        )
+        self.assertEqual(self._checked_in(), {p.pk for p in self.participants[:-1]})
+        # Roster load, missing codes lookup, then one select and update
+        self.assertLessEqual(len(app_queries(context)), 4)
+        delay.assert_called_once_with(str(self.event.pk), result.checked_in)
+
+    def test_repeat_scans_are_confirmed_with_one_query(self):
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay"):
+            checkin.check_in_participants(self.event, self._scans(self.participants))
+
+            with CaptureQueriesContext(connection) as context:
+                result = checkin.check_in_participants(
+                    self.event, self._scans(self.participants)
+                )
+
+        self.assertEqual(result.checked_in, [])
+        self.assertEqual(set(result.rejected.values()), {checkin.ALREADY_CHECKED_IN})
+        self.assertEqual(len(app_queries(context)), 1)
+
+    def test_rejections_are_read_again_before_they_are_returned(self):
+        participant = self.participants[0]
+        Participant.objects.filter(pk=participant.pk).update(
+            registration_status=Participant.RegistrationStatus.WAITLIST
+        )
+        checkin.get_roster(self.event.pk)
+        # Another process confirmed the participant after this roster loaded
+        Participant.objects.filter(pk=participant.pk).update(
+            registration_status=Participant.RegistrationStatus.CONFIRMED
+        )
+
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay"):
+            result = checkin.check_in_participants(
+                self.event, self._scans([participant])
+            )
+
+        self.assertEqual(result.checked_in, [str(participant.pk)])
+        self.assertEqual(result.rejected, {})
+
+    def test_registrations_update_the_loaded_roster(self):
+        roster = checkin.get_roster(self.event.pk)
+        user = User.objects.create_user(
+            username="latecomer", email="latecomer@example.com"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = register_participant(self.event, user)
+
+        entry = roster.get(str(result.participant.pk))
+        self.assertEqual(
+            entry.registration_status, Participant.RegistrationStatus.CONFIRMED
+        )
+
+    def test_offline_scans_keep_their_scan_time(self):
+        scanned_at = timezone.now() - timedelta(hours=2)
+        first, second = self.participants[:2]
+
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay"):
+            checkin.check_in_participants(
+                self.event,
+                [
+                    checkin.Scan(str(first.pk), scanned_at),
+                    checkin.Scan(first.ticket_code, scanned_at - timedelta(minutes=5)),
+                    checkin.Scan(str(second.pk)),
+                ],
+            )
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        # A participant scanned twice keeps the earliest scan
+        self.assertEqual(first.check_in_time, scanned_at - timedelta(minutes=5))
+        self.assertGreater(second.check_in_time, scanned_at)
+
+    def test_concurrent_gates_check_a_participant_in_once(self):
+        participant = self.participants[0]
+        checkin.get_roster(self.event.pk)
+        # Another process checked the participant in after this roster loaded
+        Participant.objects.filter(pk=participant.pk).update(
+            attendance_status=Participant.AttendanceStatus.CHECKED_IN
+        )
+
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay") as delay:
+            result = checkin.check_in_participants(
+                self.event, self._scans([participant])
+            )
+
+        self.assertEqual(result.checked_in, [])
+        self.assertEqual(
+            result.rejected, {str(participant.pk): checkin.ALREADY_CHECKED_IN}
+        )
+        delay.assert_not_called()
+
+    def test_side_effects_are_applied_once_per_batch(self):
+        batch = self.participants[:5]
+
+        with CaptureQueriesContext(connection) as context:
+            checkin.apply_check_in_side_effects(
+                str(self.event.pk), [str(participant.pk) for participant in batch]
+            )
+
+        self.assertLessEqual(len(app_queries(context)), 6)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendance_count, 5)
+        self.assertEqual(self.event.analytics.total_attendance, 5)
+        self.assertEqual(
+            set(
+                Participant.objects.filter(pk__in=[p.pk for p in batch]).values_list(
+                    "points", flat=True
+                )
+            ),
+            {10},
+        )
+        self.assertFalse(ParticipantBadge.objects.exists())
+
+    def test_level_ups_are_rewarded(self):
+        leveler, other = self.participants[:2]
+        Participant.objects.filter(pk=leveler.pk).update(points=95)
+        badge = EventBadge.objects.create(name="Level 2")
+
+        checkin.apply_check_in_side_effects(
+            str(self.event.pk), [str(leveler.pk), str(other.pk)]
+        )
+
+        leveler.refresh_from_db()
+        self.assertEqual((leveler.points, leveler.level), (105, 2))
+        self.assertEqual(
+            list(ParticipantBadge.objects.values_list("participant", "badge")),
+            [(leveler.pk, badge.pk)],
+        )
+
+    def test_sync_endpoint(self):
+        url = reverse("events:event-check-ins", args=[self.event.pk])
+        scans = [
+            {
+                "participant_id": str(self.participants[0].pk),
+                "scanned_at": (timezone.now() - timedelta(minutes=3)).isoformat(),
+            },
+            {"ticket_code": "attendee-1"},
+            {"ticket_code": "attendee-2", "scanned_at": "yesterday"},
+        ]
+
+        self.client.force_authenticate(self.participants[3].user)
+        response = self.client.post(url, {"scans": scans}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(self.organizer)
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay"):
+            response = self.client.post(url, {"scans": scans}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["checked_in"], 2)
+        self.assertEqual(response.data["rejected"], {"attendee-2": checkin.INVALID})
+
+    @load_test
+    def test_gate_check_in_throughput(self):
+        attendees = self._attendees(LOAD_TEST_CHECK_INS, prefix="fan")
+        scans = [checkin.Scan(participant.ticket_code) for participant in attendees]
+        batch_size = 500
+
+        with mock.patch("apps.events.tasks.apply_check_in_side_effects.delay"):
+            for start in range(0, len(scans), batch_size):
+                checkin.check_in_participants(
+                    self.event, scans[start : start + batch_size]
+                )
+
+        self.assertEqual(len(self._checked_in()), LOAD_TEST_CHECK_INS)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventRecommendationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.users = [
+            User.objects.create_user(
+                username=f"attendee{index}", email=f"attendee{index}@example.com"
+            )
+            for index in range(5)
+        ]
+        self.python, self.django, self.rust, self.golang = [
+            create_event(self.organizer, name=name)
+            for name in ("Python", "Django", "Rust", "Go")
+        ]
+        self.past = create_event(
+            self.organizer,
+            name="Archive",
+            start_date=timezone.now() - timedelta(days=30),
+            end_date=timezone.now() - timedelta(days=29),
+        )
+
+        first, second, third = self.users[:3]
+        EventFavorite.objects.create(user=first, event=self.python)
+        EventFavorite.objects.create(user=first, event=self.django)
+        create_participant(self.python, second)
+        create_participant(self.django, second)
+        EventView.objects.create(user=third, event=self.python)
+        EventView.objects.create(user=third, event=self.rust)
+        EventView.objects.create(user=third, event=self.past)
+
+    def _similar(self, event):
+        return list(
+            EventSimilarity.objects.filter(event=event)
+            .order_by("-score")
+            .values_list("similar_event", flat=True)
+        )
+
+    def _recommended(self, user):
+        return list(
+            EventRecommendation.objects.filter(user=user)
+            .order_by("-score")
+            .values_list("event", flat=True)
+        )
+
+    def test_similar_events_follow_shared_interactions(self):
+        recommendations.build_recommendations()
+
+        self.assertEqual(self._similar(self.python), [self.django.pk, self.rust.pk])
+        self.assertEqual(self._similar(self.rust), [self.python.pk])
+        # Past events drive similarity but are never suggested
+        self.assertEqual(self._similar(self.past), [self.rust.pk, self.python.pk])
+        self.assertNotIn(self.past.pk, self._similar(self.python))
+
+    def test_users_get_events_they_have_not_seen(self):
+        fan = self.users[3]
+        EventFavorite.objects.create(user=fan, event=self.python)
+
+        recommendations.build_recommendations()
+
+        self.assertEqual(self._recommended(fan), [self.django.pk, self.rust.pk])
+        self.assertEqual(self._recommended(self.users[0]), [self.rust.pk])
+
+    def test_incremental_refresh_picks_up_new_interactions(self):
+        recommendations.refresh_changed_recommendations()
+        self.assertEqual(self._similar(self.golang), [])
+
+        newcomer = self.users[4]
+        EventFavorite.objects.create(user=newcomer, event=self.rust)
+        EventFavorite.objects.create(user=newcomer, event=self.golang)
+        self.assertEqual(
+            event_tasks.refresh_event_recommendations()["status"], "refreshed"
+        )
+        incremental = {
+            event.pk: self._similar(event)
+            for event in (self.python, self.rust, self.golang)
+        }
+
+        self.assertIn(self.golang.pk, incremental[self.rust.pk])
+        self.assertEqual(incremental[self.golang.pk], [self.rust.pk])
+        self.assertEqual(self._recommended(newcomer), [self.python.pk])
+
+        # A full build agrees with the incremental one on the touched events
+        recommendations.build_recommendations()
+        for event_id, similar in incremental.items():
+            self.assertEqual(self._similar(Event.objects.get(pk=event_id)), similar)
+        tasks = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn("apps.events.tasks.refresh_event_recommendations", tasks)
+
+    def test_weekly_full_build_drops_deleted_interactions(self):
+        recommendations.refresh_changed_recommendations()
+        self.assertEqual(self._similar(self.python), [self.django.pk, self.rust.pk])
+
+        EventView.objects.filter(user=self.users[2], event=self.rust).delete()
+        recommendations.refresh_changed_recommendations()
+        # The deletion leaves nothing for the incremental refresh to see
+        self.assertIn(self.rust.pk, self._similar(self.python))
+
+        self.assertEqual(
+            event_tasks.rebuild_event_recommendations()["status"], "rebuilt"
+        )
+        self.assertEqual(self._similar(self.python), [self.django.pk])
+        tasks = {entry["task"] for entry in settings.CELERY_BEAT_SCHEDULE.values()}
+        self.assertIn("apps.events.tasks.rebuild_event_recommendations", tasks)
+
+    def test_recommended_action_reads_precomputed_rows(self):
+        fan = self.users[3]
+        EventFavorite.objects.create(user=fan, event=self.python)
+        recommendations.build_recommendations()
+        url = reverse("events:event-recommended")
+
+        self.client.force_authenticate(fan)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["id"] for item in response.data],
+            [str(self.django.pk), str(self.rust.pk)],
+        )
+        for query in app_queries(context):
+            self.assertNotIn("events_eventview", query["sql"])
+
+        # Users without recommendations get the trending events
+        Event.objects.filter(pk=self.golang.pk).update(trending_score=1000.0)
+        self.client.force_authenticate(self.users[4])
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]["id"], str(self.golang.pk))
+
+    @load_test
+    def test_build_over_many_interactions(self):
+        start = timezone.now() + timedelta(days=30)
+        events = Event.objects.bulk_create(
+            [
+                Event(
+                    name=f"Event {index}",
+                    slug=f"event-{index}",
+                    organizer=self.organizer,
+                    status=Event.EventStatus.PUBLISHED,
+                    start_date=start,
+                    end_date=start + timedelta(days=1),
+                )
+                for index in range(1000)
+            ]
+        )
+        users = User.objects.bulk_create(
+            [
+                User(username=f"fan{index}", email=f"fan{index}@example.com")
+                for index in range(LOAD_TEST_INTERACTIONS // 20)
+            ],
+            batch_size=2000,
+        )
+        rng = random.Random(0)
+        batch = []
+        for index in range(LOAD_TEST_INTERACTIONS):
+            user_index = index % len(users)
+            # Users stick to a neighbourhood of events, as interests do
+            event = events[(user_index * 37 + rng.randrange(50)) % len(events)]
+            batch.append(EventView(event=event, user=users[user_index]))
+            if len(batch) >= 50000:
+                EventView.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        EventView.objects.bulk_create(batch, batch_size=5000)
+
+        event_count, user_count = recommendations.build_recommendations()
+
+        matrix = recommendations.load_interactions()
+
+        self.assertEqual(len(matrix.event_ids), event_count)
+        self.assertGreater(event_count, 900)
+        self.assertGreaterEqual(user_count, len(users))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventFilterIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.organizer = User.objects.create_user(
+            username="organizer", email="organizer@example.com", password="pass12345"
+        )
+        self.tech = EventCategory.objects.create(name="Technology", slug="tech")
+        self.programming = EventCategory.objects.create(
+            name="Programming", slug="programming", parent=self.tech
+        )
+        self.python_category = EventCategory.objects.create(
+            name="Python", slug="python", parent=self.programming
+        )
+        self.music = EventCategory.objects.create(name="Music", slug="music")
+        self.web, self.data, self.ml = (
+            EventTag.objects.create(name=name, slug=name.lower())
+            for name in ("Web", "Data", "ML")
+        )
+
+        self.pycon = create_event(self.organizer, "PyCon")
+        EventCategoryRelation.objects.create(
+            event=self.pycon, category=self.python_category
+        )
+        EventTagRelation.objects.create(event=self.pycon, tag=self.web)
+        EventTagRelation.objects.create(event=self.pycon, tag=self.data)
+        self.devcon = create_event(self.organizer, "DevCon")
+        EventCategoryRelation.objects.create(event=self.devcon, category=self.tech)
+        EventTagRelation.objects.create(event=self.devcon, tag=self.ml)
+        self.concert = create_event(self.organizer, "Concert")
+        EventCategoryRelation.objects.create(event=self.concert, category=self.music)
+
+    def _names(self, response):
+        return {event["name"] for event in response.data["results"]}
+
+    def test_relation_signals_maintain_indexes(self):
+        self.pycon.refresh_from_db()
+        self.assertIn(f",{self.python_category.pk},", self.pycon.category_index)
+        self.assertNotIn(f",{self.tech.pk},", self.pycon.category_index)
+        for category in (self.tech, self.programming, self.python_category):
+            self.assertIn(f",{category.pk},", self.pycon.category_tree_index)
+        self.assertEqual(
+            self.pycon.tag_index,
+            f",{min(self.web.pk, self.data.pk)},{max(self.web.pk, self.data.pk)},",
+        )
+
+        EventTagRelation.objects.filter(event=self.pycon, tag=self.web).delete()
+        self.pycon.refresh_from_db()
+        self.assertEqual(self.pycon.tag_index, f",{self.data.pk},")
+
+        # Moving a category re-indexes the events beneath it; MPTT renumbers
+        # trees as roots are added, so reload the nodes first
+        self.music.refresh_from_db()
+        self.programming.refresh_from_db()
+        self.programming.parent = self.music
+        self.programming.save()
+        self.pycon.refresh_from_db()
+        self.assertIn(f",{self.music.pk},", self.pycon.category_tree_index)
+        self.assertNotIn(f",{self.tech.pk},", self.pycon.category_tree_index)
+
+    def test_filters_read_the_index(self):
+        url = reverse("events:event-list")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"tags": [self.web.pk, self.ml.pk]})
+        self.assertEqual(self._names(response), {"PyCon", "DevCon"})
+        for query in app_queries(context):
+            self.assertNotIn("events_eventtagrelation", query["sql"])
+            self.assertNotIn("DISTINCT", query["sql"])
+
+        response = self.client.get(url, {"categories": [self.tech.pk]})
+        self.assertEqual(self._names(response), {"DevCon"})
+        response = self.client.get(url, {"category_tree": [self.tech.pk]})
+        self.assertEqual(self._names(response), {"PyCon", "DevCon"})
+
+        # A category's events include its subcategories' events
+        response = self.client.get(
+            reverse("events:eventcategory-events", args=[self.programming.pk])
+        )
+        self.assertEqual(self._names(response), {"PyCon"})
+
+    def test_rebuild_indexes_relations_created_in_bulk(self):
+        EventTagRelation.objects.bulk_create(
+            [EventTagRelation(event=self.concert, tag=self.ml)]
+        )
+        self.assertFalse(Event.objects.with_tags([self.ml.pk]).filter(name="Concert"))
+
+        filter_index.rebuild_filter_indexes()
+        self.assertEqual(
+            set(Event.objects.with_tags([self.ml.pk]).values_list("name", flat=True)),
+            {"DevCon", "Concert"},
+        )
+
+    @load_test
+    def test_multi_tag_filter_benchmark(self):
+        tags = EventTag.objects.bulk_create(
+            [EventTag(name=f"Tag {index}", slug=f"tag-{index}") for index in range(50)]
+        )
+        start = timezone.now() + timedelta(days=30)
+        events = Event.objects.bulk_create(
+            [
+                Event(
+                    name=f"Event {index}",
+                    slug=f"event-{index}",
+                    organizer=self.organizer,
+                    status=Event.EventStatus.PUBLISHED,
+                    start_date=start,
+                    end_date=start + timedelta(days=1),
+                )
+                for index in range(LOAD_TEST_TAGGED_EVENTS)
+            ],
+            batch_size=2000,
+        )
+        rng = random.Random(0)
+        EventTagRelation.objects.bulk_create(
+            [
+                EventTagRelation(event=event, tag=tag)
+                for event in events
+                for tag in rng.sample(tags, 3)
+            ],
+            batch_size=5000,
+        )
+        filter_index.rebuild_filter_indexes()
+
+        wanted = [tag.pk for tag in tags[:3]]
+        joined = Event.objects.filter(eventtagrelation__tag__in=wanted).distinct()
+        indexed = Event.objects.with_tags(wanted)
+
+        ids = list(indexed.order_by("-start_date").values_list("pk")[:20])
+        self.assertEqual(indexed.count(), joined.count())
+        self.assertEqual(set(indexed.values_list("pk")), set(joined.values_list("pk")))
+        self.assertEqual(len(ids), 20)